@@ -1,12 +1,11 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from pathlib import Path
 import os
 from sqlalchemy.pool import NullPool
 
 db = SQLAlchemy()
-migrate = Migrate()
+migrate = None  # Flask-Migrate instance, set up by create_app() when migrations are enabled
 
 
 def create_app(test_config: dict | None = None) -> Flask:
@@ -23,6 +22,23 @@ def create_app(test_config: dict | None = None) -> Flask:
 			f"sqlite:///{Path(app.instance_path) / 'app.sqlite'}",
 		),
 		SQLALCHEMY_TRACK_MODIFICATIONS=False,
+		CACHE_MAXSIZE=int(os.environ.get("CACHE_MAXSIZE", 2048)),
+		CACHE_TTL=float(os.environ.get("CACHE_TTL", 300)),
+		# Trust a gateway-supplied user id header (e.g. "X-User-Id"); unset = session cookie only
+		USER_ID_HEADER=os.environ.get("USER_ID_HEADER"),
+		# Fleet/operator endpoints need this in the X-Admin-Token header; unset = closed (use the CLI)
+		ADMIN_TOKEN=os.environ.get("ADMIN_TOKEN"),
+		PDF_WORKERS=int(os.environ.get("PDF_WORKERS", 2)),
+		# Monte Carlo sensitivity on web requests: sample cap and process-pool size (1 = in-process)
+		SENSITIVITY_MAX_SAMPLES=int(os.environ.get("SENSITIVITY_MAX_SAMPLES", 50000)),
+		SENSITIVITY_WORKERS=int(os.environ.get("SENSITIVITY_WORKERS", 1)),
+		# Per-route SQL/render/compute timings at /metrics and sampling profiles at /admin/profile
+		INSTRUMENTATION=os.environ.get("INSTRUMENTATION", "").lower() in ("1", "true"),
+		PROFILE_MAX_SECONDS=float(os.environ.get("PROFILE_MAX_SECONDS", 30)),
+		# "auto": create tables only until the current schema is recorded; "always" | "never"
+		AUTO_CREATE_SCHEMA=os.environ.get("AUTO_CREATE_SCHEMA", "auto"),
+		# Flask-Migrate (and alembic) is only needed for `flask db ...`; skip it on web workers
+		ENABLE_MIGRATIONS=os.environ.get("ENABLE_MIGRATIONS", os.environ.get("FLASK_RUN_FROM_CLI", "")).lower() in ("1", "true"),
 	)
 
 	# Ensure the instance folder exists
@@ -43,18 +59,47 @@ def create_app(test_config: dict | None = None) -> Flask:
 
 	app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options)
 	db.init_app(app)
-	migrate.init_app(app, db)
+	if app.config["ENABLE_MIGRATIONS"]:
+		_init_migrations(app)
+
+	from .cache import init_cache
+	from .assumptions import init_assumptions
+	from .jobs import init_jobs
+	from .instrumentation import init_instrumentation
+	from .tariffs import init_tariffs
+
+	init_cache(app)
+	init_assumptions(app)
+	init_tariffs(app)
+	init_jobs(app)
+	init_instrumentation(app)
 
 	# Register blueprints
 	from .routes import bp as main_bp
+	from .api import bp as api_bp
 
 	app.register_blueprint(main_bp)
+	app.register_blueprint(api_bp)
+
+	from .cli import register_commands
+
+	register_commands(app)
 
-	# Create tables if not using migrations
+	# Create tables if not using migrations (skipped once the schema is recorded)
 	with app.app_context():
-		from . import models  # noqa: F401
-		db.create_all()
+		from .schema import ensure_schema
+
+		ensure_schema(app)
 
 	return app
 
 
+def _init_migrations(app: Flask) -> None:
+	global migrate
+	from flask_migrate import Migrate
+
+	if migrate is None:
+		migrate = Migrate()
+	migrate.init_app(app, db)
+
+
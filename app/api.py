@@ -0,0 +1,116 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import time
+from datetime import date
+from typing import Any, Callable
+
+from flask import Blueprint, Response, jsonify, request
+
+from .assumptions import assumptions_version, read_version, user_version_key
+from .identity import current_user
+from .routes import dashboard_data, ranked_recommendations, scenarios_data
+from .tariffs import tariffs_version
+
+# JSON API for the dashboard and scenario charts. Every response carries a weak ETag derived from the
+# shared per-user data version (bumped by each write to the user's appliances, profile, readings or
+# scenarios), the assumptions and tariff versions and today's date. A matching If-None-Match is answered
+# with 304 before anything is computed; larger bodies are gzipped when the client accepts it. The KPI
+# payload's cohort percentile moves with other households' writes, so its ETag also rolls over every
+# COHORT_ETAG_SECONDS instead of tracking every household in the cohort.
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+API_REVISION = 1  # bump when a payload's shape changes, so clients drop cached bodies
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+COHORT_ETAG_SECONDS = 900
+
+
+def data_etag(user_id: int, *parts: Any) -> str:
+	key = (API_REVISION, read_version(user_version_key(user_id)), assumptions_version(), tariffs_version(), date.today().isoformat(), parts)
+	return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+
+
+def cohort_window() -> int:
+	# ETag part for payloads carrying the cohort percentile (also embedded by the dashboard page)
+	return int(time.time() // COHORT_ETAG_SECONDS)
+
+
+def conditional_json(user_id: int, build: Callable[[], Any], *parts: Any) -> Response:
+	"""
+	304 when the client's ETag still matches the user's data, else build() as JSON with a fresh ETag.
+	"""
+	etag = data_etag(user_id, request.endpoint, *sorted(request.args.items(multi=True)), *parts)
+	if request.if_none_match.contains_weak(etag):
+		response = Response(status=304)
+	else:
+		response = jsonify(build())
+	response.set_etag(etag, weak=True)
+	# Always revalidate: the ETag check is cheap and the data changes on the user's next write
+	response.headers["Cache-Control"] = "private, no-cache"
+	return response
+
+
+@bp.after_request
+def gzip_response(response: Response) -> Response:
+	response.vary.add("Accept-Encoding")
+	if (
+		response.status_code != 200
+		or response.direct_passthrough
+		or "Content-Encoding" in response.headers
+		or "gzip" not in request.accept_encodings
+		or (response.content_length or 0) < GZIP_MIN_BYTES
+	):
+		return response
+	response.set_data(gzip.compress(response.get_data(), GZIP_LEVEL))
+	response.headers["Content-Encoding"] = "gzip"
+	return response
+
+
+def _recommendation_dict(r: Any) -> dict:
+	return dict(r.__dict__, key=r.key, retrofit_cost=r.retrofit_cost)
+
+
+@bp.route("/kpis")
+def kpis():
+	"""
+	Dashboard KPIs and chart series (same values as the /dashboard page).
+	"""
+	user = current_user()
+
+	def build() -> dict:
+		data = dashboard_data(user)
+		if data["profile"]:
+			data["profile"] = dict(data["profile"], peak_at=data["profile"]["peak_at"].isoformat())
+		return data
+
+	return conditional_json(user.id, build, cohort_window())
+
+
+@bp.route("/recommendations")
+def recommendations():
+	"""
+	Ranked recommendations; ?rank=co2 orders by CO2 saved.
+	"""
+	user = current_user()
+	rank = request.args.get("rank", "cost")
+	return conditional_json(user.id, lambda: {"rank": rank, "recommendations": [_recommendation_dict(r) for r in ranked_recommendations(user, rank)]})
+
+
+@bp.route("/scenarios")
+def scenarios():
+	"""
+	Saved scenarios and the baseline-vs-latest chart series (same values as the /scenarios page).
+	"""
+	user = current_user()
+
+	def build() -> dict:
+		data = scenarios_data(user)
+		data["scenarios"] = [
+			{"id": s.id, "name": s.name, "saved_kwh": s.saved_kwh, "saved_cost": s.saved_cost, "saved_co2": s.saved_co2}
+			for s in data["scenarios"]
+		]
+		return data
+
+	return conditional_json(user.id, build)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import threading
+from typing import Dict, Iterable, Mapping
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import exists, insert, literal, select, update
+
+from . import db
+from .identity import current_user_id
+from .models import Assumption, DataVersion, User, UserGoal
+from .schema import dialect_insert
+
+ASSUMPTIONS_VERSION_KEY = "assumptions"
+
+# sensible defaults
+DEFAULT_ASSUMPTIONS: Dict[str, float] = {
+	"ac_coefficient_per_degree": 0.04,
+	"default_led_w": 9.0,
+	"default_standby_w": 10.0,
+	"default_standby_hours": 2.0,
+	"lighting_cost_per_unit": 80.0,
+}
+
+
+# Dashboard goals were once global assumption rows; backfill_goals() moves them to user_goals
+LEGACY_GOAL_KEYS = {"goal_month_kwh": "month_kwh", "goal_month_cost": "month_cost"}
+
+# Shared keys most requests poll (tariffs.py adds its own); fetched together on a request's first read
+PREFETCH_VERSION_KEYS = {ASSUMPTIONS_VERSION_KEY}
+
+
+def read_versions(keys: Iterable[str]) -> Dict[str, int]:
+	"""
+	Version counters for keys (0 when absent). Inside a request they are memoized on `g`, and the first
+	read also fetches PREFETCH_VERSION_KEYS and the current household's key in the same query.
+	"""
+	keys = list(keys)
+	memo = g.setdefault("_data_versions", {}) if has_request_context() else {}
+	missing = [k for k in keys if k not in memo]
+	if missing:
+		if has_request_context():
+			user_id = current_user_id()
+			extra = PREFETCH_VERSION_KEYS | ({user_version_key(user_id)} if user_id is not None else set())
+			missing += [k for k in extra if k not in memo and k not in missing]
+		rows = dict(db.session.execute(select(DataVersion.key, DataVersion.version).where(DataVersion.key.in_(missing))).all())
+		memo.update({k: rows.get(k) or 0 for k in missing})
+	return {k: memo[k] for k in keys}
+
+
+def read_version(key: str) -> int:
+	return read_versions([key])[key]
+
+
+def _forget_versions(keys: Iterable[str]) -> None:
+	memo = g.get("_data_versions") if has_request_context() else None
+	if memo:
+		for key in keys:
+			memo.pop(key, None)
+
+
+def bump_version(key: str) -> None:
+	"""
+	Increment a shared version counter inside the caller's transaction.
+	"""
+	result = db.session.execute(update(DataVersion).where(DataVersion.key == key).values(version=DataVersion.version + 1))
+	if result.rowcount == 0:
+		db.session.add(DataVersion(key=key, version=1))
+	_forget_versions([key])
+
+
+def user_version_key(user_id: int) -> str:
+	return f"user:{user_id}"
+
+
+def bump_user_versions(user_ids: Iterable[int]) -> None:
+	"""
+	Increment the per-user data versions (API ETags) inside the caller's transaction, one statement
+	for the whole batch where the dialect supports upserts.
+	"""
+	keys = sorted({user_version_key(u) for u in user_ids})
+	if not keys:
+		return
+	insert_ = dialect_insert()
+	if insert_ is None:
+		for key in keys:
+			bump_version(key)
+		return
+	stmt = insert_(DataVersion)
+	db.session.execute(
+		stmt.on_conflict_do_update(index_elements=["key"], set_={"version": DataVersion.version + 1}),
+		[{"key": key, "version": 1} for key in keys],
+	)
+	_forget_versions(keys)
+
+
+class AssumptionsStore:
+	"""
+	Process-wide memoized assumptions snapshot.
+
+	Every worker keeps the last loaded table plus the version it was loaded at. A request only polls the
+	single `data_versions` row (memoized in `g` for the rest of the request); the table is reloaded when
+	another worker (or this one) has committed a newer version through save_assumptions().
+	"""
+
+	def __init__(self) -> None:
+		self.version = -1
+		self.values: Dict[str, float] = {}
+		self._lock = threading.Lock()
+
+	def current(self) -> tuple[int, Dict[str, float]]:
+		cached = g.get("_assumptions_snapshot")
+		if cached is not None:
+			return cached
+		version = read_version(ASSUMPTIONS_VERSION_KEY)
+		with self._lock:
+			if version != self.version:
+				values = {a.key: float(a.value) for a in Assumption.query.all()}
+				for k, v in DEFAULT_ASSUMPTIONS.items():
+					values.setdefault(k, v)
+				# Version was read before the rows, so a concurrent write can only make this snapshot newer
+				self.version, self.values = version, values
+			snapshot = (self.version, self.values)
+		g._assumptions_snapshot = snapshot
+		return snapshot
+
+
+def _store() -> AssumptionsStore:
+	return current_app.extensions["assumptions_store"]
+
+
+def init_assumptions(app) -> AssumptionsStore:
+	store = AssumptionsStore()
+	app.extensions["assumptions_store"] = store
+	return store
+
+
+def get_assumptions() -> Dict[str, float]:
+	return dict(_store().current()[1])
+
+
+def assumptions_version() -> int:
+	return _store().current()[0]
+
+
+def save_assumptions(values: Mapping[str, float]) -> None:
+	"""
+	Upsert assumption values, bump the shared version and commit in one transaction.
+	"""
+	if not values:
+		return
+	existing = {a.key: a for a in Assumption.query.filter(Assumption.key.in_(list(values))).all()}
+	for key, val in values.items():
+		if key in existing:
+			existing[key].value = val
+		else:
+			db.session.add(Assumption(key=key, value=val))
+	bump_version(ASSUMPTIONS_VERSION_KEY)
+	db.session.commit()
+	g.pop("_assumptions_snapshot", None)
+
+
+def backfill_goals() -> int:
+	"""
+	Give every household without goals the legacy global goal_month_* values (0 = no goal), then drop
+	those assumption rows. One statement and commit; safe to re-run. Returns the households backfilled.
+	"""
+	legacy = Assumption.query.filter(Assumption.key.in_(list(LEGACY_GOAL_KEYS))).all()
+	if not legacy:
+		return 0
+	goals = {col: None for col in LEGACY_GOAL_KEYS.values()}
+	for row in legacy:
+		goals[LEGACY_GOAL_KEYS[row.key]] = float(row.value) or None
+	filled = 0
+	if any(v is not None for v in goals.values()):
+		missing = select(User.id, *(literal(v, db.Float).label(col) for col, v in goals.items())).where(
+			~exists().where(UserGoal.user_id == User.id)
+		)
+		filled = db.session.execute(insert(UserGoal).from_select(["user_id", *goals], missing)).rowcount
+	for row in legacy:
+		db.session.delete(row)
+	# The dashboard's ETags key on this version, so pages cached with the old global goals revalidate
+	bump_version(ASSUMPTIONS_VERSION_KEY)
+	db.session.commit()
+	g.pop("_assumptions_snapshot", None)
+	return filled
@@ -0,0 +1,386 @@
+from __future__ import annotations
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+# Columnar (vectorized) versions of the core calculations, for many households at once.
+# Results match compute_kpis() in calculations.py; see tests/test_batch.py.
+
+APPLIANCE_COLUMNS = ["id", "user_id", "type", "power_w", "quantity", "hours_per_day", "days_per_week", "star_label"]
+USER_COLUMNS = ["id", "tariff", "ef"]
+KPI_COLUMNS = ["daily_kwh", "monthly_kwh", "monthly_cost", "monthly_co2"]
+
+
+def appliances_frame(appliances: Iterable[Any]) -> pd.DataFrame:
+	"""
+	Build a columnar appliance frame from Appliance-like objects (keeps input order).
+	"""
+	rows = [[getattr(a, c, None) for c in APPLIANCE_COLUMNS] for a in appliances]
+	return pd.DataFrame(rows, columns=APPLIANCE_COLUMNS)
+
+
+def users_frame(users: Iterable[Any]) -> pd.DataFrame:
+	"""
+	Build a users frame (indexed by user id, columns tariff and ef) from User-like objects.
+	"""
+	rows = [[getattr(u, c) for c in USER_COLUMNS] for u in users]
+	return pd.DataFrame(rows, columns=USER_COLUMNS).set_index("id")
+
+
+def load_appliances_frame(user_ids: Iterable[int] | None = None) -> pd.DataFrame:
+	"""
+	Read appliances straight into a frame, skipping ORM object construction.
+	"""
+	from sqlalchemy import select
+	from . import db
+	from .models import Appliance
+
+	stmt = select(*(getattr(Appliance, c) for c in APPLIANCE_COLUMNS)).order_by(Appliance.user_id, Appliance.id)
+	if user_ids is not None:
+		stmt = stmt.where(Appliance.user_id.in_(list(user_ids)))
+	result = db.session.execute(stmt)
+	return pd.DataFrame(result.all(), columns=APPLIANCE_COLUMNS)
+
+
+def load_users_frame(user_ids: Iterable[int] | None = None) -> pd.DataFrame:
+	"""
+	Users frame from the database, with a plan_id column (NaN = flat tariff) from user_tariffs.
+	"""
+	from sqlalchemy import select
+	from . import db
+	from .models import User, UserTariff
+
+	stmt = (
+		select(User.id, User.tariff, User.ef, UserTariff.plan_id)
+		.outerjoin(UserTariff, UserTariff.user_id == User.id)
+		.order_by(User.id)
+	)
+	if user_ids is not None:
+		stmt = stmt.where(User.id.in_(list(user_ids)))
+	result = db.session.execute(stmt)
+	frame = pd.DataFrame(result.all(), columns=USER_COLUMNS + ["plan_id"]).set_index("id")
+	frame["plan_id"] = frame["plan_id"].astype(np.float64)
+	return frame
+
+
+def daily_kwh_array(power_w: Any, quantity: Any, hours_per_day: Any, days_per_week: Any) -> np.ndarray:
+	"""
+	Per-appliance daily kWh, same operation order as Appliance.daily_kwh().
+	"""
+	power_w = np.asarray(power_w, dtype=np.float64)
+	quantity = np.asarray(quantity, dtype=np.float64)
+	avg_daily_hours = np.asarray(hours_per_day, dtype=np.float64) * (np.asarray(days_per_week, dtype=np.float64) / 7.0)
+	return (power_w * quantity * avg_daily_hours) / 1000.0
+
+
+def user_codes(user_ids: Any, index: pd.Index) -> np.ndarray:
+	"""
+	Map user ids to row positions in index; -1 for users not present.
+	"""
+	return index.get_indexer(np.asarray(user_ids))
+
+
+def daily_kwh_by_user(appliances: pd.DataFrame, index: pd.Index) -> np.ndarray:
+	"""
+	E_daily per user (Σ over that user's appliances), aligned with index.
+	Users without appliances get 0.0; appliances of users missing from index are ignored.
+	"""
+	if appliances.empty:
+		return np.zeros(len(index), dtype=np.float64)
+	daily = daily_kwh_array(
+		appliances["power_w"].to_numpy(),
+		appliances["quantity"].to_numpy(),
+		appliances["hours_per_day"].to_numpy(),
+		appliances["days_per_week"].to_numpy(),
+	)
+	codes = user_codes(appliances["user_id"], index)
+	mask = codes >= 0
+	# bincount accumulates in input order, like the scalar sum()
+	return np.bincount(codes[mask], weights=daily[mask], minlength=len(index))
+
+
+def monthly_cost_array(e_month: np.ndarray, users: pd.DataFrame, plans: dict | None = None) -> np.ndarray:
+	"""
+	Monthly bills: users with a plan_id are billed by their compiled plan, the rest at the flat tariff.
+	"""
+	tariff = users["tariff"].to_numpy(dtype=np.float64)
+	if not plans or "plan_id" not in users:
+		return e_month * tariff
+	from .tariffs import monthly_costs
+
+	return monthly_costs(e_month, tariff, users["plan_id"].to_numpy(dtype=np.float64), plans)
+
+
+def compute_kpis_batch(appliances: pd.DataFrame, users: pd.DataFrame, rounded: bool = True, plans: dict | None = None) -> pd.DataFrame:
+	"""
+	Vectorized compute_kpis() for many users in one pass.
+	appliances: columns user_id, power_w, quantity, hours_per_day, days_per_week.
+	users: indexed by user id with columns tariff and ef (and optionally plan_id, billed through plans).
+	Returns a frame indexed like users with daily_kwh, monthly_kwh, monthly_cost, monthly_co2.
+	"""
+	e_daily = daily_kwh_by_user(appliances, users.index)
+	e_month = e_daily * 30.0
+	cost = monthly_cost_array(e_month, users, plans)
+	co2 = e_month * users["ef"].to_numpy(dtype=np.float64)
+	kpis = pd.DataFrame(
+		{"daily_kwh": e_daily, "monthly_kwh": e_month, "monthly_cost": cost, "monthly_co2": co2},
+		index=users.index,
+	)
+	if rounded:
+		kpis = kpis.round({"daily_kwh": 3, "monthly_kwh": 3, "monthly_cost": 2, "monthly_co2": 2})
+	return kpis
+
+
+# Columnar recommendations: rules evaluated over arrays, Recommendation objects built only for top-K rows.
+
+_OTHER, _LIGHTING, _AC, _FRIDGE = 0, 1, 2, 3
+
+
+def _classify_types(types: pd.Series) -> np.ndarray:
+	"""
+	Classify appliance types once per distinct label instead of once per row.
+	"""
+	from .recommendations import LIGHTING_TYPES, AC_TYPES, FRIDGE_TYPES
+
+	cat = types.astype("category")
+	lookup = np.array(
+		[
+			_LIGHTING if t in LIGHTING_TYPES else _AC if t in AC_TYPES else _FRIDGE if t in FRIDGE_TYPES else _OTHER
+			for t in (str(c).lower() for c in cat.cat.categories)
+		]
+		+ [_OTHER],  # code -1 (missing type) maps to the last slot
+		dtype=np.int8,
+	)
+	return lookup[cat.cat.codes.to_numpy()]
+
+
+def _payback_array(retrofit_cost: np.ndarray, delta_cost: np.ndarray) -> np.ndarray:
+	# payback_months() over arrays; NaN where it would return None
+	with np.errstate(divide="ignore", invalid="ignore"):
+		return np.where(delta_cost > 0, retrofit_cost / np.where(delta_cost > 0, delta_cost, 1.0), np.nan)
+
+
+def _impact_score_array(delta_cost: np.ndarray, payback: np.ndarray) -> np.ndarray:
+	# _impact_score() over arrays; NaN payback means "no payback" (factor 1.0)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		factor = np.clip(12.0 / (payback + 1e-6), 0.1, 1.0)
+	return delta_cost * np.where(np.isnan(payback), 1.0, factor)
+
+
+def recommendation_frame(
+	appliances: pd.DataFrame,
+	users: pd.DataFrame,
+	assumptions: dict[str, float] | None = None,
+	plans: dict | None = None,
+) -> pd.DataFrame:
+	"""
+	Evaluate every rule of generate_recommendations() for many users at once.
+	Returns one row per candidate measure (unranked), with raw and rounded savings.
+	Users with a plan_id get slab-aware ₹ savings from their compiled plan (see generate_recommendations).
+	"""
+	from .recommendations import AC_DELTA_T, FRIDGE_NEW_KWH_YEAR, FRIDGE_RETROFIT_COST, fridge_old_kwh_year
+
+	assumptions = assumptions or {}
+	coeff_ac_per_deg = assumptions.get("ac_coefficient_per_degree", 0.04)
+	default_led_w = assumptions.get("default_led_w", 9.0)
+	default_standby_w = assumptions.get("default_standby_w", 10.0)
+	default_standby_hours = assumptions.get("default_standby_hours", 2.0)
+	lighting_cost_per_unit = assumptions.get("lighting_cost_per_unit", 80.0)
+
+	index = users.index
+	tariff = users["tariff"].to_numpy(dtype=np.float64)
+	ef = users["ef"].to_numpy(dtype=np.float64)
+	codes = user_codes(appliances["user_id"], index) if len(appliances) else np.zeros(0, dtype=np.intp)
+	known = codes >= 0
+	apps = appliances[known]
+	codes = codes[known]
+
+	kind = _classify_types(apps["type"]) if len(apps) else np.zeros(0, dtype=np.int8)
+	app_id = apps["id"].to_numpy()
+	power = apps["power_w"].to_numpy(dtype=np.float64)
+	qty = apps["quantity"].to_numpy(dtype=np.int64)
+	hours = apps["hours_per_day"].to_numpy(dtype=np.float64)
+	star = apps["star_label"].fillna("").astype(str)
+
+	parts = []
+	planned = None
+	if plans and "plan_id" in users:
+		plan_ids = users["plan_id"].to_numpy(dtype=np.float64)
+		planned = ~np.isnan(plan_ids)
+		base_kwh = daily_kwh_by_user(apps, index) * 30.0
+
+	def add(code, rows, delta_kwh, retrofit_cost, payback, **extra):
+		delta_cost = delta_kwh * tariff[rows]
+		if planned is not None and planned[rows].any():
+			from .tariffs import monthly_costs
+
+			sel = planned[rows]
+			r, base = rows[sel], base_kwh[rows[sel]]
+			delta_cost[sel] = monthly_costs(base, tariff[r], plan_ids[r], plans) - monthly_costs(
+				np.maximum(base - delta_kwh[sel], 0.0), tariff[r], plan_ids[r], plans
+			)
+		delta_co2 = delta_kwh * ef[rows]
+		if payback is None:
+			payback = _payback_array(retrofit_cost, delta_cost)
+			impact = _impact_score_array(delta_cost, payback)
+		else:
+			impact = _impact_score_array(delta_cost, np.full(len(rows), 0.1))
+		part = {
+			"user_id": index.to_numpy()[rows],
+			"code": code,
+			"delta_kwh": delta_kwh,
+			"delta_cost": delta_cost,
+			"delta_co2": delta_co2,
+			"retrofit_cost": retrofit_cost,
+			"payback": payback,
+			"impact_score": impact,
+		}
+		part.update(extra)
+		parts.append(pd.DataFrame(part))
+
+	# Lighting swap: any bulb/fitting > default_led_w assumed convertible
+	m = (kind == _LIGHTING) & (power > default_led_w)
+	add(
+		"lighting_swap",
+		codes[m],
+		((np.maximum(power[m] - default_led_w, 0.0) * qty[m] * hours[m]) / 1000.0) * 30.0,
+		lighting_cost_per_unit * qty[m],
+		None,
+		appliance_id=app_id[m], power_w=power[m], quantity=qty[m], hours_per_day=hours[m],
+	)
+
+	# AC setpoint
+	m = kind == _AC
+	e_ac_month = ((power[m] * qty[m] * hours[m]) / 1000.0) * 30.0
+	add(
+		"ac_setpoint",
+		codes[m],
+		e_ac_month * (coeff_ac_per_deg * AC_DELTA_T),
+		np.zeros(int(m.sum())),
+		0.0,
+		appliance_id=app_id[m], e_ac_month=e_ac_month,
+	)
+
+	# Standby cut: one row per user, N = number of appliance rows (at least 1)
+	n_devices = np.maximum(np.bincount(codes, minlength=len(index)), 1)
+	delta_kwh = ((default_standby_w * default_standby_hours * n_devices) / 1000.0) * 30.0
+	rows = np.flatnonzero(delta_kwh > 0)
+	add("standby_cut", rows, delta_kwh[rows], np.zeros(len(rows)), 0.0, n_devices=n_devices[rows])
+
+	# Fridge upgrade
+	m = kind == _FRIDGE
+	# Baseline per distinct star label from the scalar rule, so the two paths cannot drift
+	labels = star[m]
+	old_year = labels.map({label: fridge_old_kwh_year(label) for label in labels.unique()}).to_numpy(dtype=np.float64)
+	add(
+		"fridge_upgrade",
+		codes[m],
+		np.maximum(old_year - FRIDGE_NEW_KWH_YEAR, 0.0) / 12.0,
+		np.full(int(m.sum()), FRIDGE_RETROFIT_COST),
+		None,
+		appliance_id=app_id[m], e_old_year=old_year,
+	)
+
+	frame = pd.concat(parts, ignore_index=True)
+	frame["delta_kwh_month"] = frame["delta_kwh"].round(2)
+	frame["delta_cost_month"] = frame["delta_cost"].round(2)
+	frame["delta_co2_month"] = frame["delta_co2"].round(2)
+	frame["payback_months"] = frame["payback"].round(1)
+	frame.attrs["assumptions"] = {
+		"ac_coefficient_per_degree": coeff_ac_per_deg,
+		"default_led_w": default_led_w,
+		"default_standby_w": default_standby_w,
+		"default_standby_hours": default_standby_hours,
+	}
+	return frame
+
+
+def _rank_order(frame: pd.DataFrame, rank: str = "cost", by_user: bool = False) -> np.ndarray:
+	"""
+	Row order matching the sort in generate_recommendations() (and the route's CO2 re-sort).
+	Rows are emitted per user in rule order, so the frame position is the stable tie-breaker.
+	"""
+	payback = frame["payback_months"].to_numpy()
+	# `r.payback_months or 1e9`: None and 0.0 both sort last
+	payback_key = np.where(np.isnan(payback) | (payback == 0), 1e9, payback)
+	keys = [np.arange(len(frame)), payback_key, -frame["delta_cost_month"].to_numpy()]
+	if rank == "co2":
+		keys += [payback_key, -frame["delta_co2_month"].to_numpy()]
+	if by_user:
+		keys.append(frame["user_id"].to_numpy())
+	return np.lexsort(keys)
+
+
+def _opt_id(value: Any) -> int | None:
+	# ids become float (NaN-padded) after concatenating parts
+	return None if value is None or value != value else int(value)
+
+
+def _materialize(row: dict[str, Any], assumptions: dict[str, float]):
+	from .recommendations import (
+		Recommendation, FORMULAS, TITLES, AC_DELTA_T, FRIDGE_NEW_KWH_YEAR, lighting_swap_title,
+	)
+
+	code = row["code"]
+	led_w = assumptions["default_led_w"]
+	if code == "lighting_swap":
+		quantity = int(row["quantity"])
+		title = lighting_swap_title(quantity, row["power_w"], led_w)
+		details = {"appliance_id": _opt_id(row["appliance_id"]), "p_old_w": row["power_w"], "p_led_w": led_w, "n": quantity, "t": row["hours_per_day"], "retrofit_cost": row["retrofit_cost"]}
+	elif code == "ac_setpoint":
+		title = TITLES[code]
+		details = {"appliance_id": _opt_id(row["appliance_id"]), "e_ac_month": round(row["e_ac_month"], 2), "delta_t": AC_DELTA_T, "coefficient": assumptions["ac_coefficient_per_degree"]}
+	elif code == "standby_cut":
+		title = TITLES[code]
+		details = {"p_s": assumptions["default_standby_w"], "t": assumptions["default_standby_hours"], "n": int(row["n_devices"])}
+	else:
+		title = TITLES[code]
+		details = {"appliance_id": _opt_id(row["appliance_id"]), "e_old_year": row["e_old_year"], "e_new_year": FRIDGE_NEW_KWH_YEAR, "retrofit_cost": row["retrofit_cost"]}
+	payback = None if np.isnan(row["payback"]) else row["payback"]
+	if code in ("ac_setpoint", "standby_cut"):
+		payback_rounded = 0.0
+	else:
+		payback_rounded = payback if payback is None else round(payback, 1)
+	return Recommendation(
+		code=code,
+		title=title,
+		details=details,
+		delta_kwh_month=round(row["delta_kwh"], 2),
+		delta_cost_month=round(row["delta_cost"], 2),
+		delta_co2_month=round(row["delta_co2"], 2),
+		payback_months=payback_rounded,
+		impact_score=row["impact_score"],
+		formula=FORMULAS[code],
+	)
+
+
+def top_recommendations(frame: pd.DataFrame, k: int | None = 10, rank: str = "cost") -> list[tuple[int, Any]]:
+	"""
+	Fleet-wide top-K measures across all users as (user_id, Recommendation) pairs.
+	"""
+	if k is not None and k < len(frame):
+		# Pre-select candidates with a partial sort, then rank only those
+		column = "delta_co2_month" if rank == "co2" else "delta_cost_month"
+		values = frame[column].to_numpy()
+		threshold = np.partition(values, len(values) - k)[len(values) - k]
+		frame = frame[values >= threshold]
+	order = _rank_order(frame, rank)[:k]
+	records = frame.iloc[order].to_dict("records")
+	assumptions = frame.attrs["assumptions"]
+	return [(int(r["user_id"]), _materialize(r, assumptions)) for r in records]
+
+
+def recommendations_by_user(frame: pd.DataFrame, k: int | None = None, rank: str = "cost") -> dict[int, list[Any]]:
+	"""
+	Per-user ranked recommendations (optionally only each user's top-K), like generate_recommendations().
+	"""
+	order = _rank_order(frame, rank, by_user=True)
+	ranked = frame.iloc[order]
+	if k is not None:
+		ranked = ranked[ranked.groupby("user_id", sort=False).cumcount().to_numpy() < k]
+	assumptions = frame.attrs["assumptions"]
+	out: dict[int, list[Any]] = {}
+	for r in ranked.to_dict("records"):
+		out.setdefault(int(r["user_id"]), []).append(_materialize(r, assumptions))
+	return out
@@ -0,0 +1,107 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from flask import current_app
+
+
+class UserDataCache:
+	"""
+	In-process LRU cache with TTL for per-user derived data (KPIs, chart aggregates, recommendations).
+
+	Each entry is stored under (kind, user_id) together with the version it was computed for:
+	the user's data version, the assumptions version and any caller-supplied parts (e.g. tariff, EF).
+	Write paths call invalidate_user()/invalidate_assumptions(), so a stale entry simply fails the
+	version check and is recomputed. Callers pass the shared per-user data version in `extra`, so other
+	worker processes see a user's writes on their next request; the TTL bounds everything else.
+	"""
+
+	def __init__(self, maxsize: int = 2048, ttl: float = 300.0) -> None:
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._entries: OrderedDict[Tuple[str, int], Tuple[Hashable, float, Any]] = OrderedDict()
+		self._user_versions: Dict[int, int] = {}
+		self._assumptions_version = 0
+		self._lock = threading.Lock()
+
+	def _version(self, user_id: int, extra: Hashable) -> Hashable:
+		return (self._user_versions.get(user_id, 0), self._assumptions_version, extra)
+
+	def get_or_compute(self, kind: str, user_id: int, extra: Hashable, compute: Callable[[], Any]) -> Any:
+		key = (kind, user_id)
+		now = time.monotonic()
+		with self._lock:
+			version = self._version(user_id, extra)
+			entry = self._entries.get(key)
+			if entry is not None and entry[0] == version and entry[1] > now:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return entry[2]
+			self.misses += 1
+		value = compute()
+		if self.ttl > 0 and self.maxsize > 0:
+			with self._lock:
+				# Stored under the version read before computing: a concurrent invalidation makes it a miss
+				self._entries[key] = (version, now + self.ttl, value)
+				self._entries.move_to_end(key)
+				while len(self._entries) > self.maxsize:
+					self._entries.popitem(last=False)
+		return value
+
+	def put(self, kind: str, user_id: int, extra: Hashable, value: Any) -> None:
+		"""
+		Store a value computed elsewhere (e.g. by a write path) as if get_or_compute() had produced it.
+		"""
+		if self.ttl > 0 and self.maxsize > 0:
+			with self._lock:
+				key = (kind, user_id)
+				self._entries[key] = (self._version(user_id, extra), time.monotonic() + self.ttl, value)
+				self._entries.move_to_end(key)
+				while len(self._entries) > self.maxsize:
+					self._entries.popitem(last=False)
+
+	def invalidate_user(self, user_id: int) -> None:
+		with self._lock:
+			self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+			for key in [k for k in self._entries if k[1] == user_id]:
+				del self._entries[key]
+
+	def invalidate_assumptions(self) -> None:
+		with self._lock:
+			self._assumptions_version += 1
+			self._entries.clear()
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self.hits = 0
+			self.misses = 0
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			total = self.hits + self.misses
+			return {
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_ratio": round(self.hits / total, 4) if total else 0.0,
+				"size": len(self._entries),
+				"maxsize": self.maxsize,
+				"ttl": self.ttl,
+			}
+
+
+def init_cache(app) -> UserDataCache:
+	cache = UserDataCache(
+		maxsize=int(app.config.get("CACHE_MAXSIZE", 2048)),
+		ttl=float(app.config.get("CACHE_TTL", 300.0)),
+	)
+	app.extensions["user_data_cache"] = cache
+	return cache
+
+
+def get_cache() -> UserDataCache:
+	return current_app.extensions["user_data_cache"]
@@ -72,13 +72,20 @@ def payback_months(retrofit_cost_r: float, delta_cost_r_per_month: float) -> flo
 	return retrofit_cost_r / delta_cost_r_per_month
 
 
-def compute_kpis(appliances: Iterable[Any], tariff: float, ef: float) -> Dict[str, float]:
+def compute_kpis(appliances: Iterable[Any], tariff: float, ef: float, plan: Any = None) -> Dict[str, float]:
 	"""
 	Convenience KPI calculation bundle.
+	With a compiled tariff plan (tariffs.CompiledTariff) the cost is its slab/ToD bill instead of kWh × tariff.
+	"""
+	return kpis_from_daily_kwh(compute_daily_energy_kwh(appliances), tariff, ef, plan)
+
+
+def kpis_from_daily_kwh(e_daily: float, tariff: float, ef: float, plan: Any = None) -> Dict[str, float]:
+	"""
+	KPI bundle from an already accumulated E_daily (e.g. while streaming appliances).
 	"""
-	e_daily = compute_daily_energy_kwh(appliances)
 	e_month = compute_monthly_energy_kwh(e_daily)
-	cost = compute_monthly_cost(e_month, tariff)
+	cost = compute_monthly_cost(e_month, tariff) if plan is None else plan.bill(e_month)
 	co2 = compute_monthly_co2(e_month, ef)
 	return {
 		"daily_kwh": round(e_daily, 3),
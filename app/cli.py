@@ -0,0 +1,304 @@
+from __future__ import annotations
+import os
+import click
+from flask import Flask
+
+
+def register_commands(app: Flask) -> None:
+	"""
+	Operational commands, run with `flask --app wsgi <command>`.
+	"""
+
+	@app.cli.command("import-appliances")
+	@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+	@click.option("--user-id", type=int, default=None, help="Import every row for this user; otherwise rows need a user_id column.")
+	@click.option("--batch-size", type=click.IntRange(min=1), default=1000, show_default=True)
+	@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None, help="Defaults to the file extension.")
+	def import_appliances_command(path: str, user_id: int | None, batch_size: int, fmt: str | None) -> None:
+		"""Stream a CSV/NDJSON appliance file into the database in batches."""
+		from .importer import import_appliances, iter_records, detect_format
+
+		def show(stat) -> None:
+			click.echo(f"batch {stat.index}: {stat.inserted}/{stat.rows} inserted, {stat.rejected} rejected in {stat.seconds:.3f}s")
+
+		with open(path, "rb") as fh:
+			report = import_appliances(iter_records(fh, fmt or detect_format(path)), user_id, batch_size, on_batch=show)
+		for r in report.rejects:
+			click.echo(f"line {r['line']}: {r['error']}", err=True)
+		click.echo(f"inserted={report.inserted} rejected={report.rejected}")
+
+	@app.cli.command("ingest-readings")
+	@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+	@click.option("--user-id", type=int, default=None, help="Assign every reading to this user; otherwise rows need a user_id column.")
+	@click.option("--batch-size", type=click.IntRange(min=1), default=5000, show_default=True)
+	@click.option("--mode", type=click.Choice(["add", "replace"]), default="add", show_default=True, help="add: accumulate onto existing days; replace: overwrite them.")
+	@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None, help="Defaults to the file extension.")
+	def ingest_readings_command(path: str, user_id: int | None, batch_size: int, mode: str, fmt: str | None) -> None:
+		"""Roll interval meter readings up to daily logs and upsert them."""
+		from .importer import iter_records, detect_format
+		from .ingest import ingest_readings
+
+		with open(path, "rb") as fh:
+			report = ingest_readings(iter_records(fh, fmt or detect_format(path)), user_id, batch_size, mode)
+		for r in report.rejects:
+			click.echo(f"line {r['line']}: {r['error']}", err=True)
+		rate = report.readings / report.seconds if report.seconds else 0.0
+		click.echo(f"readings={report.readings} rejected={report.rejected} days_upserted={report.days_upserted} ({rate:,.0f} readings/s)")
+
+	@app.cli.group("rollups")
+	def rollups_group() -> None:
+		"""Maintain the pre-aggregated usage rollups."""
+
+	@rollups_group.command("rebuild")
+	def rollups_rebuild_command() -> None:
+		"""Recompute all user and city rollups from the daily logs."""
+		from .rollups import rebuild
+
+		counts = rebuild()
+		click.echo(f"usage_rows={counts['usage_rows']} city_rows={counts['city_rows']}")
+
+	@rollups_group.command("check")
+	@click.option("--limit", type=int, default=20, show_default=True, help="Mismatches to print.")
+	def rollups_check_command(limit: int) -> None:
+		"""Compare stored rollups with the logs; exits non-zero on any mismatch."""
+		from .rollups import check
+
+		problems = check()
+		for p in problems[:limit]:
+			click.echo(p, err=True)
+		click.echo(f"mismatches={len(problems)}")
+		if problems:
+			raise SystemExit(1)
+
+	@app.cli.group("scenarios")
+	def scenarios_group() -> None:
+		"""Maintain saved scenario measures."""
+
+	@scenarios_group.command("backfill")
+	@click.option("--batch-size", type=int, default=500, show_default=True)
+	def scenarios_backfill_command(batch_size: int) -> None:
+		"""Move legacy measures_json payloads into the scenario_measures table."""
+		from .scenarios import backfill_measures
+
+		click.echo(f"scenarios_converted={backfill_measures(batch_size)}")
+
+	@app.cli.group("goals")
+	def goals_group() -> None:
+		"""Household dashboard goals."""
+
+	@goals_group.command("backfill")
+	def goals_backfill_command() -> None:
+		"""Copy the legacy global goal_month_* assumptions into every household's goals."""
+		from .assumptions import backfill_goals
+
+		click.echo(f"households_backfilled={backfill_goals()}")
+
+	@scenarios_group.command("reevaluate")
+	@click.option("--chunk-size", type=int, default=500, show_default=True, help="Households per transaction.")
+	def scenarios_reevaluate_command(chunk_size: int) -> None:
+		"""Recompute every saved measure (e.g. after editing assumptions)."""
+		from sqlalchemy import select
+		from . import db
+		from .assumptions import bump_user_versions
+		from .models import ScenarioMeasure
+		from .scenarios import reevaluate
+
+		ids = db.session.execute(select(ScenarioMeasure.user_id).distinct().order_by(ScenarioMeasure.user_id)).scalars().all()
+		touched = 0
+		for i in range(0, len(ids), chunk_size):
+			chunk = ids[i : i + chunk_size]
+			touched += reevaluate(chunk, household=True)
+			bump_user_versions(chunk)
+			db.session.commit()
+		click.echo(f"households={len(ids)} measures={touched}")
+
+	@app.cli.group("cohorts")
+	def cohorts_group() -> None:
+		"""Maintain the peer cohort percentile sketches."""
+
+	@cohorts_group.command("rebuild")
+	def cohorts_rebuild_command() -> None:
+		"""Recompute cohort memberships and sketches from the appliances."""
+		from .cohorts import rebuild
+
+		counts = rebuild()
+		click.echo(f"members={counts['members']} buckets={counts['buckets']}")
+
+	@app.cli.group("forecast")
+	def forecast_group() -> None:
+		"""Month-end kWh and bill forecast models."""
+
+	@forecast_group.command("fit")
+	@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Last day of the fit window (default: yesterday).")
+	@click.option("--batch-size", type=int, default=2000, show_default=True, help="Households fitted per vectorized batch.")
+	def forecast_fit_command(end, batch_size: int) -> None:
+		"""Refit every household's model on its recent daily logs."""
+		import json
+		from .forecast import fit_all
+
+		def show(index, fitted) -> None:
+			click.echo(f"batch {index}: {fitted} households fitted", err=True)
+
+		click.echo(json.dumps(fit_all(end.date() if end else None, batch_size, on_batch=show), indent=2))
+
+	@app.cli.group("pipeline")
+	def pipeline_group() -> None:
+		"""Nightly recomputation of KPIs, recommendations and scenario savings."""
+
+	@pipeline_group.command("run")
+	@click.option("--workers", type=int, default=os.cpu_count() or 1, show_default="CPU count")
+	@click.option("--chunk-size", type=int, default=2000, show_default=True, help="Users per user_id range (new runs).")
+	@click.option("--fresh", is_flag=True, help="Abandon an unfinished run instead of resuming it.")
+	def pipeline_run_command(workers: int, chunk_size: int, fresh: bool) -> None:
+		"""Recompute every household, resuming an unfinished run where it stopped."""
+		import json
+		from .pipeline import run_pipeline
+
+		def show(result, report) -> None:
+			click.echo(f"users {result.first_user_id}-{result.last_user_id}: {result.users} in {result.seconds:.2f}s", err=True)
+
+		report = run_pipeline(workers=workers, chunk_size=chunk_size, fresh=fresh, on_chunk=show)
+		click.echo(json.dumps(report.to_dict(), indent=2))
+
+	@pipeline_group.command("status")
+	@click.option("--run-id", type=int, default=None, help="Default: the latest run.")
+	def pipeline_status_command(run_id: int | None) -> None:
+		"""Progress of a pipeline run, as JSON."""
+		import json
+		from .pipeline import run_status
+
+		status = run_status(run_id)
+		if status is None:
+			raise click.ClickException("no pipeline run found")
+		click.echo(json.dumps(status, indent=2))
+
+	@app.cli.command("optimize-scenarios")
+	@click.option("--budget", type=float, required=True, help="Retrofit budget per household (₹).")
+	@click.option("--objective", type=click.Choice(["cost", "kwh", "co2"]), default="cost", show_default=True)
+	@click.option("--chunk-size", type=int, default=5000, show_default=True, help="Users evaluated per batch.")
+	@click.option("--output", type=click.Path(dir_okay=False, writable=True), default="-", show_default=True)
+	def optimize_scenarios_command(budget: float, objective: str, chunk_size: int, output: str) -> None:
+		"""Best measure set under a budget for every household, as CSV."""
+		from sqlalchemy import select
+		from . import db
+		from .assumptions import get_assumptions
+		from .batch import load_appliances_frame, load_users_frame, recommendation_frame
+		from .models import User
+		from .solver import optimize_frame
+		from .tariffs import get_plans
+
+		ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+		assumptions, plans = get_assumptions(), get_plans()
+		with click.open_file(output, "w") as fh:
+			for i in range(0, len(ids), chunk_size):
+				chunk = ids[i : i + chunk_size]
+				frame = recommendation_frame(load_appliances_frame(chunk), load_users_frame(chunk), assumptions, plans)
+				optimize_frame(frame, budget, objective).to_csv(fh, index=False, header=i == 0)
+		if output != "-":
+			click.echo(f"households={len(ids)} written to {output}")
+
+	@app.cli.command("sensitivity")
+	@click.option("--user-id", type=int, required=True)
+	@click.option("--samples", type=int, default=100000, show_default=True)
+	@click.option("--workers", type=int, default=os.cpu_count() or 1, show_default="CPU count")
+	@click.option("--seed", type=int, default=0, show_default=True)
+	def sensitivity_command(user_id: int, samples: int, workers: int, seed: int) -> None:
+		"""Monte Carlo P10/P50/P90 savings and payback for one household, as JSON."""
+		import json
+		from . import db
+		from .assumptions import get_assumptions
+		from .models import Appliance, User
+		from .sensitivity import run_sensitivity
+		from .tariffs import plan_for_user
+
+		user = db.session.get(User, user_id)
+		if user is None:
+			raise click.ClickException(f"unknown user_id {user_id}")
+		appliances = Appliance.query.filter_by(user_id=user_id).all()
+		report = run_sensitivity(
+			appliances, user.tariff, user.ef, get_assumptions(), samples=samples, workers=workers, seed=seed, plan=plan_for_user(user_id)
+		)
+		click.echo(json.dumps(report.to_dict(), indent=2, ensure_ascii=False))
+
+	@app.cli.group("tariffs")
+	def tariffs_group() -> None:
+		"""Tariff plans and fleet re-billing."""
+
+	@tariffs_group.command("load")
+	@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+	def tariffs_load_command(path: str) -> None:
+		"""Create or replace plans from a JSON file (one plan object or a list)."""
+		import json
+		from .tariffs import save_plan
+
+		with open(path, encoding="utf-8") as fh:
+			data = json.load(fh)
+		for definition in data if isinstance(data, list) else [data]:
+			try:
+				plan = save_plan(definition)
+			except ValueError as exc:
+				raise click.ClickException(f"{definition.get('name', '?')}: {exc}")
+			click.echo(f"plan {plan.id}: {plan.name}")
+
+	@tariffs_group.command("rebill")
+	@click.option("--month", type=click.DateTime(["%Y-%m"]), required=True, help="Billing month, YYYY-MM.")
+	@click.option("--chunk-size", type=int, default=20000, show_default=True, help="Users billed per batch.")
+	@click.option("--output", type=click.Path(dir_okay=False, writable=True), default="-", show_default=True)
+	def tariffs_rebill_command(month, chunk_size: int, output: str) -> None:
+		"""Recompute every household's bill for a month under its current plan, as CSV."""
+		import time
+		from sqlalchemy import select
+		from . import db
+		from .models import User
+		from .tariffs import rebill
+
+		t0 = time.perf_counter()
+		ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+		with click.open_file(output, "w") as fh:
+			for i in range(0, len(ids), chunk_size):
+				rebill(month.date(), ids[i : i + chunk_size]).to_csv(fh, index=False, header=i == 0)
+		if output != "-":
+			click.echo(f"households={len(ids)} written to {output} in {time.perf_counter() - t0:.2f}s")
+
+	@app.cli.command("simulate-profiles")
+	@click.option("--output", type=click.Path(file_okay=False), required=True, help="Directory for profiles.npy, user_ids.npy and stats.csv.")
+	@click.option("--year", type=int, default=None, help="Calendar year (default: current year).")
+	@click.option("--chunk-size", type=int, default=2000, show_default=True, help="Households simulated per batch.")
+	def simulate_profiles_command(output: str, year: int | None, chunk_size: int) -> None:
+		"""Hourly load profile for every household, with peak and coincident-peak statistics."""
+		import json
+		from datetime import date
+		from pathlib import Path
+		from sqlalchemy import select
+		from . import db
+		from .loadprofile import simulate_fleet
+		from .models import User
+
+		ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+		summary, stats = simulate_fleet(output, ids, year or date.today().year, chunk_size=chunk_size)
+		stats.to_csv(Path(output) / "stats.csv", index=False)
+		click.echo(json.dumps(summary.to_dict(), indent=2))
+
+	@app.cli.command("generate-synthetic")
+	@click.option("--users", type=int, required=True, help="Households to add (after the highest existing user id).")
+	@click.option("--seed", type=int, default=0, show_default=True)
+	@click.option("--days", type=int, default=30, show_default=True, help="Daily logs per household (0 = none).")
+	@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Last logged day (default: today); fix it for reproducible data.")
+	@click.option("--scenario-share", type=float, default=0.2, show_default=True, help="Share of households with a saved scenario.")
+	@click.option("--block-size", type=int, default=10000, show_default=True, help="Households per generated and written block.")
+	@click.option("--workers", type=int, default=os.cpu_count() or 1, show_default=True, help="Generator processes.")
+	def generate_synthetic_command(users: int, seed: int, days: int, end, scenario_share: float, block_size: int, workers: int) -> None:
+		"""Bulk-load seeded synthetic households (appliances, logs, rollups, scenarios) for load tests."""
+		import json
+		from datetime import date
+		from .synthetic import SyntheticSpec, generate
+
+		spec = SyntheticSpec(
+			users=users, seed=seed, days=days, end=end.date() if end else date.today(), scenario_share=scenario_share, block_size=block_size
+		)
+
+		def show(index, report) -> None:
+			click.echo(f"block {index}: {report.users} users, {report.appliances} appliances, {report.logs} logs", err=True)
+
+		report = generate(spec, workers=workers, on_block=show)
+		click.echo(json.dumps(report.to_dict(), indent=2))
@@ -0,0 +1,204 @@
+from __future__ import annotations
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+
+from . import db
+from .models import Appliance, CohortMember, CohortSketch, User
+from .schema import dialect_insert
+
+# Peer comparison: where a household's estimated monthly kWh falls among homes of the same city and
+# household size. Each cohort is a log-spaced histogram (1% wide buckets from 1 kWh to 100 MWh a month)
+# stored as one cohort_sketches row per bucket; cohort_members records the bucket each household is
+# counted in, so a change moves one count from its old bucket to its new one. A lookup sums at most
+# N_BUCKETS rows of one cohort - independent of the number of households - and interpolates inside
+# the household's own bucket. Its error is bounded by that bucket's share of the cohort, well under a
+# percentile unless many homes use the same kWh to within 1%.
+
+LOW_KWH = 1.0  # bucket 0 holds everything below this
+RATIO = 1.01  # upper / lower bound of every other bucket
+N_BUCKETS = 2 + math.ceil(math.log(100_000.0 / LOW_KWH) / math.log(RATIO))
+MAX_SIZE = 6  # larger households share the "6+" cohort
+MIN_COHORT = 10  # smaller cohorts get no comparison
+YIELD_PER = 5000
+# (city, household_size, bucket): count delta
+Counts = Dict[Tuple[str, int, int], int]
+
+# Appliance.daily_kwh() × 30, summed per household
+MONTHLY_KWH = func.coalesce(
+	func.sum(Appliance.power_w * Appliance.quantity * Appliance.hours_per_day * Appliance.days_per_week), 0.0
+) * (30.0 / 7000.0)
+
+
+def bucket_of(kwh: float) -> int:
+	if kwh < LOW_KWH:
+		return 0
+	return min(N_BUCKETS - 1, 1 + int(math.log(kwh / LOW_KWH) / math.log(RATIO)))
+
+
+def _position(kwh: float, bucket: int) -> float:
+	# How far kwh lies into its bucket (0..1): linear in bucket 0, logarithmic above
+	if bucket == 0:
+		fraction = kwh / LOW_KWH
+	elif bucket == N_BUCKETS - 1:
+		fraction = 0.5
+	else:
+		fraction = math.log(kwh / LOW_KWH) / math.log(RATIO) - (bucket - 1)
+	return min(1.0, max(0.0, fraction))
+
+
+def estimate_percentile(below: int, in_bucket: int, total: int, kwh: float) -> float:
+	"""
+	Share of the cohort (%) using less than kwh, from the counts below and in kwh's bucket.
+	"""
+	if total <= 0:
+		return 0.0
+	return 100.0 * (below + _position(kwh, bucket_of(kwh)) * in_bucket) / total
+
+
+def cohort_key(city: str | None, household_size: int | None) -> Optional[Tuple[str, int]]:
+	if not city:
+		return None
+	return city, min(max(int(household_size or 1), 1), MAX_SIZE)
+
+
+def cohort_label(household_size: int, city: str) -> str:
+	size = f"{household_size}+ person" if household_size >= MAX_SIZE else f"{household_size}-person"
+	return f"{size} homes in {city}"
+
+
+def ordinal(n: int) -> str:
+	suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+	return f"{n}{suffix}"
+
+
+def _placement(city: str | None, household_size: int | None, kwh: float) -> Optional[Tuple[str, int, int]]:
+	# Households without a city or any estimated usage are not counted
+	key = cohort_key(city, household_size)
+	if key is None or kwh <= 0:
+		return None
+	return key[0], key[1], bucket_of(kwh)
+
+
+def _usage_stmt():
+	return (
+		select(User.id, User.city, User.household_size, MONTHLY_KWH)
+		.outerjoin(Appliance, Appliance.user_id == User.id)
+		.group_by(User.id, User.city, User.household_size)
+	)
+
+
+def add_counts(counts: Counts) -> None:
+	"""
+	Add bucket count deltas to the cohort sketches; the caller commits.
+	"""
+	rows = [{"city": c, "household_size": s, "bucket": b, "count": n} for (c, s, b), n in counts.items() if n]
+	if not rows:
+		return
+	insert_ = dialect_insert()
+	if insert_ is not None:
+		stmt = insert_(CohortSketch)
+		db.session.execute(
+			stmt.on_conflict_do_update(
+				index_elements=["city", "household_size", "bucket"], set_={"count": CohortSketch.count + stmt.excluded.count}
+			),
+			rows,
+		)
+		return
+	for row in rows:
+		existing = CohortSketch.query.filter_by(city=row["city"], household_size=row["household_size"], bucket=row["bucket"]).first()
+		if existing is None:
+			db.session.add(CohortSketch(**row))
+		else:
+			existing.count += row["count"]
+
+
+def refresh_cohorts(user_ids: Iterable[int]) -> int:
+	"""
+	Re-place households after their appliances, city or size changed; the caller commits.
+	Returns the number of households that moved bucket (or joined or left a cohort).
+	"""
+	user_ids = set(user_ids)
+	if not user_ids:
+		return 0
+	db.session.flush()
+	current = {
+		uid: (_placement(city, size, kwh), kwh)
+		for uid, city, size, kwh in db.session.execute(_usage_stmt().where(User.id.in_(user_ids)))
+	}
+	members = {m.user_id: m for m in db.session.execute(select(CohortMember).where(CohortMember.user_id.in_(user_ids))).scalars()}
+	counts: Counts = {}
+	moved = 0
+	for uid in user_ids:
+		new, kwh = current.get(uid, (None, 0.0))
+		member = members.get(uid)
+		old = (member.city, member.household_size, member.bucket) if member is not None else None
+		if member is not None and new is not None:
+			member.monthly_kwh = kwh
+		if old == new:
+			continue
+		moved += 1
+		if old is not None:
+			counts[old] = counts.get(old, 0) - 1
+		if new is not None:
+			counts[new] = counts.get(new, 0) + 1
+		if new is None:
+			db.session.delete(member)
+		elif member is None:
+			db.session.add(CohortMember(user_id=uid, city=new[0], household_size=new[1], bucket=new[2], monthly_kwh=kwh))
+		else:
+			member.city, member.household_size, member.bucket = new
+	add_counts(counts)
+	return moved
+
+
+def rebuild() -> Dict[str, int]:
+	"""
+	Recompute every membership and sketch from the appliances (after bulk edits outside the app).
+	"""
+	members: List[dict] = []
+	counts: Counts = {}
+	for uid, city, size, kwh in db.session.execute(_usage_stmt().execution_options(yield_per=YIELD_PER)):
+		placement = _placement(city, size, kwh)
+		if placement is None:
+			continue
+		members.append({"user_id": uid, "city": placement[0], "household_size": placement[1], "bucket": placement[2], "monthly_kwh": kwh})
+		counts[placement] = counts.get(placement, 0) + 1
+	db.session.execute(delete(CohortMember))
+	db.session.execute(delete(CohortSketch))
+	for i in range(0, len(members), YIELD_PER):
+		db.session.execute(insert(CohortMember), members[i : i + YIELD_PER])
+	add_counts(counts)
+	db.session.commit()
+	return {"members": len(members), "buckets": len(counts)}
+
+
+def cohort_percentile(user: User, monthly_kwh: float) -> Optional[dict]:
+	"""
+	The household's standing among its peers, or None without a cohort of at least MIN_COHORT homes.
+	One aggregate over the cohort's bucket rows.
+	"""
+	key = cohort_key(user.city, user.household_size)
+	if key is None or monthly_kwh <= 0:
+		return None
+	city, size = key
+	bucket = bucket_of(monthly_kwh)
+	below, in_bucket, total = db.session.execute(
+		select(
+			func.coalesce(func.sum(case((CohortSketch.bucket < bucket, CohortSketch.count), else_=0)), 0),
+			func.coalesce(func.sum(case((CohortSketch.bucket == bucket, CohortSketch.count), else_=0)), 0),
+			func.coalesce(func.sum(CohortSketch.count), 0),
+		).where(CohortSketch.city == city, CohortSketch.household_size == size)
+	).one()
+	if total < MIN_COHORT:
+		return None
+	percentile = min(100, max(0, round(estimate_percentile(below, in_bucket, total, monthly_kwh))))
+	return {
+		"city": city,
+		"household_size": size,
+		"homes": int(total),
+		"percentile": percentile,
+		"ordinal": ordinal(percentile),
+		"label": cohort_label(size, city),
+	}
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import csv
+from typing import Any, Iterable, Iterator, List
+
+from sqlalchemy import select
+
+from . import db
+from .models import Appliance, User, UserTariff
+from .calculations import kpis_from_daily_kwh
+from .tariffs import get_plans, plan_for_user
+
+# Streaming CSV exports: rows are read from a server-side cursor (yield_per) and written as they arrive,
+# so memory stays flat regardless of how many appliances/users are exported.
+
+APPLIANCE_FIELDS = ["type", "power_w", "quantity", "hours_per_day", "days_per_week", "star_label", "daily_kwh"]
+FLEET_FIELDS = ["record", "user_id"] + APPLIANCE_FIELDS + ["monthly_kwh", "monthly_cost", "monthly_co2"]
+YIELD_PER = 1000
+FLUSH_ROWS = 500
+
+
+class _Echo:
+	# csv.writer target that hands back each formatted line instead of buffering it
+	def write(self, value: str) -> str:
+		return value
+
+
+def _appliance_values(a: Appliance) -> List[Any]:
+	return [a.type, a.power_w, a.quantity, a.hours_per_day, a.days_per_week, a.star_label or "", round(a.daily_kwh(), 3)]
+
+
+def _chunked(lines: Iterable[str]) -> Iterator[str]:
+	buf: List[str] = []
+	for line in lines:
+		buf.append(line)
+		if len(buf) >= FLUSH_ROWS:
+			yield "".join(buf)
+			buf = []
+	if buf:
+		yield "".join(buf)
+
+
+def iter_user_csv(user: User) -> Iterator[str]:
+	"""
+	One household's appliances followed by a "# KPIs" section (same layout as the original export).
+	"""
+	plan = plan_for_user(user.id)
+
+	def lines() -> Iterator[str]:
+		writer = csv.writer(_Echo(), lineterminator="\n")
+		yield writer.writerow(APPLIANCE_FIELDS)
+		stmt = (
+			select(Appliance)
+			.where(Appliance.user_id == user.id)
+			.order_by(Appliance.id)
+			.execution_options(yield_per=YIELD_PER)
+		)
+		e_daily = 0
+		for a in db.session.scalars(stmt):
+			e_daily += a.daily_kwh()
+			yield writer.writerow(_appliance_values(a))
+		yield "\n# KPIs\n"
+		for k, v in kpis_from_daily_kwh(e_daily, user.tariff, user.ef, plan).items():
+			yield f"{k},{v}\n"
+
+	return _chunked(lines())
+
+
+def iter_fleet_csv() -> Iterator[str]:
+	"""
+	Every user's appliances ("appliance" rows) each followed by that user's KPIs ("kpis" row).
+	Rows arrive ordered by user, so only the running total of the current user is held.
+	"""
+	plans = get_plans()
+
+	def lines() -> Iterator[str]:
+		writer = csv.writer(_Echo(), lineterminator="\n")
+		yield writer.writerow(FLEET_FIELDS)
+		stmt = (
+			select(User.id, User.tariff, User.ef, UserTariff.plan_id, Appliance)
+			.outerjoin(UserTariff, UserTariff.user_id == User.id)
+			.outerjoin(Appliance, Appliance.user_id == User.id)
+			.order_by(User.id, Appliance.id)
+			.execution_options(yield_per=YIELD_PER)
+		)
+		current = None
+		e_daily = 0
+
+		def kpis_row(user_id: int, tariff: float, ef: float, plan_id: int | None) -> str:
+			k = kpis_from_daily_kwh(e_daily, tariff, ef, plans.get(plan_id))
+			return writer.writerow(["kpis", user_id, "", "", "", "", "", "", k["daily_kwh"], k["monthly_kwh"], k["monthly_cost"], k["monthly_co2"]])
+
+		for n, (user_id, tariff, ef, plan_id, a) in enumerate(db.session.execute(stmt), start=1):
+			if current is not None and current[0] != user_id:
+				yield kpis_row(*current)
+				e_daily = 0
+			current = (user_id, tariff, ef, plan_id)
+			if a is not None:
+				e_daily += a.daily_kwh()
+				yield writer.writerow(["appliance", user_id] + _appliance_values(a) + ["", "", ""])
+			if n % YIELD_PER == 0:
+				# keep the identity map from growing with every streamed appliance
+				db.session.expunge_all()
+		if current is not None:
+			yield kpis_row(*current)
+
+	return _chunked(lines())
@@ -0,0 +1,253 @@
+from __future__ import annotations
+import calendar
+import itertools
+import json
+import math
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from . import db
+from .assumptions import bump_user_versions
+from .models import ForecastState, Log
+
+# Month-end kWh and bill forecasts from the daily logs. Each household gets an additive Holt-Winters
+# model - damped trend, weekly seasonality indexed by weekday - fitted in vectorized batches: the last
+# FIT_DAYS of logs of BATCH_USERS households form one (households x days) matrix and every candidate
+# (alpha, beta, gamma) in GRID is filtered over it at once (NumPy, imported only by the batch fit);
+# each household keeps the candidate with the smallest one-step-ahead error. The parameters and the
+# filter state (level, trend, weekday offsets, month-to-date kWh) are stored in forecast_states and
+# advanced one day at a time as ingestion brings new complete days; a late reading for a day the
+# state already consumed refits that household. Missing days are imputed with the one-step forecast.
+# The dashboard reads one row and sums the forecast over the rest of the month.
+
+PERIOD = 7
+FIT_DAYS = 91
+INIT_DAYS = 14  # days that seed level and weekday offsets; errors are scored after them
+MIN_DAYS = 21  # metered days in the window needed for a fit
+PHI = 0.9  # trend damping per day
+GRID: Tuple[Tuple[float, float, float], ...] = tuple(
+	itertools.product((0.05, 0.1, 0.2, 0.3, 0.5), (0.0, 0.01, 0.05), (0.05, 0.15, 0.3))
+)
+BATCH_USERS = 2000
+STALE_DAYS = 14  # no forecast once the state is this far behind
+Z80 = 1.2816  # two-sided 80% band
+
+
+def _step(level: float, trend: float, offset: float, y: float | None, alpha: float, beta: float, gamma: float) -> Tuple[float, float, float, float]:
+	# One day of the filter; same operation order as the vectorized fit. Returns (level, trend, offset, fitted)
+	base = level + PHI * trend
+	fitted = base + offset
+	error = 0.0 if y is None else y - fitted
+	return base + alpha * error, PHI * trend + beta * error, offset + gamma * error, fitted
+
+
+def advance(state: ForecastState, days: Dict[date, float], through: date) -> None:
+	"""
+	Fold the days after state.last_date up to through into the state (days: kWh by date, gaps allowed).
+	"""
+	season = json.loads(state.season_json)
+	level, trend, month_kwh = state.level, state.trend, state.month_kwh
+	day = state.last_date
+	while day < through:
+		day += timedelta(days=1)
+		y = days.get(day)
+		w = day.weekday()
+		level, trend, season[w], fitted = _step(level, trend, season[w], y, state.alpha, state.beta, state.gamma)
+		if day.day == 1:
+			month_kwh = 0.0
+		month_kwh += fitted if y is None else y
+	state.level, state.trend, state.month_kwh = level, trend, month_kwh
+	state.season_json = json.dumps(season)
+	state.last_date = day
+
+
+def _fit_matrix(y: Any, start: date, grid: Sequence[Tuple[float, float, float]]) -> Dict[str, Any]:
+	"""
+	Filter every (household, candidate) pair over y (households x days, NaN = no log) and keep each
+	household's best candidate.
+	"""
+	import numpy as np
+
+	n_users, n_days = y.shape
+	params = np.asarray(grid, dtype=np.float64)
+	alpha, beta, gamma = params[:, 0], params[:, 1], params[:, 2]
+	observed = ~np.isnan(y)
+	weekday = (start.weekday() + np.arange(n_days)) % PERIOD
+
+	# Seed: mean of the first INIT_DAYS (of the whole window if those are empty) and weekday deviations from it
+	values = np.where(observed, y, 0.0)
+	count = observed[:, :INIT_DAYS].sum(axis=1)
+	total = values[:, :INIT_DAYS].sum(axis=1)
+	empty = count == 0
+	count[empty], total[empty] = observed[empty].sum(axis=1), values[empty].sum(axis=1)
+	level0 = total / np.maximum(count, 1)
+	season0 = np.zeros((n_users, PERIOD))
+	for w in range(PERIOD):
+		cols = np.flatnonzero(weekday[:INIT_DAYS] == w)
+		n = observed[:, cols].sum(axis=1)
+		season0[:, w] = np.where(n > 0, values[:, cols].sum(axis=1) / np.maximum(n, 1) - level0, 0.0)
+	season0 -= season0.mean(axis=1, keepdims=True)
+
+	n_grid = len(params)
+	level = np.repeat(level0[:, None], n_grid, axis=1)
+	trend = np.zeros((n_users, n_grid))
+	season = np.repeat(season0[:, None, :], n_grid, axis=1)
+	sse = np.zeros((n_users, n_grid))
+	month_kwh = np.zeros((n_users, n_grid))
+	end = start + timedelta(days=n_days - 1)
+	for j in range(n_days):
+		w = weekday[j]
+		obs = observed[:, j][:, None]
+		base = level + PHI * trend
+		fitted = base + season[:, :, w]
+		error = np.where(obs, y[:, j][:, None] - fitted, 0.0)
+		level = base + alpha * error
+		trend = PHI * trend + beta * error
+		season[:, :, w] = season[:, :, w] + gamma * error
+		if j >= INIT_DAYS:
+			sse += error * error
+		day = start + timedelta(days=j)
+		if (day.year, day.month) == (end.year, end.month):
+			month_kwh += np.where(obs, y[:, j][:, None], fitted)
+
+	best = np.argmin(sse, axis=1)
+	rows = np.arange(n_users)
+	scored = np.maximum(observed[:, INIT_DAYS:].sum(axis=1), 1)
+	return {
+		"params": params[best],
+		"level": level[rows, best],
+		"trend": trend[rows, best],
+		"season": season[rows, best],
+		"month_kwh": month_kwh[rows, best],
+		"sigma": np.sqrt(sse[rows, best] / scored),
+		"metered": observed.sum(axis=1),
+	}
+
+
+def fit_users(user_ids: Iterable[int], end: date, start: date | None = None) -> int:
+	"""
+	Fit the households' models on their logs from start (default: FIT_DAYS before end) through end
+	and store them; households with fewer than MIN_DAYS metered days lose their state. The caller commits.
+	Returns the number of households fitted.
+	"""
+	import numpy as np
+
+	user_ids = sorted(set(user_ids))
+	if not user_ids:
+		return 0
+	start = start or end - timedelta(days=FIT_DAYS - 1)
+	n_days = (end - start).days + 1
+	index = {uid: i for i, uid in enumerate(user_ids)}
+	y = np.full((len(user_ids), n_days), np.nan)
+	stmt = select(Log.user_id, Log.date, Log.kwh).where(Log.user_id.in_(user_ids), Log.date >= start, Log.date <= end)
+	for uid, day, kwh in db.session.execute(stmt):
+		y[index[uid], (day - start).days] = kwh
+
+	fitted = _fit_matrix(y, start, GRID)
+	now = datetime.utcnow()
+	rows = []
+	for i, uid in enumerate(user_ids):
+		if fitted["metered"][i] < MIN_DAYS:
+			continue
+		alpha, beta, gamma = (float(v) for v in fitted["params"][i])
+		rows.append({
+			"user_id": uid,
+			"alpha": alpha,
+			"beta": beta,
+			"gamma": gamma,
+			"level": float(fitted["level"][i]),
+			"trend": float(fitted["trend"][i]),
+			"season_json": json.dumps([float(v) for v in fitted["season"][i]]),
+			"last_date": end,
+			"month_kwh": float(fitted["month_kwh"][i]),
+			"sigma": float(fitted["sigma"][i]),
+			"fitted_at": now,
+		})
+	db.session.execute(delete(ForecastState).where(ForecastState.user_id.in_(user_ids)))
+	if rows:
+		db.session.execute(insert(ForecastState), rows)
+	bump_user_versions(user_ids)
+	return len(rows)
+
+
+def fit_all(end: date | None = None, batch_size: int = BATCH_USERS, on_batch=None) -> Dict[str, Any]:
+	"""
+	Refit every household with logs in the window ending at end (default: yesterday), committing per batch.
+	"""
+	t0 = time.perf_counter()
+	end = end or date.today() - timedelta(days=1)
+	start = end - timedelta(days=FIT_DAYS - 1)
+	ids = db.session.execute(select(Log.user_id).where(Log.date >= start, Log.date <= end).distinct().order_by(Log.user_id)).scalars().all()
+	fitted = 0
+	for i in range(0, len(ids), batch_size):
+		fitted += fit_users(ids[i : i + batch_size], end)
+		db.session.commit()
+		if on_batch is not None:
+			on_batch(i // batch_size, fitted)
+	# States of households without recent logs are left to go stale
+	return {"households": len(ids), "fitted": fitted, "end": end.isoformat(), "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def update_forecasts(days: Iterable[Tuple[int, date]], today: date | None = None) -> int:
+	"""
+	After ingesting (user_id, day) logs: advance the fitted states through yesterday, refitting
+	households whose already-consumed days changed. The caller commits. Returns households updated.
+	"""
+	earliest: Dict[int, date] = {}
+	for uid, day in days:
+		if uid not in earliest or day < earliest[uid]:
+			earliest[uid] = day
+	if not earliest:
+		return 0
+	through = (today or date.today()) - timedelta(days=1)
+	states = db.session.execute(select(ForecastState).where(ForecastState.user_id.in_(earliest))).scalars().all()
+	refit = [s.user_id for s in states if earliest[s.user_id] <= s.last_date]
+	moving = [s for s in states if s.last_date < earliest[s.user_id] and s.last_date < through]
+	if moving:
+		logs: Dict[int, Dict[date, float]] = {}
+		start = min(s.last_date for s in moving) + timedelta(days=1)
+		stmt = select(Log.user_id, Log.date, Log.kwh).where(
+			Log.user_id.in_([s.user_id for s in moving]), Log.date >= start, Log.date <= through
+		)
+		for uid, day, kwh in db.session.execute(stmt):
+			logs.setdefault(uid, {})[day] = kwh
+		for state in moving:
+			advance(state, logs.get(state.user_id, {}), through)
+	if refit:
+		fit_users(refit, through)
+	return len(moving) + len(refit)
+
+
+def month_forecast(user_id: int, day: date, tariff: float, plan: Any = None) -> Optional[Dict[str, Any]]:
+	"""
+	kWh and bill forecast for day's month from the household's stored state (one indexed read), or None
+	without a fitted, recent state. The band is a rough 80% interval from the fit's one-step error.
+	"""
+	state = db.session.get(ForecastState, user_id)
+	if state is None or not 0 <= (day - state.last_date).days <= STALE_DAYS:
+		return None
+	month_start = day.replace(day=1)
+	month_end = day.replace(day=calendar.monthrange(day.year, day.month)[1])
+	known = state.month_kwh if state.last_date >= month_start else 0.0
+	season = json.loads(state.season_json)
+	ahead, damping, steps = 0.0, 0.0, 0
+	for h in range(1, (month_end - state.last_date).days + 1):
+		damping += PHI ** h
+		target = state.last_date + timedelta(days=h)
+		if target >= month_start:
+			ahead += max(state.level + damping * state.trend + season[target.weekday()], 0.0)
+			steps += 1
+	kwh = known + ahead
+	band = Z80 * state.sigma * math.sqrt(steps)
+	cost = kwh * tariff if plan is None else plan.bill(kwh)
+	return {
+		"month": month_start.strftime("%B %Y"),
+		"kwh": round(kwh, 2),
+		"low_kwh": round(max(kwh - band, known), 2),
+		"high_kwh": round(kwh + band, 2),
+		"cost": round(cost, 2),
+		"through": state.last_date.isoformat(),
+	}
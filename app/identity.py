@@ -0,0 +1,82 @@
+from __future__ import annotations
+import hmac
+from functools import wraps
+from typing import Any, Callable
+
+from flask import abort, current_app, g, request, session
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .models import User
+
+# The tariff assignment and goals ride along with the user row (plan_for_user and the dashboard read
+# them without a query)
+_USER_OPTIONS = (joinedload(User.tariff_assignment), joinedload(User.goals))
+
+SESSION_KEY = "user_id"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def _new_household() -> User:
+	user = User(name="Demo User", tariff=8.0, ef=0.70, household_size=3, city="Delhi")
+	db.session.add(user)
+	db.session.commit()
+	session[SESSION_KEY] = user.id
+	return user
+
+
+def current_user() -> User:
+	"""
+	Resolve the household for this request with at most one primary-key fetch (tariff assignment and goals joined in).
+
+	Order: the USER_ID_HEADER request header (only when configured, e.g. behind a trusted gateway),
+	then the signed session cookie; a visitor with neither gets a new household pinned to their session.
+	The resolved user is memoized on `g` for the rest of the request.
+	"""
+	user = g.get("_current_user")
+	if user is not None:
+		return user
+	header = current_app.config.get("USER_ID_HEADER")
+	raw = request.headers.get(header) if header else None
+	if raw is not None:
+		try:
+			user_id = int(raw)
+		except ValueError:
+			abort(400)
+		user = db.session.get(User, user_id, options=_USER_OPTIONS)
+		if user is None:
+			abort(404)
+	else:
+		user_id = session.get(SESSION_KEY)
+		user = db.session.get(User, user_id, options=_USER_OPTIONS) if user_id is not None else None
+		if user is None:
+			user = _new_household()
+	g._current_user = user
+	return user
+
+
+def current_user_id() -> int | None:
+	"""
+	Id of the household already resolved for this request, if any (never queries, even after a commit).
+	"""
+	user = g.get("_current_user")
+	identity = inspect(user).identity if user is not None else None
+	return identity[0] if identity else None
+
+
+def admin_required(view: Callable[..., Any]) -> Callable[..., Any]:
+	"""
+	Fleet/operator endpoints: 403 unless the ADMIN_TOKEN_HEADER request header matches the ADMIN_TOKEN
+	config. With no ADMIN_TOKEN configured they are closed; use the CLI commands instead.
+	"""
+
+	@wraps(view)
+	def wrapper(*args: Any, **kwargs: Any) -> Any:
+		expected = current_app.config.get("ADMIN_TOKEN")
+		supplied = request.headers.get(ADMIN_TOKEN_HEADER, "")
+		if not expected or not hmac.compare_digest(supplied.encode(), expected.encode()):
+			abort(403)
+		return view(*args, **kwargs)
+
+	return wrapper
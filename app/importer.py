@@ -0,0 +1,221 @@
+from __future__ import annotations
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import insert, select
+
+from . import db
+from .assumptions import bump_user_versions
+from .cohorts import refresh_cohorts
+from .measures import forget_results
+from .models import Appliance, User
+from .scenarios import reevaluate
+
+# Streaming bulk import of appliances from CSV or NDJSON.
+# Rows are parsed lazily and inserted in fixed-size batches, so memory is bounded by batch_size; the
+# report keeps only the first rejects, batch timings and user ids, plus totals.
+
+MAX_REJECTS_REPORTED = 1000
+MAX_BATCHES_REPORTED = 1000
+MAX_USER_IDS_TRACKED = 10000
+MAX_BATCH_SIZE = 10000  # cap for web requests (rows held in memory per batch)
+
+
+@dataclass
+class BatchStat:
+	index: int
+	rows: int
+	inserted: int
+	rejected: int
+	seconds: float
+
+
+@dataclass
+class ImportReport:
+	inserted: int = 0
+	rejected: int = 0
+	batch_count: int = 0
+	batches: List[BatchStat] = field(default_factory=list)  # first MAX_BATCHES_REPORTED only
+	rejects: List[Dict[str, Any]] = field(default_factory=list)  # first MAX_REJECTS_REPORTED only
+	user_ids: set = field(default_factory=set)  # households written to, unless users_truncated
+	users_truncated: bool = False  # more than MAX_USER_IDS_TRACKED households; user_ids is partial
+
+	def add_users(self, user_ids: Iterable[int]) -> None:
+		if not self.users_truncated:
+			self.user_ids.update(user_ids)
+			if len(self.user_ids) > MAX_USER_IDS_TRACKED:
+				self.user_ids.clear()
+				self.users_truncated = True
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"inserted": self.inserted,
+			"rejected": self.rejected,
+			"batch_count": self.batch_count,
+			"batches": [b.__dict__ for b in self.batches],
+			"rejects": self.rejects,
+		}
+
+
+def detect_format(filename: str | None, mimetype: str | None = None) -> str:
+	name = (filename or "").lower()
+	if name.endswith((".ndjson", ".jsonl", ".json")) or (mimetype or "").endswith(("ndjson", "jsonl", "json")):
+		return "ndjson"
+	return "csv"
+
+
+def iter_records(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Dict[str, Any] | None, str | None]]:
+	"""
+	Yield (line_no, record, parse_error) from a binary stream without reading it whole.
+	"""
+	text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+	if fmt == "ndjson":
+		for line_no, line in enumerate(text, start=1):
+			if not line.strip():
+				continue
+			try:
+				record = json.loads(line)
+			except ValueError as exc:
+				yield line_no, None, f"invalid JSON: {exc}"
+				continue
+			if not isinstance(record, dict):
+				yield line_no, None, "expected a JSON object"
+				continue
+			yield line_no, record, None
+	else:
+		reader = csv.DictReader(text)
+		for record in reader:
+			yield reader.line_num, record, None
+
+
+def _float(record: Dict[str, Any], key: str, default: float | None, lo: float, hi: float) -> float:
+	raw = record.get(key)
+	if raw is None or raw == "":
+		if default is None:
+			raise ValueError(f"{key} is required")
+		return default
+	val = float(raw)
+	if not lo <= val <= hi:
+		raise ValueError(f"{key} must be between {lo:g} and {hi:g}")
+	return val
+
+
+def _user_id(raw: Any) -> int:
+	# Whole numbers only: an NDJSON 1.5 (or true) is rejected rather than truncated to 1
+	if isinstance(raw, bool) or (isinstance(raw, float) and not raw.is_integer()):
+		raise ValueError("user_id must be a whole number")
+	if isinstance(raw, (int, float)):
+		return int(raw)
+	try:
+		return int(str(raw).strip())
+	except ValueError:
+		raise ValueError("user_id must be a whole number") from None
+
+
+def validate_record(record: Dict[str, Any], user_id: int | None) -> Dict[str, Any]:
+	"""
+	Normalize one input record into Appliance column values; raises ValueError on bad input.
+	When user_id is None the record must carry its own user_id (fleet imports).
+	"""
+	type_ = str(record.get("type") or "").strip()
+	if not type_ or len(type_) > 80:
+		raise ValueError("type is required (max 80 chars)")
+	if user_id is None:
+		raw_user = record.get("user_id")
+		if raw_user is None or raw_user == "":
+			raise ValueError("user_id is required")
+		user_id = _user_id(raw_user)
+	quantity = _float(record, "quantity", 1, 1, 10000)
+	if quantity != int(quantity):
+		raise ValueError("quantity must be a whole number")
+	star_label = str(record.get("star_label") or "").strip() or None
+	if star_label and len(star_label) > 20:
+		raise ValueError("star_label max 20 chars")
+	return {
+		"user_id": user_id,
+		"type": type_,
+		"power_w": _float(record, "power_w", None, 0, 100000),
+		"quantity": int(quantity),
+		"hours_per_day": _float(record, "hours_per_day", 1.0, 0, 24),
+		"days_per_week": _float(record, "days_per_week", 7.0, 0, 7),
+		"star_label": star_label,
+	}
+
+
+def import_appliances(
+	records: Iterable[Tuple[int, Dict[str, Any] | None, str | None]],
+	user_id: int | None = None,
+	batch_size: int = 1000,
+	on_batch: Callable[[BatchStat], None] | None = None,
+) -> ImportReport:
+	"""
+	Validate and bulk-insert records in batches, committing each batch.
+	With user_id set, every row goes to that user (any user_id column is ignored).
+	"""
+	if batch_size < 1:
+		raise ValueError("batch_size must be at least 1")
+	report = ImportReport()
+	records = iter(records)
+	index = 0
+	while True:
+		chunk = list(islice(records, batch_size))
+		if not chunk:
+			break
+		t0 = time.perf_counter()
+		valid: List[Dict[str, Any]] = []
+		rejected = 0
+
+		def reject(line_no: int, error: str) -> None:
+			nonlocal rejected
+			rejected += 1
+			if len(report.rejects) < MAX_REJECTS_REPORTED:
+				report.rejects.append({"line": line_no, "error": error})
+
+		lines: List[int] = []
+		for line_no, record, error in chunk:
+			if error is not None:
+				reject(line_no, error)
+				continue
+			try:
+				valid.append(validate_record(record, user_id))
+				lines.append(line_no)
+			except (TypeError, ValueError) as exc:
+				reject(line_no, str(exc))
+
+		if user_id is None and valid:
+			wanted = {row["user_id"] for row in valid}
+			known = set(db.session.execute(select(User.id).where(User.id.in_(wanted))).scalars())
+			if known != wanted:
+				kept = []
+				for line_no, row in zip(lines, valid):
+					if row["user_id"] in known:
+						kept.append(row)
+					else:
+						reject(line_no, f"unknown user_id {row['user_id']}")
+				valid = kept
+
+		if valid:
+			batch_users = {row["user_id"] for row in valid}
+			db.session.execute(insert(Appliance), valid)
+			reevaluate(batch_users)
+			refresh_cohorts(batch_users)
+			forget_results(batch_users)
+			bump_user_versions(batch_users)
+			db.session.commit()
+			report.add_users(batch_users)
+
+		report.inserted += len(valid)
+		report.rejected += rejected
+		stat = BatchStat(index, len(chunk), len(valid), rejected, round(time.perf_counter() - t0, 4))
+		report.batch_count += 1
+		if len(report.batches) < MAX_BATCHES_REPORTED:
+			report.batches.append(stat)
+		if on_batch is not None:
+			on_batch(stat)
+		index += 1
+	return report
@@ -0,0 +1,198 @@
+from __future__ import annotations
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import select, update
+
+from . import db
+from .assumptions import bump_user_versions
+from .forecast import update_forecasts
+from .importer import _user_id
+from .models import Log, User
+from .schema import dialect_insert
+from .rollups import apply_deltas
+
+# Meter-reading ingestion: interval readings (15-min, hourly, daily) are rolled up to one row per
+# user per day and upserted on the (user_id, date) index in batches. The same transaction applies
+# the day's kWh delta to the day/week/month rollups (rollups.py) and advances the households' fitted
+# forecast models (forecast.py).
+
+MAX_REJECTS_REPORTED = 1000
+MAX_BATCH_SIZE = 50000  # cap for web requests (readings held in memory per batch)
+DailyKey = Tuple[int, date]
+
+
+@dataclass
+class IngestReport:
+	readings: int = 0
+	rejected: int = 0
+	days_upserted: int = 0
+	seconds: float = 0.0
+	rejects: List[Dict[str, Any]] = field(default_factory=list)  # first MAX_REJECTS_REPORTED only
+	user_ids: set = field(default_factory=set)
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"readings": self.readings,
+			"rejected": self.rejected,
+			"days_upserted": self.days_upserted,
+			"seconds": round(self.seconds, 4),
+			"rejects": self.rejects,
+		}
+
+
+def parse_day(raw: Any) -> date:
+	"""
+	Day a reading belongs to, from a date, datetime or ISO-8601 string ("2025-01-31" or "2025-01-31T13:15").
+	"""
+	if isinstance(raw, datetime):
+		return raw.date()
+	if isinstance(raw, date):
+		return raw
+	text = str(raw or "").strip()
+	if not text:
+		raise ValueError("timestamp is required")
+	return datetime.fromisoformat(text.replace("Z", "+00:00")).date()
+
+
+def validate_reading(record: Dict[str, Any], user_id: int | None) -> Tuple[int, date, float]:
+	if user_id is None:
+		raw_user = record.get("user_id")
+		if raw_user is None or raw_user == "":
+			raise ValueError("user_id is required")
+		user_id = _user_id(raw_user)
+	day = parse_day(record.get("timestamp", record.get("date")))
+	kwh = float(record.get("kwh"))
+	if not math.isfinite(kwh) or kwh < 0:
+		raise ValueError("kwh must be a non-negative number")
+	return user_id, day, kwh
+
+
+def rollup_daily(readings: Iterable[Tuple[int, date, float]]) -> Dict[DailyKey, float]:
+	totals: Dict[DailyKey, float] = {}
+	for user_id, day, kwh in readings:
+		key = (user_id, day)
+		totals[key] = totals.get(key, 0.0) + kwh
+	return totals
+
+
+def _existing_daily(totals: Dict[DailyKey, float]) -> Dict[DailyKey, float]:
+	# One indexed lookup per batch (a superset of the keys, filtered here)
+	rows = db.session.execute(
+		select(Log.user_id, Log.date, Log.kwh).where(
+			Log.user_id.in_({u for u, _ in totals}), Log.date.in_({d for _, d in totals})
+		)
+	)
+	return {(u, d): kwh for u, d, kwh in rows if (u, d) in totals}
+
+
+def upsert_daily(totals: Dict[DailyKey, float], mode: str = "add") -> Dict[DailyKey, Tuple[float, int]]:
+	"""
+	Write daily totals: "add" accumulates onto an existing day (readings for one day arriving in
+	several batches), "replace" overwrites it (re-sent full days).
+	Returns per-day (kWh delta, 1 if the day is new) for rollup maintenance.
+	"""
+	if not totals:
+		return {}
+	existing = _existing_daily(totals)
+	rows = [{"user_id": u, "date": d, "kwh": k} for (u, d), k in totals.items()]
+	insert = dialect_insert()
+	if insert is not None:
+		stmt = insert(Log)
+		new_kwh = Log.kwh + stmt.excluded.kwh if mode == "add" else stmt.excluded.kwh
+		db.session.execute(stmt.on_conflict_do_update(index_elements=["user_id", "date"], set_={"kwh": new_kwh}), rows)
+	else:
+		for row in rows:
+			old = existing.get((row["user_id"], row["date"]))
+			if old is None:
+				db.session.add(Log(**row))
+			else:
+				db.session.execute(
+					update(Log)
+					.where(Log.user_id == row["user_id"], Log.date == row["date"])
+					.values(kwh=old + row["kwh"] if mode == "add" else row["kwh"])
+				)
+	deltas = {}
+	for key, kwh in totals.items():
+		old = existing.get(key)
+		deltas[key] = (kwh if mode == "add" or old is None else kwh - old, 0 if old is not None else 1)
+	return deltas
+
+
+def ingest_readings(
+	records: Iterable[Tuple[int, Dict[str, Any] | None, str | None]],
+	user_id: int | None = None,
+	batch_size: int = 5000,
+	mode: str = "add",
+) -> IngestReport:
+	"""
+	Validate (line_no, record, parse_error) tuples, roll them up per day and upsert in batches.
+	With user_id set every reading belongs to that user; otherwise records carry user_id.
+	"""
+	if batch_size < 1:
+		raise ValueError("batch_size must be at least 1")
+	report = IngestReport()
+	t0 = time.perf_counter()
+	records = iter(records)
+	while True:
+		chunk = list(islice(records, batch_size))
+		if not chunk:
+			break
+		valid: List[Tuple[int, date, float]] = []
+		lines: List[int] = []
+
+		def reject(line_no: int, error: str) -> None:
+			report.rejected += 1
+			if len(report.rejects) < MAX_REJECTS_REPORTED:
+				report.rejects.append({"line": line_no, "error": error})
+
+		for line_no, record, error in chunk:
+			if error is not None:
+				reject(line_no, error)
+				continue
+			try:
+				valid.append(validate_reading(record, user_id))
+				lines.append(line_no)
+			except (TypeError, ValueError) as exc:
+				reject(line_no, str(exc))
+
+		if user_id is None and valid:
+			wanted = {r[0] for r in valid}
+			known = set(db.session.execute(select(User.id).where(User.id.in_(wanted))).scalars())
+			if known != wanted:
+				kept = []
+				for line_no, reading in zip(lines, valid):
+					if reading[0] in known:
+						kept.append(reading)
+					else:
+						reject(line_no, f"unknown user_id {reading[0]}")
+				valid = kept
+
+		totals = rollup_daily(valid)
+		apply_deltas(upsert_daily(totals, mode))
+		update_forecasts(totals)
+		bump_user_versions(u for u, _ in totals)
+		db.session.commit()
+		report.readings += len(valid)
+		report.days_upserted += len(totals)
+		report.user_ids.update(u for u, _ in totals)
+	report.seconds = time.perf_counter() - t0
+	return report
+
+
+def daily_series(user_id: int, start: date, end: date) -> List[Tuple[date, float | None]]:
+	"""
+	Daily kWh for start..end inclusive from an indexed range query; None for days without data.
+	"""
+	rows = db.session.execute(
+		select(Log.date, Log.kwh)
+		.where(Log.user_id == user_id, Log.date >= start, Log.date <= end)
+		.order_by(Log.date)
+	).all()
+	by_day = {d: kwh for d, kwh in rows}
+	days = (end - start).days + 1
+	return [(start + timedelta(days=i), by_day.get(start + timedelta(days=i))) for i in range(days)]
@@ -0,0 +1,260 @@
+from __future__ import annotations
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+
+from flask import Blueprint, Flask, Response, abort, before_render_template, current_app, has_app_context, request, template_rendered
+from sqlalchemy import event
+
+from . import db
+from .identity import admin_required
+
+# Opt-in request instrumentation (INSTRUMENTATION=1). Each request records its wall time split into SQL
+# (query count and time from cursor events), template rendering (Flask render signals) and the rest
+# (computation), plus named hot-path sections wrapped in timed(). Totals are kept per process and served
+# in Prometheus text format at /metrics; /admin/profile samples every thread's stack for a few seconds
+# and returns folded stacks (flamegraph.pl / speedscope input). When disabled nothing is registered and
+# timed() is a no-op.
+
+# The running request's record; a ContextVar keeps the per-query hooks to a single lookup
+_current: ContextVar["RequestRecord | None"] = ContextVar("instrumented_request", default=None)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("sql", "render", "compute")
+
+
+@dataclass
+class RequestRecord:
+	start: float
+	sql_queries: int = 0
+	sql_seconds: float = 0.0
+	render_seconds: float = 0.0
+	render_start: float | None = None
+	sql_start: float | None = None
+	sections: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class RouteStats:
+	count: int = 0
+	seconds: float = 0.0
+	sql_queries: int = 0
+	sql_seconds: float = 0.0
+	render_seconds: float = 0.0
+	buckets: List[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+
+
+class Metrics:
+	"""
+	Process-wide request and section totals (each worker process exports its own).
+	"""
+
+	def __init__(self) -> None:
+		self.routes: Dict[Tuple[str, str, int], RouteStats] = {}
+		self.sections: Dict[str, List[float]] = {}
+		self._lock = threading.Lock()
+
+	def observe_request(self, endpoint: str, method: str, status: int, seconds: float, record: RequestRecord) -> None:
+		with self._lock:
+			stats = self.routes.get((endpoint, method, status))
+			if stats is None:
+				stats = self.routes[(endpoint, method, status)] = RouteStats()
+			stats.count += 1
+			stats.seconds += seconds
+			stats.sql_queries += record.sql_queries
+			stats.sql_seconds += record.sql_seconds
+			stats.render_seconds += record.render_seconds
+			for i, bound in enumerate(BUCKETS):
+				if seconds <= bound:
+					stats.buckets[i] += 1
+					break
+
+	def observe_section(self, name: str, seconds: float) -> None:
+		with self._lock:
+			totals = self.sections.setdefault(name, [0, 0.0])
+			totals[0] += 1
+			totals[1] += seconds
+
+	def render(self) -> str:
+		with self._lock:
+			routes = sorted(self.routes.items())
+			sections = sorted(self.sections.items())
+		lines = [
+			"# HELP app_request_seconds Request wall time.",
+			"# TYPE app_request_seconds histogram",
+		]
+		for (endpoint, method, status), s in routes:
+			labels = f'endpoint="{endpoint}",method="{method}",status="{status}"'
+			cumulative = 0
+			for bound, n in zip(BUCKETS, s.buckets):
+				cumulative += n
+				lines.append(f'app_request_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+			lines.append(f'app_request_seconds_bucket{{{labels},le="+Inf"}} {s.count}')
+			lines.append(f"app_request_seconds_sum{{{labels}}} {s.seconds:.6f}")
+			lines.append(f"app_request_seconds_count{{{labels}}} {s.count}")
+		lines += ["# HELP app_request_phase_seconds_total Request time by phase.", "# TYPE app_request_phase_seconds_total counter"]
+		for (endpoint, method, status), s in routes:
+			compute = max(s.seconds - s.sql_seconds - s.render_seconds, 0.0)
+			for phase, value in zip(PHASES, (s.sql_seconds, s.render_seconds, compute)):
+				lines.append(f'app_request_phase_seconds_total{{endpoint="{endpoint}",method="{method}",status="{status}",phase="{phase}"}} {value:.6f}')
+		lines += ["# HELP app_sql_queries_total SQL statements executed by requests.", "# TYPE app_sql_queries_total counter"]
+		for (endpoint, method, status), s in routes:
+			lines.append(f'app_sql_queries_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {s.sql_queries}')
+		lines += ["# HELP app_section_seconds Time in instrumented hot-path sections.", "# TYPE app_section_seconds summary"]
+		for name, (count, seconds) in sections:
+			lines.append(f'app_section_seconds_sum{{section="{name}"}} {seconds:.6f}')
+			lines.append(f'app_section_seconds_count{{section="{name}"}} {count}')
+		return "\n".join(lines) + "\n"
+
+
+def _metrics() -> Metrics | None:
+	return current_app.extensions.get("instrumentation") if has_app_context() else None
+
+
+@contextmanager
+def timed(section: str) -> Iterator[None]:
+	"""
+	Time a hot-path section (recommendations, PDF rendering, ...); free when instrumentation is off.
+	"""
+	metrics = _metrics()
+	if metrics is None:
+		yield
+		return
+	t0 = time.perf_counter()
+	try:
+		yield
+	finally:
+		seconds = time.perf_counter() - t0
+		metrics.observe_section(section, seconds)
+		record = _current.get()
+		if record is not None:
+			record.sections[section] = record.sections.get(section, 0.0) + seconds
+
+
+def _before_cursor(conn, cursor, statement, parameters, context, executemany) -> None:
+	record = _current.get()
+	if record is not None:
+		record.sql_start = time.perf_counter()
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany) -> None:
+	record = _current.get()
+	if record is not None and record.sql_start is not None:
+		record.sql_queries += 1
+		record.sql_seconds += time.perf_counter() - record.sql_start
+		record.sql_start = None
+
+
+def _before_render(sender, template, context, **extra) -> None:
+	record = _current.get()
+	if record is not None:
+		record.render_start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra) -> None:
+	record = _current.get()
+	if record is not None and record.render_start is not None:
+		record.render_seconds += time.perf_counter() - record.render_start
+		record.render_start = None
+
+
+def _start_request() -> None:
+	_current.set(RequestRecord(time.perf_counter()))
+
+
+def _finish_request(response: Response) -> Response:
+	record = _current.get()
+	if record is None:
+		return response
+	_current.set(None)
+	seconds = time.perf_counter() - record.start
+	endpoint = request.endpoint or "unmatched"
+	current_app.extensions["instrumentation"].observe_request(endpoint, request.method, response.status_code, seconds, record)
+	timing = [
+		f'sql;dur={record.sql_seconds * 1000:.2f};desc="{record.sql_queries} queries"',
+		f"render;dur={record.render_seconds * 1000:.2f}",
+		*(f"{name};dur={s * 1000:.2f}" for name, s in record.sections.items()),
+		f"total;dur={seconds * 1000:.2f}",
+	]
+	response.headers["Server-Timing"] = ", ".join(timing)
+	return response
+
+
+class SamplingProfiler:
+	"""
+	Samples the stacks of all other threads every `interval` seconds; counts folded stacks.
+	"""
+
+	def __init__(self, interval: float = 0.005) -> None:
+		self.interval = interval
+		self.samples = 0
+		self.stacks: Counter[str] = Counter()
+
+	def run(self, seconds: float, ignore: set | None = None) -> "SamplingProfiler":
+		ignore = set(ignore or ()) | {threading.get_ident()}
+		deadline = time.perf_counter() + seconds
+		while time.perf_counter() < deadline:
+			for thread_id, frame in sys._current_frames().items():
+				if thread_id in ignore:
+					continue
+				names = []
+				while frame is not None:
+					code = frame.f_code
+					names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+					frame = frame.f_back
+				self.stacks[";".join(reversed(names))] += 1
+			self.samples += 1
+			time.sleep(self.interval)
+		return self
+
+	def folded(self) -> str:
+		return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+bp = Blueprint("instrumentation", __name__)
+
+
+@bp.route("/metrics")
+def metrics():
+	return Response(current_app.extensions["instrumentation"].render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/admin/profile")
+@admin_required
+def profile():
+	"""
+	Sample all threads for ?seconds=N (default 5) and return folded stacks for a flame graph.
+	"""
+	try:
+		seconds = float(request.args.get("seconds", 5))
+		interval = float(request.args.get("interval_ms", 5)) / 1000.0
+	except ValueError:
+		abort(400)
+	if not 0 < seconds <= current_app.config["PROFILE_MAX_SECONDS"] or interval <= 0:
+		abort(400)
+	profiler = SamplingProfiler(interval).run(seconds)
+	return Response(
+		profiler.folded(),
+		mimetype="text/plain",
+		headers={"Content-Disposition": "attachment; filename=profile.folded", "X-Profile-Samples": str(profiler.samples)},
+	)
+
+
+def init_instrumentation(app: Flask) -> Metrics | None:
+	if not app.config.get("INSTRUMENTATION"):
+		return None
+	metrics = Metrics()
+	app.extensions["instrumentation"] = metrics
+	app.before_request(_start_request)
+	app.after_request(_finish_request)
+	before_render_template.connect(_before_render, app)
+	template_rendered.connect(_after_render, app)
+	with app.app_context():
+		event.listen(db.engine, "before_cursor_execute", _before_cursor)
+		event.listen(db.engine, "after_cursor_execute", _after_cursor)
+	app.register_blueprint(bp)
+	return metrics
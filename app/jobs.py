@@ -0,0 +1,136 @@
+from __future__ import annotations
+import hashlib
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Set
+
+from flask import Flask, current_app
+from sqlalchemy import delete, select, update
+
+from . import db
+from .instrumentation import timed
+from .models import ReportJob
+
+# Background PDF rendering. The request renders the (cheap) report HTML and hashes it; WeasyPrint runs
+# on a local worker pool and the PDF is stored on the job row. A finished job with the same hash is
+# served directly, so unchanged reports never hit WeasyPrint again.
+
+PENDING = ("queued", "running")
+
+
+def render_pdf(html: str) -> bytes:
+	from weasyprint import HTML  # type: ignore
+
+	with timed("pdf"):
+		return HTML(string=html).write_pdf()
+
+
+def content_hash(html: str) -> str:
+	# The HTML is derived from user + appliances + KPIs, so it doubles as their content hash
+	return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+class JobRunner:
+	"""
+	Local thread pool executing report jobs; job state lives in the report_jobs table.
+	"""
+
+	def __init__(self, app: Flask, max_workers: int = 2) -> None:
+		self.app = app
+		self.max_workers = max_workers
+		self._executor: ThreadPoolExecutor | None = None
+		self._futures: Set[Future] = set()
+		self._lock = threading.Lock()
+
+	def submit(self, job_id: str, html: str) -> None:
+		with self._lock:
+			if self._executor is None:
+				self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="report-job")
+			future = self._executor.submit(self._run, job_id, html)
+			self._futures.add(future)
+		future.add_done_callback(self._futures.discard)
+
+	def join(self, timeout: float | None = None) -> None:
+		"""Wait for submitted jobs (used by tests and graceful shutdown)."""
+		wait(list(self._futures), timeout=timeout)
+
+	def _run(self, job_id: str, html: str) -> None:
+		with self.app.app_context():
+			job = db.session.get(ReportJob, job_id)
+			if job is None:
+				return
+			job.status = "running"
+			db.session.commit()
+			try:
+				job.result = render_pdf(html)
+				job.status = "done"
+			except Exception as exc:  # surfaced to the client through the job status
+				job.status = "failed"
+				job.error = str(exc)
+			job.finished_at = datetime.utcnow()
+			db.session.commit()
+			if job.status == "done":
+				_prune(job.user_id, keep=int(self.app.config.get("PDF_CACHE_PER_USER", 3)))
+
+
+def _prune(user_id: int, keep: int) -> None:
+	stale = db.session.scalars(
+		select(ReportJob.id)
+		.where(ReportJob.user_id == user_id, ReportJob.status.in_(("done", "failed")))
+		.order_by(ReportJob.finished_at.desc())
+		.offset(keep)
+	).all()
+	if stale:
+		db.session.execute(delete(ReportJob).where(ReportJob.id.in_(stale)))
+		db.session.commit()
+
+
+def init_jobs(app: Flask) -> JobRunner:
+	runner = JobRunner(app, max_workers=int(app.config.get("PDF_WORKERS", 2)))
+	app.extensions["report_jobs"] = runner
+	return runner
+
+
+def _job_timeout() -> timedelta:
+	return timedelta(seconds=float(current_app.config.get("PDF_JOB_TIMEOUT", 300)))
+
+
+def expire_stale(job: ReportJob) -> ReportJob:
+	"""
+	Mark a queued/running job older than PDF_JOB_TIMEOUT as failed: its worker is gone (e.g. a restart),
+	so the status page stops polling. The update is conditional, so a job finishing meanwhile wins.
+	"""
+	if job.status in PENDING and job.created_at <= datetime.utcnow() - _job_timeout():
+		db.session.execute(
+			update(ReportJob)
+			.where(ReportJob.id == job.id, ReportJob.status.in_(PENDING))
+			.values(status="failed", error="the report worker stopped; please try again", finished_at=datetime.utcnow())
+		)
+		db.session.commit()
+		db.session.refresh(job)
+	return job
+
+
+def enqueue_pdf(user_id: int, html: str) -> ReportJob:
+	"""
+	Return a finished or in-flight job for identical content, or queue a new one.
+	"""
+	digest = content_hash(html)
+	timeout = _job_timeout()
+	existing = db.session.scalars(
+		select(ReportJob)
+		.where(ReportJob.user_id == user_id, ReportJob.content_hash == digest, ReportJob.status != "failed")
+		.order_by(ReportJob.created_at.desc())
+		.limit(1)
+	).first()
+	if existing is not None:
+		# A pending job older than the timeout was lost (e.g. worker restart); queue a fresh one
+		if existing.status == "done" or existing.created_at > datetime.utcnow() - timeout:
+			return existing
+	job = ReportJob(id=uuid.uuid4().hex, user_id=user_id, content_hash=digest, status="queued")
+	db.session.add(job)
+	db.session.commit()
+	current_app.extensions["report_jobs"].submit(job.id, html)
+	return job
@@ -0,0 +1,196 @@
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# household_profile (one household, plain Python) is re-exported for existing callers
+from .loadshapes import CLASSES, class_index, household_profile, hours_in_year, shape_tables
+
+# Hourly (8760 h, 8784 in leap years) expected load profiles from the appliance list.
+#
+# Each appliance type maps to a usage class with a 24 h priority shape, a monthly season factor and a
+# day-of-week factor. An appliance running H h/day fills its class's preferred hours first:
+# on(hour) = clip(H × season[month] − rank[hour], 0, 1), scaled by days_per_week / 7 and the weekday
+# factor, so annual energy matches daily_kwh() × 365 up to calendar rounding. Per household the fills
+# are summed per class into (class × month × hour) tables, combined with the weekday factors in one
+# einsum to (month × weekday × hour), and expanded to the calendar with a single gather.
+# Fleets are simulated in chunks into a memory-mapped float32 .npy file. The usage classes and the
+# dashboard's single-household profile live in loadshapes.py, which does not need NumPy.
+
+HOURS_PER_YEAR = 8760  # 8784 in leap years, see hours_in_year()
+
+
+@dataclass
+class FleetSummary:
+	households: int
+	coincident_peak_kw: float
+	coincident_peak_at: datetime
+	sum_of_peaks_kw: float
+	diversity_factor: float  # sum of individual peaks / coincident peak
+	seconds: float
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"households": self.households,
+			"coincident_peak_kw": round(self.coincident_peak_kw, 3),
+			"coincident_peak_at": self.coincident_peak_at.isoformat(),
+			"sum_of_peaks_kw": round(self.sum_of_peaks_kw, 3),
+			"diversity_factor": round(self.diversity_factor, 3),
+			"seconds": round(self.seconds, 3),
+		}
+
+
+def classify(types: Iterable[str]) -> np.ndarray:
+	return np.array([class_index(t) for t in types], dtype=np.intp)
+
+
+@lru_cache(maxsize=1)
+def _tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	# rank[k, hour]: fill order (0 = first); season[k, month]; weekday[k, dow]
+	rank, season, weekday = shape_tables()
+	return np.array(rank, dtype=float), np.array(season), np.array(weekday)
+
+
+@lru_cache(maxsize=8)
+def calendar_index(year: int) -> np.ndarray:
+	"""
+	For each hour of year from Jan 1 (8760, or 8784 in leap years): flat index into a (month, weekday,
+	hour) table.
+	"""
+	hours = np.arange(hours_in_year(year))
+	days = np.datetime64(f"{year}-01-01") + (hours // 24).astype("timedelta64[D]")
+	month = days.astype("datetime64[M]").astype(int) % 12
+	dow = (days.astype("datetime64[D]").astype(int) - 4) % 7  # 1970-01-01 was a Thursday
+	return (month * 7 + dow) * 24 + hours % 24
+
+
+def _class_tables(codes: np.ndarray, n_households: int, classes: np.ndarray, kw: np.ndarray, hours: np.ndarray, days: np.ndarray) -> np.ndarray:
+	# (households, classes, 12, 24) expected kWh per hour of day, summed over each class's appliances.
+	# In rank order an appliance's fill is w for ranks below floor(on) plus w × frac(on) at floor(on), so
+	# the per-group sums are two bincounts and a cumulative sum; they are then mapped back to clock hours.
+	rank, season, _ = _tables()
+	out = np.zeros((n_households * len(CLASSES), 12, 24), dtype=np.float32)
+	if not len(codes):
+		return out.reshape(n_households, len(CLASSES), 12, 24)
+	groups, group_of = np.unique(codes * len(CLASSES) + classes, return_inverse=True)
+	hours = np.asarray(hours, dtype=np.float64)[:, None]
+	factor = season[classes]
+	h_month = hours * factor
+	# Always-on loads (fridges) follow the season through their draw, as do hours pushed past 24 h/day
+	always = hours >= 24
+	on = np.where(always, 24.0, h_month)
+	weight = np.where(always, factor, np.maximum(h_month / 24.0, 1.0))
+	weight *= (np.asarray(kw, dtype=np.float64) * np.asarray(days, dtype=np.float64) / 7.0)[:, None]
+	whole = np.clip(np.floor(on), 0, 24).astype(np.intp)
+	slot = (group_of[:, None] * 12 + np.arange(12)) * 25 + whole
+	size = len(groups) * 12 * 25
+	full = np.bincount(slot.ravel(), weights=weight.ravel(), minlength=size).reshape(-1, 12, 25)
+	part = np.bincount(slot.ravel(), weights=(weight * (on - whole)).ravel(), minlength=size).reshape(-1, 12, 25)
+	# Rank r is fully on for appliances with floor(on) > r
+	by_rank = full.sum(axis=2, keepdims=True) - np.cumsum(full[:, :, :24], axis=2) + part[:, :, :24]
+	hour_rank = rank.astype(np.intp)[groups % len(CLASSES)][:, None, :]
+	out[groups] = np.take_along_axis(by_rank, hour_rank, axis=2)
+	return out.reshape(n_households, len(CLASSES), 12, 24)
+
+
+def simulate(appliances: pd.DataFrame, index: pd.Index, year: int) -> np.ndarray:
+	"""
+	(households x hours_in_year(year)) float32 expected kWh per hour (= average kW) for the users in index.
+	appliances: columns user_id, type, power_w, quantity, hours_per_day, days_per_week.
+	"""
+	codes = index.get_indexer(appliances["user_id"].to_numpy()) if len(appliances) else np.zeros(0, dtype=np.intp)
+	known = codes >= 0
+	apps = appliances[known]
+	kw = apps["power_w"].to_numpy(dtype=np.float64) * apps["quantity"].to_numpy(dtype=np.float64) / 1000.0
+	tables = _class_tables(
+		codes[known],
+		len(index),
+		classify(apps["type"]),
+		kw,
+		apps["hours_per_day"].to_numpy(dtype=np.float64),
+		apps["days_per_week"].to_numpy(dtype=np.float64),
+	)
+	_, _, weekday = _tables()
+	week = np.einsum("hkmr,kd->hmdr", tables, weekday.astype(np.float32), optimize=True)
+	return week.reshape(len(index), -1)[:, calendar_index(year)]
+
+
+def profile_stats(profiles: np.ndarray, year: int) -> pd.DataFrame:
+	"""
+	Per household: annual kWh, peak kW and when it occurs, load factor (average / peak).
+	"""
+	peak_at = profiles.argmax(axis=1)
+	peak = profiles[np.arange(len(profiles)), peak_at].astype(np.float64)
+	annual = profiles.sum(axis=1, dtype=np.float64)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		load_factor = np.where(peak > 0, annual / profiles.shape[1] / peak, 0.0)
+	start = np.datetime64(f"{year}-01-01T00")
+	return pd.DataFrame({
+		"annual_kwh": annual.round(2),
+		"peak_kw": peak.round(3),
+		"peak_at": start + peak_at.astype("timedelta64[h]"),
+		"load_factor": load_factor.round(3),
+	})
+
+
+def simulate_fleet(
+	out_dir: str | Path,
+	user_ids: Sequence[int],
+	year: int,
+	chunk_size: int = 2000,
+	load=None,
+) -> Tuple[FleetSummary, pd.DataFrame]:
+	"""
+	Simulate many households into out_dir/profiles.npy (memory-mapped float32, households x hours of year)
+	with out_dir/user_ids.npy; returns the fleet summary and per-household stats.
+	load(chunk_ids) -> appliances frame; defaults to batch.load_appliances_frame.
+	"""
+	from numpy.lib.format import open_memmap
+
+	if load is None:
+		from .batch import load_appliances_frame as load
+	t0 = time.perf_counter()
+	out_dir = Path(out_dir)
+	out_dir.mkdir(parents=True, exist_ok=True)
+	user_ids = np.asarray(user_ids, dtype=np.int64)
+	np.save(out_dir / "user_ids.npy", user_ids)
+	n_hours = hours_in_year(year)
+	profiles = open_memmap(out_dir / "profiles.npy", mode="w+", dtype=np.float32, shape=(len(user_ids), n_hours))
+	total = np.zeros(n_hours, dtype=np.float64)
+	stats = []
+	for i in range(0, len(user_ids), chunk_size):
+		chunk = user_ids[i : i + chunk_size]
+		block = simulate(load(chunk.tolist()), pd.Index(chunk), year)
+		profiles[i : i + len(chunk)] = block
+		total += block.sum(axis=0, dtype=np.float64)
+		stats.append(profile_stats(block, year))
+	profiles.flush()
+	del profiles
+	per_household = pd.concat(stats, ignore_index=True) if stats else profile_stats(np.zeros((0, n_hours), np.float32), year)
+	per_household.insert(0, "user_id", user_ids)
+	peak_hour = int(total.argmax()) if len(user_ids) else 0
+	coincident = float(total[peak_hour]) if len(user_ids) else 0.0
+	sum_of_peaks = float(per_household["peak_kw"].sum())
+	summary = FleetSummary(
+		households=len(user_ids),
+		coincident_peak_kw=coincident,
+		coincident_peak_at=datetime(year, 1, 1) + timedelta(hours=peak_hour),
+		sum_of_peaks_kw=sum_of_peaks,
+		diversity_factor=sum_of_peaks / coincident if coincident else 0.0,
+		seconds=time.perf_counter() - t0,
+	)
+	return summary, per_household
+
+
+def open_profiles(out_dir: str | Path) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	(user_ids, profiles) from simulate_fleet(); profiles stay memory-mapped (read-only).
+	"""
+	out_dir = Path(out_dir)
+	return np.load(out_dir / "user_ids.npy"), np.load(out_dir / "profiles.npy", mmap_mode="r")
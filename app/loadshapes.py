@@ -0,0 +1,166 @@
+from __future__ import annotations
+import calendar
+import math
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .recommendations import AC_TYPES, FRIDGE_TYPES, LIGHTING_TYPES
+
+# Usage classes for the hourly load profiles, and the single-household profile the dashboard shows.
+#
+# Each appliance type maps to a usage class with a 24 h priority shape, a monthly season factor and a
+# day-of-week factor (see loadprofile.py for the model). This module is plain Python so the dashboard's
+# first response does not import NumPy/pandas: one household's (month x weekday x hour) table is at most
+# 2016 cells, expanded over the calendar one day at a time. loadprofile.py builds its arrays for fleets
+# from the same tables.
+
+CLASS_TYPES: Dict[str, set] = {
+	"lighting": LIGHTING_TYPES | {"led", "cfl", "lamp"},
+	"fan": {"fan", "ceiling fan", "cooler"},
+	"ac": AC_TYPES,
+	"fridge": FRIDGE_TYPES | {"freezer"},
+	"tv": {"tv", "television"},
+	"router": {"router", "modem", "wifi"},
+	"computer": {"laptop", "computer", "pc", "desktop", "monitor"},
+	"washer": {"wm", "washing machine", "washer", "dryer"},
+	"geyser": {"geyser", "water heater", "heater"},
+	"kitchen": {"microwave", "oven", "induction", "kettle", "mixer", "toaster"},
+	"other": set(),
+}
+CLASSES: List[str] = list(CLASS_TYPES)
+# Relative preference for each hour 0..23; only the ordering matters (highest is filled first)
+SHAPES: Dict[str, Sequence[float]] = {
+	"lighting": [2, 1, 1, 1, 1, 3, 5, 4, 2, 1, 1, 1, 1, 1, 1, 1, 2, 4, 9, 10, 10, 9, 7, 4],
+	"fan": [9, 9, 9, 8, 8, 7, 5, 3, 2, 2, 3, 4, 5, 6, 6, 5, 4, 4, 5, 6, 7, 7, 8, 9],
+	"ac": [8, 8, 7, 6, 5, 4, 2, 1, 1, 1, 2, 3, 5, 7, 8, 8, 7, 6, 6, 7, 8, 9, 10, 9],
+	"fridge": [1] * 24,
+	"tv": [1, 1, 1, 1, 1, 1, 2, 3, 3, 2, 2, 2, 3, 3, 3, 3, 4, 5, 7, 9, 10, 10, 8, 4],
+	"router": [1] * 24,
+	"computer": [1, 1, 1, 1, 1, 1, 1, 2, 4, 7, 9, 10, 9, 8, 9, 9, 8, 7, 6, 6, 5, 4, 3, 2],
+	"washer": [1, 1, 1, 1, 1, 2, 5, 9, 10, 8, 6, 4, 3, 3, 3, 3, 3, 3, 3, 3, 2, 2, 1, 1],
+	"geyser": [1, 1, 1, 1, 2, 6, 10, 9, 7, 4, 2, 1, 1, 1, 1, 1, 1, 2, 4, 5, 4, 2, 1, 1],
+	"kitchen": [1, 1, 1, 1, 1, 2, 4, 7, 8, 5, 3, 4, 7, 8, 5, 3, 3, 4, 6, 8, 9, 7, 3, 1],
+	"other": [1, 1, 1, 1, 1, 1, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 4, 5, 6, 6, 5, 3, 2],
+}
+# Monthly usage factor Jan..Dec (normalized to a mean of 1 over the year)
+SEASONS: Dict[str, Sequence[float]] = {
+	"ac": [0.1, 0.2, 0.7, 1.5, 2.0, 1.8, 1.2, 1.1, 1.2, 1.0, 0.5, 0.2],
+	"fan": [0.3, 0.5, 0.9, 1.3, 1.5, 1.4, 1.2, 1.2, 1.2, 1.1, 0.8, 0.4],
+	"geyser": [2.0, 1.7, 1.1, 0.6, 0.3, 0.3, 0.4, 0.4, 0.5, 0.8, 1.4, 1.9],
+	"fridge": [0.9, 0.9, 1.0, 1.1, 1.15, 1.1, 1.0, 1.0, 1.0, 1.0, 0.95, 0.9],
+}
+# Day-of-week factor Mon..Sun (normalized to a mean of 1)
+WEEKDAYS: Dict[str, Sequence[float]] = {
+	"tv": [0.9, 0.9, 0.9, 0.9, 1.0, 1.2, 1.2],
+	"washer": [0.7, 0.7, 0.7, 0.7, 0.7, 1.7, 1.8],
+	"computer": [1.1, 1.1, 1.1, 1.1, 1.1, 0.75, 0.75],
+	"kitchen": [0.95, 0.95, 0.95, 0.95, 0.95, 1.1, 1.15],
+}
+_TYPE_CLASS = {t: k for k, name in enumerate(CLASSES) for t in CLASS_TYPES[name]}
+
+
+def hours_in_year(year: int) -> int:
+	return 24 * (366 if calendar.isleap(year) else 365)
+
+
+def class_index(appliance_type: Any) -> int:
+	return _TYPE_CLASS.get(str(appliance_type).lower().strip(), len(CLASSES) - 1)  # "other" is last
+
+
+@lru_cache(maxsize=1)
+def shape_tables() -> Tuple[Tuple[Tuple[int, ...], ...], Tuple[Tuple[float, ...], ...], Tuple[Tuple[float, ...], ...]]:
+	"""
+	Per class: fill rank of each clock hour (0 = filled first), season factor per month and weekday factor.
+	"""
+	days = [calendar.monthrange(2023, m)[1] for m in range(1, 13)]
+	rank, season, weekday = [], [], []
+	for name in CLASSES:
+		order = sorted(range(24), key=lambda h: -SHAPES[name][h])  # stable: earlier hours win ties
+		hour_rank = [0] * 24
+		for r, h in enumerate(order):
+			hour_rank[h] = r
+		rank.append(tuple(hour_rank))
+		s = SEASONS.get(name)
+		season.append(tuple(v * sum(days) / sum(v * d for v, d in zip(s, days)) for v in s) if s else (1.0,) * 12)
+		w = WEEKDAYS.get(name)
+		weekday.append(tuple(v / (sum(w) / 7) for v in w) if w else (1.0,) * 7)
+	return tuple(rank), tuple(season), tuple(weekday)
+
+
+def week_table(appliances: Sequence[Any]) -> List[List[List[float]]]:
+	"""
+	[month][weekday][hour] expected kWh for one household: each appliance fills its class's preferred
+	hours first, on(hour) = clip(H × season[month] − rank[hour], 0, 1).
+	"""
+	rank, season, weekday = shape_tables()
+	order = [sorted(range(24), key=r.__getitem__) for r in rank]  # clock hours in fill order
+	# Appliances of one class running the same hours fill the same cells: sum their draw first
+	draws: Dict[Tuple[int, float], float] = {}
+	for a in appliances:
+		key = (class_index(a.type), float(a.hours_per_day))
+		draws[key] = draws.get(key, 0.0) + float(a.power_w) * float(a.quantity) / 1000.0 * float(a.days_per_week) / 7.0
+	by_class: Dict[int, List[List[float]]] = {}
+	for (k, hours), scale in draws.items():
+		table = by_class.setdefault(k, [[0.0] * 24 for _ in range(12)])
+		for m in range(12):
+			factor = season[k][m]
+			h_month = hours * factor
+			# Always-on loads (fridges) follow the season through their draw, as do hours pushed past 24 h/day
+			on, weight = (24.0, factor) if hours >= 24 else (h_month, max(h_month / 24.0, 1.0))
+			weight *= scale
+			row = table[m]
+			for r, hour in enumerate(order[k][: max(0, min(24, math.ceil(on)))]):
+				row[hour] += weight * min(on - r, 1.0)
+	week = [[[0.0] * 24 for _ in range(7)] for _ in range(12)]
+	for k, table in by_class.items():
+		for m in range(12):
+			for d in range(7):
+				factor, row, out = weekday[k][d], table[m], week[m][d]
+				for hour in range(24):
+					out[hour] += row[hour] * factor
+	return week
+
+
+@lru_cache(maxsize=8)
+def _calendar_cells(year: int) -> Tuple[Dict[Tuple[int, int], int], Dict[Tuple[int, int], int]]:
+	# How often each (month, weekday) occurs in year, and its first day (0-based), in calendar order
+	counts: Dict[Tuple[int, int], int] = {}
+	first: Dict[Tuple[int, int], int] = {}
+	start = date(year, 1, 1)
+	for i in range(hours_in_year(year) // 24):
+		day = start + timedelta(days=i)
+		cell = (day.month - 1, day.weekday())
+		counts[cell] = counts.get(cell, 0) + 1
+		first.setdefault(cell, i)
+	return counts, first
+
+
+def household_profile(appliances: Sequence[Any], year: int | None = None) -> Dict[str, Any]:
+	"""
+	Profile summary for one household (dashboard): peak, load factor and the average day by hour.
+	"""
+	year = year or date.today().year
+	week = week_table(appliances)
+	n_days = hours_in_year(year) // 24
+	counts, first = _calendar_cells(year)
+	day_total = [0.0] * 24
+	peak, peak_hour = 0.0, 0
+	for (m, d), n in counts.items():
+		for hour, kw in enumerate(week[m][d]):
+			day_total[hour] += n * kw
+			at = first[(m, d)] * 24 + hour
+			if kw > peak or (kw == peak and kw > 0 and at < peak_hour):  # first occurrence, like argmax
+				peak, peak_hour = kw, at
+	annual = sum(day_total)
+	average = [v / n_days for v in day_total]
+	total = sum(average)
+	return {
+		"annual_kwh": round(annual, 2),
+		"peak_kw": round(peak, 3),
+		"peak_at": datetime(year, 1, 1) + timedelta(hours=peak_hour),
+		"load_factor": round(annual / (n_days * 24) / peak, 3) if peak > 0 else 0.0,
+		"busiest_hour": max(range(24), key=lambda h: average[h]),
+		"average_day_kw": [round(v, 3) for v in average],
+		"hourly_share": [v / total if total else 1 / 24 for v in average],
+	}
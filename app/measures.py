@@ -0,0 +1,178 @@
+from __future__ import annotations
+import hashlib
+import heapq
+import json
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import case, delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .assumptions import assumptions_version
+from .models import Appliance, RecommendationResult, User
+from .queries import forget_appliances, user_appliances
+from .recommendations import FORMULAS, RULES, Recommendation, evaluate_rules, generate_recommendations, rank_key, rule_context
+from .tariffs import plan_cache_key
+
+# Persisted recommendation results: one row per rule per appliance (or per household rule), tagged with
+# the pricing/assumptions basis it was computed under. A page view reads the household's rows already
+# ranked instead of re-running every rule. Appliance change events recompute only the rule/appliance
+# pairs they touch - the rules registered for the added or deleted appliances, plus the household rules
+# that depend on the device count - and heap-merge them into the untouched, already ranked rows.
+# Households on a slab/time-of-day plan price every saving off total usage, so any appliance change
+# recomputes all of their rows; a new basis (tariff, EF, plan, assumptions) is picked up on the next read.
+
+RESULT_COLUMNS = (
+	RecommendationResult.key,
+	RecommendationResult.code,
+	RecommendationResult.appliance_id,
+	RecommendationResult.basis,
+	RecommendationResult.title,
+	RecommendationResult.details_json,
+	RecommendationResult.delta_kwh_month,
+	RecommendationResult.delta_cost_month,
+	RecommendationResult.delta_co2_month,
+	RecommendationResult.payback_months,
+	RecommendationResult.impact_score,
+)
+
+
+def result_basis(user: User, plan: Any) -> str:
+	return basis_digest(user.tariff, user.ef, assumptions_version(), plan_cache_key(plan))
+
+
+def basis_digest(tariff: float, ef: float, assumptions_version: int, plan_key: tuple | None) -> str:
+	# plan_key: tariffs.plan_cache_key() of the household's plan
+	key = (tariff, ef, assumptions_version, plan_key)
+	return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def _ranked_stmt(user_id: int):
+	# Same order as recommendations.rank_key
+	rule_order = case({code: i for i, code in enumerate(RULES)}, value=RecommendationResult.code, else_=len(RULES))
+	return (
+		select(*RESULT_COLUMNS)
+		.where(RecommendationResult.user_id == user_id)
+		.order_by(
+			RecommendationResult.delta_cost_month.desc(),
+			func.coalesce(func.nullif(RecommendationResult.payback_months, 0.0), 1e9),
+			rule_order,
+			func.coalesce(RecommendationResult.appliance_id, 0),
+		)
+	)
+
+
+def result_row(user_id: int, basis: str, rec: Recommendation) -> Dict[str, Any]:
+	return {
+		"user_id": user_id,
+		"key": rec.key,
+		"code": rec.code,
+		"appliance_id": rec.details.get("appliance_id"),
+		"basis": basis,
+		"title": rec.title,
+		"details_json": json.dumps(rec.details),
+		"delta_kwh_month": rec.delta_kwh_month,
+		"delta_cost_month": rec.delta_cost_month,
+		"delta_co2_month": rec.delta_co2_month,
+		"payback_months": rec.payback_months,
+		"impact_score": rec.impact_score,
+	}
+
+
+def _recommendation(row: Any) -> Recommendation:
+	return Recommendation(
+		code=row.code,
+		title=row.title,
+		details=json.loads(row.details_json),
+		delta_kwh_month=row.delta_kwh_month,
+		delta_cost_month=row.delta_cost_month,
+		delta_co2_month=row.delta_co2_month,
+		payback_months=row.payback_months,
+		impact_score=row.impact_score,
+		formula=FORMULAS.get(row.code, ""),
+	)
+
+
+def _store(user_id: int, basis: str, recs: Iterable[Recommendation]) -> None:
+	rows = [result_row(user_id, basis, r) for r in recs]
+	if rows:
+		db.session.execute(insert(RecommendationResult).execution_options(render_nulls=True), rows)
+
+
+def _recompute(user: User, assumptions: Dict[str, float], plan: Any) -> List[Recommendation]:
+	forget_appliances(user.id)
+	recs = generate_recommendations(user_appliances(user.id), user.tariff, user.ef, assumptions, plan)
+	recs.sort(key=rank_key)  # already in this order for appliances listed by id; makes it explicit
+	return recs
+
+
+def _replace(user_id: int, basis: str, recs: List[Recommendation]) -> None:
+	db.session.execute(delete(RecommendationResult).where(RecommendationResult.user_id == user_id))
+	_store(user_id, basis, recs)
+
+
+def stored_recommendations(user: User, assumptions: Dict[str, float], plan: Any) -> List[Recommendation]:
+	"""
+	The household's ranked recommendations from its stored results. Missing or stale results (a new
+	tariff, EF, plan or assumptions) are recomputed and stored.
+	"""
+	basis = result_basis(user, plan)
+	rows = db.session.execute(_ranked_stmt(user.id)).all()
+	if rows and all(r.basis == basis for r in rows):
+		return [_recommendation(r) for r in rows]
+	recs = _recompute(user, assumptions, plan)
+	try:
+		_replace(user.id, basis, recs)
+		db.session.commit()
+	except IntegrityError:
+		# A concurrent request stored the same results first
+		db.session.rollback()
+	return recs
+
+
+def apply_appliance_changes(
+	user: User,
+	assumptions: Dict[str, float],
+	plan: Any,
+	added: Iterable[int] = (),
+	removed: Iterable[int] = (),
+) -> List[Recommendation]:
+	"""
+	Update the stored results after appliances were added (or edited) and deleted, and return the new
+	ranked list; the caller commits.
+	"""
+	basis = result_basis(user, plan)
+	stored = db.session.execute(_ranked_stmt(user.id)).all()
+	if plan is not None or not stored or any(r.basis != basis for r in stored):
+		recs = _recompute(user, assumptions, plan)
+		_replace(user.id, basis, recs)
+		return recs
+
+	added, removed = set(added), set(removed)
+	touched = added | removed
+	household = [code for code, rule in RULES.items() if rule.household]
+	kept = (_recommendation(r) for r in stored if r.appliance_id not in touched and r.code not in household)
+	n_devices = db.session.execute(select(func.count(Appliance.id)).where(Appliance.user_id == user.id)).scalar()
+	targets = []
+	if added:
+		targets = db.session.execute(
+			select(Appliance).where(Appliance.user_id == user.id, Appliance.id.in_(added)).order_by(Appliance.id)
+		).scalars().all()
+	ctx = rule_context(user.tariff, user.ef, assumptions, None, n_devices)
+	fresh = sorted(evaluate_rules(targets, ctx), key=rank_key)
+
+	affected = RecommendationResult.code.in_(household)
+	if touched:
+		affected = or_(affected, RecommendationResult.appliance_id.in_(touched))
+	db.session.execute(delete(RecommendationResult).where(RecommendationResult.user_id == user.id, affected))
+	_store(user.id, basis, fresh)
+	return list(heapq.merge(kept, fresh, key=rank_key))
+
+
+def forget_results(user_ids: Iterable[int]) -> None:
+	"""
+	Drop stored results (e.g. after a bulk appliance import); they are recomputed on the next read.
+	"""
+	user_ids = list(user_ids)
+	if user_ids:
+		db.session.execute(delete(RecommendationResult).where(RecommendationResult.user_id.in_(user_ids)))
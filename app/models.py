@@ -1,5 +1,5 @@
 from __future__ import annotations
-from datetime import date
+from datetime import date, datetime
 from typing import Optional
 from . import db
 
@@ -17,6 +17,10 @@ class User(db.Model):
 	logs = db.relationship("Log", backref="user", lazy=True, cascade="all, delete-orphan")
 	measures = db.relationship("Measure", backref="user", lazy=True, cascade="all, delete-orphan")
 	scenarios = db.relationship("Scenario", backref="user", lazy=True, cascade="all, delete-orphan")
+	report_jobs = db.relationship("ReportJob", backref="user", lazy=True, cascade="all, delete-orphan")
+	rollups = db.relationship("UsageRollup", backref="user", lazy=True, cascade="all, delete-orphan")
+	tariff_assignment = db.relationship("UserTariff", backref="user", uselist=False, lazy=True, cascade="all, delete-orphan")
+	goals = db.relationship("UserGoal", uselist=False, lazy=True, cascade="all, delete-orphan")
 
 	def __repr__(self) -> str:
 		return f"<User {self.id} {self.name}>"
@@ -52,8 +56,17 @@ class Assumption(db.Model):
 		return f"<Assumption {self.key}={self.value}>"
 
 
+class UserGoal(db.Model):
+	# The household's monthly targets from the dashboard goals form (None = no goal)
+	__tablename__ = "user_goals"
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+	month_kwh = db.Column(db.Float, nullable=True)
+	month_cost = db.Column(db.Float, nullable=True)  # ₹
+
+
 class Log(db.Model):
 	__tablename__ = "logs"
+	__table_args__ = (db.Index("ix_logs_user_date", "user_id", "date", unique=True),)  # one row per user per day
 	id = db.Column(db.Integer, primary_key=True)
 	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
 	date = db.Column(db.Date, nullable=False, default=date.today)
@@ -81,12 +94,248 @@ class Scenario(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
 	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
 	name = db.Column(db.String(120), nullable=False)
-	measures_json = db.Column(db.Text, nullable=True)  # list of measure dicts
-	saved_kwh = db.Column(db.Float, nullable=False, default=0.0)
+	measures_json = db.Column(db.Text, nullable=True)  # legacy list of measure dicts; moved to scenario_measures by `flask scenarios backfill`
+	saved_kwh = db.Column(db.Float, nullable=False, default=0.0)  # sums of the scenario's measures
 	saved_cost = db.Column(db.Float, nullable=False, default=0.0)
 	saved_co2 = db.Column(db.Float, nullable=False, default=0.0)
 
+	measures = db.relationship(
+		"ScenarioMeasure", backref="scenario", lazy=True, cascade="all, delete-orphan", order_by="ScenarioMeasure.position"
+	)
+
 	def __repr__(self) -> str:
 		return f"<Scenario {self.id} {self.name}>"
 
 
+class ScenarioMeasure(db.Model):
+	__tablename__ = "scenario_measures"
+	# Re-evaluation looks up a household's measures by the appliance they target
+	__table_args__ = (db.Index("ix_scenario_measures_user_appliance", "user_id", "appliance_id"),)
+	id = db.Column(db.Integer, primary_key=True)
+	scenario_id = db.Column(db.Integer, db.ForeignKey("scenarios.id"), nullable=False, index=True)
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+	position = db.Column(db.Integer, nullable=False, default=0)  # order within the scenario
+	code = db.Column(db.String(50), nullable=False)  # recommendation rule, e.g. "lighting_swap"
+	appliance_id = db.Column(db.Integer, nullable=True)  # None for household-wide measures (standby_cut)
+	title = db.Column(db.String(200), nullable=False)
+	delta_kwh_month = db.Column(db.Float, nullable=False, default=0.0)
+	delta_cost_month = db.Column(db.Float, nullable=False, default=0.0)
+	delta_co2_month = db.Column(db.Float, nullable=False, default=0.0)
+	payback_months = db.Column(db.Float, nullable=True)
+	retrofit_cost = db.Column(db.Float, nullable=False, default=0.0)
+
+	@property
+	def key(self) -> str:
+		# Same identity as Recommendation.key
+		return self.code if self.appliance_id is None else f"{self.code}:{self.appliance_id}"
+
+	def __repr__(self) -> str:
+		return f"<ScenarioMeasure {self.scenario_id} {self.key}>"
+
+
+class RecommendationResult(db.Model):
+	# One rule's result for one appliance (or the household), kept up to date by measures.py
+	__tablename__ = "recommendation_results"
+	__table_args__ = (db.Index("ix_recommendation_results_user_key", "user_id", "key", unique=True),)
+	id = db.Column(db.Integer, primary_key=True)
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+	key = db.Column(db.String(80), nullable=False)  # Recommendation.key, e.g. "lighting_swap:12"
+	code = db.Column(db.String(50), nullable=False)
+	appliance_id = db.Column(db.Integer, nullable=True)  # None for household rules
+	basis = db.Column(db.String(40), nullable=False)  # pricing/assumptions fingerprint the result was computed under
+	title = db.Column(db.String(200), nullable=False)
+	details_json = db.Column(db.Text, nullable=False, default="{}")
+	delta_kwh_month = db.Column(db.Float, nullable=False, default=0.0)
+	delta_cost_month = db.Column(db.Float, nullable=False, default=0.0)
+	delta_co2_month = db.Column(db.Float, nullable=False, default=0.0)
+	payback_months = db.Column(db.Float, nullable=True)
+	impact_score = db.Column(db.Float, nullable=False, default=0.0)
+
+	def __repr__(self) -> str:
+		return f"<RecommendationResult {self.user_id} {self.key}>"
+
+
+class PipelineRun(db.Model):
+	# One nightly fleet recomputation (see pipeline.py)
+	__tablename__ = "pipeline_runs"
+	id = db.Column(db.Integer, primary_key=True)
+	status = db.Column(db.String(10), nullable=False, default="running")  # running | done | abandoned
+	chunk_size = db.Column(db.Integer, nullable=False)
+	started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+	finished_at = db.Column(db.DateTime, nullable=True)
+
+	chunks = db.relationship("PipelineChunk", backref="run", lazy=True, cascade="all, delete-orphan")
+
+	def __repr__(self) -> str:
+		return f"<PipelineRun {self.id} {self.status}>"
+
+
+class PipelineChunk(db.Model):
+	# A user_id range of a run; done is committed together with the range's results
+	__tablename__ = "pipeline_chunks"
+	__table_args__ = (db.Index("ix_pipeline_chunks_run_first", "run_id", "first_user_id", unique=True),)
+	id = db.Column(db.Integer, primary_key=True)
+	run_id = db.Column(db.Integer, db.ForeignKey("pipeline_runs.id"), nullable=False)
+	first_user_id = db.Column(db.Integer, nullable=False)
+	last_user_id = db.Column(db.Integer, nullable=False)  # inclusive
+	done = db.Column(db.Boolean, nullable=False, default=False)
+	users = db.Column(db.Integer, nullable=False, default=0)
+	seconds = db.Column(db.Float, nullable=False, default=0.0)  # worker compute time
+	finished_at = db.Column(db.DateTime, nullable=True)
+
+	def __repr__(self) -> str:
+		return f"<PipelineChunk {self.run_id} {self.first_user_id}-{self.last_user_id} {'done' if self.done else 'pending'}>"
+
+
+class UserKpiSnapshot(db.Model):
+	# A household's KPIs and savings as computed by one pipeline run
+	__tablename__ = "user_kpi_snapshots"
+	__table_args__ = (db.Index("ix_user_kpi_snapshots_run_user", "run_id", "user_id", unique=True),)
+	id = db.Column(db.Integer, primary_key=True)
+	run_id = db.Column(db.Integer, db.ForeignKey("pipeline_runs.id"), nullable=False)
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+	daily_kwh = db.Column(db.Float, nullable=False, default=0.0)
+	monthly_kwh = db.Column(db.Float, nullable=False, default=0.0)
+	monthly_cost = db.Column(db.Float, nullable=False, default=0.0)
+	monthly_co2 = db.Column(db.Float, nullable=False, default=0.0)
+	recommendations = db.Column(db.Integer, nullable=False, default=0)
+	potential_saving_month = db.Column(db.Float, nullable=False, default=0.0)  # ₹, all recommendations
+	scenario_saving_month = db.Column(db.Float, nullable=False, default=0.0)  # ₹, best saved scenario
+
+	def __repr__(self) -> str:
+		return f"<UserKpiSnapshot {self.run_id} {self.user_id}>"
+
+
+class DataVersion(db.Model):
+	__tablename__ = "data_versions"
+	key = db.Column(db.String(120), primary_key=True)  # e.g., "assumptions"
+	version = db.Column(db.Integer, nullable=False, default=0)
+
+	def __repr__(self) -> str:
+		return f"<DataVersion {self.key}={self.version}>"
+
+
+class ReportJob(db.Model):
+	__tablename__ = "report_jobs"
+	id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+	content_hash = db.Column(db.String(64), nullable=False, index=True)  # sha256 of the rendered report HTML
+	status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, done, failed
+	result = db.Column(db.LargeBinary, nullable=True)  # PDF bytes
+	error = db.Column(db.Text, nullable=True)
+	created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+	finished_at = db.Column(db.DateTime, nullable=True)
+
+	def __repr__(self) -> str:
+		return f"<ReportJob {self.id} {self.status}>"
+
+
+class UsageRollup(db.Model):
+	__tablename__ = "usage_rollups"
+	__table_args__ = (db.Index("ix_usage_rollups_user_period", "user_id", "period", "period_start", unique=True),)
+	id = db.Column(db.Integer, primary_key=True)
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+	period = db.Column(db.String(5), nullable=False)  # "day", "week" (Monday start), "month"
+	period_start = db.Column(db.Date, nullable=False)
+	kwh = db.Column(db.Float, nullable=False, default=0.0)
+	days = db.Column(db.Integer, nullable=False, default=0)  # metered days in the period
+
+	def __repr__(self) -> str:
+		return f"<UsageRollup {self.user_id} {self.period} {self.period_start} {self.kwh} kWh>"
+
+
+class CityRollup(db.Model):
+	__tablename__ = "city_rollups"
+	__table_args__ = (db.Index("ix_city_rollups_city_period", "city", "period", "period_start", unique=True),)
+	id = db.Column(db.Integer, primary_key=True)
+	city = db.Column(db.String(120), nullable=False)
+	period = db.Column(db.String(5), nullable=False)
+	period_start = db.Column(db.Date, nullable=False)
+	kwh = db.Column(db.Float, nullable=False, default=0.0)
+	days = db.Column(db.Integer, nullable=False, default=0)  # metered user-days
+
+	def __repr__(self) -> str:
+		return f"<CityRollup {self.city} {self.period} {self.period_start} {self.kwh} kWh>"
+
+
+class CohortSketch(db.Model):
+	# One histogram bucket of a peer cohort's monthly kWh (see cohorts.py)
+	__tablename__ = "cohort_sketches"
+	__table_args__ = (db.Index("ix_cohort_sketches_cohort_bucket", "city", "household_size", "bucket", unique=True),)
+	id = db.Column(db.Integer, primary_key=True)
+	city = db.Column(db.String(120), nullable=False)
+	household_size = db.Column(db.Integer, nullable=False)  # capped at cohorts.MAX_SIZE
+	bucket = db.Column(db.Integer, nullable=False)
+	count = db.Column(db.Integer, nullable=False, default=0)
+
+	def __repr__(self) -> str:
+		return f"<CohortSketch {self.city} {self.household_size} {self.bucket} {self.count}>"
+
+
+class CohortMember(db.Model):
+	# The cohort bucket a household is currently counted in
+	__tablename__ = "cohort_members"
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+	city = db.Column(db.String(120), nullable=False)
+	household_size = db.Column(db.Integer, nullable=False)
+	bucket = db.Column(db.Integer, nullable=False)
+	monthly_kwh = db.Column(db.Float, nullable=False, default=0.0)
+
+	def __repr__(self) -> str:
+		return f"<CohortMember {self.user_id} {self.city} {self.household_size} {self.bucket}>"
+
+
+class ForecastState(db.Model):
+	# A household's fitted daily-kWh model (see forecast.py), advanced as log days arrive
+	__tablename__ = "forecast_states"
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+	alpha = db.Column(db.Float, nullable=False)
+	beta = db.Column(db.Float, nullable=False)
+	gamma = db.Column(db.Float, nullable=False)
+	level = db.Column(db.Float, nullable=False)
+	trend = db.Column(db.Float, nullable=False)
+	season_json = db.Column(db.Text, nullable=False)  # 7 additive weekday offsets, Monday first
+	last_date = db.Column(db.Date, nullable=False)  # last day folded into the state
+	month_kwh = db.Column(db.Float, nullable=False, default=0.0)  # last_date's month up to last_date (gaps imputed)
+	sigma = db.Column(db.Float, nullable=False, default=0.0)  # RMS one-step error of the fit
+	fitted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+	def __repr__(self) -> str:
+		return f"<ForecastState {self.user_id} {self.last_date}>"
+
+
+class TariffPlan(db.Model):
+	__tablename__ = "tariff_plans"
+	id = db.Column(db.Integer, primary_key=True)
+	name = db.Column(db.String(120), nullable=False, unique=True)
+	fixed_charge = db.Column(db.Float, nullable=False, default=0.0)  # ₹/month
+	telescopic = db.Column(db.Boolean, nullable=False, default=True)  # False: whole usage billed at the reached slab's rate
+
+	slabs = db.relationship("TariffSlab", backref="plan", lazy=True, cascade="all, delete-orphan")
+	bands = db.relationship("TariffBand", backref="plan", lazy=True, cascade="all, delete-orphan", order_by="TariffBand.start_hour")
+
+	def __repr__(self) -> str:
+		return f"<TariffPlan {self.id} {self.name}>"
+
+
+class TariffSlab(db.Model):
+	__tablename__ = "tariff_slabs"
+	id = db.Column(db.Integer, primary_key=True)
+	plan_id = db.Column(db.Integer, db.ForeignKey("tariff_plans.id"), nullable=False, index=True)
+	upto_kwh = db.Column(db.Float, nullable=True)  # monthly kWh upper bound; NULL = no upper bound (last slab)
+	rate = db.Column(db.Float, nullable=False)  # ₹/kWh
+
+
+class TariffBand(db.Model):
+	__tablename__ = "tariff_bands"
+	id = db.Column(db.Integer, primary_key=True)
+	plan_id = db.Column(db.Integer, db.ForeignKey("tariff_plans.id"), nullable=False, index=True)
+	start_hour = db.Column(db.Integer, nullable=False)  # 0-23, inclusive
+	end_hour = db.Column(db.Integer, nullable=False)  # 1-24, exclusive; may wrap past midnight (22 -> 6)
+	adjust = db.Column(db.Float, nullable=False)  # ₹/kWh added (surcharge) or subtracted (rebate) in the band
+
+
+class UserTariff(db.Model):
+	__tablename__ = "user_tariffs"
+	user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+	plan_id = db.Column(db.Integer, db.ForeignKey("tariff_plans.id"), nullable=False, index=True)
@@ -0,0 +1,404 @@
+from __future__ import annotations
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import String, cast, create_engine, delete, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+from . import db
+from .assumptions import assumptions_version, bump_user_versions, get_assumptions, user_version_key
+from .calculations import compute_kpis
+from .measures import basis_digest, result_row
+from .models import (
+	Appliance, DataVersion, PipelineChunk, PipelineRun, RecommendationResult, Scenario, ScenarioMeasure, User, UserKpiSnapshot, UserTariff,
+)
+from .recommendations import generate_recommendations
+from .scenarios import measure_fields
+from .tariffs import get_plans, tariffs_version
+
+# Nightly fleet recomputation. A run splits the users into user_id ranges (pipeline_chunks rows, all
+# created when the run starts) and fans the pending ranges out across a process pool. A worker reads
+# its range over its own connection - users with their plan, appliances streamed in user order, saved
+# scenario measures - runs compute_kpis / generate_recommendations per household, and returns plain
+# rows. The parent writes each range's KPI snapshots, recommendation results and re-priced scenario
+# measures in one transaction together with the range's done flag, so a crashed run resumes at its
+# first unfinished range, and re-running a range replaces its rows. Each household's shared data version
+# is read before its data; a household written to since (e.g. an appliance added, which already
+# refreshed its results) keeps its live rows and only gets its KPI snapshot.
+
+DEFAULT_CHUNK_SIZE = 2000
+YIELD_PER = 5000
+APPLIANCE_COLUMNS = ("id", "user_id", "type", "power_w", "quantity", "hours_per_day", "days_per_week", "star_label")
+MEASURE_COLUMNS = (
+	"id", "scenario_id", "code", "appliance_id", "title",
+	"delta_kwh_month", "delta_cost_month", "delta_co2_month", "payback_months", "retrofit_cost",
+)
+
+
+class ApplianceRow(NamedTuple):
+	id: int
+	user_id: int
+	type: str
+	power_w: float
+	quantity: int
+	hours_per_day: float
+	days_per_week: float
+	star_label: Optional[str]
+
+	def daily_kwh(self) -> float:
+		# Same operation order as Appliance.daily_kwh()
+		avg_daily_hours = (self.hours_per_day * (self.days_per_week / 7.0))
+		return (self.power_w * self.quantity * avg_daily_hours) / 1000.0
+
+
+@dataclass(frozen=True)
+class RunContext:
+	# Everything a worker needs besides the database, read once per invocation
+	run_id: int
+	assumptions: Dict[str, float]
+	plans: Dict[int, Any]  # compiled tariff plans by id
+	assumptions_version: int
+	tariffs_version: int
+
+
+@dataclass
+class ChunkResult:
+	chunk_id: int
+	first_user_id: int
+	last_user_id: int
+	users: int = 0
+	seconds: float = 0.0
+	snapshots: List[Dict[str, Any]] = field(default_factory=list)
+	results: List[Dict[str, Any]] = field(default_factory=list)
+	measures: List[Dict[str, Any]] = field(default_factory=list)  # re-priced scenario measures, by id
+	dropped: List[int] = field(default_factory=list)  # scenario measures no longer recommended
+	scenarios: List[Dict[str, Any]] = field(default_factory=list)  # re-totalled scenarios, by id
+	changed_users: List[int] = field(default_factory=list)  # households whose scenarios changed
+	versions: Dict[int, int] = field(default_factory=dict)  # data version of each household when read
+	stale: int = 0  # households written to between compute and write, left as they are
+
+
+@dataclass
+class PipelineReport:
+	run_id: int
+	resumed: bool = False
+	workers: int = 1
+	chunks: int = 0  # processed by this invocation
+	skipped_chunks: int = 0  # finished before a resume
+	users: int = 0
+	results: int = 0
+	measures_updated: int = 0
+	stale_users: int = 0
+	worker_seconds: float = 0.0
+	seconds: float = 0.0
+
+	def add(self, result: ChunkResult) -> None:
+		self.chunks += 1
+		self.users += result.users
+		self.results += len(result.results)
+		self.measures_updated += len(result.measures) + len(result.dropped)
+		self.stale_users += result.stale
+		self.worker_seconds += result.seconds
+
+	def to_dict(self) -> Dict[str, Any]:
+		rate = self.users / self.seconds if self.seconds else 0.0
+		return {
+			"run_id": self.run_id,
+			"resumed": self.resumed,
+			"workers": self.workers,
+			"chunks": self.chunks,
+			"skipped_chunks": self.skipped_chunks,
+			"users": self.users,
+			"results": self.results,
+			"measures_updated": self.measures_updated,
+			"stale_users": self.stale_users,
+			"seconds": round(self.seconds, 3),
+			"users_per_sec": round(rate, 1),
+			"users_per_sec_per_core": round(rate / self.workers, 1),
+		}
+
+
+def plan_chunks(user_ids: Sequence[int], chunk_size: int) -> List[Tuple[int, int]]:
+	"""
+	Inclusive (first, last) user_id ranges of at most chunk_size users each, from ascending ids.
+	"""
+	return [(user_ids[i], user_ids[min(i + chunk_size, len(user_ids)) - 1]) for i in range(0, len(user_ids), chunk_size)]
+
+
+def _measure_key(row: Any) -> str:
+	# Same identity as Recommendation.key / ScenarioMeasure.key
+	return row.code if row.appliance_id is None else f"{row.code}:{row.appliance_id}"
+
+
+def _reprice(result: ChunkResult, measures: Sequence[Any], scenarios: Dict[int, Any], current: Dict[str, Any]) -> float:
+	"""
+	Re-price one household's saved measures from its current recommendations, like
+	scenarios.reevaluate(household=True). Returns the household's best scenario saving (₹/month).
+	"""
+	sums: Dict[int, List[float]] = {}
+	touched = set()
+	for m in measures:
+		rec = current.get(_measure_key(m))
+		if rec is None:
+			result.dropped.append(m.id)
+			touched.add(m.scenario_id)
+			continue
+		fields = measure_fields(rec)
+		if any(getattr(m, name) != value for name, value in fields.items()):
+			result.measures.append({"id": m.id, **fields})
+			touched.add(m.scenario_id)
+		acc = sums.setdefault(m.scenario_id, [0.0, 0.0, 0.0])
+		acc[0] += fields["delta_kwh_month"]
+		acc[1] += fields["delta_cost_month"]
+		acc[2] += fields["delta_co2_month"]
+	saved = {sid: s.saved_cost for sid, s in scenarios.items()}
+	for sid in touched:
+		kwh, cost, co2 = (round(v, 2) for v in sums.get(sid, (0.0, 0.0, 0.0)))  # every measure dropped
+		result.scenarios.append({"id": sid, "saved_kwh": kwh, "saved_cost": cost, "saved_co2": co2})
+		saved[sid] = cost
+	return max(saved.values(), default=0.0)
+
+
+def compute_chunk(conn: Connection, ctx: RunContext, chunk_id: int, first: int, last: int) -> ChunkResult:
+	"""
+	KPI snapshots, recommendation results and scenario re-pricing for users first..last (inclusive).
+	Only reads from conn.
+	"""
+	t0 = time.perf_counter()
+	result = ChunkResult(chunk_id, first, last)
+	# Versions first: a write committed after this read shows up as a version change in write_chunk
+	version_key = literal(user_version_key("")) + cast(User.id, String)
+	result.versions = dict(conn.execute(
+		select(User.id, func.coalesce(DataVersion.version, 0))
+		.outerjoin(DataVersion, DataVersion.key == version_key)
+		.where(User.id.between(first, last))
+	).all())
+	users = conn.execute(
+		select(User.id, User.tariff, User.ef, UserTariff.plan_id)
+		.outerjoin(UserTariff, UserTariff.user_id == User.id)
+		.where(User.id.between(first, last))
+		.order_by(User.id)
+	).all()
+	scenarios: Dict[int, Dict[int, Any]] = {}
+	for row in conn.execute(select(Scenario.id, Scenario.user_id, Scenario.saved_cost).where(Scenario.user_id.between(first, last))):
+		scenarios.setdefault(row.user_id, {})[row.id] = row
+	measures: Dict[int, List[Any]] = {}
+	stmt = select(ScenarioMeasure.user_id, *(getattr(ScenarioMeasure, c) for c in MEASURE_COLUMNS))
+	for row in conn.execute(stmt.where(ScenarioMeasure.user_id.between(first, last)).order_by(ScenarioMeasure.id)):
+		measures.setdefault(row.user_id, []).append(row)
+
+	stmt = select(*(getattr(Appliance, c) for c in APPLIANCE_COLUMNS)).where(Appliance.user_id.between(first, last))
+	rows = conn.execute(stmt.order_by(Appliance.user_id, Appliance.id).execution_options(yield_per=YIELD_PER))
+	groups = itertools.groupby((ApplianceRow(*row) for row in rows), key=attrgetter("user_id"))
+	group = next(groups, None)
+	for uid, tariff, ef, plan_id in users:
+		while group is not None and group[0] < uid:  # appliances of a user deleted meanwhile
+			group = next(groups, None)
+		appliances: List[ApplianceRow] = []
+		if group is not None and group[0] == uid:
+			appliances = list(group[1])
+			group = next(groups, None)
+		plan = None if plan_id is None else ctx.plans.get(plan_id)
+		kpis = compute_kpis(appliances, tariff, ef, plan)
+		recs = generate_recommendations(appliances, tariff, ef, ctx.assumptions, plan)
+		basis = basis_digest(tariff, ef, ctx.assumptions_version, None if plan is None else (plan.plan_id, ctx.tariffs_version))
+		result.results.extend(result_row(uid, basis, r) for r in recs)
+		n_changes = len(result.measures) + len(result.dropped)
+		best = _reprice(result, measures.get(uid, ()), scenarios.get(uid, {}), {r.key: r for r in recs})
+		if len(result.measures) + len(result.dropped) > n_changes:
+			result.changed_users.append(uid)
+		result.snapshots.append({
+			"run_id": ctx.run_id,
+			"user_id": uid,
+			**kpis,
+			"recommendations": len(recs),
+			"potential_saving_month": round(sum(r.delta_cost_month for r in recs), 2),
+			"scenario_saving_month": best,
+		})
+	result.users = len(users)
+	result.seconds = time.perf_counter() - t0
+	return result
+
+
+def _stale_users(result: ChunkResult) -> set:
+	# Households whose version moved since compute_chunk; the version rows stay locked until the commit
+	keys = {user_version_key(u): u for u in result.versions}
+	if not keys:
+		return set()
+	stmt = select(DataVersion.key, DataVersion.version).where(DataVersion.key.in_(keys)).with_for_update()
+	current = dict(db.session.execute(stmt).all())
+	return {u for k, u in keys.items() if current.get(k, 0) != result.versions[u]}
+
+
+def _drop_stale(result: ChunkResult, stale: set) -> None:
+	# Leave the live rows of households written to since compute_chunk read them
+	def owned(model: Any, ids: List[int]) -> set:
+		return set(db.session.execute(select(model.id).where(model.id.in_(ids), model.user_id.in_(stale))).scalars())
+
+	measures = owned(ScenarioMeasure, [m["id"] for m in result.measures] + result.dropped)
+	scenarios = owned(Scenario, [s["id"] for s in result.scenarios])
+	result.results = [r for r in result.results if r["user_id"] not in stale]
+	result.measures = [m for m in result.measures if m["id"] not in measures]
+	result.dropped = [i for i in result.dropped if i not in measures]
+	result.scenarios = [s for s in result.scenarios if s["id"] not in scenarios]
+	result.changed_users = [u for u in result.changed_users if u not in stale]
+	result.stale = len(stale)
+
+
+def write_chunk(result: ChunkResult) -> None:
+	"""
+	Replace a range's snapshots and recommendation results, apply its scenario changes and mark it
+	done, in one transaction. Households whose data version moved since the range was computed keep
+	their current results and scenarios.
+	"""
+	first, last = result.first_user_id, result.last_user_id
+	run_id = db.session.execute(select(PipelineChunk.run_id).where(PipelineChunk.id == result.chunk_id)).scalar_one()
+	# The first write takes SQLite's write lock, so no version can move between this check and the commit
+	db.session.execute(delete(UserKpiSnapshot).where(UserKpiSnapshot.run_id == run_id, UserKpiSnapshot.user_id.between(first, last)))
+	stale = _stale_users(result)
+	if stale:
+		_drop_stale(result, stale)
+	outdated = delete(RecommendationResult).where(RecommendationResult.user_id.between(first, last))
+	db.session.execute(outdated.where(RecommendationResult.user_id.not_in(stale)) if stale else outdated)
+	for model, rows in ((UserKpiSnapshot, result.snapshots), (RecommendationResult, result.results)):
+		for i in range(0, len(rows), YIELD_PER):
+			# render_nulls: rows with a None appliance_id / payback stay in the same executemany
+			db.session.execute(insert(model).execution_options(render_nulls=True), rows[i : i + YIELD_PER])
+	if result.measures:
+		db.session.execute(update(ScenarioMeasure), result.measures)
+	if result.dropped:
+		db.session.execute(delete(ScenarioMeasure).where(ScenarioMeasure.id.in_(result.dropped)))
+	if result.scenarios:
+		db.session.execute(update(Scenario), result.scenarios)
+	bump_user_versions(result.changed_users)
+	db.session.execute(
+		update(PipelineChunk)
+		.where(PipelineChunk.id == result.chunk_id)
+		.values(done=True, users=result.users, seconds=result.seconds, finished_at=datetime.utcnow())
+	)
+	db.session.commit()
+
+
+# Per-process state of pool workers, set by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(url: str, ctx: RunContext) -> None:
+	_worker["engine"] = create_engine(url, poolclass=NullPool)
+	_worker["ctx"] = ctx
+
+
+def _run_chunk(chunk_id: int, first: int, last: int) -> ChunkResult:
+	with _worker["engine"].connect() as conn:
+		return compute_chunk(conn, _worker["ctx"], chunk_id, first, last)
+
+
+def _results(ctx: RunContext, chunks: Sequence[Any], workers: int) -> Iterator[ChunkResult]:
+	if workers <= 1:
+		for c in chunks:
+			yield compute_chunk(db.session.connection(), ctx, c.id, c.first_user_id, c.last_user_id)
+		return
+	url = db.engine.url.render_as_string(hide_password=False)
+	pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(url, ctx))
+	try:
+		# map() yields in range order while later ranges are still being computed
+		yield from pool.map(_run_chunk, *zip(*((c.id, c.first_user_id, c.last_user_id) for c in chunks)))
+	finally:
+		# After a failed write, drop the queued ranges instead of computing them for nothing
+		pool.shutdown(cancel_futures=True)
+
+
+def start_run(chunk_size: int) -> PipelineRun:
+	ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+	run = PipelineRun(chunk_size=chunk_size)
+	db.session.add(run)
+	db.session.flush()
+	ranges = plan_chunks(ids, chunk_size)
+	if ranges:
+		db.session.execute(insert(PipelineChunk), [{"run_id": run.id, "first_user_id": a, "last_user_id": b} for a, b in ranges])
+	db.session.commit()
+	return run
+
+
+def unfinished_run() -> Optional[PipelineRun]:
+	stmt = select(PipelineRun).where(PipelineRun.status == "running").order_by(PipelineRun.id.desc()).limit(1)
+	return db.session.execute(stmt).scalar()
+
+
+def run_pipeline(
+	workers: int = 1,
+	chunk_size: int = DEFAULT_CHUNK_SIZE,
+	fresh: bool = False,
+	on_chunk: Callable[[ChunkResult, PipelineReport], None] | None = None,
+) -> PipelineReport:
+	"""
+	Resume the unfinished run (or, with fresh, abandon it) or start a new one, and process its pending
+	user_id ranges; with workers > 1 ranges are computed on a process pool. chunk_size only applies
+	to a new run.
+	"""
+	if chunk_size <= 0:
+		raise ValueError("chunk_size must be positive")
+	t0 = time.perf_counter()
+	run = unfinished_run()
+	if run is not None and fresh:
+		run.status = "abandoned"
+		run.finished_at = datetime.utcnow()
+		db.session.commit()
+		run = None
+	resumed = run is not None
+	if run is None:
+		run = start_run(chunk_size)
+	run_id = run.id
+	chunks = db.session.execute(
+		select(PipelineChunk.id, PipelineChunk.first_user_id, PipelineChunk.last_user_id, PipelineChunk.done)
+		.where(PipelineChunk.run_id == run_id)
+		.order_by(PipelineChunk.first_user_id)
+	).all()
+	pending = [c for c in chunks if not c.done]
+	ctx = RunContext(run_id, dict(get_assumptions()), dict(get_plans()), assumptions_version(), tariffs_version())
+	db.session.commit()  # no open read transaction while workers read (SQLite)
+	workers = max(1, min(workers, len(pending)))
+	report = PipelineReport(run_id, resumed=resumed, workers=workers, skipped_chunks=len(chunks) - len(pending))
+	for result in _results(ctx, pending, workers):
+		write_chunk(result)
+		report.add(result)
+		if on_chunk is not None:
+			on_chunk(result, report)
+	db.session.execute(update(PipelineRun).where(PipelineRun.id == run_id).values(status="done", finished_at=datetime.utcnow()))
+	db.session.commit()
+	report.seconds = time.perf_counter() - t0
+	return report
+
+
+def run_status(run_id: int | None = None) -> Optional[Dict[str, Any]]:
+	"""
+	Progress of a run (default: the latest one).
+	"""
+	stmt = select(PipelineRun).order_by(PipelineRun.id.desc()).limit(1) if run_id is None else select(PipelineRun).where(PipelineRun.id == run_id)
+	run = db.session.execute(stmt).scalar()
+	if run is None:
+		return None
+	chunks, done, users, seconds = db.session.execute(
+		select(
+			func.count(PipelineChunk.id),
+			func.count(PipelineChunk.id).filter(PipelineChunk.done.is_(True)),
+			func.coalesce(func.sum(PipelineChunk.users), 0),
+			func.coalesce(func.sum(PipelineChunk.seconds), 0.0),
+		).where(PipelineChunk.run_id == run.id)
+	).one()
+	return {
+		"run_id": run.id,
+		"status": run.status,
+		"started_at": run.started_at.isoformat(timespec="seconds"),
+		"finished_at": run.finished_at.isoformat(timespec="seconds") if run.finished_at else None,
+		"chunks": chunks,
+		"chunks_done": done,
+		"users_done": int(users),
+		"worker_seconds": round(float(seconds), 3),
+	}
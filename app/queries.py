@@ -0,0 +1,69 @@
+from __future__ import annotations
+from typing import List, Tuple
+
+from flask import g, has_request_context
+from sqlalchemy import and_, delete, func, select
+
+from . import db
+from .models import Appliance, Scenario, ScenarioMeasure
+
+# Page data in as few round trips as possible. A request that needs a household's appliances for
+# several things (KPIs, recommendations, the table) fetches them once; the scenarios page reads its
+# list and the latest scenario's measures in one statement; deletes are single DELETE ... WHERE
+# statements scoped to the owner instead of load-then-delete.
+
+
+def user_appliances(user_id: int) -> List[Appliance]:
+	"""
+	The household's appliances in insertion order, memoized for the rest of the request.
+	"""
+	memo = g.setdefault("_appliances", {}) if has_request_context() else {}
+	if user_id not in memo:
+		memo[user_id] = db.session.execute(select(Appliance).where(Appliance.user_id == user_id).order_by(Appliance.id)).scalars().all()
+	return memo[user_id]
+
+
+def forget_appliances(user_id: int) -> None:
+	if has_request_context():
+		g.get("_appliances", {}).pop(user_id, None)
+
+
+def delete_user_appliance(user_id: int, appliance_id: int) -> bool:
+	"""
+	Delete one of the household's appliances; False when it does not exist or belongs to someone else.
+	"""
+	result = db.session.execute(
+		delete(Appliance).where(Appliance.id == appliance_id, Appliance.user_id == user_id),
+		execution_options={"synchronize_session": False},
+	)
+	forget_appliances(user_id)
+	return result.rowcount > 0
+
+
+def scenario_rows(user_id: int) -> Tuple[list, List[Tuple[str, float]]]:
+	"""
+	The household's saved scenarios (id, name, saved_*), oldest first, and the latest one's measures as
+	(title, kWh/month) - one statement: only the latest scenario is joined to its measure rows.
+	"""
+	latest_id = select(func.max(Scenario.id)).where(Scenario.user_id == user_id).scalar_subquery()
+	stmt = (
+		select(
+			Scenario.id,
+			Scenario.name,
+			Scenario.saved_kwh,
+			Scenario.saved_cost,
+			Scenario.saved_co2,
+			ScenarioMeasure.title,
+			ScenarioMeasure.delta_kwh_month,
+		)
+		.outerjoin(ScenarioMeasure, and_(ScenarioMeasure.scenario_id == Scenario.id, Scenario.id == latest_id))
+		.where(Scenario.user_id == user_id)
+		.order_by(Scenario.id, ScenarioMeasure.position)
+	)
+	scenarios, measures = [], []
+	for row in db.session.execute(stmt):
+		if not scenarios or scenarios[-1].id != row.id:
+			scenarios.append(row)
+		if row.title is not None:
+			measures.append((row.title, row.delta_kwh_month))
+	return scenarios, measures
@@ -1,7 +1,7 @@
 from __future__ import annotations
 import json
 from dataclasses import dataclass
-from typing import List, Dict, Any, Iterable
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
 from .calculations import (
 	lighting_swap_savings_kwh,
 	ac_setpoint_savings_kwh,
@@ -23,6 +23,45 @@ class Recommendation:
 	impact_score: float
 	formula: str
 
+	@property
+	def key(self) -> str:
+		# Identifies one measure: a code alone is ambiguous when several appliances get the same rule
+		appliance_id = self.details.get("appliance_id")
+		return self.code if appliance_id is None else f"{self.code}:{appliance_id}"
+
+	@property
+	def retrofit_cost(self) -> float:
+		return float(self.details.get("retrofit_cost", 0.0) or 0.0)
+
+
+# Rule constants shared with the columnar engine in batch.py
+LIGHTING_TYPES = {"bulb", "tube", "lighting"}
+AC_TYPES = {"ac", "air_conditioner", "air conditioner"}
+FRIDGE_TYPES = {"fridge", "refrigerator"}
+AC_DELTA_T = 2.0  # suggest +2 C
+FRIDGE_NEW_KWH_YEAR = 180.0
+FRIDGE_RETROFIT_COST = 25000.0
+FORMULAS = {
+	"lighting_swap": "ΔE = ((P_old − P_led) × N × T / 1000) × 30",
+	"ac_setpoint": "ΔE = E_AC × (0.04 × ΔT)",
+	"standby_cut": "ΔE = (P_s × t × N / 1000) × 30",
+	"fridge_upgrade": "ΔE = (E_old − E_new) / 12",
+}
+TITLES = {
+	"ac_setpoint": "Increase AC setpoint by +2 °C",
+	"standby_cut": "Eliminate standby power on idle devices",
+	"fridge_upgrade": "Upgrade to high-efficiency fridge",
+}
+
+
+def lighting_swap_title(quantity: int, power_w: float, led_w: float) -> str:
+	return f"Swap {quantity}x {int(power_w)}W bulbs to {int(led_w)}W LEDs"
+
+
+def fridge_old_kwh_year(star_label: str | None) -> float:
+	# naive: estimate old annual kWh from star label
+	return 300.0 if (star_label or "").startswith("2") else 240.0
+
 
 def _impact_score(delta_cost_month: float, payback: float | None) -> float:
 	# Simple composite: prioritize higher monthly savings and shorter payback
@@ -30,114 +69,203 @@ def _impact_score(delta_cost_month: float, payback: float | None) -> float:
 	return delta_cost_month * payback_factor
 
 
-def generate_recommendations(
-	appliances: Iterable[Any],
+@dataclass(frozen=True)
+class RuleContext:
+	"""
+	Household-level inputs shared by every rule: ₹ pricing, EF, assumptions and the device count.
+	"""
+	ef_kg_per_kwh: float
+	assumptions: Dict[str, float]
+	cost_of: Callable[[float], float]
+	n_devices: int
+
+
+@dataclass(frozen=True)
+class Rule:
+	"""
+	A recommendation rule and what it depends on. Appliance rules are evaluated once per appliance whose
+	type is in `types` and depend only on that appliance; household rules (no types) are evaluated once
+	and depend on the device count. Every rule also depends on the RuleContext pricing and assumptions.
+	"""
+	code: str
+	evaluate: Callable[[Any, RuleContext], Optional[Recommendation]]
+	types: FrozenSet[str] = frozenset()
+
+	@property
+	def household(self) -> bool:
+		return not self.types
+
+	def applies(self, appliance: Any) -> bool:
+		return appliance.type.lower() in self.types
+
+
+def rule_context(
 	tariff_r_per_kwh: float,
 	ef_kg_per_kwh: float,
-	assumptions: Dict[str, float] | None = None,
-) -> List[Recommendation]:
+	assumptions: Dict[str, float] | None,
+	plan: Any,
+	n_devices: int,
+	base_kwh: float = 0.0,
+) -> RuleContext:
 	"""
-	Basic rule-based recommendations using provided appliances.
+	With a compiled tariff plan, ₹ savings are the marginal bill reduction from base_kwh (the household's
+	current monthly usage, slab-aware) rather than ΔkWh × tariff.
 	"""
-	assumptions = assumptions or {}
-	coeff_ac_per_deg = assumptions.get("ac_coefficient_per_degree", 0.04)
-	default_led_w = assumptions.get("default_led_w", 9.0)
-	default_standby_w = assumptions.get("default_standby_w", 10.0)
-	default_standby_hours = assumptions.get("default_standby_hours", 2.0)
+	if plan is None:
+		def cost_of(delta_kwh: float) -> float:
+			return delta_kwh * tariff_r_per_kwh
+	else:
+		def cost_of(delta_kwh: float) -> float:
+			return plan.saving(base_kwh, delta_kwh)
+	return RuleContext(ef_kg_per_kwh, assumptions or {}, cost_of, max(n_devices, 1))
 
-	recs: List[Recommendation] = []
 
+def _lighting_swap(a: Any, ctx: RuleContext) -> Optional[Recommendation]:
 	# Lighting swap: any bulb/fitting > default_led_w assumed convertible
-	lighting_units = [a for a in appliances if a.type.lower() in {"bulb", "tube", "lighting"} and a.power_w > default_led_w]
-	for a in lighting_units:
-		delta_kwh = lighting_swap_savings_kwh(a.power_w, default_led_w, a.quantity, a.hours_per_day)
-		delta_cost = delta_kwh * tariff_r_per_kwh
-		delta_co2 = delta_kwh * ef_kg_per_kwh
-		retrofit_cost = assumptions.get("lighting_cost_per_unit", 80.0) * a.quantity
-		pb = payback_months(retrofit_cost, delta_cost)
-		recs.append(
-			Recommendation(
-				code="lighting_swap",
-				title=f"Swap {a.quantity}x {int(a.power_w)}W bulbs to {int(default_led_w)}W LEDs",
-				details={"appliance_id": a.id, "p_old_w": a.power_w, "p_led_w": default_led_w, "n": a.quantity, "t": a.hours_per_day, "retrofit_cost": retrofit_cost},
-				delta_kwh_month=round(delta_kwh, 2),
-				delta_cost_month=round(delta_cost, 2),
-				delta_co2_month=round(delta_co2, 2),
-				payback_months=pb if pb is None else round(pb, 1),
-				impact_score=_impact_score(delta_cost, pb),
-				formula="ΔE = ((P_old − P_led) × N × T / 1000) × 30",
-			)
-		)
-
-	# AC setpoint: find AC appliances; estimate monthly energy share from their daily
-	ac_units = [a for a in appliances if a.type.lower() in {"ac", "air_conditioner", "air conditioner"}]
-	for a in ac_units:
-		e_ac_month = ((a.power_w * a.quantity * a.hours_per_day) / 1000.0) * 30.0
-		delta_t = 2.0  # suggest +2 C
-		delta_kwh = ac_setpoint_savings_kwh(e_ac_month, delta_t, coeff_ac_per_deg)
-		delta_cost = delta_kwh * tariff_r_per_kwh
-		delta_co2 = delta_kwh * ef_kg_per_kwh
-		recs.append(
-			Recommendation(
-				code="ac_setpoint",
-				title="Increase AC setpoint by +2 °C",
-				details={"appliance_id": a.id, "e_ac_month": round(e_ac_month, 2), "delta_t": delta_t, "coefficient": coeff_ac_per_deg},
-				delta_kwh_month=round(delta_kwh, 2),
-				delta_cost_month=round(delta_cost, 2),
-				delta_co2_month=round(delta_co2, 2),
-				payback_months=0.0,
-				impact_score=_impact_score(delta_cost, 0.1),
-				formula="ΔE = E_AC × (0.04 × ΔT)",
-			)
-		)
+	default_led_w = ctx.assumptions.get("default_led_w", 9.0)
+	if not a.power_w > default_led_w:
+		return None
+	delta_kwh = lighting_swap_savings_kwh(a.power_w, default_led_w, a.quantity, a.hours_per_day)
+	delta_cost = ctx.cost_of(delta_kwh)
+	delta_co2 = delta_kwh * ctx.ef_kg_per_kwh
+	retrofit_cost = ctx.assumptions.get("lighting_cost_per_unit", 80.0) * a.quantity
+	pb = payback_months(retrofit_cost, delta_cost)
+	return Recommendation(
+		code="lighting_swap",
+		title=lighting_swap_title(a.quantity, a.power_w, default_led_w),
+		details={"appliance_id": a.id, "p_old_w": a.power_w, "p_led_w": default_led_w, "n": a.quantity, "t": a.hours_per_day, "retrofit_cost": retrofit_cost},
+		delta_kwh_month=round(delta_kwh, 2),
+		delta_cost_month=round(delta_cost, 2),
+		delta_co2_month=round(delta_co2, 2),
+		payback_months=pb if pb is None else round(pb, 1),
+		impact_score=_impact_score(delta_cost, pb),
+		formula=FORMULAS["lighting_swap"],
+	)
+
 
+def _ac_setpoint(a: Any, ctx: RuleContext) -> Optional[Recommendation]:
+	# AC setpoint: estimate the unit's monthly energy from its daily use
+	coeff_ac_per_deg = ctx.assumptions.get("ac_coefficient_per_degree", 0.04)
+	e_ac_month = ((a.power_w * a.quantity * a.hours_per_day) / 1000.0) * 30.0
+	delta_t = AC_DELTA_T
+	delta_kwh = ac_setpoint_savings_kwh(e_ac_month, delta_t, coeff_ac_per_deg)
+	delta_cost = ctx.cost_of(delta_kwh)
+	delta_co2 = delta_kwh * ctx.ef_kg_per_kwh
+	return Recommendation(
+		code="ac_setpoint",
+		title=TITLES["ac_setpoint"],
+		details={"appliance_id": a.id, "e_ac_month": round(e_ac_month, 2), "delta_t": delta_t, "coefficient": coeff_ac_per_deg},
+		delta_kwh_month=round(delta_kwh, 2),
+		delta_cost_month=round(delta_cost, 2),
+		delta_co2_month=round(delta_co2, 2),
+		payback_months=0.0,
+		impact_score=_impact_score(delta_cost, 0.1),
+		formula=FORMULAS["ac_setpoint"],
+	)
+
+
+def _standby_cut(_: Any, ctx: RuleContext) -> Optional[Recommendation]:
 	# Standby cut: generic suggestion across devices
-	n_devices = max(len(list(appliances)), 1)
-	delta_kwh = standby_cut_savings_kwh(default_standby_w, default_standby_hours, n_devices)
-	if delta_kwh > 0:
-		delta_cost = delta_kwh * tariff_r_per_kwh
-		delta_co2 = delta_kwh * ef_kg_per_kwh
-		recs.append(
-			Recommendation(
-				code="standby_cut",
-				title="Eliminate standby power on idle devices",
-				details={"p_s": default_standby_w, "t": default_standby_hours, "n": n_devices},
-				delta_kwh_month=round(delta_kwh, 2),
-				delta_cost_month=round(delta_cost, 2),
-				delta_co2_month=round(delta_co2, 2),
-				payback_months=0.0,
-				impact_score=_impact_score(delta_cost, 0.1),
-				formula="ΔE = (P_s × t × N / 1000) × 30",
-			)
-		)
-
-	# Fridge upgrade: suggest if star_label looks old (e.g., '2-star')
-	fridges = [a for a in appliances if a.type.lower() in {"fridge", "refrigerator"}]
-	for a in fridges:
-		# naive: estimate old/new annual kWh from star label
-		old_year = 300.0 if (a.star_label or "").startswith("2") else 240.0
-		new_year = 180.0
-		delta_kwh = fridge_upgrade_savings_kwh(old_year, new_year)
-		delta_cost = delta_kwh * tariff_r_per_kwh
-		delta_co2 = delta_kwh * ef_kg_per_kwh
-		retrofit_cost = 25000.0
-		pb = payback_months(retrofit_cost, delta_cost)
-		recs.append(
-			Recommendation(
-				code="fridge_upgrade",
-				title="Upgrade to high-efficiency fridge",
-				details={"e_old_year": old_year, "e_new_year": new_year, "retrofit_cost": retrofit_cost},
-				delta_kwh_month=round(delta_kwh, 2),
-				delta_cost_month=round(delta_cost, 2),
-				delta_co2_month=round(delta_co2, 2),
-				payback_months=pb if pb is None else round(pb, 1),
-				impact_score=_impact_score(delta_cost, pb),
-				formula="ΔE = (E_old − E_new) / 12",
-			)
-		)
+	default_standby_w = ctx.assumptions.get("default_standby_w", 10.0)
+	default_standby_hours = ctx.assumptions.get("default_standby_hours", 2.0)
+	delta_kwh = standby_cut_savings_kwh(default_standby_w, default_standby_hours, ctx.n_devices)
+	if not delta_kwh > 0:
+		return None
+	delta_cost = ctx.cost_of(delta_kwh)
+	delta_co2 = delta_kwh * ctx.ef_kg_per_kwh
+	return Recommendation(
+		code="standby_cut",
+		title=TITLES["standby_cut"],
+		details={"p_s": default_standby_w, "t": default_standby_hours, "n": ctx.n_devices},
+		delta_kwh_month=round(delta_kwh, 2),
+		delta_cost_month=round(delta_cost, 2),
+		delta_co2_month=round(delta_co2, 2),
+		payback_months=0.0,
+		impact_score=_impact_score(delta_cost, 0.1),
+		formula=FORMULAS["standby_cut"],
+	)
 
-	# Rank by ₹ saved/month
-	recs.sort(key=lambda r: (-r.delta_cost_month, r.payback_months or 1e9))
+
+def _fridge_upgrade(a: Any, ctx: RuleContext) -> Optional[Recommendation]:
+	# Fridge upgrade: savings against a new fridge, estimated from the star label
+	old_year = fridge_old_kwh_year(a.star_label)
+	new_year = FRIDGE_NEW_KWH_YEAR
+	delta_kwh = fridge_upgrade_savings_kwh(old_year, new_year)
+	delta_cost = ctx.cost_of(delta_kwh)
+	delta_co2 = delta_kwh * ctx.ef_kg_per_kwh
+	retrofit_cost = FRIDGE_RETROFIT_COST
+	pb = payback_months(retrofit_cost, delta_cost)
+	return Recommendation(
+		code="fridge_upgrade",
+		title=TITLES["fridge_upgrade"],
+		details={"appliance_id": a.id, "e_old_year": old_year, "e_new_year": new_year, "retrofit_cost": retrofit_cost},
+		delta_kwh_month=round(delta_kwh, 2),
+		delta_cost_month=round(delta_cost, 2),
+		delta_co2_month=round(delta_co2, 2),
+		payback_months=pb if pb is None else round(pb, 1),
+		impact_score=_impact_score(delta_cost, pb),
+		formula=FORMULAS["fridge_upgrade"],
+	)
+
+
+# Rule registry, in evaluation order (ties in the ranking keep this order)
+RULES: Dict[str, Rule] = {}
+
+
+def register_rule(rule: Rule) -> Rule:
+	RULES[rule.code] = rule
+	return rule
+
+
+register_rule(Rule("lighting_swap", _lighting_swap, frozenset(LIGHTING_TYPES)))
+register_rule(Rule("ac_setpoint", _ac_setpoint, frozenset(AC_TYPES)))
+register_rule(Rule("standby_cut", _standby_cut))
+register_rule(Rule("fridge_upgrade", _fridge_upgrade, frozenset(FRIDGE_TYPES)))
+
+
+def evaluate_rules(appliances: Iterable[Any], ctx: RuleContext, household: bool = True) -> List[Recommendation]:
+	"""
+	Every registered rule over the given appliances (and, with household=True, the household rules),
+	in registry order then appliance order.
+	"""
+	appliances = list(appliances)
+	recs: List[Recommendation] = []
+	for rule in RULES.values():
+		if rule.household:
+			targets = [None] if household else []
+		else:
+			targets = [a for a in appliances if rule.applies(a)]
+		for target in targets:
+			rec = rule.evaluate(target, ctx)
+			if rec is not None:
+				recs.append(rec)
 	return recs
 
 
+def rank_key(rec: Recommendation) -> tuple:
+	"""
+	Total order of the ranked list: ₹ saved/month, then payback, then registry and appliance order.
+	"""
+	rule_order = list(RULES).index(rec.code) if rec.code in RULES else len(RULES)
+	return (-rec.delta_cost_month, rec.payback_months or 1e9, rule_order, rec.details.get("appliance_id") or 0)
+
+
+def generate_recommendations(
+	appliances: Iterable[Any],
+	tariff_r_per_kwh: float,
+	ef_kg_per_kwh: float,
+	assumptions: Dict[str, float] | None = None,
+	plan: Any = None,
+) -> List[Recommendation]:
+	"""
+	Basic rule-based recommendations using provided appliances.
+	With a compiled tariff plan, ₹ savings are the marginal bill reduction from the household's
+	current monthly usage (slab-aware) rather than ΔkWh × tariff.
+	"""
+	appliances = list(appliances)
+	base_kwh = sum(a.daily_kwh() for a in appliances) * 30.0 if plan is not None else 0.0
+	ctx = rule_context(tariff_r_per_kwh, ef_kg_per_kwh, assumptions, plan, len(appliances), base_kwh)
+	recs = evaluate_rules(appliances, ctx)
+	# Rank by ₹ saved/month
+	recs.sort(key=lambda r: (-r.delta_cost_month, r.payback_months or 1e9))
+	return recs
@@ -0,0 +1,202 @@
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from . import db
+from .models import CityRollup, Log, UsageRollup, User
+from .schema import dialect_insert
+
+# Pre-aggregated usage: one row per user per day/week/month (and per city) kept in step with the
+# daily logs. Ingestion applies each day's kWh delta in the same transaction as the log upsert, so
+# dashboard and goal queries read a single row instead of scanning history.
+
+PERIODS = ("day", "week", "month")
+YIELD_PER = 5000
+# (kwh delta, metered-days delta) per (user_id, day)
+Deltas = Dict[Tuple[int, date], Tuple[float, int]]
+
+
+def period_start(day: date, period: str) -> date:
+	if period == "day":
+		return day
+	if period == "week":
+		return day - timedelta(days=day.weekday())
+	if period == "month":
+		return day.replace(day=1)
+	raise ValueError(f"unknown period {period!r}")
+
+
+def _accumulate(deltas: Deltas, key_of) -> Dict[tuple, List[float]]:
+	out: Dict[tuple, List[float]] = {}
+	for (user_id, day), (kwh, days) in deltas.items():
+		owner = key_of(user_id)
+		if owner is None:
+			continue
+		for period in PERIODS:
+			acc = out.setdefault((owner, period, period_start(day, period)), [0.0, 0])
+			acc[0] += kwh
+			acc[1] += days
+	return out
+
+
+def _add_rows(model, owner_col: str, totals: Dict[tuple, List[float]]) -> None:
+	if not totals:
+		return
+	rows = [
+		{owner_col: owner, "period": period, "period_start": start, "kwh": kwh, "days": days}
+		for (owner, period, start), (kwh, days) in totals.items()
+	]
+	insert_ = dialect_insert()
+	if insert_ is not None:
+		stmt = insert_(model)
+		db.session.execute(
+			stmt.on_conflict_do_update(
+				index_elements=[owner_col, "period", "period_start"],
+				set_={"kwh": model.kwh + stmt.excluded.kwh, "days": model.days + stmt.excluded.days},
+			),
+			rows,
+		)
+		return
+	owner_attr = getattr(model, owner_col)
+	for row in rows:
+		existing = model.query.filter(
+			owner_attr == row[owner_col], model.period == row["period"], model.period_start == row["period_start"]
+		).first()
+		if existing is None:
+			db.session.add(model(**row))
+		else:
+			existing.kwh += row["kwh"]
+			existing.days += row["days"]
+
+
+def apply_deltas(deltas: Deltas) -> None:
+	"""
+	Add per-day kWh deltas to the user and city rollups; the caller commits.
+	"""
+	if not deltas:
+		return
+	_add_rows(UsageRollup, "user_id", _accumulate(deltas, lambda u: u))
+	cities = dict(db.session.execute(select(User.id, User.city).where(User.id.in_({u for u, _ in deltas}))).all())
+	_add_rows(CityRollup, "city", _accumulate(deltas, lambda u: cities.get(u) or None))
+
+
+def add_city_totals(totals: Dict[tuple, List[float]]) -> None:
+	"""
+	Add pre-summed {(city, period, period_start): [kwh, days]} to the city rollups; the caller commits.
+	"""
+	_add_rows(CityRollup, "city", totals)
+
+
+def move_city(user_id: int, old: str | None, new: str | None) -> None:
+	"""
+	Shift a user's history from one city's rollups to another's after a profile change; the caller commits.
+	"""
+	if (old or None) == (new or None):
+		return
+	rows = db.session.execute(
+		select(UsageRollup.period, UsageRollup.period_start, UsageRollup.kwh, UsageRollup.days).where(UsageRollup.user_id == user_id)
+	).all()
+	if old:
+		_add_rows(CityRollup, "city", {(old, p, s): [-kwh, -days] for p, s, kwh, days in rows})
+	if new:
+		_add_rows(CityRollup, "city", {(new, p, s): [kwh, days] for p, s, kwh, days in rows})
+
+
+def _recompute() -> Tuple[Dict[tuple, List[float]], Dict[tuple, List[float]]]:
+	# Streams the logs once; memory is bounded by the number of rollup rows, not log rows
+	users: Dict[tuple, List[float]] = {}
+	cities: Dict[tuple, List[float]] = {}
+	stmt = (
+		select(Log.user_id, Log.date, Log.kwh, User.city)
+		.join(User, User.id == Log.user_id)
+		.order_by(Log.user_id, Log.date)
+		.execution_options(yield_per=YIELD_PER)
+	)
+	for user_id, day, kwh, city in db.session.execute(stmt):
+		for period in PERIODS:
+			start = period_start(day, period)
+			acc = users.setdefault((user_id, period, start), [0.0, 0])
+			acc[0] += kwh
+			acc[1] += 1
+			if city:
+				acc = cities.setdefault((city, period, start), [0.0, 0])
+				acc[0] += kwh
+				acc[1] += 1
+	return users, cities
+
+
+def rebuild() -> Dict[str, int]:
+	"""
+	Recompute every rollup from the daily logs (after manual log edits, city renames or a restore).
+	"""
+	users, cities = _recompute()
+	db.session.execute(delete(UsageRollup))
+	db.session.execute(delete(CityRollup))
+	for model, owner_col, totals in ((UsageRollup, "user_id", users), (CityRollup, "city", cities)):
+		rows = [
+			{owner_col: owner, "period": period, "period_start": start, "kwh": kwh, "days": days}
+			for (owner, period, start), (kwh, days) in totals.items()
+		]
+		for i in range(0, len(rows), YIELD_PER):
+			db.session.execute(insert(model), rows[i : i + YIELD_PER])
+	db.session.commit()
+	return {"usage_rows": len(users), "city_rows": len(cities)}
+
+
+def check(tolerance: float = 1e-6) -> List[Dict[str, object]]:
+	"""
+	Compare stored rollups against totals recomputed from the logs; returns the mismatching rows.
+	"""
+	problems: List[Dict[str, object]] = []
+	expected_users, expected_cities = _recompute()
+	for model, owner_col, expected in ((UsageRollup, "user_id", expected_users), (CityRollup, "city", expected_cities)):
+		owner_attr = getattr(model, owner_col)
+		stored = {
+			(owner, period, start): (kwh, days)
+			for owner, period, start, kwh, days in db.session.execute(
+				select(owner_attr, model.period, model.period_start, model.kwh, model.days)
+			)
+		}
+		for key in expected.keys() | stored.keys():
+			want = tuple(expected.get(key, (0.0, 0)))
+			have = stored.get(key, (0.0, 0))
+			if abs(want[0] - have[0]) > tolerance * max(1.0, abs(want[0])) or want[1] != have[1]:
+				owner, period, start = key
+				problems.append({
+					"table": model.__tablename__,
+					owner_col: owner,
+					"period": period,
+					"period_start": start.isoformat(),
+					"expected_kwh": round(want[0], 6),
+					"stored_kwh": round(have[0], 6),
+					"expected_days": want[1],
+					"stored_days": have[1],
+				})
+	return problems
+
+
+def period_usage(user_id: int, period: str, day: date) -> Tuple[float, int]:
+	"""
+	(kWh, metered days) for the period containing day, from one indexed row.
+	"""
+	row = db.session.execute(
+		select(UsageRollup.kwh, UsageRollup.days).where(
+			UsageRollup.user_id == user_id,
+			UsageRollup.period == period,
+			UsageRollup.period_start == period_start(day, period),
+		)
+	).first()
+	return (row[0], row[1]) if row else (0.0, 0)
+
+
+def city_usage(city: str, period: str, day: date) -> Tuple[float, int]:
+	row = db.session.execute(
+		select(CityRollup.kwh, CityRollup.days).where(
+			CityRollup.city == city,
+			CityRollup.period == period,
+			CityRollup.period_start == period_start(day, period),
+		)
+	).first()
+	return (row[0], row[1]) if row else (0.0, 0)
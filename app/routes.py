@@ -1,38 +1,97 @@
 from __future__ import annotations
 import io
 import json
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from datetime import date, timedelta
+from flask import Blueprint, Response, abort, current_app, render_template, request, redirect, url_for, flash, send_file, jsonify, stream_with_context
 from . import db
-from .models import User, Appliance, Assumption, Scenario
+from .models import User, UserGoal, Appliance
 from .calculations import compute_kpis, compute_daily_energy_kwh, compute_monthly_energy_kwh
-from .recommendations import generate_recommendations
-import pandas as pd
+from .cache import get_cache
+from .cohorts import cohort_percentile, refresh_cohorts
+from .forecast import month_forecast
+from .identity import admin_required, current_user, current_user_id
+from .instrumentation import timed
+from .ingest import daily_series
+from .loadshapes import household_profile
+from .queries import delete_user_appliance, forget_appliances, scenario_rows, user_appliances
+from .rollups import move_city, period_usage
+from .measures import apply_appliance_changes, stored_recommendations
+from .scenarios import reevaluate, save_scenario, users_on_plan
+from .assumptions import get_assumptions, assumptions_version, bump_user_versions, read_version, save_assumptions, user_version_key
+from .tariffs import assign_plan, get_plans, plan_cache_key, plan_for_user, save_plan, tariff_curve
 
 bp = Blueprint("main", __name__)
 
 
-def _get_or_create_default_user() -> User:
-	user = User.query.first()
-	if not user:
-		user = User(name="Demo User", tariff=8.0, ef=0.70, household_size=3, city="Delhi")
-		db.session.add(user)
-		db.session.commit()
-	return user
+def _assumptions_map() -> dict[str, float]:
+	# Memoized per process; only reloaded when the shared assumptions version changes
+	return get_assumptions()
 
 
-def _assumptions_map() -> dict[str, float]:
-	assumptions = {a.key: float(a.value) for a in Assumption.query.all()}
-	# sensible defaults
-	defaults = {
-		"ac_coefficient_per_degree": 0.04,
-		"default_led_w": 9.0,
-		"default_standby_w": 10.0,
-		"default_standby_hours": 2.0,
-		"lighting_cost_per_unit": 80.0,
-	}
-	for k, v in defaults.items():
-		assumptions.setdefault(k, v)
-	return assumptions
+def _kpi_bundle(user: User) -> dict:
+	"""
+	KPIs plus per-type kWh/day aggregates (pie and top-hog charts) and the hourly load profile, cached per user.
+	"""
+	plan = plan_for_user(user.id)
+	year = date.today().year
+
+	def compute() -> dict:
+		appliances_list = user_appliances(user.id)
+		type_to_kwh = {}
+		for a in appliances_list:
+			type_to_kwh[a.type] = type_to_kwh.get(a.type, 0.0) + a.daily_kwh()
+		top_types = sorted(type_to_kwh.items(), key=lambda kv: kv[1], reverse=True)[:5]
+		with timed("load_profile"):
+			profile = household_profile(appliances_list, year) if appliances_list else None
+		return {
+			"kpis": compute_kpis(appliances_list, user.tariff, user.ef, plan),
+			"profile": profile,
+			"n_appliances": len(appliances_list),
+			"pie_labels": list(type_to_kwh.keys()),
+			"pie_values": [round(v, 3) for v in type_to_kwh.values()],
+			"top_labels": [t for t, _ in top_types],
+			"top_values": [round(v, 3) for _, v in top_types],
+		}
+
+	extra = (user.tariff, user.ef, plan_cache_key(plan), year, read_version(user_version_key(user.id)))
+	return get_cache().get_or_compute("kpis", user.id, extra, compute)
+
+
+def _recommendations_extra(user: User, plan) -> tuple:
+	# The shared user version keeps other workers' cached entries in step with the API ETag
+	return (user.tariff, user.ef, assumptions_version(), plan_cache_key(plan), read_version(user_version_key(user.id)))
+
+
+def _user_recommendations(user: User, assump: dict[str, float]) -> list:
+	"""
+	Ranked recommendations for the user from the stored per-appliance results, cached per user
+	(returns a fresh list callers may re-sort).
+	"""
+	plan = plan_for_user(user.id)
+
+	def compute() -> list:
+		with timed("recommendations"):
+			return stored_recommendations(user, assump, plan)
+
+	return list(get_cache().get_or_compute("recommendations", user.id, _recommendations_extra(user, plan), compute))
+
+
+def _appliances_changed(user: User, added: list | tuple = (), removed: list | tuple = ()) -> None:
+	"""
+	After the household's appliances were added or deleted: refresh saved scenarios, peer cohorts and the
+	stored recommendation results, commit, and cache the merged ranking for the next page view.
+	"""
+	db.session.flush()
+	plan = plan_for_user(user.id)
+	reevaluate([user.id], removed)
+	refresh_cohorts([user.id])
+	ranked = apply_appliance_changes(user, _assumptions_map(), plan, [a.id for a in added], removed)
+	bump_user_versions([user.id])
+	extra = _recommendations_extra(user, plan)
+	db.session.commit()
+	cache = get_cache()
+	cache.invalidate_user(current_user_id())
+	cache.put("recommendations", current_user_id(), extra, ranked)
 
 
 @bp.route("/")
@@ -42,28 +101,44 @@ def index():
 
 @bp.route("/onboarding", methods=["GET", "POST"])
 def onboarding():
-	user = _get_or_create_default_user()
+	user = current_user()
 	if request.method == "POST":
 		user.name = request.form.get("name", user.name)
 		user.tariff = float(request.form.get("tariff", user.tariff or 8.0))
 		user.ef = float(request.form.get("ef", user.ef or 0.70))
 		user.household_size = int(request.form.get("household_size", user.household_size or 3))
+		old_city = user.city
 		user.city = request.form.get("city", user.city)
+		move_city(user.id, old_city, user.city)
+		if "tariff_plan_id" in request.form:
+			raw_plan = request.form.get("tariff_plan_id", "")
+			assign_plan(user.id, int(raw_plan) if raw_plan.isdigit() and int(raw_plan) in get_plans() else None)
+		reevaluate([user.id], household=True)
+		refresh_cohorts([user.id])
+		bump_user_versions([user.id])
 		db.session.commit()
+		get_cache().invalidate_user(current_user_id())
 		flash("Profile updated", "success")
 		return redirect(url_for("main.dashboard"))
 	# KPI preview based on current appliances
-	appliances_list = Appliance.query.filter_by(user_id=user.id).all()
-	kpis_preview = None
-	if appliances_list:
-		from .calculations import compute_kpis
-		kpis_preview = compute_kpis(appliances_list, user.tariff, user.ef)
-	return render_template("onboarding.html", user=user, kpis_preview=kpis_preview)
+	bundle = _kpi_bundle(user)
+	kpis_preview = bundle["kpis"] if bundle["n_appliances"] else None
+	plan = plan_for_user(user.id)
+	monthly_kwh = kpis_preview["monthly_kwh"] if kpis_preview else 0.0
+	curve = tariff_curve(monthly_kwh, plan, [5 + 0.5 * i for i in range(21)])
+	return render_template(
+		"onboarding.html",
+		user=user,
+		kpis_preview=kpis_preview,
+		plans=sorted(get_plans().values(), key=lambda p: p.name),
+		plan=plan,
+		tariff_curve=json.dumps(curve),
+	)
 
 
 @bp.route("/appliances", methods=["GET", "POST"])
 def appliances():
-	user = _get_or_create_default_user()
+	user = current_user()
 	if request.method == "POST":
 		a = Appliance(
 			user_id=user.id,
@@ -75,18 +150,19 @@ def appliances():
 			star_label=request.form.get("star_label", None),
 		)
 		db.session.add(a)
-		db.session.commit()
+		_appliances_changed(user, added=[a])
 		flash("Appliance added", "success")
 		return redirect(url_for("main.appliances"))
-	appliances_list = Appliance.query.filter_by(user_id=user.id).all()
+	appliances_list = user_appliances(user.id)
 	return render_template("appliances.html", user=user, appliances=appliances_list)
 
 
 @bp.route("/appliances/<int:appliance_id>/delete", methods=["POST"])
 def delete_appliance(appliance_id: int):
-	a = Appliance.query.get_or_404(appliance_id)
-	db.session.delete(a)
-	db.session.commit()
+	user = current_user()
+	if not delete_user_appliance(user.id, appliance_id):
+		abort(404)
+	_appliances_changed(user, removed=[appliance_id])
 	flash("Appliance deleted", "info")
 	return redirect(url_for("main.appliances"))
 
@@ -96,7 +172,7 @@ def seed_demo():
 	Seed a richer demo dataset for the current user if they have no appliances.
 	Intended for quick Vercel/preview setup.
 	"""
-	user = _get_or_create_default_user()
+	user = current_user()
 	existing = Appliance.query.filter_by(user_id=user.id).count()
 	if existing == 0:
 		demo = [
@@ -111,115 +187,177 @@ def seed_demo():
 			{"type": "geyser", "power_w": 2000, "quantity": 1, "hours_per_day": 0.5, "days_per_week": 5},
 			{"type": "microwave", "power_w": 1200, "quantity": 1, "hours_per_day": 0.3, "days_per_week": 5},
 		]
-		for p in demo:
-			db.session.add(Appliance(user_id=user.id, **p))
-		db.session.commit()
+		added = [Appliance(user_id=user.id, **p) for p in demo]
+		db.session.add_all(added)
+		_appliances_changed(user, added=added)
 		flash("Demo data loaded.", "success")
 	else:
 		flash("Appliances already exist; demo not loaded.", "info")
 	return redirect(url_for("main.appliances"))
 
 
+def dashboard_data(user: User) -> dict:
+	"""
+	Everything the dashboard shows as plain values: the HTML page and GET /api/v1/kpis.
+	"""
+	bundle = _kpi_bundle(user)
+	kpis = bundle["kpis"]
+
+	# Weekly trend: metered kWh for the last 7 days (flat estimate until readings arrive)
+	daily_kwh = kpis["daily_kwh"]
+	today = date.today()
+	series = daily_series(user.id, today - timedelta(days=6), today)
+	line_metered = any(v is not None for _, v in series)
+	if line_metered:
+		line_values = [None if v is None else round(v, 3) for _, v in series]
+	else:
+		line_values = [daily_kwh] * 7
+
+	# Goals progress: the fitted month-end forecast, else a projection from this month's metered days,
+	# else the appliance estimate
+	plan = plan_for_user(user.id)
+	month_kwh, month_days = period_usage(user.id, "month", today)
+	forecast = month_forecast(user.id, today, user.tariff, plan)
+	if forecast is not None:
+		projected_kwh = forecast["kwh"]
+		projected_cost = forecast["cost"]
+	elif month_days:
+		projected_kwh = month_kwh / month_days * 30
+		projected_cost = projected_kwh * user.tariff if plan is None else plan.bill(projected_kwh)
+	else:
+		projected_kwh = kpis["monthly_kwh"]
+		projected_cost = kpis["monthly_cost"]
+	# Load profile: typical day by hour; on time-of-day plans, the bill for this household's own hours
+	profile = bundle["profile"]
+	tod_bill = None
+	if profile and plan is not None and any(plan.hour_adjust):
+		tod_bill = round(plan.bill(kpis["monthly_kwh"], profile["hourly_share"]), 2)
+
+	goals = user.goals
+	goal_month_kwh = float(goals.month_kwh or 0) if goals else 0.0
+	goal_month_cost = float(goals.month_cost or 0) if goals else 0.0
+	progress_kwh = 0
+	progress_cost = 0
+	if goal_month_kwh > 0:
+		progress_kwh = int(max(0, min(100, (goal_month_kwh / max(projected_kwh, 0.0001)) * 100)))
+	if goal_month_cost > 0:
+		progress_cost = int(max(0, min(100, (goal_month_cost / max(projected_cost, 0.0001)) * 100)))
+
+	return {
+		"kpis": kpis,
+		# Pie chart: kWh/day share by appliance type; top 5 hogs by daily kWh
+		"pie_labels": bundle["pie_labels"],
+		"pie_values": bundle["pie_values"],
+		"top_labels": bundle["top_labels"],
+		"top_values": bundle["top_values"],
+		"line_labels": [d.strftime("%a %d") for d, _ in series],
+		"line_values": line_values,
+		"line_metered": line_metered,
+		"line_estimate": [daily_kwh] * 7,
+		"goal_month_kwh": goal_month_kwh,
+		"goal_month_cost": goal_month_cost,
+		"progress_kwh": progress_kwh,
+		"progress_cost": progress_cost,
+		"month_kwh": round(month_kwh, 2),
+		"month_days": month_days,
+		"projected_kwh": round(projected_kwh, 2),
+		"forecast": forecast,
+		"profile": profile,
+		"profile_values": profile["average_day_kw"] if profile else [],
+		"tod_bill": tod_bill,
+		# Percentile among homes of the same city and size (None for small or unknown cohorts)
+		"cohort": cohort_percentile(user, kpis["monthly_kwh"]),
+	}
+
+
+# Dashboard series embedded in the page as JSON literals for Chart.js
+DASHBOARD_SERIES = ("pie_labels", "pie_values", "top_labels", "top_values", "line_labels", "line_values", "line_estimate", "profile_values")
+
+
 @bp.route("/dashboard", methods=["GET", "POST"])
 def dashboard():
-	user = _get_or_create_default_user()
-	appliances_list = Appliance.query.filter_by(user_id=user.id).all()
-	kpis = compute_kpis(appliances_list, user.tariff, user.ef)
-	assump = _assumptions_map()
-	# Handle goals update
+	user = current_user()
+	# Handle goals update: the household's own targets, so only its version and cache entries move
 	if request.method == "POST":
-		goal_kwh = request.form.get("goal_month_kwh")
-		goal_cost = request.form.get("goal_month_cost")
-		for key, raw in (("goal_month_kwh", goal_kwh), ("goal_month_cost", goal_cost)):
+		goals = user.goals or UserGoal(user_id=user.id)
+		for attr, key in (("month_kwh", "goal_month_kwh"), ("month_cost", "goal_month_cost")):
+			raw = request.form.get(key)
 			if raw is None or raw == "":
 				continue
 			try:
-				val = float(raw)
+				setattr(goals, attr, float(raw))
 			except ValueError:
 				continue
-			existing = Assumption.query.filter_by(key=key).first()
-			if existing:
-				existing.value = val
-			else:
-				db.session.add(Assumption(key=key, value=val))
+		user.goals = goals
+		bump_user_versions([user.id])
 		db.session.commit()
-		assump = _assumptions_map()
+		get_cache().invalidate_user(user.id)
 		flash("Goals updated", "success")
 
-	# Pie chart: kWh/day share by appliance type
-	type_to_kwh = {}
-	for a in appliances_list:
-		type_to_kwh[a.type] = type_to_kwh.get(a.type, 0.0) + a.daily_kwh()
-	pie_labels = list(type_to_kwh.keys())
-	pie_values = [round(v, 3) for v in type_to_kwh.values()]
+	from .api import cohort_window, data_etag
 
-	# Weekly trend (simple flat series from today's daily kWh)
-	daily_kwh = kpis["daily_kwh"]
-	line_labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-	line_values = [daily_kwh] * 7
-
-	# Top 5 hogs (by daily kWh)
-	top_types = sorted(type_to_kwh.items(), key=lambda kv: kv[1], reverse=True)[:5]
-	top_labels = [t for t, _ in top_types]
-	top_values = [round(v, 3) for _, v in top_types]
+	etag = data_etag(user.id, "api.kpis", cohort_window())
+	data = dashboard_data(user)
+	data.update({k: json.dumps(data[k]) for k in DASHBOARD_SERIES})
+	return render_template("dashboard.html", user=user, api_etag=etag, **data)
 
-	# Goals progress
-	goal_month_kwh = float(assump.get("goal_month_kwh", 0) or 0)
-	goal_month_cost = float(assump.get("goal_month_cost", 0) or 0)
-	progress_kwh = 0
-	progress_cost = 0
-	if goal_month_kwh > 0:
-		progress_kwh = int(max(0, min(100, (goal_month_kwh / max(kpis["monthly_kwh"], 0.0001)) * 100)))
-	if goal_month_cost > 0:
-		progress_cost = int(max(0, min(100, (goal_month_cost / max(kpis["monthly_cost"], 0.0001)) * 100)))
+def ranked_recommendations(user: User, rank: str = "cost") -> list:
+	"""
+	The user's recommendations by ₹ saved per month (then payback; recommendations.rank_key), or by CO2
+	saved first with rank="co2".
+	"""
+	recs = _user_recommendations(user, _assumptions_map())
+	if rank == "co2":
+		recs.sort(key=lambda r: (-r.delta_co2_month, (r.payback_months or 1e9)))
+	return recs
 
-	return render_template(
-		"dashboard.html",
-		user=user,
-		kpis=kpis,
-		pie_labels=json.dumps(pie_labels),
-		pie_values=json.dumps(pie_values),
-		line_labels=json.dumps(line_labels),
-		line_values=json.dumps(line_values),
-		top_labels=json.dumps(top_labels),
-		top_values=json.dumps(top_values),
-		goal_month_kwh=goal_month_kwh,
-		goal_month_cost=goal_month_cost,
-		progress_kwh=progress_kwh,
-		progress_cost=progress_cost,
-	)
 
 @bp.route("/recommendations", methods=["GET", "POST"])
 def recommendations():
-	user = _get_or_create_default_user()
-	appliances_list = Appliance.query.filter_by(user_id=user.id).all()
-	assump = _assumptions_map()
+	user = current_user()
 	rank = request.args.get("rank", "cost")
-	recs = generate_recommendations(appliances_list, user.tariff, user.ef, assump)
-	if rank == "co2":
-		recs.sort(key=lambda r: (-r.delta_co2_month, (r.payback_months or 1e9)))
+	recs = ranked_recommendations(user, rank)
 	if request.method == "POST":
 		name = request.form.get("name", "Apply All")
-		saved_kwh = round(sum(r.delta_kwh_month for r in recs), 2)
-		saved_cost = round(sum(r.delta_cost_month for r in recs), 2)
-		saved_co2 = round(sum(r.delta_co2_month for r in recs), 2)
-		sc = Scenario(
-			user_id=user.id,
-			name=name,
-			measures_json=json.dumps([r.__dict__ for r in recs]),
-			saved_kwh=saved_kwh,
-			saved_cost=saved_cost,
-			saved_co2=saved_co2,
-		)
-		db.session.add(sc)
+		save_scenario(user.id, name, recs)
+		bump_user_versions([user.id])
 		db.session.commit()
 		flash(f"Scenario '{name}' created from all recommendations.", "success")
 		return redirect(url_for("main.scenarios"))
 	return render_template("recommendations.html", user=user, recs=recs, rank=rank)
 
+@bp.route("/recommendations/sensitivity")
+def recommendations_sensitivity():
+	"""
+	P10/P50/P90 savings and payback per measure under uncertain assumptions, tariff and EF.
+	"""
+	from .sensitivity import run_sensitivity
+
+	user = current_user()
+	cap = current_app.config["SENSITIVITY_MAX_SAMPLES"]
+	try:
+		samples = int(request.args.get("samples", 10000))
+		seed = int(request.args.get("seed", 0))
+		if samples > cap:
+			raise ValueError(f"samples must be between 1 and {cap}")
+		report = run_sensitivity(
+			user_appliances(user.id),
+			user.tariff,
+			user.ef,
+			_assumptions_map(),
+			samples=samples,
+			workers=current_app.config["SENSITIVITY_WORKERS"],
+			seed=seed,
+			plan=plan_for_user(user.id),
+		)
+	except ValueError as exc:
+		return jsonify({"error": str(exc)}), 400
+	return jsonify(report.to_dict())
+
+
 @bp.route("/appliances/preset", methods=["POST"])
 def appliances_preset():
-	user = _get_or_create_default_user()
+	user = current_user()
 	pack = request.form.get("pack", "basic_2bhk")
 	presets = []
 	if pack == "basic_1bhk":
@@ -237,52 +375,155 @@ def appliances_preset():
 			{"type": "fridge", "power_w": 120, "quantity": 1, "hours_per_day": 24, "days_per_week": 7, "star_label": "3-star"},
 			{"type": "router", "power_w": 10, "quantity": 1, "hours_per_day": 24, "days_per_week": 7},
 		]
-	for p in presets:
-		db.session.add(Appliance(user_id=user.id, **p))
-	db.session.commit()
+	added = [Appliance(user_id=user.id, **p) for p in presets]
+	db.session.add_all(added)
+	_appliances_changed(user, added=added)
 	flash("Preset appliances added", "success")
 	return redirect(url_for("main.appliances"))
 
+def _request_records():
+	"""
+	(records, uploaded) from a multipart "file" field or the raw request body, parsed as a stream.
+	"""
+	from .importer import iter_records, detect_format
+
+	upload = request.files.get("file")
+	if upload is not None:
+		fmt = request.form.get("format") or detect_format(upload.filename, upload.mimetype)
+		return iter_records(upload.stream, fmt), True
+	fmt = request.args.get("format") or detect_format(None, request.mimetype)
+	return iter_records(request.stream, fmt), False
+
+
+def _batch_size_arg(default: int, cap: int) -> int:
+	"""
+	?batch_size= as an int in 1..cap (a batch is held in memory); raises ValueError otherwise.
+	"""
+	raw = request.args.get("batch_size")
+	try:
+		size = default if raw is None else int(raw)
+	except ValueError:
+		size = 0
+	if not 1 <= size <= cap:
+		raise ValueError(f"batch_size must be an integer between 1 and {cap}")
+	return size
+
+
+def _import_from_request(user_id: int | None):
+	from .importer import MAX_BATCH_SIZE, import_appliances
+
+	try:
+		batch_size = _batch_size_arg(1000, MAX_BATCH_SIZE)
+	except ValueError as exc:
+		return jsonify({"error": str(exc)}), 400
+	records, uploaded = _request_records()
+	report = import_appliances(records, user_id, batch_size)
+	cache = get_cache()
+	# A partial list (very large fleet imports) is fine: the bumped user versions already miss in the cache
+	for uid in report.user_ids:
+		cache.invalidate_user(uid)
+	if uploaded and not request.accept_mimetypes.accept_json:
+		flash(f"Imported {report.inserted} appliances ({report.rejected} rejected).", "success" if not report.rejected else "warning")
+		return redirect(url_for("main.appliances"))
+	return jsonify(report.to_dict())
+
+
+@bp.route("/appliances/import", methods=["POST"])
+def appliances_import():
+	return _import_from_request(current_user().id)
+
+
+@bp.route("/admin/appliances/import", methods=["POST"])
+@admin_required
+def admin_appliances_import():
+	"""
+	Fleet import: every row names its user_id (e.g. onboarding a housing society).
+	"""
+	return _import_from_request(None)
+
+
+def _ingest_from_request(user_id: int | None):
+	from .ingest import MAX_BATCH_SIZE, ingest_readings
+
+	mode = request.args.get("mode", "add")
+	if mode not in ("add", "replace"):
+		return jsonify({"error": "mode must be 'add' or 'replace'"}), 400
+	try:
+		batch_size = _batch_size_arg(5000, MAX_BATCH_SIZE)
+	except ValueError as exc:
+		return jsonify({"error": str(exc)}), 400
+	records, _ = _request_records()
+	report = ingest_readings(records, user_id, batch_size, mode)
+	return jsonify(report.to_dict())
+
+
+@bp.route("/readings", methods=["POST"])
+def readings_ingest():
+	"""
+	Meter readings for the current household: CSV/NDJSON rows of timestamp (or date) and kwh.
+	"""
+	return _ingest_from_request(current_user().id)
+
+
+@bp.route("/admin/readings", methods=["POST"])
+@admin_required
+def admin_readings_ingest():
+	"""
+	Fleet meter feed: every reading carries its user_id.
+	"""
+	return _ingest_from_request(None)
+
+
 @bp.route("/appliances/remove_type", methods=["POST"])
 def appliances_remove_type():
-	user = _get_or_create_default_user()
+	user = current_user()
 	device_type = request.form.get("type")
 	if not device_type:
 		flash("No type provided", "warning")
 		return redirect(url_for("main.appliances"))
+	removed = [a.id for a in user_appliances(user.id) if a.type == device_type]
 	Appliance.query.filter_by(user_id=user.id, type=device_type).delete()
-	db.session.commit()
+	forget_appliances(user.id)
+	_appliances_changed(user, removed=removed)
 	flash(f"Removed all '{device_type}' appliances.", "info")
 	return redirect(url_for("main.appliances"))
 
 
 @bp.route("/scenarios", methods=["GET", "POST"])
 def scenarios():
-	user = _get_or_create_default_user()
-	appliances_list = Appliance.query.filter_by(user_id=user.id).all()
-	kpis_base = compute_kpis(appliances_list, user.tariff, user.ef)
-	recs = generate_recommendations(appliances_list, user.tariff, user.ef, _assumptions_map())
+	user = current_user()
+	kpis_base = _kpi_bundle(user)["kpis"]
+	recs = _user_recommendations(user, _assumptions_map())
 
 	if request.method == "POST":
-		selected_codes = request.form.getlist("measures")
-		selected = [r for r in recs if r.code in selected_codes]
-		saved_kwh = round(sum(r.delta_kwh_month for r in selected), 2)
-		saved_cost = round(sum(r.delta_cost_month for r in selected), 2)
-		saved_co2 = round(sum(r.delta_co2_month for r in selected), 2)
-		sc = Scenario(
-			user_id=user.id,
-			name=request.form.get("name", "Scenario"),
-			measures_json=json.dumps([r.__dict__ for r in selected]),
-			saved_kwh=saved_kwh,
-			saved_cost=saved_cost,
-			saved_co2=saved_co2,
-		)
-		db.session.add(sc)
+		# Options carry per-measure keys ("lighting_swap:12"); a bare code still selects every measure of that rule
+		chosen = set(request.form.getlist("measures"))
+		selected = [r for r in recs if r.key in chosen or r.code in chosen]
+		save_scenario(user.id, request.form.get("name", "Scenario"), selected)
+		bump_user_versions([user.id])
 		db.session.commit()
 		flash("Scenario saved", "success")
 		return redirect(url_for("main.scenarios"))
 
-	scenarios_list = Scenario.query.filter_by(user_id=user.id).all()
+	from .api import data_etag
+
+	etag = data_etag(user.id, "api.scenarios")
+	data = scenarios_data(user, kpis_base)
+	data.update({k: json.dumps(data[k]) for k in SCENARIO_SERIES})
+	return render_template("scenarios.html", user=user, recs=recs, api_etag=etag, **data)
+
+
+# Scenario chart series embedded in the page as JSON literals
+SCENARIO_SERIES = ("bar_labels", "bar_values", "measure_labels", "measure_values")
+
+
+def scenarios_data(user: User, kpis_base: dict | None = None) -> dict:
+	"""
+	Saved scenarios plus chart series for the latest one: the HTML page and GET /api/v1/scenarios.
+	"""
+	if kpis_base is None:
+		kpis_base = _kpi_bundle(user)["kpis"]
+	scenarios_list, latest_measures = scenario_rows(user.id)
 	# Prepare chart data for latest scenario if available
 	bar_labels = []
 	bar_values = []
@@ -294,87 +535,174 @@ def scenarios():
 		energy_after = max(kpis_base["monthly_kwh"] - latest.saved_kwh, 0.0)
 		bar_values = [round(kpis_base["monthly_kwh"], 2), round(energy_after, 2)]
 		# Savings by measure (kWh) for latest scenario
-		try:
-			measures = json.loads(latest.measures_json or "[]")
-		except Exception:
-			measures = []
-		measure_labels = [m.get("title") or m.get("code", "") for m in measures]
-		measure_values = [round(float(m.get("delta_kwh_month", 0.0)), 2) for m in measures]
-	return render_template(
-		"scenarios.html",
-		user=user,
-		kpis_base=kpis_base,
-		recs=recs,
-		scenarios=scenarios_list,
-		bar_labels=json.dumps(bar_labels),
-		bar_values=json.dumps(bar_values),
-		measure_labels=json.dumps(measure_labels),
-		measure_values=json.dumps(measure_values),
-	)
+		measure_labels = [title for title, _ in latest_measures]
+		measure_values = [round(kwh, 2) for _, kwh in latest_measures]
+	return {
+		"kpis_base": kpis_base,
+		"scenarios": scenarios_list,
+		"bar_labels": bar_labels,
+		"bar_values": bar_values,
+		"measure_labels": measure_labels,
+		"measure_values": measure_values,
+	}
+
+
+@bp.route("/scenarios/optimize", methods=["GET", "POST"])
+def scenarios_optimize():
+	"""
+	Best subset of the current recommendations under a retrofit budget (₹).
+	GET returns the plan as JSON; POST (scenarios page form) saves it as a scenario.
+	"""
+	from .solver import OBJECTIVES, optimize
+
+	user = current_user()
+	objective = request.values.get("objective", "cost")
+	try:
+		budget = float(request.values.get("budget", ""))
+		if objective not in OBJECTIVES:
+			raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+		plan = optimize(_user_recommendations(user, _assumptions_map()), budget, objective)
+	except ValueError as exc:
+		if request.method == "POST":
+			flash(f"Cannot optimize: {exc}", "warning")
+			return redirect(url_for("main.scenarios"))
+		return jsonify({"error": str(exc)}), 400
+	if request.method == "GET":
+		return jsonify(plan.to_dict())
+	sc = save_scenario(user.id, request.form.get("name") or f"Best {objective} under ₹{budget:g}", plan.measures)
+	bump_user_versions([user.id])
+	db.session.commit()
+	flash(f"Scenario '{sc.name}' saved: {len(plan.measures)} measures for ₹ {plan.retrofit_cost:,.0f}", "success")
+	return redirect(url_for("main.scenarios"))
 
 
 @bp.route("/admin/assumptions", methods=["GET", "POST"])
 def admin_assumptions():
 	if request.method == "POST":
+		values = {}
 		for key, val in request.form.items():
 			try:
-				val_f = float(val)
+				values[key] = float(val)
 			except ValueError:
 				continue
-			existing = Assumption.query.filter_by(key=key).first()
-			if existing:
-				existing.value = val_f
-			else:
-				db.session.add(Assumption(key=key, value=val_f))
-		db.session.commit()
+		save_assumptions(values)
+		get_cache().invalidate_assumptions()
 		flash("Assumptions updated", "success")
 		return redirect(url_for("main.admin_assumptions"))
 	return render_template("admin_assumptions.html", assumptions=_assumptions_map())
 
 
+@bp.route("/admin/tariffs", methods=["GET", "POST"])
+@admin_required
+def admin_tariffs():
+	"""
+	List compiled tariff plans, or create/replace one from a JSON definition (see tariffs.validate_plan).
+	"""
+	if request.method == "POST":
+		try:
+			plan = save_plan(request.get_json(force=True, silent=True) or {})
+		except ValueError as exc:
+			return jsonify({"error": str(exc)}), 400
+		# Saved scenarios of households on this plan (caches and ETags already key on the tariffs version)
+		affected = users_on_plan(plan.id)
+		if affected:
+			reevaluate(affected, household=True)
+			db.session.commit()
+		return jsonify(get_plans()[plan.id].describe()), 201
+	return jsonify([p.describe() for p in get_plans().values()])
+
+
+@bp.route("/admin/cache-stats")
+@admin_required
+def cache_stats():
+	return jsonify(get_cache().stats())
+
+
 @bp.route("/export/csv")
 def export_csv():
-	user = _get_or_create_default_user()
-	appliances_list = Appliance.query.filter_by(user_id=user.id).all()
-	rows = []
-	for a in appliances_list:
-		rows.append(
-			{
-				"type": a.type,
-				"power_w": a.power_w,
-				"quantity": a.quantity,
-				"hours_per_day": a.hours_per_day,
-				"days_per_week": a.days_per_week,
-				"star_label": a.star_label or "",
-				"daily_kwh": round(a.daily_kwh(), 3),
-			}
-		)
-	kpis = compute_kpis(appliances_list, user.tariff, user.ef)
-	df = pd.DataFrame(rows)
-	buf = io.StringIO()
-	df.to_csv(buf, index=False)
-	buf.write("\n")
-	buf.write("# KPIs\n")
-	for k, v in kpis.items():
-		buf.write(f"{k},{v}\n")
-	mem = io.BytesIO(buf.getvalue().encode("utf-8"))
-	return send_file(mem, mimetype="text/csv", as_attachment=True, download_name="energy_report.csv")
+	from .exports import iter_user_csv
+
+	user = current_user()
+	return Response(
+		stream_with_context(iter_user_csv(user)),
+		mimetype="text/csv",
+		headers={"Content-Disposition": "attachment; filename=energy_report.csv"},
+	)
+
+
+@bp.route("/admin/export/csv")
+@admin_required
+def admin_export_csv():
+	"""
+	Fleet-wide export of every user's appliances and KPIs, streamed.
+	"""
+	from .exports import iter_fleet_csv
+
+	return Response(
+		stream_with_context(iter_fleet_csv()),
+		mimetype="text/csv",
+		headers={"Content-Disposition": "attachment; filename=energy_fleet.csv"},
+	)
 
 
 @bp.route("/export/pdf")
 def export_pdf():
-	# Generate a simple PDF from dashboard-like HTML using WeasyPrint (if installed)
+	# Render the report HTML here; WeasyPrint runs on the background job pool (if installed)
 	try:
-		from weasyprint import HTML  # type: ignore
+		import weasyprint  # type: ignore  # noqa: F401
 	except Exception:
 		flash("WeasyPrint not available on this environment. PDF export disabled.", "warning")
 		return redirect(url_for("main.dashboard"))
+	from .jobs import enqueue_pdf
 
-	user = _get_or_create_default_user()
-	appliances_list = Appliance.query.filter_by(user_id=user.id).all()
-	kpis = compute_kpis(appliances_list, user.tariff, user.ef)
+	user = current_user()
+	appliances_list = user_appliances(user.id)
+	kpis = _kpi_bundle(user)["kpis"]
 	html = render_template("export_pdf.html", user=user, kpis=kpis, appliances=appliances_list)
-	pdf = HTML(string=html).write_pdf()
-	return send_file(io.BytesIO(pdf), mimetype="application/pdf", as_attachment=True, download_name="energy_report.pdf")
+	job = enqueue_pdf(user.id, html)
+	if job.status == "done":
+		return _send_pdf(job)
+	if request.accept_mimetypes.best == "application/json":
+		return jsonify(_job_payload(job)), 202
+	return redirect(url_for("main.export_pdf_job", job_id=job.id))
+
+
+def _job_payload(job) -> dict:
+	payload = {
+		"id": job.id,
+		"status": job.status,
+		"status_url": url_for("main.export_pdf_job", job_id=job.id),
+	}
+	if job.status == "done":
+		payload["download_url"] = url_for("main.export_pdf_download", job_id=job.id)
+	if job.status == "failed":
+		payload["error"] = job.error
+	return payload
+
+
+def _send_pdf(job):
+	return send_file(io.BytesIO(job.result), mimetype="application/pdf", as_attachment=True, download_name="energy_report.pdf")
+
+
+def _user_job(job_id: str):
+	from .models import ReportJob
+
+	return ReportJob.query.filter_by(id=job_id, user_id=current_user().id).first_or_404()
+
+
+@bp.route("/export/pdf/jobs/<job_id>")
+def export_pdf_job(job_id: str):
+	from .jobs import expire_stale
+
+	job = expire_stale(_user_job(job_id))
+	if request.accept_mimetypes.best == "application/json":
+		return jsonify(_job_payload(job))
+	return render_template("export_pdf_job.html", job=job)
 
 
+@bp.route("/export/pdf/jobs/<job_id>/download")
+def export_pdf_download(job_id: str):
+	job = _user_job(job_id)
+	if job.status != "done":
+		return redirect(url_for("main.export_pdf_job", job_id=job.id))
+	return _send_pdf(job)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+import json
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import and_, func, or_, select, update
+
+from . import db
+from .assumptions import get_assumptions
+from .models import Appliance, Scenario, ScenarioMeasure, User, UserTariff
+from .recommendations import Recommendation, generate_recommendations
+from .tariffs import get_plans
+
+# Saved scenarios keep one scenario_measures row per measure (rule code + target appliance) instead of a
+# JSON snapshot, and the scenario's saved_* columns are the sums of its rows. When a household's data
+# changes, only the measures that change can touch are recomputed: those targeting edited or deleted
+# appliances, the household-wide standby measure (it scales with the device count), and - when the
+# tariff, EF or plan changed, or the household is on a slab/time-of-day plan where every ₹ saving
+# depends on total usage - all of the household's measures. Measures whose appliance is gone or no
+# longer qualifies are dropped. Assumption edits do not re-evaluate saved scenarios.
+
+
+def measure_fields(rec: Recommendation) -> Dict[str, Any]:
+	return {
+		"title": rec.title,
+		"delta_kwh_month": rec.delta_kwh_month,
+		"delta_cost_month": rec.delta_cost_month,
+		"delta_co2_month": rec.delta_co2_month,
+		"payback_months": rec.payback_months,
+		"retrofit_cost": rec.retrofit_cost,
+	}
+
+
+def save_scenario(user_id: int, name: str, recs: Sequence[Recommendation]) -> Scenario:
+	"""
+	Store the chosen measures as a scenario; the caller commits.
+	"""
+	scenario = Scenario(
+		user_id=user_id,
+		name=name,
+		saved_kwh=round(sum(r.delta_kwh_month for r in recs), 2),
+		saved_cost=round(sum(r.delta_cost_month for r in recs), 2),
+		saved_co2=round(sum(r.delta_co2_month for r in recs), 2),
+	)
+	scenario.measures = [
+		ScenarioMeasure(user_id=user_id, position=i, code=r.code, appliance_id=r.details.get("appliance_id"), **measure_fields(r))
+		for i, r in enumerate(recs)
+	]
+	db.session.add(scenario)
+	return scenario
+
+
+def _current_recommendations(user_ids: Iterable[int]) -> Dict[int, Dict[str, Recommendation]]:
+	user_ids = list(user_ids)
+	users = {u.id: u for u in db.session.execute(select(User).where(User.id.in_(user_ids))).scalars()}
+	plan_ids = dict(db.session.execute(select(UserTariff.user_id, UserTariff.plan_id).where(UserTariff.user_id.in_(user_ids))).all())
+	by_user: Dict[int, List[Appliance]] = {uid: [] for uid in user_ids}
+	for a in db.session.execute(select(Appliance).where(Appliance.user_id.in_(user_ids)).order_by(Appliance.id)).scalars():
+		by_user[a.user_id].append(a)
+	plans, assumptions = get_plans(), get_assumptions()
+	out = {}
+	for uid, user in users.items():
+		plan = plans.get(plan_ids[uid]) if uid in plan_ids else None
+		recs = generate_recommendations(by_user[uid], user.tariff, user.ef, assumptions, plan)
+		out[uid] = {r.key: r for r in recs}
+	return out
+
+
+def reevaluate(user_ids: Iterable[int], appliance_ids: Iterable[int] = (), household: bool = False) -> int:
+	"""
+	Refresh the saved measures a change can affect and re-total their scenarios; the caller commits.
+	appliance_ids: appliances edited or deleted (additions need none). household: tariff, EF or plan changed.
+	Returns the number of measure rows updated or dropped.
+	"""
+	user_ids = set(user_ids)
+	if not user_ids:
+		return 0
+	appliance_ids = set(appliance_ids)
+	db.session.flush()
+	if household:
+		everything = user_ids
+	else:
+		everything = set(db.session.execute(select(UserTariff.user_id).where(UserTariff.user_id.in_(user_ids))).scalars())
+	targeted = user_ids - everything
+	conditions = []
+	if everything:
+		conditions.append(ScenarioMeasure.user_id.in_(everything))
+	if targeted:
+		touched = ScenarioMeasure.code == "standby_cut"
+		if appliance_ids:
+			touched = or_(touched, ScenarioMeasure.appliance_id.in_(appliance_ids))
+		conditions.append(and_(ScenarioMeasure.user_id.in_(targeted), touched))
+	rows = db.session.execute(select(ScenarioMeasure).where(or_(*conditions))).scalars().all()
+	if not rows:
+		return 0
+
+	current = _current_recommendations({r.user_id for r in rows})
+	scenario_ids = set()
+	for row in rows:
+		scenario_ids.add(row.scenario_id)
+		rec = current.get(row.user_id, {}).get(row.key)
+		if rec is None:
+			db.session.delete(row)
+			continue
+		for name, value in measure_fields(rec).items():
+			setattr(row, name, value)
+	db.session.flush()
+	_retotal(scenario_ids)
+	return len(rows)
+
+
+def _retotal(scenario_ids: Iterable[int]) -> None:
+	scenario_ids = list(scenario_ids)
+	sums = {
+		sid: (kwh, cost, co2)
+		for sid, kwh, cost, co2 in db.session.execute(
+			select(
+				ScenarioMeasure.scenario_id,
+				func.sum(ScenarioMeasure.delta_kwh_month),
+				func.sum(ScenarioMeasure.delta_cost_month),
+				func.sum(ScenarioMeasure.delta_co2_month),
+			)
+			.where(ScenarioMeasure.scenario_id.in_(scenario_ids))
+			.group_by(ScenarioMeasure.scenario_id)
+		)
+	}
+	rows = []
+	for sid in scenario_ids:
+		kwh, cost, co2 = sums.get(sid, (0.0, 0.0, 0.0))  # every measure dropped
+		rows.append({"id": sid, "saved_kwh": round(kwh, 2), "saved_cost": round(cost, 2), "saved_co2": round(co2, 2)})
+	db.session.execute(update(Scenario), rows)
+
+
+def users_on_plan(plan_id: int) -> List[int]:
+	"""
+	Households on a tariff plan that have saved scenarios (re-evaluated when the plan is edited).
+	"""
+	stmt = select(UserTariff.user_id).where(
+		UserTariff.plan_id == plan_id, UserTariff.user_id.in_(select(ScenarioMeasure.user_id).distinct())
+	)
+	return list(db.session.execute(stmt).scalars())
+
+
+def _legacy_rows(scenario: Scenario) -> List[ScenarioMeasure]:
+	try:
+		measures = json.loads(scenario.measures_json or "[]")
+	except ValueError:
+		measures = []
+	rows = []
+	for i, m in enumerate(m for m in measures if isinstance(m, dict) and m.get("code")):
+		details = m.get("details") or {}
+		rows.append(ScenarioMeasure(
+			user_id=scenario.user_id,
+			position=i,
+			code=m["code"],
+			appliance_id=details.get("appliance_id"),
+			title=m.get("title") or m["code"],
+			delta_kwh_month=float(m.get("delta_kwh_month") or 0.0),
+			delta_cost_month=float(m.get("delta_cost_month") or 0.0),
+			delta_co2_month=float(m.get("delta_co2_month") or 0.0),
+			payback_months=m.get("payback_months"),
+			retrofit_cost=float(details.get("retrofit_cost") or 0.0),
+		))
+	return rows
+
+
+def backfill_measures(batch_size: int = 500) -> int:
+	"""
+	Move legacy measures_json payloads into scenario_measures (saved_* columns are kept as stored).
+	Commits per batch; safe to re-run. Returns the number of scenarios converted.
+	"""
+	converted = 0
+	while True:
+		batch = db.session.execute(
+			select(Scenario).where(Scenario.measures_json.is_not(None)).order_by(Scenario.id).limit(batch_size)
+		).scalars().all()
+		if not batch:
+			return converted
+		for scenario in batch:
+			if not scenario.measures:
+				scenario.measures = _legacy_rows(scenario)
+			scenario.measures_json = None
+		db.session.commit()
+		converted += len(batch)
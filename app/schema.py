@@ -0,0 +1,69 @@
+from __future__ import annotations
+import hashlib
+
+from flask import Flask
+from sqlalchemy import MetaData, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .models import DataVersion
+
+# Boot-time schema check. db.create_all() reflects every table (one round trip each) on every cold start;
+# instead we record a fingerprint of the models in data_versions once and only look that row up.
+
+SCHEMA_KEY_PREFIX = "schema:"
+
+
+def schema_fingerprint(metadata: MetaData) -> str:
+	parts = []
+	for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+		parts.append(table.name)
+		parts.extend(f"{c.name}:{c.type!r}:{c.nullable}" for c in table.columns)
+		parts.extend(sorted(f"ix:{ix.name}:{ix.unique}" for ix in table.indexes))
+	return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def dialect_insert():
+	"""
+	The dialect's insert() supporting ON CONFLICT upserts (SQLite, Postgres), or None.
+	"""
+	name = db.engine.dialect.name
+	if name == "postgresql":
+		from sqlalchemy.dialects.postgresql import insert
+	elif name == "sqlite":
+		from sqlalchemy.dialects.sqlite import insert
+	else:
+		return None
+	return insert
+
+
+def _schema_recorded(key: str) -> bool:
+	try:
+		with db.engine.connect() as conn:
+			return conn.execute(select(DataVersion.key).where(DataVersion.key == key)).first() is not None
+	except SQLAlchemyError:
+		# data_versions missing (fresh database) or unreachable: fall through to create_all
+		return False
+
+
+def ensure_schema(app: Flask) -> bool:
+	"""
+	Create missing tables unless this model fingerprint is already recorded.
+	AUTO_CREATE_SCHEMA: "auto" (default), "always" (old behaviour) or "never" (migrations only).
+	Returns True when create_all() ran.
+	"""
+	mode = app.config.get("AUTO_CREATE_SCHEMA", "auto")
+	if mode == "never":
+		return False
+	key = SCHEMA_KEY_PREFIX + schema_fingerprint(db.metadata)
+	if mode == "auto" and _schema_recorded(key):
+		return False
+	db.create_all()
+	# create_all() skips tables that already exist, so add indexes introduced since they were created
+	for table in db.metadata.sorted_tables:
+		for index in table.indexes:
+			index.create(bind=db.engine, checkfirst=True)
+	if db.session.get(DataVersion, key) is None:
+		db.session.add(DataVersion(key=key, version=1))
+		db.session.commit()
+	return True
@@ -0,0 +1,234 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import numpy as np
+
+from .assumptions import DEFAULT_ASSUMPTIONS
+from .recommendations import AC_DELTA_T, FRIDGE_RETROFIT_COST, generate_recommendations
+
+# Monte Carlo sensitivity of recommendation savings and KPIs to the assumptions table, tariff and EF.
+# Each assumption is sampled from a triangular distribution around its point value; every measure is
+# evaluated for all samples at once as (measures x samples) arrays. Large runs split the measures
+# across a process pool; every task draws the same seeded samples and returns only its percentiles,
+# so results are identical whatever the number of worker processes.
+# For a household on a tariff plan, ₹ figures are slab-aware bills (CompiledTariff) and the sampled
+# "tariff" is a multiplier on the plan's energy charges rather than a flat ₹/kWh.
+
+# (low, high) multipliers of the point estimate; the mode is the point estimate itself
+DEFAULT_SPREADS: Dict[str, Tuple[float, float]] = {
+	"ac_coefficient_per_degree": (0.5, 1.5),
+	"default_led_w": (0.75, 1.35),
+	"default_standby_w": (0.5, 1.5),
+	"default_standby_hours": (0.5, 2.0),
+	"lighting_cost_per_unit": (0.75, 1.5),
+	"tariff": (0.85, 1.15),
+	"ef": (0.9, 1.1),
+}
+PERCENTILES = (10, 50, 90)
+CELLS_PER_TASK = 4_000_000  # measures x samples evaluated by one task (bounds worker memory)
+MAX_SAMPLES = 2_000_000
+_KINDS = {"lighting_swap": 0, "ac_setpoint": 1, "standby_cut": 2, "fridge_upgrade": 3}
+
+
+@dataclass
+class MeasureBand:
+	key: str
+	code: str
+	title: str
+	delta_kwh_month: Tuple[float, float, float]  # P10, P50, P90
+	delta_cost_month: Tuple[float, float, float]
+	delta_co2_month: Tuple[float, float, float]
+	payback_months: Tuple[float | None, float | None, float | None]  # None: never pays back
+
+
+@dataclass
+class SensitivityReport:
+	samples: int
+	seed: int
+	monthly_kwh: float
+	monthly_cost: Tuple[float, float, float]
+	monthly_co2: Tuple[float, float, float]
+	measures: List[MeasureBand] = field(default_factory=list)
+
+	def to_dict(self) -> Dict[str, Any]:
+		def band(values):
+			return dict(zip((f"p{p}" for p in PERCENTILES), values))
+
+		return {
+			"samples": self.samples,
+			"seed": self.seed,
+			"kpis": {"monthly_kwh": self.monthly_kwh, "monthly_cost": band(self.monthly_cost), "monthly_co2": band(self.monthly_co2)},
+			"measures": [
+				{
+					"key": m.key,
+					"code": m.code,
+					"title": m.title,
+					"delta_kwh_month": band(m.delta_kwh_month),
+					"delta_cost_month": band(m.delta_cost_month),
+					"delta_co2_month": band(m.delta_co2_month),
+					"payback_months": band(m.payback_months),
+				}
+				for m in self.measures
+			],
+		}
+
+
+def sample_assumptions(
+	point: Mapping[str, float],
+	n: int,
+	rng: np.random.Generator,
+	spreads: Mapping[str, Tuple[float, float]] = DEFAULT_SPREADS,
+) -> Dict[str, np.ndarray]:
+	"""
+	n draws per assumption; names without a spread stay at their point value.
+	"""
+	out = {}
+	for name, value in point.items():
+		lo, hi = spreads.get(name, (1.0, 1.0))
+		if lo == hi == 1.0 or value == 0:
+			out[name] = np.full(n, float(value))
+		else:
+			out[name] = rng.triangular(value * lo, value, value * hi, size=n)
+	return out
+
+
+def measure_params(recs: Iterable[Any]) -> Dict[str, np.ndarray]:
+	"""
+	Per-measure inputs read from Recommendation.details, as columns.
+	"""
+	recs = list(recs)
+
+	def col(key: str, default: float = 0.0) -> np.ndarray:
+		return np.array([float(r.details.get(key, default) or 0.0) for r in recs])
+
+	return {
+		"kind": np.array([_KINDS[r.code] for r in recs], dtype=np.int8),
+		"p_old_w": col("p_old_w"),
+		"n": col("n"),
+		"t": col("t"),
+		"e_ac_month": col("e_ac_month"),
+		"fridge_kwh": (col("e_old_year") - col("e_new_year")) / 12.0,
+	}
+
+
+def _energy_bill(plan: Any, kwh: Any) -> Any:
+	# Plan bill without the fixed charge (the part the sampled tariff multiplier scales)
+	return plan.bill_array(kwh) - plan.fixed_charge
+
+
+def evaluate(params: Dict[str, np.ndarray], s: Dict[str, np.ndarray], plan: Any = None, base_kwh: float = 0.0) -> Dict[str, np.ndarray]:
+	"""
+	(measures x samples) monthly savings and payback for sampled assumptions s.
+	With a compiled plan, ₹ savings are the bill reduction from base_kwh, scaled by the tariff multiplier.
+	"""
+	kind = params["kind"][:, None]
+	lighting = (np.maximum(params["p_old_w"][:, None] - s["default_led_w"], 0.0) * params["n"][:, None] * params["t"][:, None] / 1000.0) * 30.0
+	ac = params["e_ac_month"][:, None] * (s["ac_coefficient_per_degree"] * AC_DELTA_T)
+	standby = ((s["default_standby_w"] * s["default_standby_hours"] * params["n"][:, None]) / 1000.0) * 30.0
+	fridge = np.broadcast_to(params["fridge_kwh"][:, None], lighting.shape)
+	delta_kwh = np.select([kind == 0, kind == 1, kind == 2], [lighting, ac, standby], fridge)
+	if plan is None:
+		delta_cost = delta_kwh * s["tariff"]
+	else:
+		delta_cost = (_energy_bill(plan, base_kwh) - _energy_bill(plan, base_kwh - delta_kwh)) * s["tariff"]
+	retrofit = np.where(kind == 0, s["lighting_cost_per_unit"] * params["n"][:, None], np.where(kind == 3, FRIDGE_RETROFIT_COST, 0.0))
+	with np.errstate(divide="ignore", invalid="ignore"):
+		payback = np.where(retrofit == 0, 0.0, np.where(delta_cost > 0, retrofit / delta_cost, np.inf))
+	return {
+		"delta_kwh": delta_kwh,
+		"delta_cost": delta_cost,
+		"delta_co2": delta_kwh * s["ef"],
+		"payback": payback,
+	}
+
+
+def _percentiles(values: np.ndarray, ndigits: int, method: str = "linear") -> np.ndarray:
+	return np.round(np.percentile(values, PERCENTILES, axis=-1, method=method), ndigits)
+
+
+def measure_bands(
+	params: Dict[str, np.ndarray],
+	point: Dict[str, float],
+	spreads: Mapping[str, Tuple[float, float]],
+	seed: int,
+	n: int,
+	plan: Any = None,
+	base_kwh: float = 0.0,
+) -> Dict[str, np.ndarray]:
+	"""
+	(percentiles x measures) bands for a slice of measures. Runs in worker processes.
+	"""
+	result = evaluate(params, sample_assumptions(point, n, np.random.default_rng(seed), spreads), plan, base_kwh)
+	bands = {k: _percentiles(result[k], 2) for k in ("delta_kwh", "delta_cost", "delta_co2")}
+	bands["payback"] = _percentiles(result["payback"], 1, method="nearest")  # may hold inf (no saving)
+	return bands
+
+
+def run_sensitivity(
+	appliances: Iterable[Any],
+	tariff: float,
+	ef: float,
+	assumptions: Mapping[str, float] | None = None,
+	samples: int = 10000,
+	workers: int = 1,
+	seed: int = 0,
+	spreads: Mapping[str, Tuple[float, float]] = DEFAULT_SPREADS,
+	plan: Any = None,
+) -> SensitivityReport:
+	"""
+	P10/P50/P90 of each recommended measure's savings and payback, and of monthly cost/CO2.
+	With workers > 1, slices of measures are evaluated on a process pool.
+	plan: the household's CompiledTariff (None = flat tariff ₹/kWh).
+	"""
+	if not 1 <= samples <= MAX_SAMPLES:
+		raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+	appliances = list(appliances)
+	point = dict(DEFAULT_ASSUMPTIONS)
+	point.update({k: float(v) for k, v in (assumptions or {}).items() if k in point})
+	recs = generate_recommendations(appliances, tariff, ef, point, plan)
+	point.update(tariff=float(tariff) if plan is None else 1.0, ef=float(ef))
+	params = measure_params(recs)
+	monthly_kwh = sum(a.daily_kwh() for a in appliances) * 30.0
+
+	n_measures = len(params["kind"])
+	per_task = max(1, min(CELLS_PER_TASK // samples, -(-n_measures // max(workers, 1))))
+	slices = [slice(i, i + per_task) for i in range(0, n_measures, per_task)]
+	parts = [{k: v[sl] for k, v in params.items()} for sl in slices]
+	if workers > 1 and len(parts) > 1:
+		with ProcessPoolExecutor(max_workers=min(workers, len(parts))) as pool:
+			n_parts = len(parts)
+			results = list(pool.map(
+				measure_bands, parts, [point] * n_parts, [dict(spreads)] * n_parts, [seed] * n_parts, [samples] * n_parts,
+				[plan] * n_parts, [monthly_kwh] * n_parts,
+			))
+	else:
+		results = [measure_bands(part, point, spreads, seed, samples, plan, monthly_kwh) for part in parts]
+	# No candidate measures (e.g. nothing to swap and standby assumed 0 W): only the KPI bands
+	bands = {k: np.concatenate([r[k] for r in results], axis=-1) for k in results[0]} if results else {}
+	kpi_samples = sample_assumptions(point, samples, np.random.default_rng(seed), spreads)
+	if plan is None:
+		monthly_cost = monthly_kwh * kpi_samples["tariff"]
+	else:
+		monthly_cost = plan.fixed_charge + _energy_bill(plan, monthly_kwh) * kpi_samples["tariff"]
+	measures = [
+		MeasureBand(
+			key=r.key,
+			code=r.code,
+			title=r.title,
+			delta_kwh_month=tuple(bands["delta_kwh"][:, i].tolist()),
+			delta_cost_month=tuple(bands["delta_cost"][:, i].tolist()),
+			delta_co2_month=tuple(bands["delta_co2"][:, i].tolist()),
+			payback_months=tuple(None if not np.isfinite(v) else v for v in bands["payback"][:, i].tolist()),
+		)
+		for i, r in enumerate(recs)
+	]
+	return SensitivityReport(
+		samples=samples,
+		seed=seed,
+		monthly_kwh=round(monthly_kwh, 2),
+		monthly_cost=tuple(_percentiles(monthly_cost, 2).tolist()),
+		monthly_co2=tuple(_percentiles(monthly_kwh * kpi_samples["ef"], 2).tolist()),
+		measures=measures,
+	)
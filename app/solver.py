@@ -0,0 +1,154 @@
+from __future__ import annotations
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Budgeted scenario solver: pick the subset of recommendations that maximizes a saving
+# (₹, kWh or CO2 per month) without the summed retrofit cost exceeding a budget.
+# 0/1 knapsack by dynamic programming over discretized cost, vectorized per item with NumPy.
+
+OBJECTIVES = {"cost": "delta_cost_month", "kwh": "delta_kwh_month", "co2": "delta_co2_month"}
+MAX_CELLS = 10000  # capacity resolution of the DP table (cost units per budget)
+
+
+@dataclass
+class Solution:
+	selected: List[int]  # positions in the candidate list, ascending
+	spent: float
+	value: float
+	exact: bool  # False when costs had to be rounded up to the DP's cost unit
+
+
+@dataclass
+class Plan:
+	budget: float
+	objective: str
+	measures: List[Any] = field(default_factory=list)
+	retrofit_cost: float = 0.0
+	saved_kwh: float = 0.0
+	saved_cost: float = 0.0
+	saved_co2: float = 0.0
+	exact: bool = True
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"budget": self.budget,
+			"objective": self.objective,
+			"retrofit_cost": round(self.retrofit_cost, 2),
+			"saved_kwh": round(self.saved_kwh, 2),
+			"saved_cost": round(self.saved_cost, 2),
+			"saved_co2": round(self.saved_co2, 2),
+			"exact": self.exact,
+			"measures": [dict(r.__dict__, key=r.key, retrofit_cost=r.retrofit_cost) for r in self.measures],
+		}
+
+
+def _cost_unit(costs: np.ndarray, budget: float, max_cells: int) -> float:
+	# Whole-rupee costs share a common divisor (e.g. 80/unit lamps, 25000 fridges): use it when the
+	# table stays small, which keeps the answer exact; otherwise split the budget into max_cells steps.
+	if np.all(costs == np.round(costs)):
+		g = int(np.gcd.reduce(np.round(costs).astype(np.int64)))
+		if g > 0 and budget / g <= max_cells:
+			return float(g)
+	return max(budget / max_cells, 1e-9)
+
+
+def solve_knapsack(costs: Sequence[float], values: Sequence[float], budget: float, max_cells: int = MAX_CELLS) -> Solution:
+	"""
+	Best subset of items by total value with total cost <= budget.
+	Free items with positive value are always taken; items without value are never taken.
+	"""
+	if budget < 0 or not math.isfinite(budget):
+		raise ValueError("budget must be a non-negative number")
+	costs = np.asarray(costs, dtype=np.float64)
+	values = np.asarray(values, dtype=np.float64)
+	useful = values > 0
+	chosen = np.flatnonzero(useful & (costs <= 0)).tolist()
+	paid = np.flatnonzero(useful & (costs > 0) & (costs <= budget))
+	exact = True
+	if costs[paid].sum() <= budget:
+		chosen += paid.tolist()
+	elif len(paid):
+		unit = _cost_unit(costs[paid], budget, max_cells)
+		weights = np.ceil(costs[paid] / unit - 1e-9).astype(np.int64)
+		exact = bool(np.allclose(weights * unit, costs[paid]))
+		cap = int(math.floor(budget / unit + 1e-9))
+		best = np.zeros(cap + 1)
+		take = np.zeros((len(paid), cap + 1), dtype=bool)
+		for i, (w, v) in enumerate(zip(weights, values[paid])):
+			if w > cap:
+				continue
+			with_item = best[: cap + 1 - w] + v
+			better = with_item > best[w:]
+			take[i, w:] = better
+			best[w:] = np.where(better, with_item, best[w:])
+		c = cap
+		for i in range(len(paid) - 1, -1, -1):
+			if take[i, c]:
+				chosen.append(int(paid[i]))
+				c -= weights[i]
+	chosen.sort()
+	return Solution(chosen, float(costs[chosen].sum()) if chosen else 0.0, float(values[chosen].sum()) if chosen else 0.0, exact)
+
+
+def optimize(recs: Sequence[Any], budget: float, objective: str = "cost") -> Plan:
+	"""
+	Best set of Recommendation objects for one household under a retrofit budget (₹).
+	"""
+	if objective not in OBJECTIVES:
+		raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+	attr = OBJECTIVES[objective]
+	solution = solve_knapsack([r.retrofit_cost for r in recs], [getattr(r, attr) for r in recs], budget)
+	picked = [recs[i] for i in solution.selected]
+	return Plan(
+		budget=budget,
+		objective=objective,
+		measures=picked,
+		retrofit_cost=solution.spent,
+		saved_kwh=sum(r.delta_kwh_month for r in picked),
+		saved_cost=sum(r.delta_cost_month for r in picked),
+		saved_co2=sum(r.delta_co2_month for r in picked),
+		exact=solution.exact,
+	)
+
+
+def _measure_keys(frame: pd.DataFrame) -> np.ndarray:
+	ids = frame["appliance_id"].to_numpy() if "appliance_id" in frame else np.full(len(frame), np.nan)
+	codes = frame["code"].to_numpy()
+	return np.array([c if i is None or i != i else f"{c}:{int(i)}" for c, i in zip(codes, ids)], dtype=object)
+
+
+def optimize_frame(frame: pd.DataFrame, budget: float, objective: str = "cost") -> pd.DataFrame:
+	"""
+	Solve every user in a recommendation_frame() at once; one row of totals per user.
+	"""
+	if objective not in OBJECTIVES:
+		raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+	columns = ["user_id", "measures", "retrofit_cost", "saved_kwh", "saved_cost", "saved_co2", "exact"]
+	if not len(frame):
+		return pd.DataFrame(columns=columns)
+	frame = frame.sort_values("user_id", kind="stable")
+	user_ids = frame["user_id"].to_numpy()
+	costs = frame["retrofit_cost"].to_numpy(dtype=np.float64)
+	deltas = {k: frame[col].to_numpy(dtype=np.float64) for k, col in OBJECTIVES.items()}
+	keys = _measure_keys(frame)
+	bounds = np.flatnonzero(np.diff(user_ids)) + 1
+	starts = np.concatenate([[0], bounds])
+	ends = np.concatenate([bounds, [len(frame)]])
+	rows = []
+	for s, e in zip(starts, ends):
+		solution = solve_knapsack(costs[s:e], deltas[objective][s:e], budget)
+		idx = np.asarray(solution.selected, dtype=np.intp) + s
+		rows.append((
+			int(user_ids[s]),
+			";".join(keys[idx]),
+			round(solution.spent, 2),
+			round(float(deltas["kwh"][idx].sum()), 2),
+			round(float(deltas["cost"][idx].sum()), 2),
+			round(float(deltas["co2"][idx].sum()), 2),
+			solution.exact,
+		))
+	return pd.DataFrame(rows, columns=columns)
@@ -54,11 +54,17 @@
 	if (!canvas || !slider) return;
 	const monthlyKwh = parseFloat(canvas.dataset.kwh || '0');
 	const ef = parseFloat(canvas.dataset.ef || '0.7');
+	// Server-computed [avg ₹/kWh, ₹/month] points (slab plans are not linear in the tariff)
+	const curve = canvas.dataset.curve ? JSON.parse(canvas.dataset.curve) : null;
 	const ctx = canvas.getContext('2d');
 
 	function genData() {
 		const tariffs = [];
 		const costs = [];
+		if (curve && curve.length) {
+			curve.forEach(([t, c]) => { tariffs.push(t.toFixed(1)); costs.push(c); });
+			return { tariffs, costs };
+		}
 		for (let t = 5; t <= 15; t += 0.5) {
 			tariffs.push(t.toFixed(1));
 			costs.push(parseFloat((monthlyKwh * t).toFixed(2)));
@@ -66,6 +72,12 @@
 		return { tariffs, costs };
 	}
 
+	function costAt(t) {
+		if (!curve || !curve.length) return monthlyKwh * t;
+		const nearest = curve.reduce((best, p) => Math.abs(p[0] - t) < Math.abs(best[0] - t) ? p : best);
+		return nearest[1];
+	}
+
 	const d = genData();
 	const chart = new Chart(ctx, {
 		type: 'line',
@@ -87,10 +99,64 @@
 	function updatePreview() {
 		const t = parseFloat(slider.value);
 		if (sliderVal) sliderVal.textContent = t.toFixed(1);
-		if (previewCost) previewCost.textContent = (monthlyKwh * t).toFixed(2);
+		if (previewCost) previewCost.textContent = costAt(t).toFixed(2);
 	}
 	updatePreview();
 	slider.addEventListener('input', updatePreview);
 })();
 
 
+// Live refresh of dashboard/scenario data from the JSON API. The last ETag is sent back as
+// If-None-Match, so an unchanged household costs a bodiless 304 and no chart work.
+(() => {
+	const source = document.querySelector('[data-api]');
+	if (!source || !window.fetch) return;
+	const url = source.dataset.api;
+	const everyMs = parseInt(source.dataset.refresh || '60', 10) * 1000;
+	// ETag of the data the page was rendered from, so the first poll is normally a 304
+	let etag = source.dataset.etag ? `W/"${source.dataset.etag}"` : null;
+
+	function pick(data, path) {
+		return path.split('.').reduce((v, k) => (v == null ? v : v[k]), data);
+	}
+
+	function render(data) {
+		document.querySelectorAll('[data-field]').forEach((el) => {
+			const v = pick(data, el.dataset.field);
+			if (v != null) el.textContent = v;
+		});
+		Object.values(window.liveCharts || {}).forEach(({ chart, labels, series }) => {
+			if (!chart) return;
+			if (labels) chart.data.labels = data[labels];
+			series.forEach((name, i) => { if (chart.data.datasets[i]) chart.data.datasets[i].data = data[name]; });
+			chart.update('none');
+		});
+		document.querySelectorAll('[data-rows]').forEach((tbody) => {
+			const columns = tbody.dataset.columns.split(' ');
+			tbody.replaceChildren(...(data[tbody.dataset.rows] || []).map((row) => {
+				const tr = document.createElement('tr');
+				columns.forEach((c) => { const td = document.createElement('td'); td.textContent = row[c]; tr.appendChild(td); });
+				return tr;
+			}));
+		});
+	}
+
+	async function refresh() {
+		if (document.hidden) return;
+		const headers = { Accept: 'application/json' };
+		if (etag) headers['If-None-Match'] = etag;
+		try {
+			// no-store: let the server's 304 through instead of the browser substituting its cached copy
+			const res = await fetch(url, { headers, credentials: 'same-origin', cache: 'no-store' });
+			if (res.status !== 200) return;
+			etag = res.headers.get('ETag');
+			render(await res.json());
+		} catch (e) {
+			// offline or server restarting: keep the current view
+		}
+	}
+
+	refresh();
+	setInterval(refresh, everyMs);
+	document.addEventListener('visibilitychange', refresh);
+})();
@@ -0,0 +1,397 @@
+from __future__ import annotations
+import csv
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+from . import db
+from .cohorts import add_counts, bucket_of, cohort_key
+from .models import Appliance, CohortMember, Log, Scenario, ScenarioMeasure, UsageRollup, User
+from .recommendations import TITLES, lighting_swap_title
+from .rollups import PERIODS, add_city_totals, period_start
+
+# Synthetic households for load testing. Users are generated in fixed-size blocks, each from its own
+# generator seeded with (seed, block index), so the data depends only on the seed, the block size and
+# the end date - not on how many worker processes produce it. Every block holds its users' appliances,
+# daily logs (with matching usage rollups), cohort memberships, and scenarios with their measures; city
+# rollups and cohort bucket counts are summed across blocks. Appliance and scenario ids are assigned from fixed per-user slots after the highest
+# existing ids, so blocks can reference them without coordinating.
+# Rows are written with COPY on Postgres (worker processes write their own blocks) and with a single
+# cursor executemany on SQLite (blocks are generated in parallel, written by the parent).
+
+# city: (share of households, mean tariff ₹/kWh, grid emission factor kgCO2/kWh)
+CITIES = {
+	"Delhi": (0.18, 7.5, 0.72),
+	"Mumbai": (0.17, 9.5, 0.74),
+	"Bengaluru": (0.15, 8.0, 0.68),
+	"Chennai": (0.12, 7.0, 0.70),
+	"Kolkata": (0.10, 8.5, 0.80),
+	"Hyderabad": (0.10, 8.2, 0.76),
+	"Pune": (0.09, 9.0, 0.74),
+	"Jaipur": (0.09, 7.8, 0.78),
+}
+HOUSEHOLD_SIZES = ((1, 0.10), (2, 0.20), (3, 0.30), (4, 0.22), (5, 0.12), (6, 0.06))
+# type: (ownership probability, median W, W log-spread, median h/day, h log-spread, min days/week, units per person)
+# Wattages follow the appliance form's defaults (static/main.js); bulbs/tubes mix LED and older fittings.
+CATALOGUE: Dict[str, Tuple[float, float, float, float, float, int, float]] = {
+	"bulb": (0.97, 9, 0.25, 5.0, 0.35, 7, 1.2),
+	"tube": (0.60, 18, 0.20, 6.0, 0.35, 7, 0.5),
+	"fan": (0.95, 70, 0.08, 8.0, 0.35, 6, 0.6),
+	"AC": (0.45, 1200, 0.20, 4.0, 0.45, 4, 0.0),
+	"fridge": (0.90, 120, 0.20, 24.0, 0.0, 7, 0.0),
+	"tv": (0.90, 90, 0.25, 3.5, 0.40, 6, 0.0),
+	"router": (0.70, 10, 0.15, 24.0, 0.0, 7, 0.0),
+	"laptop": (0.55, 60, 0.15, 4.0, 0.40, 5, 0.0),
+	"monitor": (0.20, 30, 0.15, 5.0, 0.35, 5, 0.0),
+	"wm": (0.60, 500, 0.20, 0.7, 0.30, 3, 0.0),
+	"geyser": (0.50, 2000, 0.15, 0.5, 0.40, 4, 0.0),
+	"microwave": (0.40, 1200, 0.12, 0.3, 0.40, 4, 0.0),
+}
+# Share of bulbs/tubes that are incandescent (60 W) / fluorescent (36 W) rather than LED
+OLD_FITTINGS = {"bulb": (0.35, 60), "tube": (0.40, 36)}
+STAR_LABELS = (("2-star", 0.15), ("3-star", 0.45), ("4-star", 0.15), ("5-star", 0.25))
+WEEKEND_FACTOR = 1.12
+
+USER_COLUMNS = ("id", "name", "tariff", "ef", "household_size", "city")
+APPLIANCE_COLUMNS = ("id", "user_id", "type", "power_w", "quantity", "hours_per_day", "days_per_week", "star_label")
+LOG_COLUMNS = ("user_id", "date", "kwh")
+SCENARIO_COLUMNS = ("id", "user_id", "name", "saved_kwh", "saved_cost", "saved_co2")
+MEASURE_COLUMNS = (
+	"scenario_id", "user_id", "position", "code", "appliance_id", "title",
+	"delta_kwh_month", "delta_cost_month", "delta_co2_month", "payback_months", "retrofit_cost",
+)
+ROLLUP_COLUMNS = ("user_id", "period", "period_start", "kwh", "days")
+MEMBER_COLUMNS = ("user_id", "city", "household_size", "bucket", "monthly_kwh")
+# Insert order respects the foreign keys
+TABLES = (
+	(User.__tablename__, USER_COLUMNS),
+	(Appliance.__tablename__, APPLIANCE_COLUMNS),
+	(Log.__tablename__, LOG_COLUMNS),
+	(UsageRollup.__tablename__, ROLLUP_COLUMNS),
+	(CohortMember.__tablename__, MEMBER_COLUMNS),
+	(Scenario.__tablename__, SCENARIO_COLUMNS),
+	(ScenarioMeasure.__tablename__, MEASURE_COLUMNS),
+)
+# Saved-scenario measures use the recommendation rules' default assumptions
+LED_W, LED_COST_PER_UNIT, AC_SAVING_PER_RUN = 9.0, 80.0, 0.04 * 2.0
+STANDBY_KWH_PER_DEVICE = 10.0 * 2.0 / 1000.0 * 30.0
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+	users: int
+	seed: int = 0
+	days: int = 30  # daily logs per household, ending at `end` (0 = none)
+	end: date = field(default_factory=date.today)
+	scenario_share: float = 0.2  # households with a saved scenario
+	block_size: int = 10000
+
+
+@dataclass(frozen=True)
+class IdOffsets:
+	# First id of each table for this run; user k (0-based) owns appliance ids appliance + k * len(CATALOGUE) + type
+	user: int = 1
+	appliance: int = 1
+	scenario: int = 1
+
+
+@dataclass
+class Block:
+	index: int
+	rows: Dict[str, List[tuple]]
+	city_totals: Dict[tuple, List[float]]
+	cohort_counts: Dict[tuple, int]
+
+	def counts(self) -> Dict[str, int]:
+		return {table: len(rows) for table, rows in self.rows.items()}
+
+
+@dataclass
+class GenerationReport:
+	users: int = 0
+	appliances: int = 0
+	logs: int = 0
+	scenarios: int = 0
+	measures: int = 0
+	usage_rollups: int = 0
+	first_user_id: int = 0
+	seconds: float = 0.0
+
+	def add(self, counts: Dict[str, int]) -> None:
+		self.users += counts.get(User.__tablename__, 0)
+		self.appliances += counts.get(Appliance.__tablename__, 0)
+		self.logs += counts.get(Log.__tablename__, 0)
+		self.scenarios += counts.get(Scenario.__tablename__, 0)
+		self.usage_rollups += counts.get(UsageRollup.__tablename__, 0)
+		self.measures += counts.get(ScenarioMeasure.__tablename__, 0)
+
+	def to_dict(self) -> Dict[str, Any]:
+		rows = self.users + self.appliances + self.logs + self.scenarios + self.measures + self.usage_rollups
+		return {
+			"users": self.users,
+			"appliances": self.appliances,
+			"logs": self.logs,
+			"scenarios": self.scenarios,
+			"measures": self.measures,
+			"usage_rollups": self.usage_rollups,
+			"first_user_id": self.first_user_id,
+			"seconds": round(self.seconds, 3),
+			"rows_per_second": round(rows / self.seconds) if self.seconds else None,
+		}
+
+
+def _weighted(rng: np.random.Generator, choices: Sequence[Tuple[Any, float]], n: int) -> np.ndarray:
+	values, weights = zip(*choices)
+	return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=np.asarray(weights) / sum(weights))]
+
+
+def _appliances(rng: np.random.Generator, user_ids: np.ndarray, sizes: np.ndarray, first_ids: np.ndarray) -> Tuple[List[tuple], Dict[str, np.ndarray]]:
+	"""
+	Appliance rows (one per owned type, grouped by user) and their columns; first_ids holds each user's first id slot.
+	"""
+	n = len(user_ids)
+	cols: Dict[str, List[np.ndarray]] = {k: [] for k in ("owner", "order", "type", "power", "qty", "hours", "days", "star")}
+	for order, (kind, (p_own, watts, w_spread, hours, h_spread, min_days, per_person)) in enumerate(CATALOGUE.items()):
+		owner = np.flatnonzero(rng.random(n) < p_own)
+		m = len(owner)
+		median_w = np.full(m, float(watts))
+		if kind in OLD_FITTINGS:
+			share, old_w = OLD_FITTINGS[kind]
+			median_w[rng.random(m) < share] = old_w
+		power = np.round(median_w * np.exp(w_spread * rng.standard_normal(m)), 1)
+		if per_person:
+			qty = 1 + rng.poisson(per_person * sizes[owner])
+		elif kind == "AC":
+			qty = 1 + ((sizes[owner] >= 4) & (rng.random(m) < 0.3))
+		else:
+			qty = np.ones(m, dtype=np.int64)
+		hrs = np.round(np.clip(hours * np.exp(h_spread * rng.standard_normal(m)), 0.1, 24.0), 2)
+		days = rng.integers(min_days, 8, size=m)
+		star = _weighted(rng, STAR_LABELS, m) if kind in ("fridge", "AC") else np.full(m, None, dtype=object)
+		for key, value in zip(cols, (owner, np.full(m, order), np.full(m, kind, dtype=object), power, qty, hrs, days, star)):
+			cols[key].append(value)
+	flat = {k: np.concatenate(v) for k, v in cols.items()}
+	by_user = np.lexsort((flat["order"], flat["owner"]))
+	flat = {k: v[by_user] for k, v in flat.items()}
+	flat["id"] = first_ids[flat["owner"]] + flat["order"]
+	rows = list(zip(
+		flat["id"].tolist(),
+		user_ids[flat["owner"]].tolist(),
+		flat["type"].tolist(),
+		flat["power"].tolist(),
+		flat["qty"].tolist(),
+		flat["hours"].tolist(),
+		flat["days"].tolist(),
+		flat["star"].tolist(),
+	))
+	return rows, flat
+
+
+def generate_block(spec: SyntheticSpec, index: int, ids: IdOffsets = IdOffsets()) -> Block:
+	"""
+	Users ids.user + index * block_size onwards (at most block_size of them) and all their rows.
+	"""
+	rng = np.random.default_rng([spec.seed, index])
+	start = index * spec.block_size
+	n = min(spec.block_size, spec.users - start)
+	offsets = np.arange(start, start + n)
+	user_ids = ids.user + offsets
+
+	names = list(CITIES)
+	share, mean_tariff, mean_ef = (np.array(v) for v in zip(*CITIES.values()))
+	city = rng.choice(len(names), size=n, p=share / share.sum())
+	sizes = _weighted(rng, HOUSEHOLD_SIZES, n).astype(np.int64)
+	tariff = np.round(mean_tariff[city] * np.exp(0.08 * rng.standard_normal(n)), 2)
+	ef = np.round(mean_ef[city] + 0.02 * rng.standard_normal(n), 3)
+	city_names = np.asarray(names, dtype=object)[city]
+	rows: Dict[str, List[tuple]] = {
+		User.__tablename__: list(zip(
+			user_ids.tolist(), [f"Household {i}" for i in user_ids.tolist()], tariff.tolist(), ef.tolist(), sizes.tolist(), city_names.tolist()
+		)),
+	}
+	rows[Appliance.__tablename__], appliances = _appliances(rng, user_ids, sizes, ids.appliance + offsets * len(CATALOGUE))
+	owner = appliances["owner"]
+	daily = np.bincount(
+		owner, weights=appliances["power"] * appliances["qty"] * appliances["hours"] * appliances["days"] / 7.0 / 1000.0, minlength=n
+	)
+
+	# Daily logs around the appliance estimate: weekends heavier, day-to-day noise
+	days = [spec.end - timedelta(days=spec.days - 1 - i) for i in range(spec.days)]
+	city_totals: Dict[tuple, List[float]] = {}
+	rows[Log.__tablename__] = []
+	rows[UsageRollup.__tablename__] = []
+	if days:
+		weekday = np.array([WEEKEND_FACTOR if d.weekday() >= 5 else 1.0 for d in days])
+		kwh = np.round(daily[:, None] * weekday[None, :] * np.exp(0.15 * rng.standard_normal((n, len(days)))), 3)
+		iso = [d.isoformat() for d in days]
+		rows[Log.__tablename__] = list(zip(np.repeat(user_ids, len(days)).tolist(), iso * n, kwh.ravel().tolist()))
+		for period in PERIODS:
+			starts = [period_start(d, period) for d in days]
+			keys = sorted(set(starts))
+			member = np.array([[s == k for k in keys] for s in starts], dtype=float)
+			totals = kwh @ member
+			counts = member.sum(axis=0).astype(int).tolist()
+			for j, key in enumerate(keys):
+				rows[UsageRollup.__tablename__] += zip(
+					user_ids.tolist(), [period] * n, [key.isoformat()] * n, totals[:, j].tolist(), [counts[j]] * n
+				)
+				per_city = np.bincount(city, weights=totals[:, j], minlength=len(names))
+				members = np.bincount(city, minlength=len(names))
+				for c, name in enumerate(names):
+					if members[c]:
+						city_totals[(name, period, key)] = [float(per_city[c]), int(members[c]) * counts[j]]
+
+	# Peer cohorts place households by their estimated monthly kWh, as cohorts.refresh_cohorts() would
+	cohort_counts: Dict[tuple, int] = {}
+	rows[CohortMember.__tablename__] = []
+	for uid, city_name, size, monthly in zip(user_ids.tolist(), city_names.tolist(), sizes.tolist(), (daily * 30.0).tolist()):
+		if monthly <= 0:
+			continue
+		key = (*cohort_key(city_name, size), bucket_of(monthly))
+		cohort_counts[key] = cohort_counts.get(key, 0) + 1
+		rows[CohortMember.__tablename__].append((uid, *key, monthly))
+
+	# A saved scenario for some households: their LED swap, AC setpoint and standby measures, computed as
+	# generate_recommendations() would on a flat tariff (so re-evaluation leaves them unchanged)
+	with_scenario = np.flatnonzero(rng.random(n) < spec.scenario_share)
+	devices = np.bincount(owner, minlength=n)
+	targets = {}
+	for kind in ("bulb", "AC"):
+		pick = appliances["type"] == kind
+		row_of = np.full(n, -1)
+		row_of[owner[pick]] = np.flatnonzero(pick)
+		targets[kind] = row_of
+	rows[Scenario.__tablename__] = []
+	rows[ScenarioMeasure.__tablename__] = []
+	for i in with_scenario.tolist():
+		uid, rate, factor = int(user_ids[i]), float(tariff[i]), float(ef[i])
+		measures = []  # code, appliance id, title, kWh/month, retrofit ₹, payback months or None
+		b = targets["bulb"][i]
+		if b >= 0 and appliances["power"][b] > LED_W:
+			power, qty, hours = float(appliances["power"][b]), int(appliances["qty"][b]), float(appliances["hours"][b])
+			kwh = (power - LED_W) * qty * hours / 1000.0 * 30.0
+			retrofit = LED_COST_PER_UNIT * qty
+			payback = round(retrofit / (kwh * rate), 1) if kwh * rate > 0 else None
+			measures.append(("lighting_swap", int(appliances["id"][b]), lighting_swap_title(qty, power, LED_W), kwh, retrofit, payback))
+		a = targets["AC"][i]
+		if a >= 0:
+			e_ac = float(appliances["power"][a]) * int(appliances["qty"][a]) * float(appliances["hours"][a]) / 1000.0 * 30.0
+			measures.append(("ac_setpoint", int(appliances["id"][a]), TITLES["ac_setpoint"], e_ac * AC_SAVING_PER_RUN, 0.0, 0.0))
+		measures.append(("standby_cut", None, TITLES["standby_cut"], STANDBY_KWH_PER_DEVICE * max(int(devices[i]), 1), 0.0, 0.0))
+		scenario_id = ids.scenario + int(offsets[i])
+		totals = [0.0, 0.0, 0.0]
+		for position, (code, appliance_id, title, kwh, retrofit, payback) in enumerate(measures):
+			deltas = (round(kwh, 2), round(kwh * rate, 2), round(kwh * factor, 2))
+			totals = [t + d for t, d in zip(totals, deltas)]
+			rows[ScenarioMeasure.__tablename__].append((scenario_id, uid, position, code, appliance_id, title, *deltas, payback, retrofit))
+		rows[Scenario.__tablename__].append((scenario_id, uid, "Quick wins", *(round(t, 2) for t in totals)))
+	return Block(index, rows, city_totals, cohort_counts)
+
+
+def _copy(cursor, table: str, columns: Sequence[str], rows: List[tuple]) -> None:
+	buf = io.StringIO()
+	csv.writer(buf).writerows(rows)  # None is written as an empty field, which CSV COPY reads as NULL
+	sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+	if hasattr(cursor, "copy_expert"):  # psycopg2
+		buf.seek(0)
+		cursor.copy_expert(sql, buf)
+	else:  # psycopg 3
+		with cursor.copy(sql) as copy:
+			copy.write(buf.getvalue())
+
+
+def write_block(conn: Connection, block: Block) -> None:
+	"""
+	Insert a block's rows on an open connection (the caller's transaction): COPY on Postgres,
+	one DB-API executemany per table on SQLite, SQLAlchemy executemany elsewhere.
+	"""
+	dialect = conn.dialect.name
+	cursor = conn.connection.dbapi_connection.cursor() if dialect in ("postgresql", "sqlite") else None
+	try:
+		for table, columns in TABLES:
+			rows = block.rows.get(table)
+			if not rows:
+				continue
+			if dialect == "postgresql":
+				_copy(cursor, table, columns, rows)
+			elif dialect == "sqlite":
+				cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+			else:
+				model = db.metadata.tables[table]
+				conn.execute(insert(model), [dict(zip(columns, row)) for row in rows])
+	finally:
+		if cursor is not None:
+			cursor.close()
+
+
+def _run_block(spec: SyntheticSpec, index: int, ids: IdOffsets, url: str | None) -> Block:
+	# Process-pool entry point: with a database URL the worker writes its own block and returns only counts
+	block = generate_block(spec, index, ids)
+	if url is None:
+		return block
+	engine = create_engine(url, poolclass=NullPool)
+	try:
+		with engine.begin() as conn:
+			write_block(conn, block)
+	finally:
+		engine.dispose()
+	return Block(index, {table: [None] * len(rows) for table, rows in block.rows.items()}, block.city_totals, block.cohort_counts)
+
+
+def _blocks(spec: SyntheticSpec, ids: IdOffsets, workers: int, url: str | None) -> Iterator[Block]:
+	n_blocks = -(-spec.users // spec.block_size)
+	if workers <= 1:
+		for index in range(n_blocks):
+			yield _run_block(spec, index, ids, url)
+		return
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		# map() yields in block order while later blocks are still being generated
+		yield from pool.map(_run_block, [spec] * n_blocks, range(n_blocks), [ids] * n_blocks, [url] * n_blocks)
+
+
+def generate(spec: SyntheticSpec, workers: int = 1, on_block=None) -> GenerationReport:
+	"""
+	Add spec.users synthetic households after the highest existing user id, with their rollups.
+	With workers > 1 blocks are generated on a process pool; on Postgres the workers also COPY them in.
+	"""
+	if spec.users <= 0 or spec.block_size <= 0:
+		raise ValueError("users and block_size must be positive")
+	t0 = time.perf_counter()
+	engine = db.engine
+	ids = IdOffsets(*((db.session.execute(select(func.max(model.id))).scalar() or 0) + 1 for model in (User, Appliance, Scenario)))
+	db.session.commit()
+	report = GenerationReport(first_user_id=ids.user)
+	# Postgres workers write in parallel over their own connections; SQLite has a single writer
+	url = engine.url.render_as_string(hide_password=False) if engine.dialect.name == "postgresql" and workers > 1 else None
+	city_totals: Dict[tuple, List[float]] = {}
+	cohort_counts: Dict[tuple, int] = {}
+	for block in _blocks(spec, ids, workers, url):
+		if url is None:
+			with engine.begin() as conn:
+				write_block(conn, block)
+		for key, (kwh, days) in block.city_totals.items():
+			acc = city_totals.setdefault(key, [0.0, 0])
+			acc[0] += kwh
+			acc[1] += days
+		for key, count in block.cohort_counts.items():
+			cohort_counts[key] = cohort_counts.get(key, 0) + count
+		report.add(block.counts())
+		if on_block is not None:
+			on_block(block.index, report)
+	if engine.dialect.name == "postgresql":
+		# Ids were given explicitly; move the sequences past them
+		for table in (User.__tablename__, Appliance.__tablename__, Scenario.__tablename__):
+			db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"))
+	add_city_totals(city_totals)
+	add_counts(cohort_counts)
+	db.session.commit()
+	report.seconds = time.perf_counter() - t0
+	return report
@@ -0,0 +1,320 @@
+from __future__ import annotations
+import math
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Mapping, Sequence
+
+from flask import current_app, g
+from sqlalchemy import inspect, select
+
+from . import db
+from .assumptions import PREFETCH_VERSION_KEYS, bump_version, read_version
+from .identity import current_user_id
+from .models import TariffBand, TariffPlan, TariffSlab, UserTariff
+
+# Slab and time-of-day tariffs. Plans live in tariff_plans/tariff_slabs/tariff_bands and are compiled
+# once per version into CompiledTariff: ascending slab bounds with the cumulative charge at each bound,
+# so a bill is one bisect (or one np.searchsorted over a whole fleet) instead of a walk over the slabs.
+# Users without a user_tariffs row keep the flat User.tariff rate.
+
+TARIFFS_VERSION_KEY = "tariffs"
+PREFETCH_VERSION_KEYS.add(TARIFFS_VERSION_KEY)
+HOURS = 24
+
+
+class CompiledTariff:
+	"""
+	Monthly bill for a plan: fixed charge + slab energy charge + time-of-day adjustments.
+	"""
+
+	def __init__(
+		self,
+		plan_id: int | None,
+		name: str,
+		bounds: Sequence[float],
+		rates: Sequence[float],
+		fixed_charge: float = 0.0,
+		telescopic: bool = True,
+		hour_adjust: Sequence[float] | None = None,
+	) -> None:
+		self.plan_id = plan_id
+		self.name = name
+		self.bounds = [float(b) for b in bounds]  # ascending upper bounds; the last one is inf
+		self.rates = [float(r) for r in rates]
+		self.lower = [0.0] + self.bounds[:-1]
+		self.cumulative = [0.0]  # charge for all slabs below slab i
+		for lo, hi, rate in zip(self.lower[:-1], self.bounds[:-1], self.rates[:-1]):
+			self.cumulative.append(self.cumulative[-1] + (hi - lo) * rate)
+		self.fixed_charge = float(fixed_charge)
+		self.telescopic = telescopic
+		self.hour_adjust = list(hour_adjust or [0.0] * HOURS)  # ₹/kWh per hour of day
+		# Flat usage profile unless the caller supplies hourly shares
+		self.tod_adjust = sum(self.hour_adjust) / HOURS
+
+	@classmethod
+	def flat(cls, rate: float) -> "CompiledTariff":
+		return cls(None, "flat", [math.inf], [rate])
+
+	def energy_charge(self, kwh: float) -> float:
+		kwh = max(kwh, 0.0)
+		i = bisect_left(self.bounds, kwh)
+		if not self.telescopic:
+			return kwh * self.rates[i]
+		return self.cumulative[i] + (kwh - self.lower[i]) * self.rates[i]
+
+	def tod_charge(self, kwh: float, hourly_share: Sequence[float] | None = None) -> float:
+		if hourly_share is None:
+			return max(kwh, 0.0) * self.tod_adjust
+		return max(kwh, 0.0) * sum(s * a for s, a in zip(hourly_share, self.hour_adjust))
+
+	def bill(self, kwh: float, hourly_share: Sequence[float] | None = None) -> float:
+		return self.fixed_charge + self.energy_charge(kwh) + self.tod_charge(kwh, hourly_share)
+
+	def saving(self, base_kwh: float, delta_kwh: float) -> float:
+		"""
+		Bill reduction when monthly usage drops from base_kwh by delta_kwh (marginal, slab-aware).
+		"""
+		return self.bill(base_kwh) - self.bill(max(base_kwh - delta_kwh, 0.0))
+
+	def bill_array(self, kwh: Any) -> Any:
+		import numpy as np
+
+		kwh = np.maximum(np.asarray(kwh, dtype=np.float64), 0.0)
+		bounds = np.asarray(self.bounds)
+		rates = np.asarray(self.rates)
+		i = np.searchsorted(bounds, kwh, side="left")
+		if self.telescopic:
+			energy = np.asarray(self.cumulative)[i] + (kwh - np.asarray(self.lower)[i]) * rates[i]
+		else:
+			energy = kwh * rates[i]
+		return self.fixed_charge + energy + kwh * self.tod_adjust
+
+	def describe(self) -> Dict[str, Any]:
+		return {
+			"id": self.plan_id,
+			"name": self.name,
+			"fixed_charge": self.fixed_charge,
+			"telescopic": self.telescopic,
+			"slabs": [{"upto_kwh": None if math.isinf(b) else b, "rate": r} for b, r in zip(self.bounds, self.rates)],
+			"hour_adjust": self.hour_adjust,
+		}
+
+
+def _band_hours(start: int, end: int) -> List[int]:
+	# end is exclusive and may wrap past midnight (22 -> 6)
+	return [h % HOURS for h in range(start, end if end > start else end + HOURS)]
+
+
+def compile_plan(plan: TariffPlan) -> CompiledTariff:
+	slabs = sorted(plan.slabs, key=lambda s: math.inf if s.upto_kwh is None else s.upto_kwh)
+	hour_adjust = [0.0] * HOURS
+	for band in plan.bands:
+		for h in _band_hours(band.start_hour, band.end_hour):
+			hour_adjust[h] += band.adjust
+	return CompiledTariff(
+		plan.id,
+		plan.name,
+		[math.inf if s.upto_kwh is None else s.upto_kwh for s in slabs],
+		[s.rate for s in slabs],
+		plan.fixed_charge,
+		plan.telescopic,
+		hour_adjust,
+	)
+
+
+class TariffRegistry:
+	"""
+	Process-wide compiled plans, reloaded only when the shared tariffs version changes
+	(same polling scheme as AssumptionsStore).
+	"""
+
+	def __init__(self) -> None:
+		self.version = -1
+		self.plans: Dict[int, CompiledTariff] = {}
+		self._lock = threading.Lock()
+
+	def current(self) -> tuple[int, Dict[int, CompiledTariff]]:
+		cached = g.get("_tariffs_snapshot")
+		if cached is not None:
+			return cached
+		version = read_version(TARIFFS_VERSION_KEY)
+		with self._lock:
+			if version != self.version:
+				self.version, self.plans = version, {p.id: compile_plan(p) for p in TariffPlan.query.all()}
+			snapshot = (self.version, self.plans)
+		g._tariffs_snapshot = snapshot
+		return snapshot
+
+
+def _registry() -> TariffRegistry:
+	return current_app.extensions["tariff_registry"]
+
+
+def init_tariffs(app) -> TariffRegistry:
+	registry = TariffRegistry()
+	app.extensions["tariff_registry"] = registry
+	return registry
+
+
+def get_plans() -> Dict[int, CompiledTariff]:
+	return _registry().current()[1]
+
+
+def tariffs_version() -> int:
+	return _registry().current()[0]
+
+
+def plan_for_user(user_id: int) -> CompiledTariff | None:
+	"""
+	The user's compiled plan, or None for the flat User.tariff rate (memoized per request).
+	"""
+	memo = g.setdefault("_user_plans", {})
+	if user_id not in memo:
+		user = g.get("_current_user")
+		if current_user_id() == user_id and "tariff_assignment" in inspect(user).dict:
+			# current_user() eager-loads the assignment with the user row
+			row = user.tariff_assignment
+			plan_id = None if row is None else row.plan_id
+		else:
+			plan_id = db.session.execute(select(UserTariff.plan_id).where(UserTariff.user_id == user_id)).scalar()
+		memo[user_id] = None if plan_id is None else get_plans().get(plan_id)
+	return memo[user_id]
+
+
+def plan_cache_key(plan: CompiledTariff | None) -> tuple | None:
+	return None if plan is None else (plan.plan_id, tariffs_version())
+
+
+def assign_plan(user_id: int, plan_id: int | None) -> None:
+	"""
+	Put a user on a plan (None = back to the flat rate); the caller commits.
+	"""
+	row = db.session.get(UserTariff, user_id)
+	if plan_id is None:
+		if row is not None:
+			db.session.delete(row)
+	elif row is None:
+		db.session.add(UserTariff(user_id=user_id, plan_id=plan_id))
+	else:
+		row.plan_id = plan_id
+	g.pop("_user_plans", None)
+	if current_user_id() == user_id:
+		db.session.expire(g._current_user, ["tariff_assignment"])
+
+
+def validate_plan(definition: Mapping[str, Any]) -> Dict[str, Any]:
+	"""
+	Normalize a plan definition; raises ValueError on bad input.
+	{"name", "fixed_charge", "telescopic", "slabs": [{"upto_kwh", "rate"}], "bands": [{"start_hour", "end_hour", "adjust"}]}
+	"""
+	if not isinstance(definition, Mapping):
+		raise ValueError("expected a plan object")
+	name = str(definition.get("name") or "").strip()
+	if not name or len(name) > 120:
+		raise ValueError("name is required (max 120 chars)")
+	try:
+		slabs = [(None if s.get("upto_kwh") is None else float(s["upto_kwh"]), float(s["rate"])) for s in definition.get("slabs") or []]
+		bands = [(int(b["start_hour"]), int(b["end_hour"]), float(b["adjust"])) for b in definition.get("bands") or []]
+		fixed = float(definition.get("fixed_charge") or 0.0)
+	except (AttributeError, KeyError, TypeError, ValueError):
+		raise ValueError("slabs need upto_kwh and rate; bands need start_hour, end_hour and adjust") from None
+	telescopic = definition.get("telescopic", True)
+	if not isinstance(telescopic, bool):  # a JSON bool: "false" must not read as true
+		raise ValueError("telescopic must be true or false")
+	if not slabs:
+		raise ValueError("at least one slab is required")
+	bounded = [u for u, _ in slabs if u is not None]
+	# JSON NaN/Infinity (and "inf" strings) parse as floats; the open last slab is spelled upto_kwh: null
+	if not all(math.isfinite(v) for v in [fixed, *bounded, *(r for _, r in slabs), *(a for _, _, a in bands)]):
+		raise ValueError("slab bounds, rates, band adjustments and fixed_charge must be finite")
+	if len(bounded) != len(slabs) - 1 or slabs[-1][0] is not None:
+		raise ValueError("only the last slab may (and must) have no upto_kwh")
+	if any(b <= a for a, b in zip([0.0] + bounded, bounded)):
+		raise ValueError("slab upper bounds must be positive and ascending")
+	if any(rate < 0 for _, rate in slabs):
+		raise ValueError("slab rates must be non-negative")
+	for start, end, _ in bands:
+		if not (0 <= start < HOURS and 0 < end <= HOURS and start != end):
+			raise ValueError("band hours must satisfy 0 <= start_hour < 24, 0 < end_hour <= 24")
+	if fixed < 0:
+		raise ValueError("fixed_charge must be non-negative")
+	return {"name": name, "fixed_charge": fixed, "telescopic": telescopic, "slabs": slabs, "bands": bands}
+
+
+def save_plan(definition: Mapping[str, Any]) -> TariffPlan:
+	"""
+	Create or replace (by name) a tariff plan, bump the shared version and commit.
+	"""
+	values = validate_plan(definition)
+	plan = TariffPlan.query.filter_by(name=values["name"]).first()
+	if plan is None:
+		plan = TariffPlan(name=values["name"])
+		db.session.add(plan)
+	plan.fixed_charge = values["fixed_charge"]
+	plan.telescopic = values["telescopic"]
+	plan.slabs = [TariffSlab(upto_kwh=u, rate=r) for u, r in values["slabs"]]
+	plan.bands = [TariffBand(start_hour=s, end_hour=e, adjust=a) for s, e, a in values["bands"]]
+	bump_version(TARIFFS_VERSION_KEY)
+	db.session.commit()
+	g.pop("_tariffs_snapshot", None)
+	g.pop("_user_plans", None)
+	return plan
+
+
+def tariff_curve(kwh: float, plan: CompiledTariff | None, rates: Sequence[float]) -> List[List[float]]:
+	"""
+	[average ₹/kWh, ₹/month] points for the profile's "what if your tariff changes" sparkline.
+	A plan's energy and time-of-day charges are scaled so its average rate matches each point.
+	"""
+	if plan is None or kwh <= 0:
+		return [[r, round(kwh * r, 2)] for r in rates]
+	variable = plan.bill(kwh) - plan.fixed_charge
+	current = variable / kwh
+	return [[r, round(plan.fixed_charge + variable * (r / current if current else 0.0), 2)] for r in rates]
+
+
+def monthly_costs(kwh: Any, flat_rate: Any, plan_ids: Any, plans: Mapping[int, CompiledTariff]) -> Any:
+	"""
+	Vectorized monthly bills: each plan's users are billed in one bisect pass, the rest at their flat rate.
+	plan_ids holds NaN for users without a plan.
+	"""
+	import numpy as np
+
+	kwh = np.asarray(kwh, dtype=np.float64)
+	cost = kwh * np.asarray(flat_rate, dtype=np.float64)
+	plan_ids = np.asarray(plan_ids, dtype=np.float64)
+	for pid in np.unique(plan_ids[~np.isnan(plan_ids)]):
+		plan = plans.get(int(pid))
+		if plan is not None:
+			rows = plan_ids == pid
+			cost[rows] = plan.bill_array(kwh[rows])
+	return cost
+
+
+def rebill(month: Any, user_ids: Sequence[int]) -> Any:
+	"""
+	One month's bills for a chunk of users as a frame (user_id, plan_id, kwh, source, bill).
+	Metered month rollups are billed where present, the appliance estimate elsewhere.
+	"""
+	import numpy as np
+	import pandas as pd
+	from .batch import compute_kpis_batch, load_appliances_frame, load_users_frame, monthly_cost_array
+	from .models import UsageRollup
+
+	users = load_users_frame(user_ids)
+	estimate = compute_kpis_batch(load_appliances_frame(user_ids), users, rounded=False)["monthly_kwh"].to_numpy()
+	metered = dict(db.session.execute(
+		select(UsageRollup.user_id, UsageRollup.kwh).where(
+			UsageRollup.period == "month", UsageRollup.period_start == month, UsageRollup.user_id.in_(list(user_ids))
+		)
+	).all())
+	metered_kwh = users.index.map(metered).to_numpy(dtype=np.float64, na_value=np.nan)
+	has_meter = ~np.isnan(metered_kwh)
+	kwh = np.where(has_meter, metered_kwh, estimate)
+	return pd.DataFrame({
+		"user_id": users.index.to_numpy(),
+		"plan_id": users["plan_id"].astype("Int64").array,
+		"kwh": np.round(kwh, 3),
+		"source": np.where(has_meter, "metered", "estimate"),
+		"bill": np.round(monthly_cost_array(kwh, users, get_plans()), 2),
+	})
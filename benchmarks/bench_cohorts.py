@@ -0,0 +1,77 @@
+"""
+Peer cohort percentiles on a synthetic fleet: sketch lookup vs. counting the cohort's members, with the
+sketch's error against exact ranks.
+
+	python -m benchmarks.bench_cohorts --users 1000000
+"""
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from app import create_app, db
+from app.cohorts import cohort_key, cohort_percentile, refresh_cohorts
+from app.models import Appliance, CohortMember, User
+from app.synthetic import SyntheticSpec, generate
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--users", type=int, default=100000)
+	parser.add_argument("--lookups", type=int, default=500)
+	parser.add_argument("--workers", type=int, default=4)
+	args = parser.parse_args()
+
+	url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'cohorts.sqlite'}"
+	app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+	with app.app_context():
+		t0 = time.perf_counter()
+		generate(SyntheticSpec(users=args.users, seed=1, days=0, end=date(2025, 1, 31)), workers=args.workers)
+		print(f"users={args.users} generated in {time.perf_counter() - t0:.1f}s")
+
+		rng = random.Random(3)
+		sample = [rng.randint(1, args.users) for _ in range(args.lookups)]
+		members = {m.user_id: m for m in db.session.execute(select(CohortMember).where(CohortMember.user_id.in_(sample))).scalars()}
+		users = {u.id: u for u in db.session.execute(select(User).where(User.id.in_(sample))).scalars()}
+		sample = [uid for uid in sample if uid in members]
+
+		t0 = time.perf_counter()
+		estimates = [cohort_percentile(users[uid], members[uid].monthly_kwh) for uid in sample]
+		sketch_s = time.perf_counter() - t0
+
+		t0 = time.perf_counter()
+		exact = []
+		for uid in sample:
+			m = members[uid]
+			below, total = db.session.execute(
+				select(func.count().filter(CohortMember.monthly_kwh < m.monthly_kwh), func.count()).where(
+					CohortMember.city == m.city, CohortMember.household_size == m.household_size
+				)
+			).one()
+			exact.append(100.0 * below / total)
+		scan_s = time.perf_counter() - t0
+		errors = [abs(est["percentile"] - ref) for est, ref in zip(estimates, exact) if est is not None]
+		print(f"lookups={len(sample)} cohorts={len({cohort_key(users[u].city, users[u].household_size) for u in sample})}")
+		print(f"sketch lookup  : {sketch_s / len(sample) * 1000:8.3f} ms/household")
+		print(f"member scan    : {scan_s / len(sample) * 1000:8.3f} ms/household  ({scan_s / max(sketch_s, 1e-9):.0f}x)")
+		print(f"max |error| vs exact rank (rounded percentile): {max(errors):.2f} points")
+
+		# Incremental updates: a household adds an appliance and is re-placed
+		times = []
+		for uid in sample[:20]:
+			db.session.add(Appliance(user_id=uid, type="geyser", power_w=2000, quantity=1, hours_per_day=1, days_per_week=7))
+			db.session.flush()
+			t0 = time.perf_counter()
+			refresh_cohorts([uid])
+			db.session.commit()
+			times.append(time.perf_counter() - t0)
+		print(f"refresh + commit: {statistics.median(times) * 1000:6.3f} ms/household (median of {len(times)})")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,45 @@
+"""
+Forecast model fitting on a synthetic fleet with daily logs: a full refit per batch size, in
+households/sec, plus the dashboard's single-row forecast read.
+
+	python -m benchmarks.bench_forecast --users 20000 --batch-size 500 2000
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from app import create_app
+from app.forecast import FIT_DAYS, fit_all, month_forecast
+from app.synthetic import SyntheticSpec, generate
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--users", type=int, default=5000)
+	parser.add_argument("--batch-size", type=int, nargs="+", default=[500, 2000])
+	parser.add_argument("--reads", type=int, default=2000)
+	args = parser.parse_args()
+
+	end = date(2025, 3, 14)
+	url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'forecast.sqlite'}"
+	app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+	with app.app_context():
+		t0 = time.perf_counter()
+		generate(SyntheticSpec(users=args.users, seed=1, days=FIT_DAYS, end=end))
+		print(f"users={args.users} days={FIT_DAYS} generated in {time.perf_counter() - t0:.1f}s")
+		print(f"{'batch':>6} {'seconds':>8} {'homes/s':>9} {'fitted':>7}")
+		for batch_size in args.batch_size:
+			report = fit_all(end, batch_size)
+			print(f"{batch_size:>6} {report['seconds']:>8.2f} {report['households'] / report['seconds']:>9,.0f} {report['fitted']:>7}")
+
+		t0 = time.perf_counter()
+		for uid in range(1, args.reads + 1):
+			month_forecast(uid, end + timedelta(days=1), 8.0)
+		print(f"month_forecast: {(time.perf_counter() - t0) / args.reads * 1e6:.0f} us/read")
+
+
+if __name__ == "__main__":
+	main()
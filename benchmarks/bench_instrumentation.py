@@ -0,0 +1,81 @@
+"""
+Request overhead of INSTRUMENTATION=1: /dashboard latency with and without it, in alternating rounds.
+
+	python -m benchmarks.bench_instrumentation --users 1000 --requests 2000 --rounds 6
+"""
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+from flask import Response
+
+from app import create_app, db
+from app.instrumentation import _after_cursor, _before_cursor, _finish_request, _start_request
+from benchmarks.load_dashboard import seed
+
+
+def drive(app, n_users: int, n_requests: int, seed_: int) -> float:
+	rng = random.Random(seed_)
+	client = app.test_client()
+	t0 = time.perf_counter()
+	for _ in range(n_requests):
+		resp = client.get("/dashboard", headers={"X-User-Id": str(rng.randint(1, n_users))})
+		assert resp.status_code == 200, resp.status_code
+	return (time.perf_counter() - t0) / n_requests
+
+
+def hook_cost(app, queries: int, n: int = 20000) -> float:
+	# Direct cost of the per-request and per-query hooks (the end-to-end delta is within run-to-run noise)
+	def one() -> None:
+		_start_request()
+		for _ in range(queries):
+			_before_cursor(None, None, None, None, None, False)
+			_after_cursor(None, None, None, None, None, False)
+		_finish_request(response)
+
+	with app.test_request_context("/dashboard"):
+		response = Response("")
+		return timeit.timeit(one, number=n) / n
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--users", type=int, default=1000)
+	parser.add_argument("--requests", type=int, default=2000, help="requests per round and mode")
+	parser.add_argument("--rounds", type=int, default=5)
+	args = parser.parse_args()
+
+	url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'instr.sqlite'}"
+	apps = {}
+	for enabled in (False, True):
+		apps[enabled] = create_app({"SQLALCHEMY_DATABASE_URI": url, "USER_ID_HEADER": "X-User-Id", "INSTRUMENTATION": enabled})
+	with apps[False].app_context():
+		db.drop_all()
+		db.create_all()
+		seed(args.users)
+	for app in apps.values():
+		drive(app, args.users, args.users, 0)  # warm both caches
+
+	means = {False: [], True: []}
+	for r in range(args.rounds):
+		for enabled in ((False, True) if r % 2 == 0 else (True, False)):
+			means[enabled].append(drive(apps[enabled], args.users, args.requests, r))
+
+	off, on = statistics.median(means[False]), statistics.median(means[True])
+	print(f"users={args.users} requests/round={args.requests} rounds={args.rounds}")
+	print(f"off: {off * 1000:.3f} ms/request")
+	print(f"on : {on * 1000:.3f} ms/request  overhead {(on / off - 1) * 100:+.2f}%")
+	stats = apps[True].extensions["instrumentation"].routes[("main.dashboard", "GET", 200)]
+	queries = round(stats.sql_queries / stats.count)
+	print(f"phases: sql {stats.sql_seconds / stats.seconds:.0%}, render {stats.render_seconds / stats.seconds:.0%}, rest {1 - (stats.sql_seconds + stats.render_seconds) / stats.seconds:.0%}")
+	cost = hook_cost(apps[True], queries)
+	print(f"hooks: {cost * 1e6:.1f} us/request with {queries} queries = {cost / off * 100:.2f}% of a request")
+
+
+if __name__ == "__main__":
+	main()
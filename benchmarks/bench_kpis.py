@@ -0,0 +1,61 @@
+"""
+Per-object compute_kpis() loop vs. vectorized compute_kpis_batch().
+
+	python -m benchmarks.bench_kpis --users 10000 --appliances-per-user 10
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+
+from app.models import Appliance, User
+from app.calculations import compute_kpis
+from app.batch import appliances_frame, users_frame, compute_kpis_batch
+
+
+def build(n_users: int, per_user: int, seed: int = 42):
+	rng = random.Random(seed)
+	users, by_user = [], {}
+	for uid in range(1, n_users + 1):
+		users.append(User(id=uid, name=f"u{uid}", tariff=rng.uniform(4, 12), ef=0.7))
+		by_user[uid] = [
+			Appliance(user_id=uid, type="bulb", power_w=rng.uniform(5, 2000), quantity=rng.randint(1, 6),
+				hours_per_day=rng.uniform(0.1, 24), days_per_week=rng.randint(1, 7))
+			for _ in range(per_user)
+		]
+	return users, by_user
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--users", type=int, default=10000)
+	parser.add_argument("--appliances-per-user", type=int, default=10)
+	args = parser.parse_args()
+
+	users, by_user = build(args.users, args.appliances_per_user)
+	all_appliances = [a for u in users for a in by_user[u.id]]
+
+	t0 = time.perf_counter()
+	for u in users:
+		compute_kpis(by_user[u.id], u.tariff, u.ef)
+	loop_s = time.perf_counter() - t0
+
+	# Frame construction is timed separately: nightly jobs read columns directly (load_appliances_frame)
+	t0 = time.perf_counter()
+	app_df = appliances_frame(all_appliances)
+	usr_df = users_frame(users)
+	frame_s = time.perf_counter() - t0
+
+	t0 = time.perf_counter()
+	compute_kpis_batch(app_df, usr_df)
+	batch_s = time.perf_counter() - t0
+
+	n = len(all_appliances)
+	print(f"users={args.users} appliances={n}")
+	print(f"per-object loop : {loop_s * 1000:9.1f} ms")
+	print(f"frame build     : {frame_s * 1000:9.1f} ms")
+	print(f"vectorized batch: {batch_s * 1000:9.1f} ms  ({loop_s / max(batch_s, 1e-9):.0f}x)")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,62 @@
+"""
+Hourly load profiles for a fleet: 8760 h x households written to a memory-mapped .npy.
+
+	python -m benchmarks.bench_loadprofile --households 50000
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from app.loadprofile import open_profiles, simulate_fleet
+from app.loadshapes import CLASS_TYPES, CLASSES
+
+TYPICAL_W = {"lighting": 12, "fan": 70, "ac": 1400, "fridge": 130, "tv": 90, "router": 10, "computer": 60, "washer": 500, "geyser": 2000, "kitchen": 1100, "other": 150}
+
+
+def build(households: int, per_household: int, seed: int = 0) -> pd.DataFrame:
+	rng = np.random.default_rng(seed)
+	n = households * per_household
+	classes = rng.integers(0, len(CLASSES), n)
+	types = np.array([sorted(CLASS_TYPES[c])[0] if CLASS_TYPES[c] else "other" for c in CLASSES], dtype=object)
+	watts = np.array([TYPICAL_W[c] for c in CLASSES], dtype=float)
+	return pd.DataFrame({
+		"user_id": np.repeat(np.arange(1, households + 1), per_household),
+		"type": types[classes],
+		"power_w": watts[classes] * rng.uniform(0.7, 1.3, n),
+		"quantity": rng.integers(1, 4, n),
+		"hours_per_day": np.where(classes == CLASSES.index("fridge"), 24.0, rng.uniform(0.5, 10, n)),
+		"days_per_week": rng.integers(3, 8, n),
+	})
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--households", type=int, default=50000)
+	parser.add_argument("--appliances-per-household", type=int, default=12)
+	parser.add_argument("--chunk-size", type=int, default=2000)
+	parser.add_argument("--year", type=int, default=2025)
+	args = parser.parse_args()
+
+	frame = build(args.households, args.appliances_per_household)
+	starts = np.searchsorted(frame["user_id"].to_numpy(), np.arange(1, args.households + 2))
+
+	def load(chunk):
+		return frame.iloc[starts[chunk[0] - 1] : starts[chunk[-1]]]
+
+	with tempfile.TemporaryDirectory() as out:
+		summary, stats = simulate_fleet(out, list(range(1, args.households + 1)), args.year, args.chunk_size, load=load)
+		_, profiles = open_profiles(out)
+		size_mb = profiles.nbytes / 1e6
+		del profiles
+
+	print(f"households={args.households} appliances={len(frame)} chunk={args.chunk_size}")
+	print(f"simulated in {summary.seconds:.2f}s ({args.households / summary.seconds:,.0f} households/s), profiles {size_mb:,.0f} MB float32")
+	print(f"coincident peak {summary.coincident_peak_kw:,.0f} kW at {summary.coincident_peak_at:%Y-%m-%d %H:00}, diversity factor {summary.diversity_factor:.2f}")
+	print(f"median household peak {stats['peak_kw'].median():.2f} kW, load factor {stats['load_factor'].median():.2f}")
+
+
+if __name__ == "__main__":
+	main()
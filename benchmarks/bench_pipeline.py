@@ -0,0 +1,42 @@
+"""
+Nightly pipeline throughput on a synthetic fleet: a fresh run per worker count, in users/sec and
+users/sec per core.
+
+	python -m benchmarks.bench_pipeline --users 100000 --workers 1 2 4
+"""
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from app import create_app
+from app.pipeline import run_pipeline
+from app.synthetic import SyntheticSpec, generate
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--users", type=int, default=20000)
+	parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+	parser.add_argument("--chunk-size", type=int, default=2000)
+	args = parser.parse_args()
+
+	url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'pipeline.sqlite'}"
+	app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+	with app.app_context():
+		t0 = time.perf_counter()
+		generate(SyntheticSpec(users=args.users, seed=1, days=0, end=date(2025, 1, 31)), workers=max(args.workers))
+		print(f"users={args.users} generated in {time.perf_counter() - t0:.1f}s")
+		print(f"{'workers':>7} {'seconds':>8} {'users/s':>9} {'users/s/core':>12} {'results':>8}")
+		for workers in args.workers:
+			report = run_pipeline(workers=workers, chunk_size=args.chunk_size, fresh=True).to_dict()
+			print(
+				f"{workers:>7} {report['seconds']:>8.2f} {report['users_per_sec']:>9,.0f} "
+				f"{report['users_per_sec_per_core']:>12,.0f} {report['results']:>8}"
+			)
+
+
+if __name__ == "__main__":
+	main()
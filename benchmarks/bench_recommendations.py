@@ -0,0 +1,49 @@
+"""
+Per-user generate_recommendations() loop vs. columnar recommendation_frame() + top-K.
+
+	python -m benchmarks.bench_recommendations --users 10000 --top 100
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+
+from app.recommendations import generate_recommendations
+from app.batch import appliances_frame, users_frame, recommendation_frame, top_recommendations
+from .bench_kpis import build
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--users", type=int, default=10000)
+	parser.add_argument("--appliances-per-user", type=int, default=10)
+	parser.add_argument("--top", type=int, default=100)
+	args = parser.parse_args()
+
+	users, by_user = build(args.users, args.appliances_per_user)
+	rng = random.Random(1)
+	for apps in by_user.values():
+		for a in apps:
+			a.type = rng.choice(["bulb", "tube", "fan", "AC", "fridge", "tv"])
+	app_df = appliances_frame(a for u in users for a in by_user[u.id])
+	usr_df = users_frame(users)
+
+	t0 = time.perf_counter()
+	ranked = []
+	for u in users:
+		ranked.extend(generate_recommendations(by_user[u.id], u.tariff, u.ef))
+	ranked.sort(key=lambda r: -r.delta_cost_month)
+	loop_s = time.perf_counter() - t0
+
+	t0 = time.perf_counter()
+	frame = recommendation_frame(app_df, usr_df)
+	top_recommendations(frame, k=args.top)
+	batch_s = time.perf_counter() - t0
+
+	print(f"users={args.users} candidate measures={len(frame)}")
+	print(f"per-user loop + sort : {loop_s * 1000:9.1f} ms")
+	print(f"columnar + top-{args.top:<5}: {batch_s * 1000:9.1f} ms  ({loop_s / max(batch_s, 1e-9):.0f}x)")
+
+
+if __name__ == "__main__":
+	main()
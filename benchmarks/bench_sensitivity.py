@@ -0,0 +1,48 @@
+"""
+Monte Carlo sensitivity: wall time by sample count and worker processes.
+
+	python -m benchmarks.bench_sensitivity --samples 10000 100000 1000000 --workers 1 2 4
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import time
+
+from app.models import Appliance
+from app.sensitivity import run_sensitivity
+
+
+def household(n: int, seed: int = 7) -> list:
+	rng = random.Random(seed)
+	return [
+		Appliance(id=i + 1, user_id=1, type=rng.choice(["bulb", "tube", "AC", "fridge", "tv"]), power_w=rng.uniform(20, 1500),
+			quantity=rng.randint(1, 8), hours_per_day=rng.uniform(1, 12), days_per_week=7, star_label=rng.choice(["2-star", "3-star"]))
+		for i in range(n)
+	]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--appliances", type=int, default=40)
+	parser.add_argument("--samples", type=int, nargs="+", default=[10000, 100000, 1000000])
+	parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+	args = parser.parse_args()
+
+	apps = household(args.appliances)
+	print(f"appliances={args.appliances} cpus={os.cpu_count()}")
+	print(f"{'samples':>10} " + " ".join(f"{f'{w} worker(s)':>14}" for w in args.workers))
+	for n in args.samples:
+		cells = []
+		base = None
+		for w in args.workers:
+			t0 = time.perf_counter()
+			run_sensitivity(apps, 8.0, 0.7, samples=n, workers=w)
+			s = time.perf_counter() - t0
+			base = base or s
+			cells.append(f"{s * 1000:8.0f} ms {base / s:3.1f}x")
+		print(f"{n:>10} " + " ".join(f"{c:>14}" for c in cells))
+
+
+if __name__ == "__main__":
+	main()
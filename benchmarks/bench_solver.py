@@ -0,0 +1,47 @@
+"""
+Budgeted scenario solver: one household with hundreds of candidate measures, and a fleet batch.
+
+	python -m benchmarks.bench_solver --measures 500 --budget 50000 --users 10000
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+
+from app.recommendations import generate_recommendations
+from app.batch import appliances_frame, users_frame, recommendation_frame
+from app.solver import optimize, optimize_frame
+from .bench_kpis import build
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--measures", type=int, default=500, help="Appliances in the single-household case.")
+	parser.add_argument("--budget", type=float, default=50000)
+	parser.add_argument("--users", type=int, default=10000)
+	args = parser.parse_args()
+
+	rng = random.Random(3)
+	users, by_user = build(1, args.measures)
+	for i, a in enumerate(by_user[1]):
+		a.id = i + 1
+		a.type = rng.choice(["bulb", "tube", "AC", "fridge"])
+	recs = generate_recommendations(by_user[1], users[0].tariff, users[0].ef)
+	t0 = time.perf_counter()
+	plan = optimize(recs, args.budget)
+	single_ms = (time.perf_counter() - t0) * 1000
+	print(f"1 household, {len(recs)} candidates: {single_ms:8.2f} ms  picked={len(plan.measures)} spent=₹{plan.retrofit_cost:,.0f} exact={plan.exact}")
+
+	users, by_user = build(args.users, 10)
+	for apps in by_user.values():
+		for a in apps:
+			a.type = rng.choice(["bulb", "tube", "fan", "AC", "fridge", "tv"])
+	frame = recommendation_frame(appliances_frame(a for u in users for a in by_user[u.id]), users_frame(users))
+	t0 = time.perf_counter()
+	optimize_frame(frame, args.budget)
+	fleet_s = time.perf_counter() - t0
+	print(f"{args.users} households, {len(frame)} candidates: {fleet_s * 1000:8.1f} ms  ({args.users / fleet_s:,.0f} households/s)")
+
+
+if __name__ == "__main__":
+	main()
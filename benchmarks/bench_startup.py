@@ -0,0 +1,74 @@
+"""
+Cold-start benchmark: import time of `wsgi` (includes create_app) and time to first response.
+
+Each sample runs in a fresh interpreter against an already-initialised SQLite database, which is what a
+serverless cold start sees. Pass --ref to measure another commit side by side (extracted with git archive).
+
+	python -m benchmarks.bench_startup --runs 10
+	python -m benchmarks.bench_startup --runs 10 --ref <commit-before>
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import wsgi
+t1 = time.perf_counter()
+resp = wsgi.app.test_client().get("/dashboard")
+t2 = time.perf_counter()
+assert resp.status_code == 200, resp.status_code
+heavy = [m for m in ("pandas", "numpy", "weasyprint", "alembic") if m in sys.modules]
+print(json.dumps({"import_s": t1 - t0, "first_response_s": t2 - t1, "heavy_modules": heavy}))
+"""
+
+
+def sample(tree: Path, db_url: str) -> dict:
+	env = dict(os.environ, DATABASE_URL=db_url, PYTHONDONTWRITEBYTECODE="1")
+	env.pop("FLASK_RUN_FROM_CLI", None)
+	out = subprocess.run([sys.executable, "-c", PROBE], cwd=tree, env=env, capture_output=True, text=True, check=True)
+	return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(tree: Path, runs: int) -> dict:
+	db_url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'startup.sqlite'}"
+	sample(tree, db_url)  # first boot creates the schema; not timed
+	samples = [sample(tree, db_url) for _ in range(runs)]
+	return {
+		"import_ms": round(statistics.median(s["import_s"] for s in samples) * 1000, 1),
+		"first_response_ms": round(statistics.median(s["first_response_s"] for s in samples) * 1000, 1),
+		"heavy_modules": samples[-1]["heavy_modules"],
+	}
+
+
+def extract(ref: str) -> Path:
+	dest = Path(tempfile.mkdtemp(prefix="startup-ref-"))
+	archive = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True).stdout
+	subprocess.run(["tar", "-x", "-C", str(dest)], input=archive, check=True)
+	return dest
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--runs", type=int, default=10)
+	parser.add_argument("--ref", default=None, help="git ref to compare against the working tree")
+	args = parser.parse_args()
+
+	results = {"working tree": measure(ROOT, args.runs)}
+	if args.ref:
+		results[args.ref] = measure(extract(args.ref), args.runs)
+	for name, r in results.items():
+		print(f"{name:>14}: import {r['import_ms']:7.1f} ms  first response {r['first_response_ms']:7.1f} ms  heavy modules loaded: {', '.join(r['heavy_modules']) or '-'}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,51 @@
+"""
+Fleet re-billing under slab/ToD plans: per-user bill() loop vs. vectorized monthly_costs().
+
+	python -m benchmarks.bench_tariffs --users 100000
+"""
+from __future__ import annotations
+import argparse
+import math
+import time
+
+import numpy as np
+
+from app.tariffs import CompiledTariff, monthly_costs
+
+
+def plans() -> dict:
+	tod = [-1.5] * 6 + [0.0] * 12 + [1.0] * 4 + [-1.5] * 2
+	return {
+		1: CompiledTariff(1, "telescopic 4-slab", [100, 300, 500, math.inf], [4.71, 10.29, 14.55, 16.74], 120.0, True, tod),
+		2: CompiledTariff(2, "non-telescopic", [200, math.inf], [6.0, 8.0], 50.0, False),
+		3: CompiledTariff(3, "8-slab", [50, 100, 150, 200, 300, 400, 800, math.inf], [3, 4, 5, 6, 7, 8, 9, 10], 75.0),
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--users", type=int, default=100000)
+	args = parser.parse_args()
+
+	rng = np.random.default_rng(0)
+	kwh = rng.gamma(2.0, 120.0, args.users)
+	flat = rng.uniform(5, 12, args.users)
+	plan_ids = rng.choice([1.0, 2.0, 3.0, np.nan], args.users)
+	compiled = plans()
+
+	t0 = time.perf_counter()
+	loop = [flat[i] * kwh[i] if np.isnan(p) else compiled[int(p)].bill(kwh[i]) for i, p in enumerate(plan_ids)]
+	loop_s = time.perf_counter() - t0
+
+	t0 = time.perf_counter()
+	vec = monthly_costs(kwh, flat, plan_ids, compiled)
+	vec_s = time.perf_counter() - t0
+	assert np.allclose(loop, vec)
+
+	print(f"users={args.users} plans={len(compiled)} (+ flat)")
+	print(f"per-user bill() loop : {loop_s * 1000:9.1f} ms")
+	print(f"vectorized            : {vec_s * 1000:9.1f} ms  ({loop_s / max(vec_s, 1e-9):.0f}x)")
+
+
+if __name__ == "__main__":
+	main()
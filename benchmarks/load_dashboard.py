@@ -0,0 +1,91 @@
+"""
+Dashboard throughput with many distinct households resolved per request.
+
+Seeds N users (a few appliances each) and drives /dashboard through the Flask test client,
+identifying each request with the X-User-Id header.
+
+	python -m benchmarks.load_dashboard --users 10000 --requests 20000
+	# Postgres stand-in, e.g. `docker run -p 5432:5432 -e POSTGRES_PASSWORD=pw postgres:16`
+	python -m benchmarks.load_dashboard --database-url postgresql://postgres:pw@localhost/postgres --reset
+"""
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.models import User, Appliance
+
+PACK = [
+	{"type": "bulb", "power_w": 60, "quantity": 6, "hours_per_day": 5, "days_per_week": 7},
+	{"type": "fan", "power_w": 70, "quantity": 2, "hours_per_day": 8, "days_per_week": 7},
+	{"type": "AC", "power_w": 1200, "quantity": 1, "hours_per_day": 3, "days_per_week": 6},
+	{"type": "fridge", "power_w": 110, "quantity": 1, "hours_per_day": 24, "days_per_week": 7, "star_label": "3-star"},
+	{"type": "tv", "power_w": 80, "quantity": 1, "hours_per_day": 3, "days_per_week": 7},
+]
+
+
+def seed(n_users: int) -> None:
+	db.session.execute(insert(User), [{"id": i, "name": f"Household {i}", "tariff": 8.0, "ef": 0.7} for i in range(1, n_users + 1)])
+	db.session.execute(insert(Appliance), [dict(p, user_id=i) for i in range(1, n_users + 1) for p in PACK])
+	db.session.commit()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+	parser.add_argument("--reset", action="store_true", help="drop and recreate tables (required for --database-url)")
+	parser.add_argument("--users", type=int, default=10000)
+	parser.add_argument("--requests", type=int, default=20000)
+	parser.add_argument("--threads", type=int, default=1)
+	args = parser.parse_args()
+
+	url = args.database_url or f"sqlite:///{Path(tempfile.mkdtemp()) / 'load.sqlite'}"
+	if args.database_url and not args.reset:
+		parser.error("--reset is required with --database-url (the benchmark drops all tables)")
+	app = create_app({"SQLALCHEMY_DATABASE_URI": url, "USER_ID_HEADER": "X-User-Id"})
+	with app.app_context():
+		db.drop_all()
+		db.create_all()
+		t0 = time.perf_counter()
+		seed(args.users)
+		print(f"seeded {args.users} users in {time.perf_counter() - t0:.2f}s ({db.engine.dialect.name})")
+
+	per_thread = args.requests // args.threads
+	latencies: list[float] = []
+	lock = threading.Lock()
+
+	def worker(seed_: int) -> None:
+		rng = random.Random(seed_)
+		client = app.test_client()
+		local = []
+		for _ in range(per_thread):
+			uid = rng.randint(1, args.users)
+			t = time.perf_counter()
+			resp = client.get("/dashboard", headers={"X-User-Id": str(uid)})
+			local.append(time.perf_counter() - t)
+			assert resp.status_code == 200, resp.status_code
+		with lock:
+			latencies.extend(local)
+
+	t0 = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=args.threads) as pool:
+		list(pool.map(worker, range(args.threads)))
+	wall = time.perf_counter() - t0
+
+	latencies.sort()
+	print(f"requests={len(latencies)} threads={args.threads} wall={wall:.2f}s throughput={len(latencies) / wall:.0f} req/s")
+	print(f"latency p50={statistics.median(latencies) * 1000:.2f}ms p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f}ms")
+	with app.app_context():
+		print("cache:", app.extensions["user_data_cache"].stats())
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,253 @@
+"""
+Reproducible performance baseline: compute_kpis, generate_recommendations and the /dashboard,
+/recommendations, /scenarios and /export/csv routes (Flask test client) on seeded synthetic households.
+
+Calculation cases run on 10 / 1k / 100k appliances. Route cases run against a single household with
+10 and 1k appliances and a 10k-user fleet (10 appliances each, 100k in total), with the per-user cache
+cleared before every request (cold) and kept (warm). Results are written as JSON; --compare reads an
+earlier run and exits non-zero when a case's median got slower than --threshold.
+
+	python -m benchmarks.suite --output baseline.json
+	python -m benchmarks.suite --output new.json --compare baseline.json --threshold 0.15
+	python -m benchmarks.suite --quick --only route:/dashboard
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.assumptions import DEFAULT_ASSUMPTIONS
+from app.calculations import compute_kpis
+from app.models import Appliance, Scenario, ScenarioMeasure, User
+from app.recommendations import generate_recommendations
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA = 1
+CALC_SIZES = (10, 1_000, 100_000)
+# (users, appliances per user)
+ROUTE_DATASETS = ((1, 10), (1, 1_000), (10_000, 10))
+ROUTES = ("/dashboard", "/recommendations", "/scenarios", "/export/csv")
+QUICK_CALC_SIZES = (10, 1_000)
+QUICK_ROUTE_DATASETS = ((1, 10), (1_000, 10))
+# type, power range (W), hours/day range
+TYPES = (
+	("bulb", (9, 100), (2, 8)),
+	("tube", (18, 40), (3, 10)),
+	("fan", (45, 80), (4, 14)),
+	("AC", (900, 2000), (1, 8)),
+	("fridge", (90, 250), (24, 24)),
+	("tv", (40, 150), (1, 6)),
+	("geyser", (1500, 3000), (0.2, 1)),
+	("router", (5, 15), (24, 24)),
+)
+# code, title, kWh/month of each saved scenario's measures
+MEASURES = (
+	("lighting_swap", "Switch to LED", 12.5),
+	("ac_setpoint", "Raise AC setpoint", 30.0),
+)
+
+
+def appliance_rows(n_users: int, per_user: int, seed: int = 42) -> List[dict]:
+	"""
+	Deterministic appliance rows for users 1..n_users (ids assigned in order).
+	"""
+	rng = random.Random(seed)
+	rows = []
+	for uid in range(1, n_users + 1):
+		for _ in range(per_user):
+			kind, (lo_w, hi_w), (lo_h, hi_h) = TYPES[rng.randrange(len(TYPES))]
+			rows.append({
+				"id": len(rows) + 1,
+				"user_id": uid,
+				"type": kind,
+				"power_w": round(rng.uniform(lo_w, hi_w), 1),
+				"quantity": rng.randint(1, 6) if kind in ("bulb", "tube", "fan") else 1,
+				"hours_per_day": round(rng.uniform(lo_h, hi_h), 2),
+				"days_per_week": rng.randint(3, 7),
+				"star_label": rng.choice(("2-star", "3-star", "5-star")) if kind == "fridge" else None,
+			})
+	return rows
+
+
+def timings(fn: Callable[[], object], runs: int, max_seconds: float, setup: Callable[[], object] | None = None) -> dict:
+	"""
+	Time fn() up to `runs` times (at least 3, stopping after max_seconds); setup() runs untimed before each call.
+	"""
+	samples: List[float] = []
+	deadline = time.perf_counter() + max_seconds
+	while len(samples) < runs and (len(samples) < 3 or time.perf_counter() < deadline):
+		if setup is not None:
+			setup()
+		t0 = time.perf_counter()
+		fn()
+		samples.append(time.perf_counter() - t0)
+	samples.sort()
+	return {
+		"median_ms": round(statistics.median(samples) * 1000, 4),
+		"p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 4),
+		"min_ms": round(samples[0] * 1000, 4),
+		"runs": len(samples),
+	}
+
+
+def calculation_cases(sizes, runs: int, max_seconds: float) -> Dict[str, dict]:
+	results = {}
+	for n in sizes:
+		appliances = [Appliance(**row) for row in appliance_rows(1, n)]
+		results[f"kpis:{n}"] = timings(lambda: compute_kpis(appliances, 8.0, 0.7), runs, max_seconds)
+		results[f"recommendations:{n}"] = timings(
+			lambda: generate_recommendations(appliances, 8.0, 0.7, DEFAULT_ASSUMPTIONS), runs, max_seconds
+		)
+	return results
+
+
+def route_cases(n_users: int, per_user: int, paths, runs: int, max_seconds: float) -> Dict[str, dict]:
+	url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'suite.sqlite'}"
+	app = create_app({"SQLALCHEMY_DATABASE_URI": url, "USER_ID_HEADER": "X-User-Id"})
+	with app.app_context():
+		db.drop_all()
+		db.create_all()
+		db.session.execute(insert(User), [{"id": i, "name": f"Household {i}", "tariff": 8.0, "ef": 0.7} for i in range(1, n_users + 1)])
+		db.session.execute(insert(Appliance), appliance_rows(n_users, per_user))
+		db.session.execute(insert(Scenario), [
+			{"id": 3 * (i - 1) + k + 1, "user_id": i, "name": f"Scenario {k}", "saved_kwh": 42.5, "saved_cost": 340.0, "saved_co2": 29.75}
+			for i in range(1, n_users + 1)
+			for k in range(3)
+		])
+		db.session.execute(insert(ScenarioMeasure), [
+			{
+				"scenario_id": 3 * (i - 1) + k + 1,
+				"user_id": i,
+				"position": position,
+				"code": code,
+				"title": title,
+				"delta_kwh_month": kwh,
+				"delta_cost_month": kwh * 8.0,
+				"delta_co2_month": kwh * 0.7,
+			}
+			for i in range(1, n_users + 1)
+			for k in range(3)
+			for position, (code, title, kwh) in enumerate(MEASURES)
+		])
+		db.session.commit()
+	client = app.test_client()
+	cache = app.extensions["user_data_cache"]
+	rng = random.Random(7)
+	# Cold requests spread over the fleet; warm ones cycle over a small, already-cached set
+	hot = [rng.randint(1, n_users) for _ in range(min(n_users, 50))]
+
+	def get(path: str, user_id: int) -> None:
+		response = client.get(path, headers={"X-User-Id": str(user_id)})
+		response.get_data()
+		assert response.status_code == 200, (path, response.status_code)
+
+	results = {}
+	label = f"{n_users}x{per_user}"
+	for path in paths:
+		get(path, 1)  # process-wide stores (assumptions, tariffs) load once per worker; not timed
+		users = iter(rng.randint(1, n_users) for _ in range(runs))
+		current = [1]
+
+		def cold_setup() -> None:
+			cache.clear()
+			current[0] = next(users)
+
+		results[f"route:{path}:cold:{label}"] = timings(lambda: get(path, current[0]), runs, max_seconds, cold_setup)
+		for uid in hot:
+			get(path, uid)
+		warm = iter(hot * (runs // len(hot) + 1))
+		results[f"route:{path}:warm:{label}"] = timings(lambda: get(path, next(warm)), runs, max_seconds)
+	return results
+
+
+def environment() -> dict:
+	try:
+		commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+		dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "app"], cwd=ROOT, capture_output=True, text=True).stdout.strip())
+	except (OSError, subprocess.CalledProcessError):
+		commit, dirty = None, None
+	return {
+		"commit": commit,
+		"dirty": dirty,
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"sqlite": sqlite3.sqlite_version,
+		"created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+	}
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+	"""
+	Print median changes for cases present in both runs; returns the names that regressed beyond threshold.
+	"""
+	regressed = []
+	for name in sorted(set(current) & set(baseline)):
+		old, new = baseline[name]["median_ms"], current[name]["median_ms"]
+		ratio = new / old if old else float("inf")
+		flag = ""
+		if ratio > 1 + threshold:
+			flag = "  REGRESSION"
+			regressed.append(name)
+		elif ratio < 1 - threshold:
+			flag = "  faster"
+		print(f"{name:<48} {old:10.3f} -> {new:10.3f} ms  {ratio - 1:+7.1%}{flag}")
+	skipped = len(set(baseline) - set(current))
+	if skipped:
+		print(f"({skipped} baseline case(s) not run)")
+	return regressed
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--output", type=Path, default=None, help="write results as JSON")
+	parser.add_argument("--compare", type=Path, default=None, help="earlier --output file to compare against")
+	parser.add_argument("--threshold", type=float, default=0.2, help="relative median slowdown flagged as a regression")
+	parser.add_argument("--runs", type=int, default=30, help="samples per case (at least 3)")
+	parser.add_argument("--max-seconds", type=float, default=10.0, help="time cap per case")
+	parser.add_argument("--quick", action="store_true", help="smaller sizes (10/1k appliances, 1k-user fleet)")
+	parser.add_argument("--only", default=None, help="run cases whose name starts with this prefix")
+	args = parser.parse_args()
+
+	calc_sizes = QUICK_CALC_SIZES if args.quick else CALC_SIZES
+	datasets = QUICK_ROUTE_DATASETS if args.quick else ROUTE_DATASETS
+	results: Dict[str, dict] = {}
+	only = args.only or ""
+	if not only.startswith("route:"):
+		results.update(calculation_cases(calc_sizes, args.runs, args.max_seconds))
+	paths = [p for p in ROUTES if f"route:{p}:".startswith(only) or only.startswith(f"route:{p}:")]
+	if paths:
+		for n_users, per_user in datasets:
+			t0 = time.perf_counter()
+			results.update(route_cases(n_users, per_user, paths, args.runs, args.max_seconds))
+			print(f"routes on {n_users}x{per_user}: {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+	results = {k: v for k, v in results.items() if k.startswith(only)}
+
+	for name, r in results.items():
+		print(f"{name:<48} median {r['median_ms']:10.3f} ms  p95 {r['p95_ms']:10.3f} ms  ({r['runs']} runs)")
+	if args.output is not None:
+		payload = {"schema": SCHEMA, "environment": environment(), "args": {"runs": args.runs, "quick": args.quick}, "results": results}
+		args.output.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+	if args.compare is not None:
+		baseline = json.loads(args.compare.read_text())
+		print(f"\ncompared with {args.compare} ({baseline['environment'].get('commit') or 'unknown commit'}), threshold {args.threshold:.0%}")
+		regressed = compare(results, baseline["results"], args.threshold)
+		if regressed:
+			print(f"{len(regressed)} case(s) regressed", file=sys.stderr)
+			sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,24 @@
+import pytest
+from app import create_app
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def app(tmp_path):
+	app = create_app(
+		{
+			"TESTING": True,
+			"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.sqlite'}",
+			"ADMIN_TOKEN": ADMIN_TOKEN,
+		}
+	)
+	yield app
+
+
+@pytest.fixture
+def client(app):
+	client = app.test_client()
+	# The default client is also the operator: /admin/* endpoints check this header (identity.admin_required)
+	client.environ_base["HTTP_X_ADMIN_TOKEN"] = ADMIN_TOKEN
+	return client
@@ -0,0 +1,119 @@
+import gzip
+import io
+import json
+from app import db
+from app.models import Appliance, User
+from app.assumptions import read_version, user_version_key
+from app.importer import import_appliances, iter_records
+
+
+def _login(app, client, user_id=1):
+	with client.session_transaction() as sess:
+		sess["user_id"] = user_id
+	with app.app_context():
+		db.session.add(User(id=user_id, name="a"))
+		db.session.add_all([
+			Appliance(user_id=user_id, type="bulb", power_w=60, quantity=10, hours_per_day=6, days_per_week=7),
+			Appliance(user_id=user_id, type="AC", power_w=1500, quantity=1, hours_per_day=6, days_per_week=7),
+		])
+		db.session.commit()
+
+
+def test_kpis_match_dashboard_and_revalidate(app, client):
+	_login(app, client)
+	first = client.get("/api/v1/kpis")
+	assert first.status_code == 200 and first.headers["Cache-Control"] == "private, no-cache"
+	etag = first.headers["ETag"]
+	data = first.get_json()
+	assert data["kpis"]["daily_kwh"] == round(0.06 * 10 * 6 + 1.5 * 6, 3)
+	assert data["pie_labels"] == ["bulb", "AC"] and len(data["profile_values"]) == 24
+
+	again = client.get("/api/v1/kpis", headers={"If-None-Match": etag})
+	assert again.status_code == 304 and again.data == b"" and again.headers["ETag"] == etag
+	# The dashboard page embeds the same ETag for its first poll
+	assert etag.strip('W/"') in client.get("/dashboard").data.decode()
+
+	client.post("/appliances", data={"type": "tv", "power_w": 100, "quantity": 1, "hours_per_day": 4, "days_per_week": 7})
+	changed = client.get("/api/v1/kpis", headers={"If-None-Match": etag})
+	assert changed.status_code == 200 and changed.headers["ETag"] != etag
+	assert changed.get_json()["kpis"]["daily_kwh"] == data["kpis"]["daily_kwh"] + 0.4
+
+
+def test_recommendations_and_scenarios(app, client):
+	_login(app, client)
+	recs = client.get("/api/v1/recommendations?rank=co2").get_json()
+	assert recs["rank"] == "co2" and {r["code"] for r in recs["recommendations"]} >= {"lighting_swap", "ac_setpoint"}
+	by_cost = client.get("/api/v1/recommendations")
+	scen = client.get("/api/v1/scenarios")
+	assert scen.get_json()["scenarios"] == [] and scen.get_json()["kpis_base"]["monthly_kwh"] > 0
+	# Query strings are part of the ETag
+	assert client.get("/api/v1/recommendations?rank=co2", headers={"If-None-Match": by_cost.headers["ETag"]}).status_code == 200
+
+	client.post("/scenarios", data={"name": "S1", "measures": ["ac_setpoint"]})
+	after = client.get("/api/v1/scenarios", headers={"If-None-Match": scen.headers["ETag"]})
+	assert after.status_code == 200
+	body = after.get_json()
+	assert [s["name"] for s in body["scenarios"]] == ["S1"] and body["bar_labels"] == ["Baseline", "S1"]
+
+
+def test_gzip_and_bulk_version_bumps(app, client):
+	_login(app, client)
+	plain = client.get("/api/v1/recommendations")
+	zipped = client.get("/api/v1/recommendations", headers={"Accept-Encoding": "gzip"})
+	assert "Content-Encoding" not in plain.headers and zipped.headers["Content-Encoding"] == "gzip"
+	assert "Accept-Encoding" in zipped.headers["Vary"]
+	assert json.loads(gzip.decompress(zipped.data)) == plain.get_json()
+	assert zipped.headers["ETag"] == plain.headers["ETag"]
+
+	with app.app_context():
+		db.session.add(User(id=2, name="b"))
+		db.session.commit()
+		before = read_version(user_version_key(1))
+		csv = "user_id,type,power_w,quantity,hours_per_day,days_per_week\n1,fan,70,1,8,7\n2,fan,70,1,8,7\n1,tv,90,1,3,7\n"
+		import_appliances(iter_records(io.BytesIO(csv.encode()), "csv"))
+		assert read_version(user_version_key(1)) == before + 1
+		assert read_version(user_version_key(2)) == 1
+
+
+def test_other_worker_never_pairs_new_etag_with_cached_body(app, client, tmp_path):
+	from app import create_app
+
+	_login(app, client)
+	other = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"]})
+	other_client = other.test_client()
+	with other_client.session_transaction() as sess:
+		sess["user_id"] = 1
+	stale = other_client.get("/api/v1/kpis")
+	other_client.get("/api/v1/recommendations")
+	assert stale.get_json()["kpis"]["daily_kwh"] == round(0.06 * 10 * 6 + 1.5 * 6, 3)
+
+	# A write on this worker; the other worker's cached bundle must not be served under the new ETag
+	client.post("/appliances", data={"type": "tv", "power_w": 100, "quantity": 1, "hours_per_day": 4, "days_per_week": 7})
+	fresh = other_client.get("/api/v1/kpis", headers={"If-None-Match": stale.headers["ETag"]})
+	assert fresh.status_code == 200 and fresh.headers["ETag"] != stale.headers["ETag"]
+	assert fresh.get_json()["kpis"]["daily_kwh"] == stale.get_json()["kpis"]["daily_kwh"] + 0.4
+	assert other_client.get("/api/v1/recommendations").get_json() == client.get("/api/v1/recommendations").get_json()
+
+
+def test_goals_are_per_household(app, client):
+	from app.assumptions import assumptions_version
+
+	_login(app, client)
+	other = app.test_client()
+	_login(app, other, user_id=2)
+	other_etag = other.get("/api/v1/kpis").headers["ETag"]
+	with app.app_context():
+		before = assumptions_version()
+
+	client.post("/dashboard", data={"goal_month_kwh": "150", "goal_month_cost": ""})
+	mine = client.get("/api/v1/kpis").get_json()
+	assert (mine["goal_month_kwh"], mine["goal_month_cost"]) == (150.0, 0.0) and mine["progress_kwh"] > 0
+	client.post("/dashboard", data={"goal_month_cost": "900"})
+	assert client.get("/api/v1/kpis").get_json()["goal_month_cost"] == 900.0
+
+	# The other household keeps no goals, and neither its ETag nor the shared assumptions moved
+	theirs = other.get("/api/v1/kpis", headers={"If-None-Match": other_etag})
+	assert theirs.status_code == 304
+	assert other.get("/api/v1/kpis").get_json()["goal_month_kwh"] == 0.0
+	with app.app_context():
+		assert assumptions_version() == before
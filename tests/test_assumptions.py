@@ -0,0 +1,53 @@
+from app import create_app
+from app.assumptions import get_assumptions, save_assumptions, assumptions_version
+
+
+def test_snapshot_refreshes_across_workers(app, tmp_path):
+	# A second app on the same database stands in for another gunicorn worker
+	other = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"]})
+	with other.test_request_context():
+		assert get_assumptions()["default_led_w"] == 9.0
+		stale_store = other.extensions["assumptions_store"]
+		loaded_values = stale_store.values
+
+	with app.test_request_context():
+		save_assumptions({"default_led_w": 7.0})
+		assert get_assumptions()["default_led_w"] == 7.0
+		assert assumptions_version() == 1
+
+	with other.test_request_context():
+		assert get_assumptions()["default_led_w"] == 7.0
+		assert stale_store.values is not loaded_values
+
+
+def test_snapshot_not_reloaded_when_version_unchanged(app):
+	with app.test_request_context():
+		get_assumptions()
+		loaded = app.extensions["assumptions_store"].values
+	with app.test_request_context():
+		assert get_assumptions()["ac_coefficient_per_degree"] == 0.04
+		assert app.extensions["assumptions_store"].values is loaded
+
+
+def test_legacy_global_goals_backfill_into_households(app, client):
+	from app import db
+	from app.models import Assumption, User, UserGoal
+
+	with app.app_context():
+		db.session.add_all([User(id=1, name="a"), User(id=2, name="b"), User(id=3, name="c")])
+		db.session.add(UserGoal(user_id=2, month_kwh=80.0))  # set after goals became per household
+		db.session.add_all([Assumption(key="goal_month_kwh", value=150.0), Assumption(key="goal_month_cost", value=0.0)])
+		db.session.commit()
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	etag = client.get("/api/v1/kpis").headers["ETag"]
+
+	result = app.test_cli_runner().invoke(args=["goals", "backfill"])
+	assert result.exit_code == 0 and "households_backfilled=2" in result.output
+	with app.app_context():
+		goals = {g.user_id: (g.month_kwh, g.month_cost) for g in UserGoal.query.all()}
+		assert goals == {1: (150.0, None), 2: (80.0, None), 3: (150.0, None)}
+		assert Assumption.query.filter(Assumption.key.like("goal_%")).count() == 0
+	assert client.get("/api/v1/kpis", headers={"If-None-Match": etag}).status_code == 200
+	assert client.get("/api/v1/kpis").get_json()["goal_month_kwh"] == 150.0
+	assert "households_backfilled=0" in app.test_cli_runner().invoke(args=["goals", "backfill"]).output
@@ -0,0 +1,78 @@
+import random
+import pytest
+from app.models import Appliance, User
+from app.calculations import compute_kpis
+from app.batch import appliances_frame, users_frame, compute_kpis_batch
+
+
+def _households(n_users=50, seed=7):
+	rng = random.Random(seed)
+	users, appliances = [], []
+	for uid in range(1, n_users + 1):
+		users.append(User(id=uid, name=f"u{uid}", tariff=rng.uniform(4, 12), ef=rng.uniform(0.5, 0.9)))
+		for i in range(rng.randint(0, 12)):
+			appliances.append(
+				Appliance(
+					id=len(appliances) + 1,
+					user_id=uid,
+					type=rng.choice(["bulb", "fan", "AC", "fridge", "tv"]),
+					power_w=rng.uniform(5, 2000),
+					quantity=rng.randint(1, 6),
+					hours_per_day=rng.uniform(0.1, 24),
+					days_per_week=rng.randint(1, 7),
+					star_label=rng.choice([None, "", "2-star", "3-star", "5-star"]),
+				)
+			)
+	return users, appliances
+
+
+def test_batch_kpis_match_scalar():
+	users, appliances = _households()
+	raw = compute_kpis_batch(appliances_frame(appliances), users_frame(users), rounded=False)
+	out = compute_kpis_batch(appliances_frame(appliances), users_frame(users))
+	for u in users:
+		own = [a for a in appliances if a.user_id == u.id]
+		expected = compute_kpis(own, u.tariff, u.ef)
+		assert raw.loc[u.id, "daily_kwh"] == pytest.approx(sum(a.daily_kwh() for a in own), rel=1e-12)
+		assert out.loc[u.id, "daily_kwh"] == pytest.approx(expected["daily_kwh"], abs=1e-3)
+		assert out.loc[u.id, "monthly_kwh"] == pytest.approx(expected["monthly_kwh"], abs=1e-3)
+		assert out.loc[u.id, "monthly_cost"] == pytest.approx(expected["monthly_cost"], abs=1e-2)
+		assert out.loc[u.id, "monthly_co2"] == pytest.approx(expected["monthly_co2"], abs=1e-2)
+
+
+def test_batch_kpis_user_without_appliances():
+	users = [User(id=1, name="a", tariff=8.0, ef=0.7), User(id=2, name="b", tariff=8.0, ef=0.7)]
+	appliances = [Appliance(id=1, user_id=1, type="tv", power_w=100, quantity=1, hours_per_day=10, days_per_week=7)]
+	out = compute_kpis_batch(appliances_frame(appliances), users_frame(users))
+	assert out.loc[1].to_dict() == {"daily_kwh": 1.0, "monthly_kwh": 30.0, "monthly_cost": 240.0, "monthly_co2": 21.0}
+	assert out.loc[2, "monthly_kwh"] == 0.0
+
+
+def test_batch_recommendations_match_scalar():
+	from app.recommendations import generate_recommendations
+	from app.batch import recommendation_frame, recommendations_by_user, top_recommendations
+
+	users, appliances = _households(n_users=40, seed=11)
+	for i, a in enumerate(appliances):
+		a.star_label = "2-star" if i % 3 == 0 else "4-star"
+	assumptions = {"default_led_w": 12.0, "lighting_cost_per_unit": 95.0}
+	frame = recommendation_frame(appliances_frame(appliances), users_frame(users), assumptions)
+	for rank in ("cost", "co2"):
+		by_user = recommendations_by_user(frame, rank=rank)
+		everything = []
+		for u in users:
+			expected = generate_recommendations([a for a in appliances if a.user_id == u.id], u.tariff, u.ef, assumptions)
+			if rank == "co2":
+				expected.sort(key=lambda r: (-r.delta_co2_month, (r.payback_months or 1e9)))
+			got = by_user[u.id]
+			assert [(r.code, r.title, r.details) for r in got] == [(r.code, r.title, r.details) for r in expected]
+			for g, e in zip(got, expected):
+				assert g.delta_cost_month == pytest.approx(e.delta_cost_month, abs=0.01)
+				assert g.payback_months == e.payback_months
+				assert g.impact_score == pytest.approx(e.impact_score)
+			everything.extend(got)
+
+		top = top_recommendations(frame, k=5, rank=rank)
+		column = "delta_co2_month" if rank == "co2" else "delta_cost_month"
+		best = sorted((getattr(r, column) for r in everything), reverse=True)[:5]
+		assert [getattr(r, column) for _, r in top] == best
@@ -0,0 +1,48 @@
+from app.cache import UserDataCache, get_cache
+
+
+def test_cache_hit_miss_and_invalidation():
+	cache = UserDataCache(maxsize=10, ttl=60)
+	calls = []
+
+	def compute():
+		calls.append(1)
+		return len(calls)
+
+	assert cache.get_or_compute("kpis", 1, (8.0, 0.7), compute) == 1
+	assert cache.get_or_compute("kpis", 1, (8.0, 0.7), compute) == 1
+	# tariff change is part of the version
+	assert cache.get_or_compute("kpis", 1, (9.0, 0.7), compute) == 2
+	cache.invalidate_user(1)
+	assert cache.get_or_compute("kpis", 1, (9.0, 0.7), compute) == 3
+	cache.invalidate_assumptions()
+	assert cache.get_or_compute("kpis", 1, (9.0, 0.7), compute) == 4
+	assert cache.stats()["hits"] == 1
+	assert cache.stats()["misses"] == 4
+
+
+def test_cache_ttl_and_lru_eviction():
+	expired = UserDataCache(maxsize=10, ttl=0)
+	assert expired.get_or_compute("kpis", 1, None, lambda: "a") == "a"
+	assert expired.get_or_compute("kpis", 1, None, lambda: "b") == "b"
+
+	cache = UserDataCache(maxsize=2, ttl=60)
+	cache.get_or_compute("kpis", 1, None, lambda: 1)
+	cache.get_or_compute("kpis", 2, None, lambda: 2)
+	cache.get_or_compute("kpis", 1, None, lambda: 1)  # touch user 1
+	cache.get_or_compute("kpis", 3, None, lambda: 3)  # evicts user 2
+	assert cache.get_or_compute("kpis", 1, None, lambda: "recomputed") == 1
+	assert cache.get_or_compute("kpis", 2, None, lambda: "recomputed") == "recomputed"
+
+
+def test_routes_reuse_and_invalidate_cache(app, client):
+	client.get("/dashboard")
+	client.get("/dashboard")
+	with app.app_context():
+		assert get_cache().stats()["hits"] >= 1
+	client.post("/appliances", data={"type": "tv", "power_w": "100", "quantity": "1", "hours_per_day": "10", "days_per_week": "7"})
+	page = client.get("/dashboard").get_data(as_text=True)
+	assert "240.0" in page  # 1 kWh/day → 30 kWh/month → ₹240/month at ₹8
+	client.post("/admin/assumptions", data={"default_led_w": "7"})
+	assert client.get("/admin/cache-stats").get_json()["size"] == 0
+	assert app.test_client().get("/admin/cache-stats").status_code == 403
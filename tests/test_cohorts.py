@@ -0,0 +1,118 @@
+from datetime import date
+import numpy as np
+from sqlalchemy import select
+from app import db
+from app.cohorts import MIN_COHORT, bucket_of, estimate_percentile, ordinal, rebuild, refresh_cohorts
+from app.models import Appliance, CohortMember, CohortSketch, User
+from app.synthetic import SyntheticSpec, generate
+
+
+def _sketch():
+	return sorted(db.session.execute(select(CohortSketch.city, CohortSketch.household_size, CohortSketch.bucket, CohortSketch.count).where(CohortSketch.count != 0)).all())
+
+
+def test_percentiles_within_one_point_at_a_million_households():
+	rng = np.random.default_rng(5)
+	n = 1_000_000
+	cohort = rng.integers(0, 48, size=n)
+	# Skewed, heavy-tailed usage with a different median per cohort, rounded like stored kWh
+	kwh = np.round(np.exp(rng.normal(np.log(80 + 10 * cohort), 0.6 + 0.01 * (cohort % 7))), 2)
+	buckets = np.array([bucket_of(v) for v in kwh.tolist()])
+	worst = 0.0
+	for c in range(0, 48, 5):
+		values = np.sort(kwh[cohort == c])
+		counts = np.bincount(buckets[cohort == c])
+		cumulative = np.concatenate([[0], np.cumsum(counts)])
+		for v in rng.choice(values, size=300):
+			b = bucket_of(float(v))
+			exact = 100.0 * np.searchsorted(values, v, side="left") / len(values)
+			estimate = estimate_percentile(int(cumulative[b]), int(counts[b]), len(values), float(v))
+			worst = max(worst, abs(estimate - exact))
+	assert worst < 1.0
+
+
+def test_buckets_and_ordinals():
+	assert bucket_of(0.2) == 0 and bucket_of(1.0) == 1
+	assert bucket_of(100.0) < bucket_of(101.5) and bucket_of(1e9) == bucket_of(1e12)
+	assert [ordinal(n) for n in (1, 2, 3, 11, 12, 22, 78, 100)] == ["1st", "2nd", "3rd", "11th", "12th", "22nd", "78th", "100th"]
+
+
+def test_cohort_updates_incrementally(app, client):
+	with app.app_context():
+		# Twelve 3-person Delhi homes whose only appliance is a 100..1200 W load for 5 h a day
+		db.session.add_all([User(id=i, name=f"h{i}", city="Delhi", household_size=3) for i in range(1, MIN_COHORT + 3)])
+		db.session.add_all([
+			Appliance(user_id=i, type="AC", power_w=100.0 * i, quantity=1, hours_per_day=5, days_per_week=7) for i in range(2, MIN_COHORT + 3)
+		])
+		refresh_cohorts(range(1, MIN_COHORT + 3))
+		db.session.commit()
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	# User 1 joins the cohort with its first appliance; rebuild agrees with the incremental counts
+	client.post("/appliances", data={"type": "fan", "power_w": 650, "quantity": 1, "hours_per_day": 5})
+	with app.app_context():
+		incremental = _sketch()
+		assert sum(c for *_, c in incremental) == MIN_COHORT + 2
+		assert rebuild() == {"members": MIN_COHORT + 2, "buckets": MIN_COHORT + 2}
+		assert _sketch() == incremental
+
+	cohort = client.get("/api/v1/kpis").get_json()["cohort"]
+	# 650 W sits above the 200..600 W homes: 5 of the 12 use less, plus part of its own bucket (itself)
+	assert 100 * 5 / 12 <= cohort.pop("percentile") <= 100 * 6 / 12
+	assert cohort.pop("ordinal") in client.get("/dashboard").data.decode()
+	assert cohort == {"city": "Delhi", "household_size": 3, "homes": 12, "label": "3-person homes in Delhi"}
+
+	client.post("/appliances", data={"type": "geyser", "power_w": 2000, "quantity": 1, "hours_per_day": 5})
+	assert client.get("/api/v1/kpis").get_json()["cohort"]["percentile"] >= 100 * 11 / 12
+
+	# Moving city leaves the Delhi cohort below MIN_COHORT for the new city: no comparison
+	client.post("/onboarding", data={"name": "h1", "tariff": 8, "ef": 0.7, "household_size": 3, "city": "Pune"})
+	assert client.get("/api/v1/kpis").get_json()["cohort"] is None
+	with app.app_context():
+		member = db.session.get(CohortMember, 1)
+		assert (member.city, member.household_size) == ("Pune", 3)
+		assert sum(n for c, _, _, n in _sketch() if c == "Delhi") == MIN_COHORT + 1
+
+	client.post("/appliances/remove_type", data={"type": "fan"})
+	client.post("/appliances/remove_type", data={"type": "geyser"})
+	with app.app_context():
+		assert db.session.get(CohortMember, 1) is None
+		assert not [row for row in _sketch() if row[0] == "Pune"]
+
+
+def test_synthetic_load_matches_rebuild(app):
+	with app.app_context():
+		generate(SyntheticSpec(users=300, seed=2, days=0, end=date(2025, 1, 31), block_size=100))
+		loaded = _sketch()
+		assert sum(c for *_, c in loaded) == 300
+		rebuild()
+		assert _sketch() == loaded
+
+
+def test_kpis_etag_rolls_over_for_other_households_changes(app, client, monkeypatch):
+	from app import api
+
+	clock = [1_000_000.0]
+	monkeypatch.setattr(api, "time", type("Clock", (), {"time": staticmethod(lambda: clock[0])}))
+	with app.app_context():
+		db.session.add_all([User(id=i, name=f"h{i}", city="Delhi", household_size=3) for i in range(1, MIN_COHORT + 2)])
+		db.session.add_all([
+			Appliance(user_id=i, type="AC", power_w=100.0 * i, quantity=1, hours_per_day=5, days_per_week=7) for i in range(1, MIN_COHORT + 2)
+		])
+		refresh_cohorts(range(1, MIN_COHORT + 2))
+		db.session.commit()
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	first = client.get("/api/v1/kpis")
+	assert first.get_json()["cohort"]["percentile"] > 0
+	assert first.headers["ETag"].strip('W/"') in client.get("/dashboard").data.decode()
+
+	# Another household drops below user 1: user 1's version is unchanged, so the ETag holds until the window ends
+	with app.app_context():
+		db.session.get(Appliance, 2).power_w = 10.0
+		refresh_cohorts([2])
+		db.session.commit()
+	assert client.get("/api/v1/kpis", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+	clock[0] += api.COHORT_ETAG_SECONDS
+	later = client.get("/api/v1/kpis", headers={"If-None-Match": first.headers["ETag"]})
+	assert later.status_code == 200 and later.get_json()["cohort"]["percentile"] > first.get_json()["cohort"]["percentile"]
@@ -0,0 +1,36 @@
+from app import db
+from app.models import User, Appliance
+
+
+def test_user_csv_export(client):
+	client.post("/appliances", data={"type": "tv", "power_w": "100", "quantity": "1", "hours_per_day": "10", "days_per_week": "7"})
+	resp = client.get("/export/csv")
+	assert resp.mimetype == "text/csv"
+	assert resp.get_data(as_text=True) == (
+		"type,power_w,quantity,hours_per_day,days_per_week,star_label,daily_kwh\n"
+		"tv,100.0,1,10.0,7.0,,1.0\n"
+		"\n# KPIs\n"
+		"daily_kwh,1.0\nmonthly_kwh,30.0\nmonthly_cost,240.0\nmonthly_co2,21.0\n"
+	)
+
+
+def test_fleet_csv_export_streams_every_user(app, client):
+	with app.app_context():
+		db.session.add_all([User(id=1, name="a"), User(id=2, name="b"), User(id=3, name="c", tariff=10.0)])
+		db.session.add_all(
+			[
+				Appliance(user_id=1, type="tv", power_w=100, quantity=1, hours_per_day=10, days_per_week=7),
+				Appliance(user_id=3, type="fan", power_w=50, quantity=2, hours_per_day=10, days_per_week=7),
+				Appliance(user_id=1, type="bulb", power_w=10, quantity=1, hours_per_day=10, days_per_week=7),
+			]
+		)
+		db.session.commit()
+	assert app.test_client().get("/admin/export/csv").status_code == 403
+	resp = client.get("/admin/export/csv")
+	assert resp.is_streamed
+	lines = resp.get_data(as_text=True).splitlines()
+	assert lines[0].startswith("record,user_id,type")
+	records = [(line.split(",")[0], line.split(",")[1]) for line in lines[1:]]
+	assert records == [("appliance", "1"), ("appliance", "1"), ("kpis", "1"), ("kpis", "2"), ("appliance", "3"), ("kpis", "3")]
+	assert lines[3].endswith(",1.1,33.0,264.0,23.1")
+	assert lines[6].endswith(",1.0,30.0,300.0,21.0")
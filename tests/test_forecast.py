@@ -0,0 +1,107 @@
+import json
+import math
+import random
+from datetime import date, timedelta
+import pytest
+from app import db
+from app import forecast
+from app.forecast import fit_users, month_forecast, update_forecasts
+from app.models import ForecastState, Log, User
+
+WEEKLY = [9.0, 8.5, 8.8, 9.2, 10.0, 13.5, 14.0]  # Monday first
+
+
+def _series(user_id, start, end, rng, scale=1.0, skip=()):
+	day, rows = start, []
+	while day <= end:
+		if day not in skip:
+			rows.append(Log(user_id=user_id, date=day, kwh=round(scale * WEEKLY[day.weekday()] + rng.gauss(0, 0.4), 3)))
+		day += timedelta(days=1)
+	return rows
+
+
+def _state(user_id):
+	state = db.session.get(ForecastState, user_id)
+	return (state.last_date, state.level, state.trend, json.loads(state.season_json), state.month_kwh)
+
+
+def test_incremental_advance_matches_batch_fit(app, monkeypatch):
+	monkeypatch.setattr(forecast, "GRID", ((0.2, 0.01, 0.15),))
+	rng = random.Random(3)
+	start, cut, end = date(2025, 1, 1), date(2025, 2, 20), date(2025, 3, 9)
+	with app.app_context():
+		for uid, scale in ((1, 1.0), (2, 1.6)):
+			db.session.add(User(id=uid, name=f"u{uid}"))
+			db.session.add_all(_series(uid, start, end, rng, scale, skip={date(2025, 2, 27), date(2025, 3, 1)}))
+		db.session.commit()
+
+		assert fit_users([1, 2], cut, start) == 2
+		# Two ingests move the states across the month boundary, with gaps imputed
+		update_forecasts([(1, date(2025, 2, 21)), (2, date(2025, 2, 21))], today=date(2025, 3, 3))
+		update_forecasts([(1, date(2025, 3, 9)), (2, date(2025, 3, 5))], today=end + timedelta(days=1))
+		db.session.commit()
+		incremental = {uid: _state(uid) for uid in (1, 2)}
+
+		fit_users([1, 2], end, start)
+		for uid in (1, 2):
+			batch = _state(uid)
+			assert incremental[uid][0] == batch[0] == end
+			assert incremental[uid][1:3] == pytest.approx(batch[1:3], abs=1e-9)
+			assert incremental[uid][3] == pytest.approx(batch[3], abs=1e-9)
+			assert incremental[uid][4] == pytest.approx(batch[4], abs=1e-9)
+
+
+def test_forecast_tracks_weekly_usage(app):
+	rng = random.Random(11)
+	end = date(2025, 3, 12)
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add_all(_series(1, end - timedelta(days=120), end, rng))
+		db.session.commit()
+		assert fit_users([1], end) == 1
+		db.session.commit()
+
+		result = month_forecast(1, end + timedelta(days=1), tariff=8.0)
+		actual = sum(WEEKLY[date(2025, 3, d).weekday()] for d in range(1, 32))
+		assert result["month"] == "March 2025" and result["through"] == end.isoformat()
+		assert result["kwh"] == pytest.approx(actual, rel=0.04)
+		assert result["low_kwh"] < result["kwh"] < result["high_kwh"]
+		assert result["cost"] == pytest.approx(result["kwh"] * 8.0, abs=0.05)
+		# Stale or missing states give no forecast
+		assert month_forecast(1, end + timedelta(days=forecast.STALE_DAYS + 1), tariff=8.0) is None
+		assert month_forecast(2, end, tariff=8.0) is None
+
+
+def test_dashboard_forecast_follows_ingest(app, client):
+	client.get("/dashboard")
+	today = date.today()
+	rng = random.Random(5)
+	with app.app_context():
+		user_id = db.session.execute(db.select(User.id)).scalar_one()
+		db.session.add_all(_series(user_id, today - timedelta(days=80), today - timedelta(days=3), rng))
+		db.session.commit()
+	assert client.get("/api/v1/kpis").get_json()["forecast"] is None
+
+	result = app.test_cli_runner().invoke(args=["forecast", "fit", "--end", (today - timedelta(days=3)).isoformat()])
+	assert result.exit_code == 0, result.output
+	assert json.loads(result.output[result.output.index("{"):])["fitted"] == 1
+	fitted = client.get("/api/v1/kpis").get_json()["forecast"]
+	assert fitted["through"] == (today - timedelta(days=3)).isoformat()
+
+	# New complete days advance the stored state; today's partial day waits
+	body = "\n".join(f'{{"date": "{today - timedelta(days=i)}", "kwh": 30}}' for i in range(3))
+	client.post("/readings?format=ndjson", data=body, content_type="application/x-ndjson")
+	advanced = client.get("/api/v1/kpis").get_json()
+	assert advanced["forecast"]["through"] == (today - timedelta(days=1)).isoformat()
+	assert advanced["projected_kwh"] == advanced["forecast"]["kwh"]
+	page = client.get("/dashboard").get_data(as_text=True)
+	assert f'data-field="forecast.kwh">{advanced["forecast"]["kwh"]}<' in page
+
+	# A late reading for a consumed day refits the household
+	with app.app_context():
+		before = db.session.get(ForecastState, user_id).fitted_at
+	client.post("/readings?format=ndjson", data=f'{{"date": "{today - timedelta(days=20)}", "kwh": 5}}', content_type="application/x-ndjson")
+	with app.app_context():
+		state = db.session.get(ForecastState, user_id)
+		assert state.fitted_at > before and state.last_date == today - timedelta(days=1)
+	assert not math.isnan(client.get("/api/v1/kpis").get_json()["forecast"]["kwh"])
@@ -0,0 +1,55 @@
+from sqlalchemy import event
+from app import db
+from app.models import User, Appliance
+
+
+def test_sessions_get_separate_households(app):
+	a, b = app.test_client(), app.test_client()
+	a.post("/appliances", data={"type": "tv", "power_w": "100", "quantity": "1", "hours_per_day": "10", "days_per_week": "7"})
+	b.get("/dashboard")
+	with app.app_context():
+		assert User.query.count() == 2
+		assert Appliance.query.count() == 1
+		owner = Appliance.query.first().user_id
+	# b cannot delete a's appliance
+	with app.app_context():
+		appliance_id = Appliance.query.first().id
+	assert b.post(f"/appliances/{appliance_id}/delete").status_code == 404
+	assert a.get("/appliances").status_code == 200
+	with app.app_context():
+		assert Appliance.query.first().user_id == owner
+
+
+def test_header_resolution_costs_one_user_fetch(app):
+	app.config["USER_ID_HEADER"] = "X-User-Id"
+	with app.app_context():
+		db.session.add_all([User(name=f"u{i}") for i in range(3)])
+		db.session.commit()
+		engine = db.engine
+	client = app.test_client()
+	statements = []
+	listener = lambda conn, cursor, stmt, params, ctx, many: statements.append(stmt)
+	event.listen(engine, "before_cursor_execute", listener)
+	try:
+		assert client.get("/dashboard", headers={"X-User-Id": "2"}).status_code == 200
+	finally:
+		event.remove(engine, "before_cursor_execute", listener)
+	user_selects = [s for s in statements if "FROM users" in s]
+	assert len(user_selects) == 1
+	assert client.get("/dashboard", headers={"X-User-Id": "999"}).status_code == 404
+	assert client.get("/dashboard", headers={"X-User-Id": "abc"}).status_code == 400
+
+
+def test_admin_endpoints_need_the_admin_token(app):
+	csv = b"user_id,type,power_w,quantity,hours_per_day,days_per_week\n1,tv,100,1,4,7\n"
+	client = app.test_client()
+	for headers in ({}, {"X-Admin-Token": "wrong"}):
+		assert client.post("/admin/appliances/import?format=csv", data=csv, content_type="text/csv", headers=headers).status_code == 403
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.commit()
+	resp = client.post("/admin/appliances/import?format=csv", data=csv, content_type="text/csv", headers={"X-Admin-Token": app.config["ADMIN_TOKEN"]})
+	assert resp.status_code == 200 and resp.get_json()["inserted"] == 1
+	# No token configured: the endpoints are closed
+	app.config["ADMIN_TOKEN"] = None
+	assert client.post("/admin/appliances/import?format=csv", data=csv, content_type="text/csv", headers={"X-Admin-Token": ""}).status_code == 403
@@ -0,0 +1,84 @@
+import io
+import json
+import pytest
+from app import db
+from app.models import Appliance, User
+from app.importer import import_appliances, iter_records
+
+CSV = b"""type,power_w,quantity,hours_per_day,days_per_week,star_label
+bulb,60,5,6,7,
+fan,70,2,8,7,
+AC,,1,3,6,
+fridge,120,1.5,24,7,2-star
+tv,90,1,30,7,
+router,10,1,24,7,
+"""
+
+
+def test_csv_import_batches_and_rejects(app):
+	with app.app_context():
+		user = User(name="flat 1")
+		db.session.add(user)
+		db.session.commit()
+		report = import_appliances(iter_records(io.BytesIO(CSV), "csv"), user.id, batch_size=2)
+		assert report.inserted == 3
+		assert [r["line"] for r in report.rejects] == [4, 5, 6]
+		assert [b.rows for b in report.batches] == [2, 2, 2]
+		assert Appliance.query.filter_by(user_id=user.id).count() == 3
+
+
+def test_ndjson_fleet_import_requires_known_users(app):
+	with app.app_context():
+		db.session.add_all([User(id=1, name="a"), User(id=2, name="b")])
+		db.session.commit()
+		lines = [
+			{"user_id": 1, "type": "bulb", "power_w": 60},
+			{"user_id": 2, "type": "fan", "power_w": 70, "quantity": 3},
+			{"user_id": 3, "type": "tv", "power_w": 90},
+			{"type": "tv", "power_w": 90},
+		]
+		body = "\n".join(json.dumps(x) for x in lines).encode() + b"\nnot json\n"
+		report = import_appliances(iter_records(io.BytesIO(body), "ndjson"))
+		assert report.inserted == 2
+		assert report.rejected == 3
+		assert report.user_ids == {1, 2}
+
+
+def test_import_endpoint_streams_raw_body(app, client):
+	resp = client.post("/appliances/import?format=csv", data=CSV, content_type="text/csv")
+	data = resp.get_json()
+	assert data["inserted"] == 3 and data["rejected"] == 3
+	page = client.get("/appliances").get_data(as_text=True)
+	assert "router" in page
+	for bad in ("-1", "0", "abc", "10001"):
+		resp = client.post(f"/appliances/import?format=csv&batch_size={bad}", data=CSV, content_type="text/csv")
+		assert resp.status_code == 400 and "batch_size" in resp.get_json()["error"]
+	with app.app_context():
+		assert Appliance.query.count() == 3
+		with pytest.raises(ValueError):
+			import_appliances(iter_records(io.BytesIO(CSV), "csv"), 1, batch_size=0)
+
+
+def test_fleet_import_rejects_fractional_user_ids_and_bounds_the_report(app, monkeypatch):
+	from app import importer
+
+	monkeypatch.setattr(importer, "MAX_BATCHES_REPORTED", 2)
+	monkeypatch.setattr(importer, "MAX_USER_IDS_TRACKED", 2)
+	with app.app_context():
+		db.session.add_all([User(id=i, name=str(i)) for i in (1, 2, 3)])
+		db.session.commit()
+		lines = [
+			{"user_id": 1.5, "type": "bulb", "power_w": 60},
+			{"user_id": True, "type": "bulb", "power_w": 60},
+			{"user_id": "2.0", "type": "bulb", "power_w": 60},
+			{"user_id": 2.0, "type": "fan", "power_w": 70},
+			{"user_id": "1", "type": "tv", "power_w": 90},
+			{"user_id": 3, "type": "tv", "power_w": 90},
+		]
+		body = "\n".join(json.dumps(x) for x in lines).encode()
+		report = import_appliances(iter_records(io.BytesIO(body), "ndjson"), batch_size=1)
+		assert (report.inserted, report.rejected) == (3, 3)
+		assert {r["error"] for r in report.rejects} == {"user_id must be a whole number"}
+		assert sorted(a.user_id for a in Appliance.query) == [1, 2, 3]
+		assert report.batch_count == 6 and len(report.batches) == 2 and report.to_dict()["batch_count"] == 6
+		assert report.users_truncated and not report.user_ids
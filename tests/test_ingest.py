@@ -0,0 +1,58 @@
+import io
+from datetime import date, timedelta
+from app import db
+from app.models import Log, User
+from app.importer import iter_records
+from app.ingest import ingest_readings, daily_series
+
+
+def _records(rows):
+	return [(i + 1, r, None) for i, r in enumerate(rows)]
+
+
+def test_interval_readings_roll_up_and_upsert(app):
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.commit()
+		quarter_hours = [{"timestamp": f"2025-03-01T{h:02d}:{m:02d}", "kwh": 0.25} for h in range(24) for m in (0, 15, 30, 45)]
+		report = ingest_readings(_records(quarter_hours), user_id=1, batch_size=10)
+		assert report.readings == 96
+		assert Log.query.count() == 1
+		assert Log.query.one().kwh == 24.0
+
+		# Later batches for the same day accumulate; replace mode overwrites
+		ingest_readings(_records([{"date": "2025-03-01", "kwh": 1}]), user_id=1)
+		assert Log.query.one().kwh == 25.0
+		ingest_readings(_records([{"date": "2025-03-01", "kwh": 3}, {"date": "2025-03-02", "kwh": 4}]), user_id=1, mode="replace")
+		assert [(log.date.day, log.kwh) for log in Log.query.order_by(Log.date)] == [(1, 3.0), (2, 4.0)]
+
+		series = daily_series(1, date(2025, 2, 28), date(2025, 3, 2))
+		assert series == [(date(2025, 2, 28), None), (date(2025, 3, 1), 3.0), (date(2025, 3, 2), 4.0)]
+
+
+def test_fleet_ingest_rejects_bad_rows(app):
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.commit()
+		csv = b"user_id,timestamp,kwh\n1,2025-03-01T10:00,0.5\n2,2025-03-01T10:00,0.5\n1,bad,0.5\n1,2025-03-01T11:00,-1\n"
+		assert app.test_client().post("/admin/readings?format=csv", data=csv, content_type="text/csv").status_code == 403
+		report = ingest_readings(iter_records(io.BytesIO(csv), "csv"))
+		assert report.readings == 1 and report.rejected == 3
+		ndjson = b'{"user_id": 1.5, "date": "2025-03-02", "kwh": 1}\n{"user_id": true, "date": "2025-03-02", "kwh": 1}\n{"user_id": 1.0, "date": "2025-03-02", "kwh": 2}\n'
+		report = ingest_readings(iter_records(io.BytesIO(ndjson), "ndjson"))
+		assert report.readings == 1 and [r["error"] for r in report.rejects] == ["user_id must be a whole number"] * 2
+		assert db.session.execute(db.select(Log.kwh).where(Log.date == date(2025, 3, 2))).scalar_one() == 2
+
+
+def test_dashboard_plots_metered_trend(client, app):
+	client.get("/dashboard")
+	today = date.today()
+	body = "\n".join(f'{{"date": "{today - timedelta(days=i)}", "kwh": {i + 1}.5}}' for i in range(3))
+	for bad in ("-1", "0", "x", "50001"):
+		resp = client.post(f"/readings?format=ndjson&batch_size={bad}", data=body, content_type="application/x-ndjson")
+		assert resp.status_code == 400 and "batch_size" in resp.get_json()["error"]
+	resp = client.post("/readings?format=ndjson", data=body, content_type="application/x-ndjson")
+	assert resp.get_json()["days_upserted"] == 3
+	page = client.get("/dashboard").get_data(as_text=True)
+	assert "Metered kWh/day" in page
+	assert "[null, null, null, null, 3.5, 2.5, 1.5]" in page
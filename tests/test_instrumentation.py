@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from app import create_app, db
+from app.models import Appliance, User
+from app.instrumentation import SamplingProfiler, timed
+
+
+@pytest.fixture
+def instrumented(tmp_path):
+	app = create_app({
+		"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.sqlite'}", "INSTRUMENTATION": True, "ADMIN_TOKEN": "t",
+	})
+	client = app.test_client()
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add(Appliance(user_id=1, type="bulb", power_w=60, quantity=4, hours_per_day=5, days_per_week=7))
+		db.session.commit()
+	return app, client
+
+
+def test_disabled_by_default(app, client):
+	assert "instrumentation" not in app.extensions
+	assert client.get("/metrics").status_code == 404
+	with app.app_context(), timed("noop"):
+		pass
+	assert "Server-Timing" not in client.get("/dashboard").headers
+
+
+def test_request_breakdown_and_metrics(instrumented):
+	app, client = instrumented
+	response = client.get("/dashboard")
+	timing = response.headers["Server-Timing"]
+	assert "sql;dur=" in timing and "render;dur=" in timing and "recommendations" not in timing
+	client.get("/recommendations")
+	client.get("/no-such-page")
+
+	stats = app.extensions["instrumentation"].routes
+	dash = stats[("main.dashboard", "GET", 200)]
+	assert dash.count == 1 and dash.sql_queries > 0 and 0 < dash.sql_seconds < dash.seconds and dash.render_seconds > 0
+	assert ("unmatched", "GET", 404) in stats
+
+	text = client.get("/metrics").data.decode()
+	assert 'app_request_seconds_count{endpoint="main.dashboard",method="GET",status="200"} 1' in text
+	assert 'app_request_seconds_bucket{endpoint="main.dashboard",method="GET",status="200",le="+Inf"} 1' in text
+	assert 'phase="sql"' in text and 'phase="render"' in text and 'phase="compute"' in text
+	assert 'app_section_seconds_count{section="recommendations"} 1' in text
+	assert 'app_sql_queries_total{endpoint="main.recommendations"' in text
+
+
+def test_sampling_profiler(instrumented):
+	app, client = instrumented
+
+	def busy_loop_for_profile():
+		end = time.perf_counter() + 0.3
+		while time.perf_counter() < end:
+			sum(range(1000))
+
+	worker = threading.Thread(target=busy_loop_for_profile)
+	worker.start()
+	profiler = SamplingProfiler(0.002).run(0.2)
+	worker.join()
+	assert profiler.samples > 10
+	assert any("busy_loop_for_profile" in stack for stack in profiler.stacks)
+
+	assert client.get("/admin/profile?seconds=0.05").status_code == 403
+	admin = {"X-Admin-Token": "t"}
+	assert client.get("/admin/profile?seconds=999", headers=admin).status_code == 400
+	response = client.get("/admin/profile?seconds=0.05&interval_ms=5", headers=admin)
+	assert response.status_code == 200 and int(response.headers["X-Profile-Samples"]) > 0
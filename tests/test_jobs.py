@@ -0,0 +1,78 @@
+import sys
+import types
+import pytest
+from app import jobs
+
+
+@pytest.fixture
+def fake_weasyprint(monkeypatch):
+	calls = []
+
+	def render(html):
+		calls.append(html)
+		return b"%PDF-fake"
+
+	monkeypatch.setitem(sys.modules, "weasyprint", types.ModuleType("weasyprint"))
+	monkeypatch.setattr(jobs, "render_pdf", render)
+	return calls
+
+
+def test_pdf_job_lifecycle_and_content_cache(app, client, fake_weasyprint):
+	json_headers = {"Accept": "application/json"}
+	resp = client.get("/export/pdf", headers=json_headers)
+	assert resp.status_code == 202
+	job = resp.get_json()
+	app.extensions["report_jobs"].join(timeout=5)
+
+	status = client.get(job["status_url"], headers=json_headers).get_json()
+	assert status["status"] == "done"
+	download = client.get(status["download_url"])
+	assert download.data == b"%PDF-fake"
+
+	# Unchanged report is served straight from the finished job
+	again = client.get("/export/pdf")
+	assert again.status_code == 200 and again.data == b"%PDF-fake"
+	assert len(fake_weasyprint) == 1
+
+	# Changing appliances changes the content hash → new job
+	client.post("/appliances", data={"type": "tv", "power_w": "100", "quantity": "1", "hours_per_day": "1", "days_per_week": "7"})
+	resp = client.get("/export/pdf", headers=json_headers)
+	assert resp.status_code == 202 and resp.get_json()["id"] != job["id"]
+	app.extensions["report_jobs"].join(timeout=5)
+	assert len(fake_weasyprint) == 2
+
+
+def test_pdf_job_failure_is_reported(app, client, monkeypatch):
+	monkeypatch.setitem(sys.modules, "weasyprint", types.ModuleType("weasyprint"))
+
+	def boom(html):
+		raise RuntimeError("no fonts")
+
+	monkeypatch.setattr(jobs, "render_pdf", boom)
+	job = client.get("/export/pdf", headers={"Accept": "application/json"}).get_json()
+	app.extensions["report_jobs"].join(timeout=5)
+	status = client.get(job["status_url"], headers={"Accept": "application/json"}).get_json()
+	assert status == {"id": job["id"], "status": "failed", "status_url": job["status_url"], "error": "no fonts"}
+	assert "failed" in client.get(job["status_url"]).get_data(as_text=True)
+
+
+def test_lost_pending_jobs_are_failed_by_the_status_page(app, client):
+	from datetime import datetime, timedelta
+	from app import db
+	from app.models import ReportJob, User
+
+	client.get("/dashboard")
+	old = datetime.utcnow() - timedelta(seconds=301)
+	with app.app_context():
+		user_id = db.session.execute(db.select(User.id)).scalar_one()
+		db.session.add_all([
+			ReportJob(id="lost", user_id=user_id, content_hash="a", status="running", created_at=old),
+			ReportJob(id="fresh", user_id=user_id, content_hash="b", status="queued"),
+		])
+		db.session.commit()
+	json_headers = {"Accept": "application/json"}
+	status = client.get("/export/pdf/jobs/lost", headers=json_headers).get_json()
+	assert status["status"] == "failed" and "try again" in status["error"]
+	page = client.get("/export/pdf/jobs/lost").get_data(as_text=True)
+	assert "http-equiv=\"refresh\"" not in page and "Try again" in page
+	assert client.get("/export/pdf/jobs/fresh", headers=json_headers).get_json()["status"] == "queued"
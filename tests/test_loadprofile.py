@@ -0,0 +1,116 @@
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from app import db
+from app.models import Appliance, User
+from app.loadprofile import CLASSES, HOURS_PER_YEAR, calendar_index, classify, household_profile, open_profiles, profile_stats, simulate, simulate_fleet
+
+
+def _frame(rows):
+	return pd.DataFrame(rows, columns=["user_id", "type", "power_w", "quantity", "hours_per_day", "days_per_week"])
+
+
+def test_calendar_index():
+	idx = calendar_index(2025)  # 1 Jan 2025 was a Wednesday
+	assert idx.shape == (HOURS_PER_YEAR,)
+	assert idx[0] == (0 * 7 + 2) * 24 and idx[23] == (0 * 7 + 2) * 24 + 23
+	assert idx[-1] == (11 * 7 + 2) * 24 + 23  # 31 Dec 2025, Wednesday, 23:00
+	leap = calendar_index(2024)
+	assert leap.shape == (HOURS_PER_YEAR + 24,)
+	assert leap[-1] == (11 * 7 + 1) * 24 + 23  # 31 Dec 2024, Tuesday, 23:00
+
+
+def test_classify():
+	assert [CLASSES[k] for k in classify(["Bulb", "AC", "geyser", "toaster", "unknown"])] == ["lighting", "ac", "geyser", "kitchen", "other"]
+
+
+def test_annual_energy_and_peaks():
+	frame = _frame([
+		(1, "router", 10, 1, 24, 7),
+		(1, "fridge", 150, 1, 24, 7),
+		(2, "bulb", 10, 6, 5, 7),
+		(2, "ac", 1500, 1, 8, 7),
+		(3, "tv", 100, 1, 4, 5),
+	])
+	profiles = simulate(frame, pd.Index([1, 2, 3, 4]), 2025)
+	assert profiles.shape == (4, HOURS_PER_YEAR) and profiles.dtype == np.float32
+	daily = np.array([0.01 * 24 + 0.15 * 24, 0.06 * 5 + 1.5 * 8, 0.1 * 4 * 5 / 7, 0.0])
+	assert np.allclose(profiles.sum(axis=1), daily * 365, rtol=0.01)
+	assert not profiles[3].any()
+	# Router load is flat; lights run in the evening; AC peaks in summer
+	assert profiles[0].min() > 0.01 and profiles[0].reshape(-1, 24).std(axis=1).max() < 1e-6
+	stats = profile_stats(profiles, 2025)
+	assert stats.loc[1, "peak_kw"] == pytest.approx(1.56, abs=0.01)
+	assert stats.loc[1, "peak_at"].hour == 22
+	monthly = profiles[1].reshape(-1, 24).sum(axis=1)
+	assert monthly[120:150].sum() > 5 * monthly[:30].sum()  # May vs January
+	assert 0 < stats.loc[1, "load_factor"] < 1
+	day = profiles[1].reshape(-1, 24)
+	assert day[:, 19].mean() > day[:, 3].mean()
+
+
+def test_household_profile_and_fleet(app, tmp_path):
+	with app.app_context():
+		db.session.add_all([User(id=i, name=str(i)) for i in (1, 2, 3)])
+		db.session.add_all([
+			Appliance(user_id=1, type="bulb", power_w=10, quantity=4, hours_per_day=5, days_per_week=7),
+			Appliance(user_id=2, type="geyser", power_w=2000, quantity=1, hours_per_day=1, days_per_week=7),
+			Appliance(user_id=3, type="fridge", power_w=120, quantity=1, hours_per_day=24, days_per_week=7),
+		])
+		db.session.commit()
+		one = household_profile(Appliance.query.filter_by(user_id=2).all(), 2025)
+		assert sum(one["hourly_share"]) == pytest.approx(1.0)
+		assert one["annual_kwh"] == pytest.approx(2 * 365, rel=0.01)
+		assert one["average_day_kw"].index(max(one["average_day_kw"])) == 6  # morning hot water
+
+		summary, stats = simulate_fleet(tmp_path / "fleet", [1, 2, 3], 2025, chunk_size=2)
+		ids, profiles = open_profiles(tmp_path / "fleet")
+		assert ids.tolist() == [1, 2, 3] and isinstance(profiles, np.memmap) and profiles.shape == (3, HOURS_PER_YEAR)
+		assert stats["user_id"].tolist() == [1, 2, 3]
+		total = np.asarray(profiles, dtype=np.float64).sum(axis=0)
+		assert summary.coincident_peak_kw == pytest.approx(total.max(), rel=1e-6)
+		assert summary.sum_of_peaks_kw >= summary.coincident_peak_kw
+		assert summary.diversity_factor >= 1.0
+
+
+@pytest.mark.parametrize("year", [2024, 2025])
+def test_household_profile_matches_fleet_simulation(year):
+	rows = [
+		(0, "bulb", 10, 6, 5, 7), (0, "LED", 9, 2, 5, 7), (0, "ac", 1500, 1, 8, 6), (0, "fridge", 150, 1, 24, 7),
+		(0, "tv", 100, 1, 4, 5), (0, "wm", 500, 1, 0.7, 4), (0, "geyser", 2000, 1, 1, 7), (0, "gadget", 30, 2, 30, 7),
+	]
+	appliances = [Appliance(type=t, power_w=w, quantity=q, hours_per_day=h, days_per_week=d) for _, t, w, q, h, d in rows]
+	one = household_profile(appliances, year)
+	profile = simulate(_frame(rows), pd.Index([0]), year)
+	stats = profile_stats(profile, year).iloc[0]
+	assert profile.shape[1] == (8784 if year == 2024 else 8760)
+	assert one["annual_kwh"] == pytest.approx(stats["annual_kwh"], rel=1e-5)
+	assert one["peak_kw"] == pytest.approx(stats["peak_kw"], abs=1e-3)
+	assert one["peak_at"] == pd.Timestamp(stats["peak_at"]).to_pydatetime()
+	assert one["load_factor"] == pytest.approx(stats["load_factor"], abs=1e-3)
+	day = profile[0].reshape(-1, 24).mean(axis=0, dtype=np.float64)
+	assert one["average_day_kw"] == pytest.approx(day.tolist(), abs=1e-3)
+	assert one["busiest_hour"] == int(day.argmax())
+
+
+def test_dashboard_does_not_import_numpy_or_pandas(tmp_path):
+	probe = (
+		"import sys\n"
+		"from app import create_app, db\n"
+		"from app.models import Appliance, User\n"
+		f"app = create_app({{'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///{tmp_path / 'cold.sqlite'}'}})\n"
+		"with app.app_context():\n"
+		"\tdb.session.add(User(id=1, name='a'))\n"
+		"\tdb.session.add(Appliance(user_id=1, type='AC', power_w=1500, quantity=1, hours_per_day=6, days_per_week=7))\n"
+		"\tdb.session.commit()\n"
+		"client = app.test_client()\n"
+		"with client.session_transaction() as sess:\n"
+		"\tsess['user_id'] = 1\n"
+		"assert b'Typical day: average kW by hour' in client.get('/dashboard').data\n"
+		"print(sorted(m for m in ('numpy', 'pandas') if m in sys.modules))\n"
+	)
+	out = subprocess.run([sys.executable, "-c", probe], cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True, check=True)
+	assert out.stdout.strip().splitlines()[-1] == "[]"
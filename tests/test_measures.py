@@ -0,0 +1,113 @@
+from collections import Counter
+import pytest
+from sqlalchemy import select
+from app import db
+from app.models import Appliance, RecommendationResult, User
+from app.recommendations import RULES, Rule, generate_recommendations, rank_key
+
+SLABS = {"name": "LT-I", "fixed_charge": 100, "slabs": [{"upto_kwh": 100, "rate": 4}, {"upto_kwh": None, "rate": 12}]}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+	"""
+	Counts rule evaluations per code.
+	"""
+	counts = Counter()
+	for code, rule in list(RULES.items()):
+		def counted(target, ctx, _evaluate=rule.evaluate, _code=code):
+			counts[_code] += 1
+			return _evaluate(target, ctx)
+
+		monkeypatch.setitem(RULES, code, Rule(code, counted, rule.types))
+	return counts
+
+
+@pytest.fixture
+def household(app, client):
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a", tariff=8.0, ef=0.7))
+		db.session.commit()
+	client.post("/appliances/preset", data={"pack": "basic_2bhk"})
+	return client
+
+
+def _expected(app):
+	with app.app_context():
+		user = db.session.get(User, 1)
+		appliances = db.session.execute(select(Appliance).where(Appliance.user_id == 1).order_by(Appliance.id)).scalars().all()
+		return [(r.key, r.delta_cost_month, r.payback_months, r.title) for r in generate_recommendations(appliances, user.tariff, user.ef)]
+
+
+def _shown(app, client):
+	recs = client.get("/api/v1/recommendations").get_json()["recommendations"]
+	return [(r["key"], r["delta_cost_month"], r["payback_months"], r["title"]) for r in recs]
+
+
+def test_change_events_keep_the_full_ranking(app, household):
+	household.post("/appliances", data={"type": "bulb", "power_w": 100, "quantity": 3, "hours_per_day": 4})
+	household.post("/appliances", data={"type": "fridge", "power_w": 150, "quantity": 1, "hours_per_day": 24, "star_label": "2-star"})
+	household.post("/appliances/2/delete")
+	household.post("/appliances", data={"type": "AC", "power_w": 1800, "quantity": 1, "hours_per_day": 2})
+	household.post("/appliances/remove_type", data={"type": "bulb"})
+	expected = _expected(app)
+	assert _shown(app, household) == expected  # the ranking the write path cached
+	app.extensions["user_data_cache"].clear()
+	assert _shown(app, household) == expected  # read back from the stored rows
+	with app.app_context():
+		stored = db.session.execute(select(RecommendationResult.key)).scalars().all()
+		assert sorted(stored) == sorted(k for k, *_ in expected)
+
+
+def test_only_affected_pairs_are_evaluated(app, household, calls):
+	household.post("/appliances", data={"type": "fan", "power_w": 70, "quantity": 2, "hours_per_day": 8})
+	assert calls == {"standby_cut": 1}  # no rule targets fans; the device count changed
+	calls.clear()
+	household.post("/appliances", data={"type": "tube", "power_w": 36, "quantity": 4, "hours_per_day": 5})
+	assert calls == {"lighting_swap": 1, "standby_cut": 1}
+	calls.clear()
+	household.post("/appliances/1/delete")
+	assert calls == {"standby_cut": 1}
+	calls.clear()
+	app.extensions["user_data_cache"].clear()
+	household.get("/recommendations")
+	assert not calls  # page views read the stored results
+	assert _shown(app, household) == _expected(app)
+
+
+def test_basis_and_plan_changes_recompute_everything(app, household, calls):
+	household.post("/onboarding", data={"name": "a", "tariff": 10, "ef": 0.7, "household_size": 3, "city": ""})
+	household.get("/recommendations")
+	assert calls["lighting_swap"] == 1 and calls["ac_setpoint"] == 1 and calls["fridge_upgrade"] == 1
+	assert _shown(app, household) == _expected(app)
+
+	# On a slab plan every ₹ saving depends on total usage: an added appliance re-prices all measures
+	plan = household.post("/admin/tariffs", json=SLABS).get_json()
+	household.post("/onboarding", data={"name": "a", "tariff": 10, "ef": 0.7, "household_size": 3, "city": "", "tariff_plan_id": str(plan["id"])})
+	calls.clear()
+	household.post("/appliances", data={"type": "geyser", "power_w": 2000, "quantity": 1, "hours_per_day": 1})
+	assert calls["ac_setpoint"] == 1 and calls["fridge_upgrade"] == 1
+	with app.app_context():
+		from app.tariffs import get_plans
+
+		user = db.session.get(User, 1)
+		appliances = db.session.execute(select(Appliance).where(Appliance.user_id == 1).order_by(Appliance.id)).scalars().all()
+		expected = generate_recommendations(appliances, user.tariff, user.ef, None, get_plans()[plan["id"]])
+	assert _shown(app, household) == [(r.key, r.delta_cost_month, r.payback_months, r.title) for r in expected]
+
+
+def test_rank_key_matches_generate_order():
+	class A:
+		def __init__(self, id, type, power_w, quantity=1, hours_per_day=5.0, star_label=None):
+			self.id, self.type, self.power_w, self.quantity, self.hours_per_day = id, type, power_w, quantity, hours_per_day
+			self.days_per_week, self.star_label = 7, star_label
+
+		def daily_kwh(self):
+			return self.power_w * self.quantity * self.hours_per_day / 1000.0
+
+	# Equal savings on two bulbs: ties fall back to registry then appliance order
+	appliances = [A(1, "bulb", 60), A(2, "bulb", 60), A(3, "AC", 1500), A(4, "fridge", 150), A(5, "tube", 36, 2)]
+	recs = generate_recommendations(appliances, 8.0, 0.7)
+	assert sorted(recs, key=rank_key) == recs
@@ -0,0 +1,163 @@
+from datetime import date
+import pytest
+from sqlalchemy import func, select
+from app import create_app, db
+from app import pipeline
+from app.assumptions import bump_user_versions, get_assumptions, save_assumptions
+from app.calculations import compute_kpis
+from app.measures import apply_appliance_changes, result_basis
+from app.models import Appliance, PipelineChunk, RecommendationResult, Scenario, ScenarioMeasure, User, UserKpiSnapshot
+from app.pipeline import plan_chunks, run_pipeline, run_status
+from app.recommendations import generate_recommendations
+from app.scenarios import reevaluate
+from app.synthetic import SyntheticSpec, generate
+from app.tariffs import assign_plan, get_plans, save_plan
+
+SPEC = SyntheticSpec(users=130, seed=4, days=0, end=date(2025, 3, 4), scenario_share=0.4, block_size=65)
+SLABS = {"name": "LT-I", "fixed_charge": 100, "slabs": [{"upto_kwh": 100, "rate": 4}, {"upto_kwh": None, "rate": 12}]}
+
+
+def _fleet(app):
+	with app.app_context():
+		generate(SPEC)
+		plan = save_plan(SLABS)
+		assign_plan(3, plan.id)
+		db.session.commit()
+		# Saved lighting measures are re-priced by the run
+		save_assumptions({"default_led_w": 7.0})
+
+
+def _snapshot_and_results(app, run_id=None):
+	with app.app_context():
+		stmt = select(*[c for c in UserKpiSnapshot.__table__.c if c.name not in ("id", "run_id")])
+		if run_id is not None:
+			stmt = stmt.where(UserKpiSnapshot.run_id == run_id)
+		snapshots = db.session.execute(stmt.order_by(UserKpiSnapshot.user_id)).all()
+		results = db.session.execute(
+			select(*[c for c in RecommendationResult.__table__.c if c.name != "id"]).order_by(RecommendationResult.user_id, RecommendationResult.key)
+		).all()
+		return snapshots, results
+
+
+def _measures():
+	return db.session.execute(
+		select(ScenarioMeasure.id, ScenarioMeasure.title, ScenarioMeasure.delta_cost_month, Scenario.saved_cost)
+		.join(Scenario, Scenario.id == ScenarioMeasure.scenario_id)
+		.order_by(ScenarioMeasure.id)
+	).all()
+
+
+def test_plan_chunks():
+	assert plan_chunks([1, 2, 5, 9, 10], 2) == [(1, 2), (5, 9), (10, 10)]
+	assert plan_chunks([], 3) == []
+
+
+def test_run_matches_per_household_calculations(app):
+	_fleet(app)
+	with app.app_context():
+		before = _measures()
+		report = run_pipeline(chunk_size=40)
+		assert report.to_dict()["users"] == 130 and report.chunks == 4 and not report.resumed
+		assert report.measures_updated > 0
+		after = _measures()
+		assert len(after) == len(before) and after != before
+
+		plans, assumptions = get_plans(), get_assumptions()
+		for user in db.session.execute(select(User).order_by(User.id)).scalars():
+			plan = plans.get(user.tariff_assignment.plan_id) if user.tariff_assignment else None
+			appliances = db.session.execute(select(Appliance).where(Appliance.user_id == user.id).order_by(Appliance.id)).scalars().all()
+			snapshot = db.session.execute(select(UserKpiSnapshot).where(UserKpiSnapshot.user_id == user.id)).scalar_one()
+			kpis = compute_kpis(appliances, user.tariff, user.ef, plan)
+			assert {k: getattr(snapshot, k) for k in kpis} == kpis
+			recs = generate_recommendations(appliances, user.tariff, user.ef, assumptions, plan)
+			stored = db.session.execute(
+				select(RecommendationResult).where(RecommendationResult.user_id == user.id).order_by(RecommendationResult.id)
+			).scalars().all()
+			assert [(r.key, r.delta_cost_month, r.title) for r in stored] == [(r.key, r.delta_cost_month, r.title) for r in recs]
+			# Page views read these rows rather than recomputing
+			assert {r.basis for r in stored} <= {result_basis(user, plan)}
+			assert snapshot.potential_saving_month == round(sum(r.delta_cost_month for r in recs), 2)
+
+		# The run left saved scenarios exactly where a full re-evaluation puts them
+		reevaluate(db.session.execute(select(Scenario.user_id)).scalars().all(), household=True)
+		assert _measures() == after
+		db.session.rollback()
+		assert run_status()["status"] == "done"
+
+
+def test_crashed_run_resumes_at_the_first_unfinished_range(app, monkeypatch):
+	_fleet(app)
+	write_chunk = pipeline.write_chunk
+	written = []
+
+	def crash_on_third(result):
+		if len(written) == 2:
+			raise RuntimeError("worker node lost")
+		write_chunk(result)
+		written.append(result.first_user_id)
+
+	monkeypatch.setattr(pipeline, "write_chunk", crash_on_third)
+	with app.app_context():
+		with pytest.raises(RuntimeError):
+			run_pipeline(chunk_size=40)
+		status = run_status()
+		assert (status["status"], status["chunks"], status["chunks_done"], status["users_done"]) == ("running", 4, 2, 80)
+		assert db.session.execute(select(func.count(UserKpiSnapshot.id))).scalar() == 80
+
+	monkeypatch.setattr(pipeline, "write_chunk", write_chunk)
+	with app.app_context():
+		report = run_pipeline(chunk_size=10)  # the resumed run keeps its own ranges
+		assert (report.run_id, report.resumed, report.skipped_chunks, report.chunks, report.users) == (status["run_id"], True, 2, 2, 50)
+		assert db.session.execute(select(func.count(UserKpiSnapshot.id))).scalar() == 130
+		assert db.session.execute(select(func.count(PipelineChunk.id)).where(PipelineChunk.done.is_(False))).scalar() == 0
+		resumed = _snapshot_and_results(app, report.run_id)
+
+		again = run_pipeline(chunk_size=40)
+		assert not again.resumed and again.run_id != report.run_id and again.measures_updated == 0
+		assert db.session.execute(select(func.count(UserKpiSnapshot.id)).where(UserKpiSnapshot.run_id == again.run_id)).scalar() == 130
+	assert resumed == _snapshot_and_results(app, again.run_id)
+
+
+def test_household_written_during_the_run_keeps_its_live_results(app, monkeypatch):
+	_fleet(app)
+	write_chunk = pipeline.write_chunk
+
+	def add_bulb_then_write(result):
+		if result.first_user_id == 1:
+			# Another request adds an appliance after the range was read
+			user = db.session.get(User, 1)
+			bulb = Appliance(user_id=1, type="bulb", power_w=60, quantity=4, hours_per_day=5, days_per_week=7)
+			db.session.add(bulb)
+			db.session.flush()
+			apply_appliance_changes(user, get_assumptions(), None, [bulb.id])
+			bump_user_versions([1])
+			db.session.commit()
+		write_chunk(result)
+
+	monkeypatch.setattr(pipeline, "write_chunk", add_bulb_then_write)
+	with app.app_context():
+		report = run_pipeline(chunk_size=40)
+		assert report.stale_users == 1 and report.to_dict()["stale_users"] == 1
+		user = db.session.get(User, 1)
+		appliances = db.session.execute(select(Appliance).where(Appliance.user_id == 1).order_by(Appliance.id)).scalars().all()
+		recs = generate_recommendations(appliances, user.tariff, user.ef, get_assumptions(), None)
+		stored = db.session.execute(select(RecommendationResult.key).where(RecommendationResult.user_id == 1)).scalars().all()
+		assert sorted(stored) == sorted(r.key for r in recs) and any(k.startswith("lighting_swap") for k in stored)
+		# The rest of the range was written as usual
+		assert db.session.execute(select(func.count(UserKpiSnapshot.id))).scalar() == 130
+
+
+def test_process_pool_matches_in_process(app, tmp_path):
+	_fleet(app)
+	with app.app_context():
+		run_pipeline(workers=1, chunk_size=30)
+
+	other = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'parallel.sqlite'}"})
+	_fleet(other)
+	runner = other.test_cli_runner()
+	result = runner.invoke(args=["pipeline", "run", "--workers", "2", "--chunk-size", "30"])
+	assert result.exit_code == 0, result.output
+	assert '"users": 130' in result.output and '"workers": 2' in result.output
+	assert _snapshot_and_results(app) == _snapshot_and_results(other)
+	status = runner.invoke(args=["pipeline", "status"])
+	assert '"chunks_done": 5' in status.output
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Appliance, User
+
+# Most SQL statements each page may issue; cold = the household's KPI/recommendation cache is empty
+ROUTE_BUDGETS = {
+	"/dashboard": (7, 6),
+	"/scenarios": (5, 3),
+	"/recommendations": (3, 2),
+	"/appliances": (2, 2),
+	"/onboarding": (3, 2),
+	"/api/v1/kpis": (7, 6),
+	"/api/v1/scenarios": (4, 3),
+	"/export/csv": (2, 2),
+}
+
+
+@contextmanager
+def count_queries(app):
+	statements = []
+
+	def record(conn, cursor, statement, parameters, context, executemany):
+		statements.append(statement)
+
+	with app.app_context():
+		engine = db.engine
+	event.listen(engine, "before_cursor_execute", record)
+	try:
+		yield statements
+	finally:
+		event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def household(app, client):
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a", city="Delhi"))
+		db.session.add_all([
+			Appliance(user_id=1, type=t, power_w=w, quantity=q, hours_per_day=h, days_per_week=7)
+			for t, w, q, h in (("bulb", 60, 8, 6), ("AC", 1500, 1, 6), ("fan", 70, 3, 8), ("fridge", 150, 1, 24))
+		])
+		db.session.commit()
+	client.post("/scenarios", data={"name": "S1", "measures": ["ac_setpoint"]})
+	client.post("/scenarios", data={"name": "S2", "measures": ["lighting_swap"]})
+	# Load the per-process assumptions and tariff stores; budgets cover steady-state requests
+	client.get("/onboarding")
+	return client
+
+
+@pytest.mark.parametrize("path", sorted(ROUTE_BUDGETS))
+def test_route_query_budget(app, household, path):
+	cold, warm = ROUTE_BUDGETS[path]
+	app.extensions["user_data_cache"].clear()
+	with count_queries(app) as statements:
+		assert household.get(path).status_code == 200
+	assert len(statements) <= cold, "\n".join(statements)
+	with count_queries(app) as statements:
+		response = household.get(path)
+		response.get_data()
+	assert response.status_code == 200
+	assert len(statements) <= warm, "\n".join(statements)
+
+
+def test_eager_tariff_assignment_and_single_scenario_query(app, household):
+	plan = household.post("/admin/tariffs", json={"name": "Slabs", "slabs": [{"upto_kwh": 100, "rate": 4}, {"upto_kwh": None, "rate": 9}]}).get_json()
+	household.post("/onboarding", data={"name": "a", "tariff": 8, "ef": 0.7, "household_size": 3, "city": "", "tariff_plan_id": str(plan["id"])})
+	with count_queries(app) as statements:
+		assert "Slabs" in household.get("/onboarding").data.decode()
+	# The assignment comes joined to the user row, never as its own query
+	assert not any(s.startswith("SELECT user_tariffs") for s in statements)
+
+	with count_queries(app) as statements:
+		body = household.get("/api/v1/scenarios").get_json()
+	assert sum("FROM scenarios" in s for s in statements) == 1
+	assert [s["name"] for s in body["scenarios"]] == ["S1", "S2"] and body["bar_labels"] == ["Baseline", "S2"]
+	assert body["measure_labels"] and all(label for label in body["measure_labels"])
+
+
+def test_delete_is_one_statement_and_scoped_to_owner(app, household):
+	with app.app_context():
+		db.session.add(User(id=2, name="b"))
+		other = Appliance(user_id=2, type="tv", power_w=90, quantity=1, hours_per_day=3, days_per_week=7)
+		db.session.add(other)
+		db.session.commit()
+		other_id = other.id
+		mine = db.session.query(Appliance.id).filter_by(user_id=1).first()[0]
+
+	assert household.post(f"/appliances/{other_id}/delete").status_code == 404
+	with count_queries(app) as statements:
+		assert household.post(f"/appliances/{mine}/delete").status_code == 302
+	deletes = [i for i, s in enumerate(statements) if s.startswith("DELETE FROM appliances")]
+	# No load-then-delete (appliances are read afterwards only to re-evaluate saved scenarios)
+	assert len(deletes) == 1 and not any(s.startswith("SELECT appliances") for s in statements[: deletes[0]])
+	with app.app_context():
+		assert db.session.get(Appliance, other_id) is not None
+		assert db.session.get(Appliance, mine) is None
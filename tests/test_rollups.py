@@ -0,0 +1,61 @@
+from datetime import date
+from app import db
+from app.models import CityRollup, Log, UsageRollup, User
+from app.ingest import ingest_readings
+from app.rollups import check, period_start, period_usage, city_usage, rebuild
+
+
+def _records(rows):
+	return [(i + 1, r, None) for i, r in enumerate(rows)]
+
+
+def test_period_start():
+	d = date(2025, 3, 13)  # Thursday
+	assert period_start(d, "day") == d
+	assert period_start(d, "week") == date(2025, 3, 10)
+	assert period_start(d, "month") == date(2025, 3, 1)
+
+
+def test_ingest_maintains_rollups(app):
+	with app.app_context():
+		db.session.add_all([User(id=1, name="a", city="Pune"), User(id=2, name="b", city="Pune")])
+		db.session.commit()
+		ingest_readings(_records([{"date": "2025-03-01", "kwh": 2}, {"date": "2025-03-03", "kwh": 3}]), user_id=1)
+		ingest_readings(_records([{"date": "2025-03-03", "kwh": 1}]), user_id=1)
+		ingest_readings(_records([{"date": "2025-03-03", "kwh": 4}]), user_id=1, mode="replace")
+		ingest_readings(_records([{"user_id": 2, "date": "2025-03-03", "kwh": 5}]))
+
+		assert period_usage(1, "month", date(2025, 3, 20)) == (6.0, 2)
+		assert period_usage(1, "week", date(2025, 3, 3)) == (4.0, 1)
+		assert period_usage(1, "day", date(2025, 3, 2)) == (0.0, 0)
+		assert city_usage("Pune", "month", date(2025, 3, 1)) == (11.0, 3)
+		assert check() == []
+
+
+def test_check_detects_drift_and_rebuild_repairs(app):
+	with app.app_context():
+		db.session.add(User(id=1, name="a", city="Pune"))
+		db.session.commit()
+		ingest_readings(_records([{"date": "2025-03-01", "kwh": 2}]), user_id=1)
+		Log.query.one().kwh = 10.0  # edited behind the rollups' back
+		db.session.commit()
+		problems = check()
+		assert {p["table"] for p in problems} == {"usage_rollups", "city_rollups"}
+		assert rebuild() == {"usage_rows": 3, "city_rows": 3}
+		assert check() == []
+		assert period_usage(1, "month", date(2025, 3, 1)) == (10.0, 1)
+
+
+def test_city_change_moves_history(app, client):
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a", city="Pune"))
+		db.session.commit()
+		ingest_readings(_records([{"date": "2025-03-01", "kwh": 2}]), user_id=1)
+	client.post("/onboarding", data={"name": "a", "tariff": 8, "ef": 0.7, "household_size": 3, "city": "Delhi"})
+	with app.app_context():
+		assert city_usage("Delhi", "month", date(2025, 3, 1)) == (2.0, 1)
+		assert city_usage("Pune", "month", date(2025, 3, 1)) == (0.0, 0)
+		assert check() == []
+		assert UsageRollup.query.count() == 3 and CityRollup.query.count() == 6
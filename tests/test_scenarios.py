@@ -0,0 +1,92 @@
+import json
+import pytest
+from sqlalchemy import select
+from app import db
+from app.models import Appliance, Scenario, ScenarioMeasure, User
+from app.scenarios import backfill_measures
+
+SLABS = {"name": "LT-I", "fixed_charge": 100, "slabs": [{"upto_kwh": 100, "rate": 4}, {"upto_kwh": None, "rate": 12}]}
+
+
+@pytest.fixture
+def household(app, client):
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a", tariff=8.0, ef=0.7))
+		db.session.add_all([
+			Appliance(id=i, user_id=1, type=t, power_w=w, quantity=q, hours_per_day=h, days_per_week=7)
+			for i, (t, w, q, h) in enumerate((("bulb", 60, 8, 6), ("AC", 1500, 1, 6), ("tube", 36, 4, 5)), start=1)
+		])
+		db.session.commit()
+	client.post("/scenarios", data={"name": "S1", "measures": ["lighting_swap", "ac_setpoint", "standby_cut"]})
+	return client
+
+
+def _measures(app):
+	with app.app_context():
+		rows = db.session.execute(select(ScenarioMeasure).order_by(ScenarioMeasure.position)).scalars().all()
+		scenario = db.session.execute(select(Scenario)).scalar_one()
+		return {(m.code, m.appliance_id): (m.delta_kwh_month, m.delta_cost_month) for m in rows}, scenario
+
+
+def test_save_stores_one_row_per_measure(app, household):
+	measures, scenario = _measures(app)
+	assert set(measures) == {("lighting_swap", 1), ("lighting_swap", 3), ("ac_setpoint", 2), ("standby_cut", None)}
+	assert scenario.measures_json is None
+	assert scenario.saved_kwh == pytest.approx(sum(kwh for kwh, _ in measures.values()), abs=0.05)
+	assert scenario.saved_cost == pytest.approx(sum(cost for _, cost in measures.values()), abs=0.05)
+	page = household.get("/scenarios").data.decode()
+	assert "Swap 8x 60W bulbs to 9W LEDs" in page
+
+
+def test_appliance_changes_touch_only_affected_measures(app, household):
+	before, _ = _measures(app)
+	household.post("/appliances", data={"type": "fan", "power_w": 70, "quantity": 2, "hours_per_day": 8})
+	after, scenario = _measures(app)
+	# One more device: only the standby measure grows
+	assert after[("standby_cut", None)][0] > before[("standby_cut", None)][0]
+	assert {k: v for k, v in after.items() if k[0] != "standby_cut"} == {k: v for k, v in before.items() if k[0] != "standby_cut"}
+
+	assert household.post("/appliances/1/delete").status_code == 302
+	after, scenario = _measures(app)
+	assert ("lighting_swap", 1) not in after and ("lighting_swap", 3) in after
+	assert scenario.saved_kwh == pytest.approx(sum(kwh for kwh, _ in after.values()), abs=0.05)
+	assert household.post("/appliances/99/delete").status_code == 404
+
+
+def test_tariff_and_plan_changes_reprice_measures(app, household):
+	before, _ = _measures(app)
+	household.post("/onboarding", data={"name": "a", "tariff": 10, "ef": 0.7, "household_size": 3, "city": ""})
+	after, scenario = _measures(app)
+	for key, (kwh, cost) in after.items():
+		assert kwh == before[key][0] and cost == pytest.approx(kwh * 10, abs=0.02)
+
+	plan = household.post("/admin/tariffs", json=SLABS).get_json()
+	household.post("/onboarding", data={"name": "a", "tariff": 10, "ef": 0.7, "household_size": 3, "city": "", "tariff_plan_id": str(plan["id"])})
+	on_plan, _ = _measures(app)
+	assert all(on_plan[key][1] == pytest.approx(kwh * 12, abs=0.02) for key, (kwh, _) in after.items())
+	# Editing the plan re-prices the saved measures of households on it
+	household.post("/admin/tariffs", json={**SLABS, "slabs": [{"upto_kwh": 100, "rate": 4}, {"upto_kwh": None, "rate": 6}]})
+	edited, scenario = _measures(app)
+	assert all(edited[key][1] == pytest.approx(kwh * 6, abs=0.02) for key, (kwh, _) in after.items())
+	assert scenario.saved_cost == pytest.approx(sum(cost for _, cost in edited.values()), abs=0.05)
+
+
+def test_backfill_converts_legacy_json(app, client):
+	legacy = [
+		{"code": "ac_setpoint", "title": "Raise AC", "details": {"appliance_id": 2}, "delta_kwh_month": 30.0, "delta_cost_month": 240.0, "delta_co2_month": 21.0, "payback_months": 0.0},
+		{"code": "lighting_swap", "title": "LEDs", "details": {"appliance_id": 1, "retrofit_cost": 640.0}, "delta_kwh_month": 12.5, "delta_cost_month": 100.0, "delta_co2_month": 8.75, "payback_months": 6.4},
+	]
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add_all([Scenario(user_id=1, name=f"old {i}", measures_json=json.dumps(legacy), saved_kwh=42.5) for i in range(3)])
+		db.session.commit()
+		assert backfill_measures(batch_size=2) == 3
+		assert backfill_measures() == 0
+		rows = db.session.execute(select(ScenarioMeasure).where(ScenarioMeasure.scenario_id == 1).order_by(ScenarioMeasure.position)).scalars().all()
+		assert [(m.code, m.appliance_id, m.retrofit_cost) for m in rows] == [("ac_setpoint", 2, 0.0), ("lighting_swap", 1, 640.0)]
+		assert db.session.execute(select(Scenario.measures_json).where(Scenario.measures_json.is_not(None))).first() is None
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	assert "LEDs" in client.get("/scenarios").data.decode()
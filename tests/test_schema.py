@@ -0,0 +1,24 @@
+from app import create_app, db
+from app.schema import schema_fingerprint
+
+
+def test_schema_created_once_per_fingerprint(app, monkeypatch):
+	calls = []
+	original = db.create_all
+	monkeypatch.setattr(db, "create_all", lambda *a, **kw: (calls.append(1), original(*a, **kw)))
+	url = app.config["SQLALCHEMY_DATABASE_URI"]
+
+	create_app({"SQLALCHEMY_DATABASE_URI": url})
+	assert calls == []  # the fixture's boot recorded the schema
+	create_app({"SQLALCHEMY_DATABASE_URI": url, "AUTO_CREATE_SCHEMA": "always"})
+	assert calls == [1]
+
+
+def test_fingerprint_tracks_model_changes():
+	from sqlalchemy import MetaData, Table, Column, Integer, String
+
+	a, b = MetaData(), MetaData()
+	Table("t", a, Column("id", Integer, primary_key=True))
+	Table("t", b, Column("id", Integer, primary_key=True), Column("name", String(10)))
+	assert schema_fingerprint(a) != schema_fingerprint(b)
+	assert schema_fingerprint(db.metadata) == schema_fingerprint(db.metadata)
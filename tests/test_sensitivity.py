@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from app import db
+from app.models import Appliance, User
+from app.recommendations import generate_recommendations
+from app.sensitivity import evaluate, measure_params, run_sensitivity, sample_assumptions
+
+
+def _appliances():
+	return [
+		Appliance(id=1, user_id=1, type="bulb", power_w=60, quantity=10, hours_per_day=6, days_per_week=7),
+		Appliance(id=3, user_id=1, type="AC", power_w=1500, quantity=1, hours_per_day=6, days_per_week=7),
+		Appliance(id=4, user_id=1, type="fridge", power_w=150, quantity=1, hours_per_day=24, days_per_week=7, star_label="2-star"),
+	]
+
+
+def test_point_estimate_matches_generate_recommendations():
+	recs = generate_recommendations(_appliances(), 8.0, 0.7)
+	point = {"ac_coefficient_per_degree": 0.04, "default_led_w": 9.0, "default_standby_w": 10.0,
+		"default_standby_hours": 2.0, "lighting_cost_per_unit": 80.0, "tariff": 8.0, "ef": 0.7}
+	s = sample_assumptions(point, 4, np.random.default_rng(0), spreads={})
+	result = evaluate(measure_params(recs), s)
+	for i, r in enumerate(recs):
+		assert result["delta_cost"][i, 0] == pytest.approx(r.delta_cost_month, abs=0.01)
+		assert result["delta_co2"][i, 0] == pytest.approx(r.delta_co2_month, abs=0.01)
+		assert result["payback"][i, 0] == pytest.approx(r.payback_months, abs=0.1)
+
+
+def test_bands_are_ordered_and_reproducible():
+	report = run_sensitivity(_appliances(), 8.0, 0.7, samples=20000, seed=3)
+	assert report == run_sensitivity(_appliances(), 8.0, 0.7, samples=20000, seed=3, workers=2)
+	for m in report.measures:
+		p10, p50, p90 = m.delta_cost_month
+		assert p10 <= p50 <= p90
+	lighting = next(m for m in report.measures if m.key == "lighting_swap:1")
+	assert lighting.delta_cost_month[0] < 729.6 < lighting.delta_cost_month[2]  # point estimate inside the band
+	fridge = next(m for m in report.measures if m.code == "fridge_upgrade")
+	assert fridge.delta_kwh_month == (10.0, 10.0, 10.0)  # no uncertain input
+	assert report.monthly_cost[0] < report.monthly_kwh * 8.0 < report.monthly_cost[2]
+	with pytest.raises(ValueError):
+		run_sensitivity(_appliances(), 8.0, 0.7, samples=0)
+
+
+def test_sensitivity_route(app, client):
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add_all(_appliances())
+		db.session.commit()
+	data = client.get("/recommendations/sensitivity?samples=2000").get_json()
+	assert data["samples"] == 2000
+	assert set(data["measures"][0]["delta_cost_month"]) == {"p10", "p50", "p90"}
+	assert client.get("/recommendations/sensitivity?samples=10000000").status_code == 400
+
+
+def test_no_candidate_measures_gives_kpi_bands_only(app, client):
+	tv = [Appliance(id=1, user_id=1, type="tv", power_w=100, quantity=1, hours_per_day=4, days_per_week=7)]
+	report = run_sensitivity(tv, 8.0, 0.7, {"default_standby_w": 0}, samples=500, workers=2)
+	assert report.measures == [] and report.monthly_kwh == 12.0
+	assert report.monthly_cost[0] < 96.0 < report.monthly_cost[2]
+
+	from app.assumptions import save_assumptions
+
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add_all(tv)
+		db.session.commit()
+		save_assumptions({"default_standby_w": 0})
+	resp = client.get("/recommendations/sensitivity?samples=500")
+	assert resp.status_code == 200 and resp.get_json()["measures"] == []
+
+
+def test_plan_households_get_slab_aware_bands(app, client):
+	import math
+	from app.tariffs import CompiledTariff, assign_plan, save_plan
+
+	plan = CompiledTariff(1, "LT-I", [100, 300, math.inf], [4, 8, 12], 100.0)
+	recs = generate_recommendations(_appliances(), 8.0, 0.7, None, plan)
+	point = run_sensitivity(_appliances(), 8.0, 0.7, samples=50, spreads={}, plan=plan)
+	by_key = {m.key: m for m in point.measures}
+	for r in recs:
+		assert by_key[r.key].delta_cost_month[1] == pytest.approx(r.delta_cost_month, abs=0.01)
+	assert point.monthly_cost[1] == pytest.approx(plan.bill(point.monthly_kwh), abs=0.01)
+	report = run_sensitivity(_appliances(), 8.0, 0.7, samples=5000, seed=1, plan=plan)
+	assert report == run_sensitivity(_appliances(), 8.0, 0.7, samples=5000, seed=1, plan=plan, workers=2)
+	assert report.monthly_cost[0] < plan.bill(report.monthly_kwh) < report.monthly_cost[2]
+
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.test_request_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add_all(_appliances())
+		db.session.commit()
+		assign_plan(1, save_plan({"name": "LT-I", "fixed_charge": 100, "slabs": plan.describe()["slabs"]}).id)
+		db.session.commit()
+	data = client.get("/recommendations/sensitivity?samples=2000").get_json()
+	flat = run_sensitivity(_appliances(), 8.0, 0.7, samples=2000)
+	assert data["kpis"]["monthly_cost"]["p50"] != flat.monthly_cost[1]
+	assert data["kpis"]["monthly_cost"]["p50"] == pytest.approx(plan.bill(data["kpis"]["monthly_kwh"]), rel=0.05)
@@ -0,0 +1,124 @@
+import itertools
+import random
+import pytest
+from app import db
+from app.models import Appliance, Scenario, User
+from app.recommendations import generate_recommendations
+from app.batch import appliances_frame, users_frame, recommendation_frame
+from app.solver import optimize, optimize_frame, solve_knapsack
+
+
+def _brute_force(costs, values, budget):
+	best = 0.0
+	for n in range(len(costs) + 1):
+		for combo in itertools.combinations(range(len(costs)), n):
+			if sum(costs[i] for i in combo) <= budget:
+				best = max(best, sum(max(values[i], 0) for i in combo))
+	return best
+
+
+def test_knapsack_matches_brute_force():
+	rng = random.Random(5)
+	for _ in range(40):
+		n = rng.randint(1, 9)
+		costs = [rng.choice([0, 80, 160, 240, 800, 25000]) * rng.randint(0, 3) for _ in range(n)]
+		values = [round(rng.uniform(-5, 300), 2) for _ in range(n)]
+		budget = rng.choice([0, 100, 500, 1000, 30000])
+		sol = solve_knapsack(costs, values, budget)
+		assert sol.spent <= budget and sol.exact
+		assert sol.value == pytest.approx(_brute_force(costs, values, budget))
+
+
+def test_knapsack_never_exceeds_budget_when_discretized():
+	rng = random.Random(9)
+	costs = [rng.uniform(10, 5000) for _ in range(200)]
+	values = [rng.uniform(1, 100) for _ in range(200)]
+	sol = solve_knapsack(costs, values, 50000.5, max_cells=500)
+	assert not sol.exact
+	assert sol.spent <= 50000.5
+	with pytest.raises(ValueError):
+		solve_knapsack(costs, values, -1)
+
+
+def _appliances():
+	return [
+		Appliance(id=1, user_id=1, type="bulb", power_w=60, quantity=10, hours_per_day=6, days_per_week=7),
+		Appliance(id=2, user_id=1, type="tube", power_w=40, quantity=4, hours_per_day=5, days_per_week=7),
+		Appliance(id=3, user_id=1, type="AC", power_w=1500, quantity=1, hours_per_day=6, days_per_week=7),
+		Appliance(id=4, user_id=1, type="fridge", power_w=150, quantity=1, hours_per_day=24, days_per_week=7, star_label="2-star"),
+	]
+
+
+def test_optimize_picks_individual_lighting_swaps():
+	recs = generate_recommendations(_appliances(), 8.0, 0.7)
+	assert len({r.key for r in recs}) == len(recs)
+	plan = optimize(recs, budget=800)  # fits the 10-bulb swap (₹800) but not both swaps (₹1120)
+	keys = {r.key for r in plan.measures}
+	assert "lighting_swap:1" in keys and "lighting_swap:2" not in keys
+	assert {"ac_setpoint:3", "standby_cut"} <= keys  # free measures always included
+	assert plan.retrofit_cost == 800
+	assert optimize(recs, budget=0).retrofit_cost == 0
+	with pytest.raises(ValueError):
+		optimize(recs, 100, objective="speed")
+
+
+def test_optimize_frame_matches_per_user():
+	rng = random.Random(2)
+	users = [User(id=u, name=f"u{u}", tariff=rng.uniform(4, 12), ef=0.7) for u in (1, 2, 3)]
+	apps = []
+	for u in users:
+		for i in range(12):
+			apps.append(Appliance(id=len(apps) + 1, user_id=u.id, type=rng.choice(["bulb", "tube", "AC", "fridge", "tv"]),
+				power_w=rng.uniform(20, 1500), quantity=rng.randint(1, 8), hours_per_day=rng.uniform(1, 12), days_per_week=7))
+	frame = recommendation_frame(appliances_frame(apps), users_frame(users))
+	result = optimize_frame(frame, 3000, "kwh").set_index("user_id")
+	for u in users:
+		plan = optimize(generate_recommendations([a for a in apps if a.user_id == u.id], u.tariff, u.ef), 3000, "kwh")
+		row = result.loc[u.id]
+		assert row["saved_kwh"] == pytest.approx(plan.saved_kwh, abs=0.01)
+		assert row["retrofit_cost"] == pytest.approx(plan.retrofit_cost)
+
+
+def test_optimize_route(app, client):
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add_all(_appliances())
+		db.session.commit()
+	resp = client.get("/scenarios/optimize?budget=800&objective=cost")
+	assert resp.status_code == 200
+	assert "lighting_swap:1" in [m["key"] for m in resp.get_json()["measures"]]
+	assert client.get("/scenarios/optimize?budget=abc").status_code == 400
+
+	client.post("/scenarios/optimize", data={"budget": 800, "objective": "cost"})
+	client.post("/scenarios", data={"name": "one lamp", "measures": ["lighting_swap:2"]})
+	with app.app_context():
+		saved = Scenario.query.order_by(Scenario.id).all()
+		assert saved[0].name == "Best cost under ₹800"
+		assert [m.appliance_id for m in saved[1].measures] == [2]
+
+
+def test_optimize_scenarios_cli_bills_through_plans(app):
+	from app.tariffs import assign_plan, get_plans, save_plan
+
+	slabs = {"name": "LT-I", "slabs": [{"upto_kwh": 100, "rate": 4}, {"upto_kwh": 300, "rate": 8}, {"upto_kwh": None, "rate": 12}]}
+	with app.test_request_context():
+		db.session.add_all([User(id=1, name="a"), User(id=2, name="b")])
+		db.session.add_all(_appliances())
+		db.session.add_all([Appliance(id=10 + a.id, user_id=2, type=a.type, power_w=a.power_w, quantity=a.quantity,
+			hours_per_day=a.hours_per_day, days_per_week=a.days_per_week, star_label=a.star_label) for a in _appliances()])
+		db.session.commit()
+		plan = save_plan(slabs)
+		assign_plan(1, plan.id)
+		db.session.commit()
+		compiled = get_plans()[plan.id]
+
+	result = app.test_cli_runner().invoke(args=["optimize-scenarios", "--budget", "800"])
+	assert result.exit_code == 0, result.output
+	rows = {int(line.split(",")[0]): line.split(",") for line in result.output.splitlines()[1:]}
+	planned = optimize(generate_recommendations(_appliances(), 8.0, 0.7, None, compiled), 800)
+	flat = optimize(generate_recommendations(_appliances(), 8.0, 0.7), 800)
+	assert float(rows[1][4]) == pytest.approx(planned.saved_cost, abs=0.01)
+	assert float(rows[2][4]) == pytest.approx(flat.saved_cost, abs=0.01)
+	assert planned.saved_cost != flat.saved_cost
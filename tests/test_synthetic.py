@@ -0,0 +1,77 @@
+from datetime import date
+from sqlalchemy import func, select
+from app import create_app, db
+from app.models import Appliance, CityRollup, Log, Scenario, ScenarioMeasure, User
+from app.rollups import check
+from app.scenarios import reevaluate
+from app.synthetic import CATALOGUE, IdOffsets, SyntheticSpec, generate, generate_block
+
+SPEC = SyntheticSpec(users=130, seed=7, days=10, end=date(2025, 3, 4), scenario_share=0.3, block_size=50)
+
+
+def _dump(app):
+	with app.app_context():
+		return {
+			model.__tablename__: db.session.execute(select(*[c for c in model.__table__.c if c.name != "id"]).order_by(*model.__table__.c)).all()
+			for model in (User, Appliance, Log, Scenario, ScenarioMeasure, CityRollup)
+		}
+
+
+def test_blocks_are_deterministic_and_plausible():
+	a, b = generate_block(SPEC, 1), generate_block(SPEC, 1)
+	assert a.rows == b.rows and a.city_totals == b.city_totals
+	users = a.rows["users"]
+	assert [u[0] for u in users] == list(range(51, 101))
+	appliances = a.rows["appliances"]
+	assert [r[1] for r in appliances] == sorted(r[1] for r in appliances)  # grouped by user
+	assert [r[0] for r in appliances] == sorted(r[0] for r in appliances)
+	assert all(1 + 50 * len(CATALOGUE) <= r[0] < 1 + 100 * len(CATALOGUE) for r in appliances)
+	assert {r[2] for r in appliances} <= set(CATALOGUE)
+	assert all(r[3] > 0 and r[4] >= 1 and 0 < r[5] <= 24 and 1 <= r[6] <= 7 for r in appliances)
+	assert len(a.rows["logs"]) == 50 * SPEC.days
+	assert generate_block(SyntheticSpec(users=130, seed=8, block_size=50), 1).rows["appliances"] != appliances
+
+	shifted = generate_block(SPEC, 1, IdOffsets(user=11, appliance=1001, scenario=501))
+	assert [r[0] - 1000 for r in shifted.rows["appliances"]] == [r[0] for r in appliances]
+	owned = {r[0] for r in shifted.rows["appliances"]}
+	scenario_ids = {r[0] for r in shifted.rows["scenarios"]}
+	measures = shifted.rows["scenario_measures"]
+	assert scenario_ids and {m[0] for m in measures} == scenario_ids
+	assert all(m[4] is None or m[4] in owned for m in measures)
+
+
+def test_generate_matches_across_worker_counts(app, tmp_path):
+	with app.app_context():
+		db.session.add(User(id=1, name="existing", city="Delhi"))
+		db.session.commit()
+		report = generate(SPEC, workers=1)
+		assert report.first_user_id == 2 and report.users == 130
+		assert db.session.execute(select(func.count(User.id))).scalar() == 131
+		assert db.session.execute(select(func.count(Log.id))).scalar() == report.logs == 130 * SPEC.days
+		assert report.appliances > 130 * 4 and 0 < report.scenarios < 130
+		assert check() == []  # user and city rollups agree with the logs
+		measures = db.session.execute(select(ScenarioMeasure.id, ScenarioMeasure.delta_kwh_month, ScenarioMeasure.delta_cost_month).order_by(ScenarioMeasure.id)).all()
+		assert len(measures) == report.measures > report.scenarios
+		users = db.session.execute(select(Scenario.user_id)).scalars().all()
+		reevaluate(users, household=True)  # generated measures match what the rules compute
+		assert db.session.execute(select(ScenarioMeasure.id, ScenarioMeasure.delta_kwh_month, ScenarioMeasure.delta_cost_month).order_by(ScenarioMeasure.id)).all() == measures
+		db.session.rollback()
+
+	other = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'parallel.sqlite'}"})
+	with other.app_context():
+		db.session.add(User(id=1, name="existing", city="Delhi"))
+		db.session.commit()
+		generate(SPEC, workers=2)
+	assert _dump(app) == _dump(other)
+
+
+def test_generated_households_render(app, client):
+	runner = app.test_cli_runner()
+	result = runner.invoke(args=["generate-synthetic", "--users", "20", "--seed", "3", "--days", "7", "--end", "2025-01-31", "--workers", "1"])
+	assert result.exit_code == 0, result.output
+	assert '"users": 20' in result.output
+	with client.session_transaction() as sess:
+		sess["user_id"] = 5
+	assert client.get("/dashboard").status_code == 200
+	assert b"Household 5" in client.get("/onboarding").data
+	assert client.get("/api/v1/kpis").get_json()["kpis"]["daily_kwh"] > 0
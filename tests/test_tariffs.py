@@ -0,0 +1,126 @@
+import math
+from datetime import date
+import numpy as np
+import pytest
+from app import db
+from app.models import Appliance, User
+from app.calculations import compute_kpis
+from app.recommendations import generate_recommendations
+from app.batch import appliances_frame, compute_kpis_batch, load_users_frame, recommendation_frame
+from app.tariffs import CompiledTariff, assign_plan, get_plans, rebill, save_plan, tariff_curve, validate_plan
+
+SLABS = {
+	"name": "LT-I",
+	"fixed_charge": 100,
+	"slabs": [{"upto_kwh": 100, "rate": 4}, {"upto_kwh": 300, "rate": 8}, {"upto_kwh": None, "rate": 12}],
+	"bands": [{"start_hour": 22, "end_hour": 6, "adjust": -1.5}],
+}
+
+
+def _plan(telescopic=True, bands=None):
+	return CompiledTariff(1, "p", [100, 300, math.inf], [4, 8, 12], 100.0, telescopic, bands)
+
+
+def test_slab_bills():
+	p = _plan()
+	assert p.bill(0) == 100
+	assert p.bill(100) == 100 + 400
+	assert p.bill(250) == 100 + 400 + 150 * 8
+	assert p.bill(400) == 100 + 400 + 1600 + 100 * 12
+	assert _plan(telescopic=False).bill(250) == 100 + 250 * 8
+	kwh = np.array([0, 50, 100, 250, 400, 1000])
+	assert np.allclose(p.bill_array(kwh), [p.bill(k) for k in kwh])
+	assert p.saving(250, 200) == pytest.approx(p.bill(250) - p.bill(50))
+	assert CompiledTariff.flat(8).bill(10) == 80
+
+
+def test_time_of_day_bands():
+	adjust = [-1.5] * 6 + [0.0] * 16 + [-1.5] * 2  # 22:00-06:00 rebate
+	p = _plan(bands=adjust)
+	assert p.bill(120) == pytest.approx(_plan().bill(120) - 120 * 1.5 * 8 / 24)
+	night_only = [1 / 8 if h < 6 or h >= 22 else 0.0 for h in range(24)]
+	assert p.bill(120, night_only) == pytest.approx(_plan().bill(120) - 120 * 1.5)
+
+
+def test_validate_plan_rejects_bad_definitions():
+	assert validate_plan(SLABS)["slabs"][-1] == (None, 12.0)
+	for bad in (
+		{"name": "x", "slabs": []},
+		{"name": "x", "slabs": [{"upto_kwh": 100, "rate": 4}]},
+		{"name": "x", "slabs": [{"upto_kwh": 300, "rate": 4}, {"upto_kwh": 100, "rate": 5}, {"rate": 6}]},
+		{"name": "x", "slabs": [{"rate": 4}], "bands": [{"start_hour": 25, "end_hour": 3, "adjust": 1}]},
+		{"name": "x", "slabs": [{"upto": 4}]},
+		{"name": "x", "slabs": [{"rate": 4}], "telescopic": "false"},
+		{"name": "x", "slabs": [{"rate": 4}], "telescopic": 0},
+		{"name": "x", "slabs": [{"upto_kwh": "inf", "rate": 4}, {"rate": 6}]},
+		{"name": "x", "slabs": [{"upto_kwh": 100, "rate": math.nan}, {"rate": 6}]},
+		{"name": "x", "slabs": [{"rate": math.inf}]},
+		{"name": "x", "slabs": [{"rate": 4}], "fixed_charge": "nan"},
+		{"name": "x", "slabs": [{"rate": 4}], "bands": [{"start_hour": 1, "end_hour": 3, "adjust": -math.inf}]},
+		[],
+	):
+		with pytest.raises(ValueError):
+			validate_plan(bad)
+	assert validate_plan({**SLABS, "telescopic": False})["telescopic"] is False
+
+
+def _appliances(user_id=1):
+	return [
+		Appliance(id=user_id * 10 + 1, user_id=user_id, type="bulb", power_w=60, quantity=10, hours_per_day=6, days_per_week=7),
+		Appliance(id=user_id * 10 + 2, user_id=user_id, type="AC", power_w=1500, quantity=1, hours_per_day=6, days_per_week=7),
+	]
+
+
+def test_plan_flows_into_kpis_and_recommendations(app):
+	with app.test_request_context():
+		db.session.add_all([User(id=1, name="a"), User(id=2, name="b")])
+		db.session.add_all(_appliances(1) + _appliances(2))
+		db.session.commit()
+		plan = save_plan(SLABS)
+		assign_plan(1, plan.id)
+		db.session.commit()
+		compiled = get_plans()[plan.id]
+
+		kpis = compute_kpis(_appliances(), 8.0, 0.7, compiled)
+		assert kpis["monthly_cost"] == round(compiled.bill(kpis["monthly_kwh"]), 2)
+		recs = generate_recommendations(_appliances(), 8.0, 0.7, None, compiled)
+		ac = next(r for r in recs if r.code == "ac_setpoint")
+		assert ac.delta_cost_month == round(compiled.saving(kpis["monthly_kwh"], ac.delta_kwh_month), 2)
+
+		users = load_users_frame()
+		apps = appliances_frame(Appliance.query.order_by(Appliance.id).all())
+		batch = compute_kpis_batch(apps, users, plans=get_plans())
+		assert batch.loc[1, "monthly_cost"] == kpis["monthly_cost"]
+		assert batch.loc[2, "monthly_cost"] == compute_kpis(_appliances(2), 8.0, 0.7)["monthly_cost"]
+		frame = recommendation_frame(apps, users, plans=get_plans())
+		row = frame[(frame["user_id"] == 1) & (frame["code"] == "ac_setpoint")].iloc[0]
+		assert row["delta_cost_month"] == ac.delta_cost_month
+
+		bills = rebill(date(2025, 3, 1), [1, 2]).set_index("user_id")
+		assert bills.loc[1, "bill"] == kpis["monthly_cost"] and bills.loc[1, "source"] == "estimate"
+
+
+def test_tariff_curve():
+	assert tariff_curve(100, None, [5, 10]) == [[5, 500], [10, 1000]]
+	p = _plan()
+	curve = dict((t, c) for t, c in tariff_curve(250, p, [4, 8]))
+	assert curve[8] - 100 == pytest.approx((p.bill(250) - 100) * 8 / ((p.bill(250) - 100) / 250))
+
+
+def test_admin_and_profile_routes(app, client):
+	with client.session_transaction() as sess:
+		sess["user_id"] = 1
+	with app.app_context():
+		db.session.add(User(id=1, name="a"))
+		db.session.add_all(_appliances())
+		db.session.commit()
+	assert app.test_client().post("/admin/tariffs", json=SLABS).status_code == 403
+	assert client.post("/admin/tariffs", json={"name": "x"}).status_code == 400
+	assert client.post("/admin/tariffs", data='{"name": "x", "slabs": [{"rate": NaN}]}', content_type="application/json").status_code == 400
+	created = client.post("/admin/tariffs", json=SLABS).get_json()
+	assert created["slabs"][-1] == {"upto_kwh": None, "rate": 12.0}
+	flat_cost = client.get("/export/csv").data.decode().rsplit("monthly_cost,", 1)[1].split()[0]
+	client.post("/onboarding", data={"name": "a", "tariff": 8, "ef": 0.7, "household_size": 3, "city": "", "tariff_plan_id": str(created["id"])})
+	plan_cost = client.get("/export/csv").data.decode().rsplit("monthly_cost,", 1)[1].split()[0]
+	assert flat_cost != plan_cost
+	assert b"data-curve" in client.get("/onboarding").data